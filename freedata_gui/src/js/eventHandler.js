@@ -217,6 +217,7 @@ export function eventDispatcher(data) {
     case "arq":
       if (data["arq-transfer-outbound"]) {
         stateStore.arq_is_receiving = false;
+        mergeHistograms(data["arq-transfer-outbound"]);
         switch (data["arq-transfer-outbound"].state) {
           case "NEW":
             message = `
@@ -273,16 +274,6 @@ export function eventDispatcher(data) {
             );
             stateStore.arq_total_bytes =
               data["arq-transfer-outbound"].total_bytes;
-            stateStore.arq_speed_list_timestamp.value = toRaw(
-              data["arq-transfer-outbound"].statistics.time_histogram,
-            );
-            stateStore.arq_speed_list_bpm.value = toRaw(
-              data["arq-transfer-outbound"].statistics.bpm_histogram,
-            );
-            stateStore.arq_speed_list_snr.value = toRaw(
-              data["arq-transfer-outbound"].statistics.snr_histogram,
-            );
-
             stateStore.arq_bytes_per_minute =
               data["arq-transfer-outbound"].statistics.bytes_per_minute;
             stateStore.arq_bits_per_second =
@@ -374,6 +365,7 @@ export function eventDispatcher(data) {
 
       if (data["arq-transfer-inbound"]) {
         stateStore.arq_is_receiving = true;
+        mergeHistograms(data["arq-transfer-inbound"]);
         switch (data["arq-transfer-inbound"].state) {
           case "NEW":
             message = `
@@ -458,16 +450,6 @@ export function eventDispatcher(data) {
             );
             stateStore.arq_total_bytes =
               data["arq-transfer-inbound"].received_bytes;
-            stateStore.arq_speed_list_timestamp.value = toRaw(
-              data["arq-transfer-inbound"].statistics.time_histogram,
-            );
-            stateStore.arq_speed_list_bpm.value = toRaw(
-              data["arq-transfer-inbound"].statistics.bpm_histogram,
-            );
-            stateStore.arq_speed_list_snr.value = toRaw(
-              data["arq-transfer-inbound"].statistics.snr_histogram,
-            );
-
             stateStore.arq_bytes_per_minute =
               data["arq-transfer-inbound"].statistics.bytes_per_minute;
             stateStore.arq_bits_per_second =
@@ -563,6 +545,38 @@ export function eventDispatcher(data) {
   }
 }
 
+// progress events only carry the histogram entries added since the previous event,
+// keyed by the number of the sample. They are merged in every state, a delta
+// isn't sent again. The first delta of a session starts the charts anew.
+const HISTOGRAM_SIZE = 20;
+const HISTOGRAMS = {
+  arq_speed_list_timestamp: "time_histogram",
+  arq_speed_list_bpm: "bpm_histogram",
+  arq_speed_list_snr: "snr_histogram",
+};
+let histogramSession = null;
+function mergeHistograms(transfer) {
+  const statistics = transfer.statistics;
+  // the statistics at the end of a session have complete histograms numbered from 0
+  if (!statistics || !statistics.histogram_delta) {
+    return;
+  }
+  const reset =
+    statistics.histogram_reset || transfer.session_id !== histogramSession;
+  histogramSession = transfer.session_id;
+  // all charts share the sample numbers, the timestamps are their labels
+  for (const [list, name] of Object.entries(HISTOGRAMS)) {
+    const merged = reset ? {} : { ...toRaw(stateStore[list].value) };
+    Object.assign(merged, toRaw(statistics[name]) || {});
+    // integer keys are kept in ascending order
+    const keys = Object.keys(merged);
+    for (const key of keys.slice(0, Math.max(0, keys.length - HISTOGRAM_SIZE))) {
+      delete merged[key];
+    }
+    stateStore[list].value = merged;
+  }
+}
+
 function build_HSL() {
   for (let i = 0; i < stateStore.activities.length; i++) {
     if (
@@ -0,0 +1,236 @@
+"""
+Airtime and channel utilization accounting.
+
+Keeps track of our own transmissions, decoded transmissions of other stations
+and the busy state of the channel, and summarizes them over rolling windows.
+"""
+import threading
+import time
+from collections import deque, defaultdict
+import numpy as np
+from modem_frametypes import FRAME_TYPE as FR_TYPE
+
+# rolling windows in seconds
+WINDOWS = {
+    "1m": 60,
+    "1h": 3600,
+    "24h": 86400,
+}
+
+# window the optional duty cycle limit applies to
+DUTY_CYCLE_WINDOW = WINDOWS["1h"]
+
+# frame types carrying their session id in the second byte
+SESSION_FRAME_TYPES = {
+    frame_type.value: frame_type.name.split("_")[0]
+    for frame_type in FR_TYPE
+    if frame_type.name.startswith(("ARQ_", "P2P_CONNECTION_"))
+}
+
+# don't account a channel state for longer than this, e.g. while the modem wasn't running
+MAX_CHANNEL_STATE_AGE = 1.0
+
+
+def describe_frame(frame: bytes):
+    """
+    Get frame type and session of a frame
+
+    :param frame: frame as transmitted, or a burst of frames
+    :type frame: bytes
+    :return: frame type name, session key or None
+    :rtype: tuple
+    """
+    if isinstance(frame, list):
+        frame = frame[0] if frame else None
+    if not frame:
+        return "UNKNOWN", None
+    try:
+        frame_type = FR_TYPE(frame[0]).name
+    except ValueError:
+        return "UNKNOWN", None
+    session = None
+    if frame[0] in SESSION_FRAME_TYPES and len(frame) > 1:
+        session = f"{SESSION_FRAME_TYPES[frame[0]]}-{frame[1]}"
+    return frame_type, session
+
+
+class AirtimeAccounting:
+    """
+    Accounts airtime of transmissions and the channel busy state over the last 24 hours
+
+    Transmissions are kept as events, the channel busy state is integrated
+    into per second buckets.
+    """
+
+    BUCKETS = WINDOWS["24h"]
+
+    def __init__(self, slots: int = 5):
+        self.lock = threading.Lock()
+        self.slots = slots
+
+        # (timestamp, seconds, mode, frame type, session)
+        self.tx_events = deque()
+        # (timestamp, seconds, mode, frame type, station)
+        self.rx_events = deque()
+
+        # busy time per second in centiseconds, column 0 is the channel, then one column per slot
+        self.busy_centiseconds = np.zeros((self.BUCKETS, slots + 1), dtype=np.uint8)
+        # second each bucket belongs to, for detecting outdated buckets
+        self.bucket_second = np.full(self.BUCKETS, -1, dtype=np.int64)
+
+        self.last_channel_update = None
+        self.last_channel_state = None
+
+    def record_tx(self, seconds: float, mode: str, frame_type: str = "UNKNOWN", session=None, timestamp=None) -> None:
+        """
+        Account one of our own transmissions
+
+        :param seconds: airtime of the transmission
+        :type seconds: float
+        :param mode: name of the mode
+        :type mode: str
+        :param frame_type: name of the frame type
+        :type frame_type: str
+        :param session: session key, if the frame belongs to a session
+        :type session: str
+        :param timestamp: unix time of the transmission, defaults to now
+        :type timestamp: float
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            self.tx_events.append((timestamp, seconds, mode, frame_type, session))
+            self.prune(timestamp)
+
+    def record_rx(self, seconds: float, mode: str, frame_type: str = "UNKNOWN", station=None, timestamp=None) -> None:
+        """
+        Account a decoded transmission of another station
+
+        :param seconds: airtime of the transmission
+        :type seconds: float
+        :param mode: name of the mode
+        :type mode: str
+        :param frame_type: name of the frame type
+        :type frame_type: str
+        :param station: callsign of the station, if known
+        :type station: str
+        :param timestamp: unix time of the transmission, defaults to now
+        :type timestamp: float
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            self.rx_events.append((timestamp, seconds, mode, frame_type, station))
+            self.prune(timestamp)
+
+    def record_channel_state(self, slot_busy, timestamp=None) -> None:
+        """
+        Update the busy state of the slots. The previous state is accounted
+        for the time passed since the last update.
+
+        :param slot_busy: busy state per slot
+        :type slot_busy: list
+        :param timestamp: unix time of the update, defaults to now
+        :type timestamp: float
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        state = np.zeros(self.slots + 1, dtype=bool)
+        state[1:] = np.asarray(slot_busy, dtype=bool)[:self.slots]
+        state[0] = state[1:].any()
+
+        with self.lock:
+            if self.last_channel_state is not None and self.last_channel_state[0]:
+                elapsed = min(timestamp - self.last_channel_update, MAX_CHANNEL_STATE_AGE)
+                if elapsed > 0:
+                    self.add_busy_time(self.last_channel_update, elapsed, self.last_channel_state)
+            self.last_channel_update = timestamp
+            self.last_channel_state = state
+
+    def add_busy_time(self, start: float, seconds: float, state: np.ndarray) -> None:
+        busy = state.astype(np.int16)
+        while seconds > 1e-6:
+            second = int(start)
+            part = min(seconds, second + 1 - start)
+            bucket = second % self.BUCKETS
+            if self.bucket_second[bucket] != second:
+                self.bucket_second[bucket] = second
+                self.busy_centiseconds[bucket] = 0
+            added = self.busy_centiseconds[bucket] + busy * int(round(part * 100))
+            self.busy_centiseconds[bucket] = np.minimum(added, 100)
+            start += part
+            seconds -= part
+
+    def prune(self, now: float) -> None:
+        oldest = now - WINDOWS["24h"]
+        for events in (self.tx_events, self.rx_events):
+            while events and events[0][0] < oldest:
+                events.popleft()
+
+    def tx_seconds(self, window: float, now=None) -> float:
+        """
+        Our own airtime within a window
+
+        :param window: window in seconds
+        :type window: float
+        :param now: end of the window, defaults to now
+        :type now: float
+        :return: seconds
+        :rtype: float
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            return sum(event[1] for event in self.tx_events if event[0] > now - window)
+
+    def is_duty_cycle_exceeded(self, limit_percent: float, now=None) -> bool:
+        """
+        Check our duty cycle of the last hour against a limit
+
+        :param limit_percent: limit in percent, 0 or None for no limit
+        :type limit_percent: float
+        :return: True if we reached the limit
+        :rtype: bool
+        """
+        if not limit_percent:
+            return False
+        return self.tx_seconds(DUTY_CYCLE_WINDOW, now) / DUTY_CYCLE_WINDOW * 100 >= limit_percent
+
+    @staticmethod
+    def sum_by(events, index):
+        result = defaultdict(float)
+        for event in events:
+            if event[index] is not None:
+                result[event[index]] += event[1]
+        return {key: round(value, 2) for key, value in result.items()}
+
+    def window_summary(self, window: float, now: float) -> dict:
+        with self.lock:
+            tx_events = [event for event in self.tx_events if event[0] > now - window]
+            rx_events = [event for event in self.rx_events if event[0] > now - window]
+            in_window = (self.bucket_second > now - window) & (self.bucket_second <= now)
+            busy = self.busy_centiseconds[in_window].sum(axis=0, dtype=np.int64) / 100
+
+        tx_seconds = sum(event[1] for event in tx_events)
+        rx_seconds = sum(event[1] for event in rx_events)
+        return {
+            "tx_seconds": round(tx_seconds, 2),
+            "tx_duty_cycle": round(tx_seconds / window * 100, 2),
+            "tx_by_mode": self.sum_by(tx_events, 2),
+            "tx_by_frame_type": self.sum_by(tx_events, 3),
+            "tx_by_session": self.sum_by(tx_events, 4),
+            "rx_seconds": round(rx_seconds, 2),
+            "rx_by_mode": self.sum_by(rx_events, 2),
+            "rx_by_frame_type": self.sum_by(rx_events, 3),
+            "rx_by_station": self.sum_by(rx_events, 4),
+            "channel_busy": round(busy[0] / window * 100, 2),
+            "slot_busy": [round(value / window * 100, 2) for value in busy[1:]],
+        }
+
+    def summary(self, now=None) -> dict:
+        """
+        Summarize the airtime for all windows
+
+        :param now: end of the windows, defaults to now
+        :type now: float
+        :return: summary per window, times in seconds, duty cycles in percent
+        :rtype: dict
+        """
+        now = time.time() if now is None else now
+        return {name: self.window_summary(window, now) for name, window in WINDOWS.items()}
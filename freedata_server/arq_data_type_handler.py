@@ -4,14 +4,24 @@ import structlog
 import lzma
 import gzip
 import zlib
-from message_p2p import message_received, message_failed, message_transmitted
+import struct
+from message_p2p import message_received, message_failed, message_transmitted, message_requeued
 from enum import Enum
 
+# a batch of p2p messages starts with version and number of messages, followed by an index with
+# end in the compressed stream and length of each message, then a single deflate stream which is
+# flushed after every message. Messages within a received part of the batch can be decompressed.
+BATCH_VERSION = 1
+BATCH_HEADER = struct.Struct(">BB")
+BATCH_INDEX_ENTRY = struct.Struct(">II")
+BATCH_MAX_MESSAGES = 255
+
 class ARQ_SESSION_TYPES(Enum):
     raw = 0
     raw_lzma = 10
     raw_gzip = 11
     p2pmsg_zlib = 20
+    p2pmsg_batch_zlib = 21
     p2p_connection = 30
 
 class ARQDataTypeHandler:
@@ -19,6 +29,9 @@ class ARQDataTypeHandler:
         self.logger = structlog.get_logger(type(self).__name__)
         self.event_manager = event_manager
         self.state_manager = state_manager
+        # messages of a batch already delivered by this session, an IRS delivers
+        # the received part when it fails and the rest if the ISS completes the batch later on
+        self.delivered_batch_messages = 0
 
         self.handlers = {
             ARQ_SESSION_TYPES.raw: {
@@ -45,6 +58,14 @@ class ARQDataTypeHandler:
                 'failed' : self.failed_p2pmsg_zlib,
                 'transmitted': self.transmitted_p2pmsg_zlib,
             },
+            ARQ_SESSION_TYPES.p2pmsg_batch_zlib: {
+                'prepare': self.prepare_p2pmsg_batch_zlib,
+                'handle': self.handle_p2pmsg_batch_zlib,
+                'failed': self.failed_p2pmsg_batch_zlib,
+                'failed_partial': self.failed_partial_p2pmsg_batch_zlib,
+                'received_partial': self.received_partial_p2pmsg_batch_zlib,
+                'transmitted': self.transmitted_p2pmsg_batch_zlib,
+            },
             ARQ_SESSION_TYPES.p2p_connection: {
                 'prepare': self.prepare_p2p_connection,
                 'handle': self.handle_p2p_connection,
@@ -70,16 +91,28 @@ class ARQDataTypeHandler:
         else:
             self.log(f"Unknown handling endpoint for type: {type_byte}", isWarning=True)
 
-    def failed(self, type_byte: int, data: bytearray, statistics: dict):
+    def failed(self, type_byte: int, data: bytearray, statistics: dict, confirmed_bytes: int = 0):
         session_type = self.get_session_type_from_value(type_byte)
 
         self.state_manager.setARQ(False)
 
+        # some types make use of the part the IRS confirmed
+        if confirmed_bytes and session_type in self.handlers and 'failed_partial' in self.handlers[session_type]:
+            return self.handlers[session_type]['failed_partial'](data, statistics, confirmed_bytes)
+
         if session_type in self.handlers and 'failed' in self.handlers[session_type]:
             return self.handlers[session_type]['failed'](data, statistics)
         else:
             self.log(f"Unknown handling endpoint: {session_type}", isWarning=True)
 
+    def received_partial(self, type_byte: int, data: bytearray, statistics: dict):
+        """
+        Handle the contiguously received part of a failed transmission, if the type supports it
+        """
+        session_type = self.get_session_type_from_value(type_byte)
+        if session_type in self.handlers and 'received_partial' in self.handlers[session_type]:
+            return self.handlers[session_type]['received_partial'](data, statistics)
+
     def prepare(self, data: bytearray, session_type=ARQ_SESSION_TYPES.raw):
         if session_type in self.handlers and 'prepare' in self.handlers[session_type]:
             return self.handlers[session_type]['prepare'](data), session_type.value
@@ -186,6 +219,109 @@ class ARQDataTypeHandler:
         return decompressed_data
     
     
+    def prepare_p2pmsg_batch_zlib(self, payloads):
+        compressor = zlib.compressobj(level=6, wbits=-zlib.MAX_WBITS, strategy=zlib.Z_FILTERED)
+        index = bytearray()
+        stream = bytearray()
+        for payload in payloads[:BATCH_MAX_MESSAGES]:
+            stream += compressor.compress(payload)
+            stream += compressor.flush(zlib.Z_SYNC_FLUSH)
+            index += BATCH_INDEX_ENTRY.pack(len(stream), len(payload))
+        stream += compressor.flush()
+        compressed_data = bytearray(BATCH_HEADER.pack(BATCH_VERSION, len(payloads[:BATCH_MAX_MESSAGES]))) + index + stream
+
+        self.log(f"Preparing ZLIB compressed P2PMSG batch: {len(payloads)} messages, {sum(map(len, payloads))} Bytes >>> {len(compressed_data)} Bytes")
+        return compressed_data
+
+    def unpack_p2pmsg_batch(self, data, available=None):
+        """
+        Messages of a batch which are completely within the first available bytes
+
+        :param data: batch
+        :type data: bytes
+        :param available: number of valid bytes, defaults to all
+        :type available: int
+        :return: message payloads
+        :rtype: list
+        """
+        available = len(data) if available is None else min(available, len(data))
+        if available < BATCH_HEADER.size:
+            return []
+        version, count = BATCH_HEADER.unpack_from(data)
+        if version != BATCH_VERSION:
+            self.log(f"Unknown P2PMSG batch version {version}", isWarning=True)
+            return []
+        stream_start = BATCH_HEADER.size + count * BATCH_INDEX_ENTRY.size
+        if available < stream_start:
+            return []
+
+        entries = []
+        for position in range(count):
+            end, length = BATCH_INDEX_ENTRY.unpack_from(data, BATCH_HEADER.size + position * BATCH_INDEX_ENTRY.size)
+            if stream_start + end > available:
+                break
+            entries.append((end, length))
+        if not entries:
+            return []
+
+        try:
+            decompressor = zlib.decompressobj(wbits=-zlib.MAX_WBITS)
+            decompressed_data = decompressor.decompress(bytes(data[stream_start:stream_start + entries[-1][0]]))
+        except zlib.error as e:
+            self.log(f"Error decompressing P2PMSG batch: {e}", isWarning=True)
+            return []
+
+        payloads = []
+        position = 0
+        for _, length in entries:
+            payloads.append(decompressed_data[position:position + length])
+            position += length
+        return payloads
+
+    def deliver_p2pmsg_batch(self, payloads, statistics):
+        for payload in payloads[self.delivered_batch_messages:]:
+            message_received(self.event_manager, self.state_manager, payload, statistics)
+        self.delivered_batch_messages = max(self.delivered_batch_messages, len(payloads))
+
+    def handle_p2pmsg_batch_zlib(self, data, statistics):
+        payloads = self.unpack_p2pmsg_batch(data)
+        self.log(f"Handling ZLIB compressed P2PMSG batch: {len(payloads)} messages from {len(data)} Bytes")
+        self.deliver_p2pmsg_batch(payloads, statistics)
+        return payloads
+
+    def received_partial_p2pmsg_batch_zlib(self, data, statistics):
+        payloads = self.unpack_p2pmsg_batch(data)
+        self.log(f"Handling partially received P2PMSG batch: {len(payloads)} complete messages in {len(data)} Bytes", isWarning=True)
+        self.deliver_p2pmsg_batch(payloads, statistics)
+        return payloads
+
+    def failed_p2pmsg_batch_zlib(self, data, statistics):
+        payloads = self.unpack_p2pmsg_batch(data)
+        self.log(f"Handling failed P2PMSG batch: {len(payloads)} messages", isWarning=True)
+        for payload in payloads:
+            message_failed(self.event_manager, self.state_manager, payload, statistics)
+        return payloads
+
+    def failed_partial_p2pmsg_batch_zlib(self, data, statistics, confirmed_bytes):
+        payloads = self.unpack_p2pmsg_batch(data)
+        delivered = len(self.unpack_p2pmsg_batch(data, confirmed_bytes))
+        if not delivered:
+            return self.failed_p2pmsg_batch_zlib(data, statistics)
+
+        # the IRS got the first messages, the others are sent again with the next session
+        self.log(f"Handling partially failed P2PMSG batch: {delivered} of {len(payloads)} messages confirmed", isWarning=True)
+        for payload in payloads[:delivered]:
+            message_transmitted(self.event_manager, self.state_manager, payload, statistics)
+        for payload in payloads[delivered:]:
+            message_requeued(self.event_manager, self.state_manager, payload, statistics)
+        return payloads
+
+    def transmitted_p2pmsg_batch_zlib(self, data, statistics):
+        payloads = self.unpack_p2pmsg_batch(data)
+        for payload in payloads:
+            message_transmitted(self.event_manager, self.state_manager, payload, statistics)
+        return payloads
+
     def prepare_p2p_connection(self, data):
         compressed_data = gzip.compress(data)
         self.log(f"Preparing gzip compressed P2P_CONNECTION data: {len(data)} Bytes >>> {len(compressed_data)} Bytes")
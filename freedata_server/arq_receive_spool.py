@@ -0,0 +1,197 @@
+"""
+Receive buffers of IRS sessions, optionally backed by spool files.
+
+A spool file is named after the ISS callsign and the CRC of the transfer and
+consists of a small header and the data, mapped into memory. The header holds
+the number of contiguously received bytes, so after a restart of the server
+the IRS can answer ARQ_SESSION_INFO with the offset it really has and the ISS
+continues from there. The pages of a memory mapped file are written back by the
+operating system, large transfers therefore don't need to stay in RAM.
+
+Without a spool directory, the buffer is an anonymous mapping which isn't kept.
+"""
+import mmap
+import os
+import re
+import struct
+import time
+import structlog
+import helpers
+
+SPOOL_MAGIC = b"FDSP"
+SPOOL_VERSION = 1
+SPOOL_SUFFIX = ".spool"
+
+# magic, version, total length, contiguously received bytes
+SPOOL_HEADER = struct.Struct(">4sBQQ")
+
+# seconds until an untouched spool file gets deleted, if not configured
+DEFAULT_MAX_AGE = 24 * 3600
+
+log = structlog.get_logger("arq_receive_spool")
+
+
+def get_spool_path(directory: str, dxcall: str, total_crc: str) -> str:
+    """
+    Spool file of a transfer
+
+    :param directory: spool directory
+    :type directory: str
+    :param dxcall: callsign of the ISS
+    :type dxcall: str
+    :param total_crc: CRC of the transfer as hex string
+    :type total_crc: str
+    :return: path of the spool file
+    :rtype: str
+    """
+    # callsigns come from the air, keep them from leaving the directory
+    name = re.sub(r"[^A-Za-z0-9-]", "_", f"{dxcall}_{total_crc}")
+    return os.path.join(directory, name + SPOOL_SUFFIX)
+
+
+class ReceiveSpool:
+    """
+    Fixed size buffer of a transfer with the number of contiguously received bytes
+    """
+
+    def __init__(self, total_length: int, path: str = None):
+        """
+        :param total_length: length of the transfer
+        :type total_length: int
+        :param path: spool file, None for a buffer in memory only
+        :type path: str
+        """
+        self.path = path
+        self.total_length = total_length
+        self.file = None
+        size = SPOOL_HEADER.size + max(total_length, 1)
+
+        if path is None:
+            self.map = mmap.mmap(-1, size)
+            self.write_header(0)
+            return
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        valid = os.path.exists(path) and os.path.getsize(path) == size and self.read_file_header(path) == total_length
+        self.file = open(path, "r+b" if valid else "w+b")
+        if not valid:
+            self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        if not valid:
+            self.write_header(0)
+
+    @staticmethod
+    def read_file_header(path: str):
+        try:
+            with open(path, "rb") as file:
+                magic, version, total_length, _ = SPOOL_HEADER.unpack(file.read(SPOOL_HEADER.size))
+        except (OSError, struct.error):
+            return None
+        if magic != SPOOL_MAGIC or version != SPOOL_VERSION:
+            return None
+        return total_length
+
+    def write_header(self, offset: int) -> None:
+        SPOOL_HEADER.pack_into(self.map, 0, SPOOL_MAGIC, SPOOL_VERSION, self.total_length, offset)
+
+    @property
+    def offset(self) -> int:
+        """
+        Number of contiguously received bytes, as persisted
+        """
+        return min(SPOOL_HEADER.unpack_from(self.map, 0)[3], self.total_length)
+
+    def set_offset(self, offset: int) -> None:
+        """
+        Persist the number of contiguously received bytes, after the data has been written
+        """
+        self.write_header(min(offset, self.total_length))
+        if self.file:
+            self.map.flush()
+
+    def write(self, offset: int, data) -> int:
+        """
+        Write received data, cut at the end of the transfer
+
+        :return: number of bytes written
+        :rtype: int
+        """
+        data = data[:max(0, self.total_length - offset)]
+        start = SPOOL_HEADER.size + offset
+        self.map[start:start + len(data)] = data
+        return len(data)
+
+    def read(self, length: int = None) -> bytearray:
+        """
+        Data from the start of the transfer
+
+        :param length: number of bytes, defaults to the whole transfer
+        :type length: int
+        """
+        length = self.total_length if length is None else min(length, self.total_length)
+        return bytearray(self.map[SPOOL_HEADER.size:SPOOL_HEADER.size + length])
+
+    def update_crc(self, crc: int, start: int, end: int) -> int:
+        """
+        Continue a CRC-32 with the data of a range, without copying it
+
+        :param crc: CRC-32 of the data in front of start
+        :type crc: int
+        :return: CRC-32 of the data up to end
+        :rtype: int
+        """
+        with memoryview(self.map) as view, view[SPOOL_HEADER.size + start:SPOOL_HEADER.size + end] as data:
+            return helpers.update_crc_32(crc, data)
+
+    def close(self) -> None:
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def delete(self) -> None:
+        self.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def open_spool(directory: str, dxcall: str, total_crc: str, total_length: int) -> ReceiveSpool:
+    """
+    Open the receive buffer of a transfer, continuing a spool file if there is one
+
+    :param directory: spool directory, empty for a buffer in memory only
+    :type directory: str
+    """
+    if not directory:
+        return ReceiveSpool(total_length)
+    try:
+        return ReceiveSpool(total_length, get_spool_path(directory, dxcall, total_crc))
+    except OSError as e:
+        log.warning("[SPOOL] can't use spool file, receiving into memory", directory=directory, e=e)
+        return ReceiveSpool(total_length)
+
+
+def expire_spools(directory: str, max_age: float = DEFAULT_MAX_AGE, now: float = None) -> int:
+    """
+    Delete spool files which haven't been written for max_age seconds
+
+    :return: number of deleted files
+    :rtype: int
+    """
+    if not directory or not os.path.isdir(directory):
+        return 0
+    now = time.time() if now is None else now
+    deleted = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if not name.endswith(SPOOL_SUFFIX):
+            continue
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+                deleted += 1
+        except OSError as e:
+            log.warning("[SPOOL] can't delete spool file", path=path, e=e)
+    return deleted
@@ -0,0 +1,113 @@
+"""
+Building blocks of selective repeat ARQ.
+
+The IRS keeps the received byte ranges in a RangeMap and acknowledges a burst
+with the number of contiguously received bytes and a bitmap of the following
+frames. The ISS puts the acknowledged ranges in its own RangeMap and only
+repeats the frames which aren't covered.
+"""
+import bisect
+
+# version of the ARQ protocol supporting selective repeat, advertised in ARQ_SESSION_OPEN_ACK
+SELECTIVE_REPEAT_VERSION = 2
+
+# frames a single ARQ_BURST_ACK_SR can acknowledge beyond the contiguous offset
+BITMAP_BITS = 32
+
+
+class RangeMap:
+    """
+    Sorted, merged list of [start, end) byte ranges
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def add(self, start: int, end: int) -> None:
+        """
+        Add a range, merging it with overlapping and adjacent ranges
+
+        :param start: first byte
+        :type start: int
+        :param end: byte after the last one
+        :type end: int
+        """
+        if end <= start:
+            return
+        # first range ending at or after start and last range starting at or before end
+        first = bisect.bisect_left(self.ends, start)
+        last = bisect.bisect_right(self.starts, end)
+        if first < last:
+            start = min(start, self.starts[first])
+            end = max(end, self.ends[last - 1])
+        self.starts[first:last] = [start]
+        self.ends[first:last] = [end]
+
+    def contains(self, start: int, end: int) -> bool:
+        """
+        Check if a range is covered completely
+        """
+        index = bisect.bisect_right(self.starts, start) - 1
+        return index >= 0 and self.ends[index] >= end
+
+    def contiguous(self, start: int = 0) -> int:
+        """
+        End of the range covering start, or start if it isn't covered
+        """
+        index = bisect.bisect_right(self.starts, start) - 1
+        if index >= 0 and self.ends[index] >= start:
+            return self.ends[index]
+        return start
+
+    def ranges(self) -> list:
+        return list(zip(self.starts, self.ends))
+
+    def __len__(self):
+        return sum(end - start for start, end in zip(self.starts, self.ends))
+
+
+def encode_bitmap(received: RangeMap, offset: int, frame_size: int, total_length: int) -> int:
+    """
+    Bitmap of the frames following offset which have been received completely
+
+    Bit n stands for the bytes offset + n * frame_size up to the next frame,
+    cut at total_length.
+
+    :param received: received byte ranges
+    :type received: RangeMap
+    :param offset: number of contiguously received bytes
+    :type offset: int
+    :param frame_size: data bytes per frame
+    :type frame_size: int
+    :param total_length: length of the data
+    :type total_length: int
+    :return: bitmap
+    :rtype: int
+    """
+    bitmap = 0
+    if frame_size <= 0:
+        return bitmap
+    for bit in range(BITMAP_BITS):
+        start = offset + bit * frame_size
+        if start >= total_length:
+            break
+        if received.contains(start, min(start + frame_size, total_length)):
+            bitmap |= 1 << bit
+    return bitmap
+
+
+def decode_bitmap(offset: int, frame_size: int, bitmap: int, total_length: int) -> RangeMap:
+    """
+    Byte ranges acknowledged by offset and bitmap, see encode_bitmap
+
+    :return: acknowledged byte ranges
+    :rtype: RangeMap
+    """
+    acknowledged = RangeMap()
+    acknowledged.add(0, min(offset, total_length))
+    for bit in range(BITMAP_BITS):
+        if bitmap & (1 << bit):
+            start = offset + bit * frame_size
+            acknowledged.add(start, min(start + frame_size, total_length))
+    return acknowledged
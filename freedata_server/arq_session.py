@@ -1,14 +1,15 @@
-import datetime
 import threading
 import codec2
 import data_frame_factory
 import structlog
 from event_manager import EventManager
 from modem_frametypes import FRAME_TYPE
-import time
 from arq_data_type_handler import ARQDataTypeHandler
 from codec2 import FREEDV_MODE_USED_SLOTS, FREEDV_MODE
 import stats
+import arq_selective_repeat
+import arq_timeouts
+import arq_session_metrics
 class ARQSession:
     SPEED_LEVEL_DICT = {
         0: {
@@ -48,6 +49,9 @@ class ARQSession:
         # },
     }
 
+    # seconds we wait beyond the expected end before acknowledging an incomplete selective repeat burst
+    BURST_ACK_GUARD = 1.0
+
     def __init__(self, config: dict, modem, dxcall: str, state_manager):
         self.logger = structlog.get_logger(type(self).__name__)
         self.config = config
@@ -72,26 +76,40 @@ class ARQSession:
 
         self.frames_per_burst = 1
 
+        # frames per burst we want to use with selective repeat, 1 for stop and wait
+        self.window = max(1, min(self.config['MODEM'].get('arq_window', 0), arq_selective_repeat.BITMAP_BITS))
+        self.selective_repeat = False
+
+        # turnaround of the other station, for deriving our timeouts
+        self.turnaround = arq_timeouts.TurnaroundEstimator()
+
         self.frame_factory = data_frame_factory.DataFrameFactory(self.config)
         self.event_frame_received = threading.Event()
 
+        # transmissions and timeouts are driven by the scheduler of the state manager, on its clock
+        self.scheduler = self.states.session_scheduler
+        self.clock = self.states.clock
+        # the transmission we are waiting for a reply to, see launch_transmission
+        self.pending_reply = None
+        self.pending_reply_lock = threading.Lock()
+
         self.arq_data_type_handler = ARQDataTypeHandler(self.event_manager, self.states)
         self.id = None
-        self.session_started = time.time()
+        self.session_started = self.clock.time()
         self.session_ended = 0
         self.session_max_age = 500
 
         # this timestamp is updated by "set_state", everytime we have a state change.
         # we will use the schedule manager, for checking, how old is the state change for deciding, how we continue with the message
-        self.last_state_change_timestamp = time.time()
+        self.last_state_change_timestamp = self.clock.time()
 
         self.statistics = stats.stats(self.config, self.event_manager, self.states)
 
-        # histogram lists for storing statistics
-        self.snr_histogram = []
-        self.bpm_histogram = []
-        self.bps_histogram = []
-        self.time_histogram = []
+        # histograms for the statistics, progress events are coalesced, see arq_session_metrics
+        self.metrics = arq_session_metrics.SessionMetrics()
+        self.progress = arq_session_metrics.ProgressThrottle(self.scheduler,
+                                                             self.config['MODEM'].get('arq_progress_interval', 0),
+                                                             self.emit_progress)
 
     def log(self, message, isWarning=False):
         msg = f"[{type(self).__name__}][id={self.id}][state={self.state}]: {message}"
@@ -108,26 +126,124 @@ class ARQSession:
 
         self.modem.transmit(mode, 1, 1, frame)
 
+    def launch_transmission(self, frame, mode, timeout, on_timeout, reply_mode=None, reply_delay=0, **details):
+        """
+        Transmit a frame or burst by the scheduler and wait for a reply
+
+        Any frame received for the session counts as reply. Without one, on_timeout
+        is called with the pending reply, a dict which can be passed to
+        retransmit.
+
+        :param frame: frame or list of frames sent within a single transmission
+        :param mode: FREEDV_MODE or 'auto'
+        :param timeout: seconds to wait after our transmission, a callable for computing it per attempt
+        :param on_timeout: called without a reply
+        :param reply_mode: FREEDV_MODE of the reply, for measuring the turnaround
+        :param reply_delay: additional seconds the other station may wait before replying
+        :param details: kept in the pending reply
+        """
+        pending = {
+            'frame': frame,
+            'mode': mode,
+            'timeout': timeout,
+            'on_timeout': on_timeout,
+            'reply_mode': reply_mode,
+            'reply_delay': reply_delay,
+            'attempts': 0,
+            'answered': False,
+            'transmission_ended': None,
+            'reply_timeout': None,
+            'timer': None,
+            **details,
+        }
+        with self.pending_reply_lock:
+            self.cancel_pending_reply()
+            self.pending_reply = pending
+        self.scheduler.submit(self.retransmit, pending)
+
+    def retransmit(self, pending):
+        if pending is not self.pending_reply:
+            return
+        self.transmit_frame(pending['frame'], pending['mode'])
+        with self.pending_reply_lock:
+            if pending is not self.pending_reply or pending['answered']:
+                return
+            pending['attempts'] += 1
+            pending['transmission_ended'] = self.clock.monotonic()
+            timeout = pending['timeout']
+            pending['reply_timeout'] = timeout() if callable(timeout) else timeout
+            self.log(f"Waiting {pending['reply_timeout']:.2f} seconds...")
+            pending['timer'] = self.scheduler.call_later(pending['reply_timeout'] + pending['reply_delay'],
+                                                         self.on_reply_timeout, pending)
+
+    def on_reply_timeout(self, pending):
+        with self.pending_reply_lock:
+            if pending is not self.pending_reply or pending['answered']:
+                return
+        pending['on_timeout'](pending)
+
+    def reply_received(self):
+        """
+        Stop waiting for a reply and measure the turnaround of the other station
+        """
+        with self.pending_reply_lock:
+            pending = self.pending_reply
+            if pending is None or pending['answered']:
+                return
+            pending['answered'] = True
+            if pending['timer']:
+                pending['timer'].cancel()
+            if pending['reply_mode'] is None or pending['transmission_ended'] is None:
+                return
+            elapsed = self.clock.monotonic() - pending['transmission_ended']
+            # a reply to a repeated frame could belong to any of the attempts,
+            # a reply after the delay of the other station tells nothing about the turnaround
+            if pending['attempts'] == 1 and elapsed <= pending['reply_timeout']:
+                self.turnaround.add_sample(elapsed - arq_timeouts.get_airtime(pending['reply_mode']))
+
+    def cancel_pending_reply(self):
+        if self.pending_reply and self.pending_reply['timer']:
+            self.pending_reply['timer'].cancel()
+        self.pending_reply = None
+
+    def stop_waiting(self):
+        with self.pending_reply_lock:
+            self.cancel_pending_reply()
+
     def set_state(self, state):
-        self.last_state_change_timestamp = time.time()
+        self.last_state_change_timestamp = self.clock.time()
         if self.state == state:
             self.log(f"{type(self).__name__} state {self.state.name} unchanged.")
         else:
             self.log(f"{type(self).__name__} state change from {self.state.name} to {state.name} at {self.last_state_change_timestamp}")
         self.state = state
 
+    def get_burst_frame_type(self):
+        return FRAME_TYPE.ARQ_BURST_FRAME_SR if self.selective_repeat else FRAME_TYPE.ARQ_BURST_FRAME
+
     def get_data_payload_size(self):
         return self.frame_factory.get_available_data_payload_for_mode(
-            FRAME_TYPE.ARQ_BURST_FRAME,
+            self.get_burst_frame_type(),
             self.SPEED_LEVEL_DICT[self.speed_level]["mode"]
             )
 
+    def get_reply_timeout(self, reply_mode, delay=0):
+        """
+        Seconds to wait for a reply after our transmission has ended
+
+        :param reply_mode: FREEDV_MODE of the expected reply
+        :param delay: additional seconds the other station waits before replying
+        :return: timeout in seconds
+        """
+        return self.turnaround.get_timeout(arq_timeouts.get_airtime(reply_mode)) + delay
+
     def set_details(self, snr, frequency_offset):
         self.snr = snr
         self.frequency_offset = frequency_offset
 
     def on_frame_received(self, frame):
         self.event_frame_received.set()
+        self.reply_received()
         self.log(f"Received {frame['frame_type']}")
         frame_type = frame['frame_type_int']
         if self.state in self.STATE_TRANSITION and frame_type in self.STATE_TRANSITION[self.state]:
@@ -135,13 +251,16 @@ class ARQSession:
             received_data, type_byte = getattr(self, action_name)(frame)
 
             if isinstance(received_data, bytearray) and isinstance(type_byte, int):
-                self.arq_data_type_handler.dispatch(type_byte, received_data, self.update_histograms(len(received_data), len(received_data)))
+                self.progress.cancel()
+                self.update_histograms(len(received_data), len(received_data))
+                self.arq_data_type_handler.dispatch(type_byte, received_data,
+                                                    self.calculate_session_statistics(len(received_data), len(received_data)))
             return
         
         self.log(f"Ignoring unknown transition from state {self.state.name} with frame {frame['frame_type']}")
 
     def is_session_outdated(self):
-        session_alivetime = time.time() - self.session_max_age
+        session_alivetime = self.clock.time() - self.session_max_age
         return self.session_ended < session_alivetime and self.state.name in [
             'FAILED',
             'ENDED',
@@ -150,58 +269,65 @@ class ARQSession:
 
     def calculate_session_duration(self):
         if self.session_ended == 0:
-            return time.time() - self.session_started
+            return self.clock.time() - self.session_started
 
         return self.session_ended - self.session_started
 
-    def calculate_session_statistics(self, confirmed_bytes, total_bytes):
+    def calculate_session_rates(self, confirmed_bytes, total_bytes):
         duration = self.calculate_session_duration()
-        # total_bytes = self.total_length
-        # self.total_length
         duration_in_minutes = duration / 60  # Convert duration from seconds to minutes
 
-        # Calculate bytes per minute
-        if duration_in_minutes > 0:
+        # Calculate bytes per minute and bits per second
+        if duration > 0:
             bytes_per_minute = int(confirmed_bytes / duration_in_minutes)
+            bits_per_second = int((confirmed_bytes * 8) / duration)
         else:
             bytes_per_minute = 0
-
-        # Calculate bits per second
-        bits_per_second = int((confirmed_bytes * 8) / duration)
-
-
-        # Convert histograms lists to dictionaries
-        time_histogram_dict = dict(enumerate(self.time_histogram))
-        snr_histogram_dict = dict(enumerate(self.snr_histogram))
-        bpm_histogram_dict = dict(enumerate(self.bpm_histogram))
-        bps_histogram_dict = dict(enumerate(self.bps_histogram))
+            bits_per_second = 0
 
         return {
             'total_bytes': total_bytes,
             'duration': duration,
             'bytes_per_minute': bytes_per_minute,
             'bits_per_second': bits_per_second,
-            'time_histogram': time_histogram_dict,
-            'snr_histogram': snr_histogram_dict,
-            'bpm_histogram': bpm_histogram_dict,
-            'bps_histogram': bps_histogram_dict,
         }
 
-    def update_histograms(self, confirmed_bytes, total_bytes):
+    def calculate_session_statistics(self, confirmed_bytes, total_bytes):
+        # complete statistics with all histograms, for the end of a session
+        statistics = self.calculate_session_rates(confirmed_bytes, total_bytes)
+        statistics.update(self.metrics.get_histograms())
+        return statistics
 
-        stats = self.calculate_session_statistics(confirmed_bytes, total_bytes)
-        self.snr_histogram.append(self.snr)
-        self.bpm_histogram.append(stats['bytes_per_minute'])
-        self.bps_histogram.append(stats['bits_per_second'])
-        self.time_histogram.append(datetime.datetime.now().isoformat())
+    def update_histograms(self, confirmed_bytes, total_bytes):
+        rates = self.calculate_session_rates(confirmed_bytes, total_bytes)
+        self.metrics.add(self.snr, rates['bytes_per_minute'], rates['bits_per_second'])
+        return rates
 
-        # Limit the size of each histogram to the last 20 entries
-        self.snr_histogram = self.snr_histogram[-20:]
-        self.bpm_histogram = self.bpm_histogram[-20:]
-        self.bps_histogram = self.bps_histogram[-20:]
-        self.time_histogram = self.time_histogram[-20:]
+    def send_progress(self, confirmed_bytes, total_bytes):
+        """
+        Report the progress of the session, coalesced to the configured interval
 
-        return stats
+        :param confirmed_bytes: bytes received or confirmed by the IRS
+        :param total_bytes: length of the transfer
+        """
+        self.progress.update(confirmed_bytes, total_bytes)
+
+    def emit_progress(self, confirmed_bytes, total_bytes):
+        # only the histogram entries added since the previous progress event
+        statistics = self.calculate_session_rates(confirmed_bytes, total_bytes)
+        first_delta = self.metrics.reported == 0
+        statistics.update(self.metrics.get_delta())
+        # the GUI merges the deltas into its charts, the first one of a session starts them anew
+        statistics['histogram_delta'] = True
+        statistics['histogram_reset'] = first_delta
+        self.event_manager.send_arq_session_progress(not self.is_IRS, self.id, self.dxcall, confirmed_bytes, total_bytes,
+                                                     self.state.name, self.speed_level, statistics=statistics)
+
+    def send_session_finished(self, outbound, success, statistics):
+        # progress still waiting for its interval would arrive after the end of the session
+        self.progress.cancel()
+        self.event_manager.send_arq_session_finished(outbound, self.id, self.dxcall, success, self.state.name,
+                                                     statistics=statistics)
 
     def check_channel_busy(self, channel_busy_slot, mode_slot):
         for busy, mode in zip(channel_busy_slot, mode_slot):
@@ -209,17 +335,15 @@ class ARQSession:
                 return False
         return True
 
-    def get_appropriate_speed_level(self, snr, maximum_bandwidth=None):
+    def get_available_speed_levels(self, maximum_bandwidth=None):
         """
-        Determines the appropriate speed level based on the SNR, channel busy slot, and maximum bandwidth.
+        Determines the speed levels allowed by the channel busy slot and maximum bandwidth.
 
         Parameters:
-        - snr (float): The signal-to-noise ratio.
-        - channel_busy_slot (list of bool): The busy condition of the channels.
         - maximum_bandwidth (float, optional): The maximum bandwidth. If None, uses the default from the configuration.
 
         Returns:
-        - int: The appropriate speed level.
+        - list of int: The available speed levels, at least the lowest one.
         """
         # Use default maximum bandwidth from configuration if not provided
         if maximum_bandwidth is None:
@@ -229,13 +353,30 @@ class ARQSession:
         if maximum_bandwidth == 0:
             maximum_bandwidth = max(details['bandwidth'] for details in self.SPEED_LEVEL_DICT.values())
 
-        # Iterate through speed levels in reverse order to find the highest appropriate one
-        for level in sorted(self.SPEED_LEVEL_DICT.keys(), reverse=True):
+        levels = []
+        for level in sorted(self.SPEED_LEVEL_DICT.keys()):
             details = self.SPEED_LEVEL_DICT[level]
             mode_slots = details['slots'].value
-            if (snr >= details['min_snr'] and
-                details['bandwidth'] <= maximum_bandwidth and
+            if (details['bandwidth'] <= maximum_bandwidth and
                 self.check_channel_busy(self.states.channel_busy_slot, mode_slots)):
+                levels.append(level)
+
+        return levels or [min(self.SPEED_LEVEL_DICT.keys())]
+
+    def get_appropriate_speed_level(self, snr, maximum_bandwidth=None):
+        """
+        Determines the appropriate speed level based on the SNR, channel busy slot, and maximum bandwidth.
+
+        Parameters:
+        - snr (float): The signal-to-noise ratio.
+        - maximum_bandwidth (float, optional): The maximum bandwidth. If None, uses the default from the configuration.
+
+        Returns:
+        - int: The appropriate speed level.
+        """
+        # Iterate through speed levels in reverse order to find the highest appropriate one
+        for level in reversed(self.get_available_speed_levels(maximum_bandwidth)):
+            if snr >= self.SPEED_LEVEL_DICT[level]['min_snr']:
                 return level
 
         # Return the lowest level if no higher level is found
@@ -243,15 +384,13 @@ class ARQSession:
     
     def reset_session(self):
         self.received_bytes = 0
-        self.snr_histogram = []
-        self.bpm_histogram = []
-        self.bps_histogram = []
-        self.time_histogram = []
+        self.progress.cancel()
+        self.metrics = arq_session_metrics.SessionMetrics()
         self.type_byte = None
         self.total_length = 0
         self.total_crc = ''
-        self.received_data = None
         self.received_bytes = 0
         self.received_crc = None
+        self.received_ranges = arq_selective_repeat.RangeMap()
         self.maximum_bandwidth = 0
         self.abort = False
\ No newline at end of file
@@ -1,10 +1,13 @@
 import threading
 import arq_session
-import helpers
+import arq_receive_spool
+import arq_selective_repeat
+import arq_speed_controller
+import arq_timeouts
+from arq_session_iss import ARQSessionISS
 from modem_frametypes import FRAME_TYPE
 from codec2 import FREEDV_MODE
 from enum import Enum
-import time
 
 
 class IRS_State(Enum):
@@ -15,12 +18,13 @@ class IRS_State(Enum):
     ENDED = 4
     FAILED = 5
     ABORTED = 6
-    RESUME = 7 # State, which allows resuming of a transmission - will be set after some waiting time, higher than TIMEOUT_DATA for ensuring clean states
+    RESUME = 7 # State, which allows resuming of a transmission - will be set after some waiting time, higher than TIMEOUT_RESUME for ensuring clean states
 
 class ARQSessionIRS(arq_session.ARQSession):
 
-    TIMEOUT_CONNECT = 55 #14.2
-    TIMEOUT_DATA = 90
+    # the schedule manager sets sessions without a state change for this long to RESUME,
+    # so there is no point in waiting longer for the ISS
+    TIMEOUT_RESUME = 90
 
     STATE_TRANSITION = {
         IRS_State.NEW: { 
@@ -36,21 +40,25 @@ class ARQSessionIRS(arq_session.ARQSession):
         IRS_State.INFO_ACK_SENT: {
             FRAME_TYPE.ARQ_SESSION_INFO.value: 'send_info_ack',
             FRAME_TYPE.ARQ_BURST_FRAME.value: 'receive_data',
+            FRAME_TYPE.ARQ_BURST_FRAME_SR.value: 'receive_data',
             FRAME_TYPE.ARQ_STOP.value: 'send_stop_ack'
 
         },
         IRS_State.BURST_REPLY_SENT: {
             FRAME_TYPE.ARQ_BURST_FRAME.value: 'receive_data',
+            FRAME_TYPE.ARQ_BURST_FRAME_SR.value: 'receive_data',
             FRAME_TYPE.ARQ_STOP.value: 'send_stop_ack'
 
         },
         IRS_State.ENDED: {
             FRAME_TYPE.ARQ_BURST_FRAME.value: 'receive_data',
+            FRAME_TYPE.ARQ_BURST_FRAME_SR.value: 'receive_data',
             FRAME_TYPE.ARQ_STOP.value: 'send_stop_ack'
 
         },
         IRS_State.FAILED: {
             FRAME_TYPE.ARQ_BURST_FRAME.value: 'receive_data',
+            FRAME_TYPE.ARQ_BURST_FRAME_SR.value: 'receive_data',
             #FRAME_TYPE.ARQ_SESSION_OPEN.value: 'send_open_ack',
         },
         IRS_State.ABORTED: {
@@ -72,7 +80,8 @@ class ARQSessionIRS(arq_session.ARQSession):
 
         self.id = session_id
         self.dxcall = dxcall
-        self.version = 1
+        # highest protocol version we support, announced in the open ack
+        self.version = arq_selective_repeat.SELECTIVE_REPEAT_VERSION
         self.is_IRS = True
 
         self.state = IRS_State.NEW
@@ -81,12 +90,28 @@ class ARQSessionIRS(arq_session.ARQSession):
         self.type_byte = None
         self.total_length = 0
         self.total_crc = ''
-        self.received_data = None
+        # receive buffer, see arq_receive_spool
+        self.spool = None
         self.received_bytes = 0
         self.received_crc = None
+        self.received_ranges = arq_selective_repeat.RangeMap()
+
+        # selective repeat bursts
+        self.burst_ack_lock = threading.Lock()
+        self.burst_ack_timer = None
+        self.burst_ack_generation = 0
+        self.burst_frame_size = 0
+        self.last_burst_frame = None
 
         self.maximum_bandwidth = 0
 
+        self.speed_controller = arq_speed_controller.SpeedLevelController(
+            self.SPEED_LEVEL_DICT,
+            {level: self.frame_factory.get_available_data_payload_for_mode(FRAME_TYPE.ARQ_BURST_FRAME, details['mode'])
+             for level, details in self.SPEED_LEVEL_DICT.items()},
+            hysteresis=self.config['MODEM'].get('arq_speed_hysteresis', 0),
+            probe_interval=self.config['MODEM'].get('arq_probe_interval', 0))
+
         self.abort = False
 
     def all_data_received(self):
@@ -94,20 +119,60 @@ class ARQSessionIRS(arq_session.ARQSession):
         return self.total_length == self.received_bytes
 
     def final_crc_matches(self) -> bool:
-        return self.total_crc == helpers.get_crc_32(bytes(self.received_data)).hex()
-
-    def transmit_and_wait(self, frame, timeout, mode):
-        self.event_frame_received.clear()
-        self.transmit_frame(frame, mode)
-        self.log(f"Waiting {timeout} seconds...")
-        if not self.event_frame_received.wait(timeout) and self.state not in [IRS_State.ABORTED, IRS_State.FAILED]:
+        # the CRC has been accumulated while the data arrived
+        return self.received_crc is not None and self.total_crc == self.received_crc.to_bytes(4, "big").hex()
+
+    def open_spool(self):
+        # continue where a previous session, maybe before a restart, has stopped
+        if self.spool:
+            self.spool.close()
+        self.spool = arq_receive_spool.open_spool(self.config['MODEM'].get('arq_spool_directory', ''),
+                                                  self.dxcall, self.total_crc, self.total_length)
+        self.received_bytes = self.spool.offset
+        self.received_crc = self.spool.update_crc(0, 0, self.received_bytes)
+        self.received_ranges = arq_selective_repeat.RangeMap()
+        if self.received_bytes:
+            self.received_ranges.add(0, self.received_bytes)
+            self.log(f"Resuming from spool at {self.received_bytes}/{self.total_length} bytes")
+
+    def close_spool(self, delete=False):
+        if self.spool:
+            if delete:
+                self.spool.delete()
+            else:
+                self.spool.close()
+            self.spool = None
+
+    def reset_session(self):
+        self.close_spool()
+        super().reset_session()
+
+    def on_iss_timeout(self, pending):
+        if self.state not in [IRS_State.ABORTED, IRS_State.FAILED]:
             self.log("Timeout waiting for ISS. Session failed.")
             self.transmission_failed()
 
+    def get_iss_timeout(self, request_mode, reply_mode, retries, frames=1):
+        """
+        Seconds the ISS keeps on repeating a frame without getting our reply
+
+        :param request_mode: FREEDV_MODE of the frames the ISS repeats
+        :param reply_mode: FREEDV_MODE of our reply
+        :param retries: number of attempts of the ISS
+        :param frames: frames per attempt
+        :return: timeout in seconds
+        """
+        attempt = arq_timeouts.get_airtime(request_mode, frames) + self.get_reply_timeout(reply_mode)
+        return min(self.TIMEOUT_RESUME, retries * attempt)
+
+    def get_data_timeout(self):
+        # the ISS falls back to the lowest speed level when repeating a burst
+        mode = self.get_mode_by_speed_level(min(self.SPEED_LEVEL_DICT))
+        return self.get_iss_timeout(mode, self.get_burst_ack_mode(), ARQSessionISS.RETRIES_DATA,
+                                    frames=self.frames_per_burst)
+
     def launch_transmit_and_wait(self, frame, timeout, mode):
-        thread_wait = threading.Thread(target = self.transmit_and_wait, 
-                                       args = [frame, timeout, mode], daemon=True)
-        thread_wait.start()
+        self.launch_transmission(frame, mode, timeout, self.on_iss_timeout)
     
     def send_open_ack(self, open_frame):
         # check for maximum bandwidth. If ISS bandwidth is higher than own, then use own
@@ -131,19 +196,24 @@ class ARQSessionIRS(arq_session.ARQSession):
             self.version,
             self.snr, flag_abort=self.abort)
 
-        self.launch_transmit_and_wait(ack_frame, self.TIMEOUT_CONNECT, mode=FREEDV_MODE.signalling)
+        timeout = self.get_iss_timeout(FREEDV_MODE.signalling, FREEDV_MODE.signalling, ARQSessionISS.RETRIES_INFO)
+        self.launch_transmit_and_wait(ack_frame, timeout, mode=FREEDV_MODE.signalling)
         if not self.abort:
             self.set_state(IRS_State.OPEN_ACK_SENT)
         return None, None
 
     def send_info_ack(self, info_frame):
         # Get session info from ISS
-        if self.received_bytes == 0:
-            self.received_data = bytearray(info_frame['total_length'])
+        new_transfer = self.spool is None or self.total_crc != info_frame['total_crc'] \
+            or self.total_length != info_frame['total_length']
         self.total_length = info_frame['total_length']
         self.total_crc = info_frame['total_crc']
+        if new_transfer:
+            self.open_spool()
         self.dx_snr.append(info_frame['snr'])
         self.type_byte = info_frame['type']
+        self.selective_repeat = info_frame['flag']['SELECTIVE_REPEAT']
+        self.frames_per_burst = self.window if self.selective_repeat else 1
 
         self.calibrate_speed_settings()
 
@@ -153,41 +223,145 @@ class ARQSessionIRS(arq_session.ARQSession):
         info_ack = self.frame_factory.build_arq_session_info_ack(
             self.id, self.received_bytes, self.snr,
             self.speed_level, self.frames_per_burst, flag_abort=self.abort)
-        self.launch_transmit_and_wait(info_ack, self.TIMEOUT_CONNECT, mode=FREEDV_MODE.signalling)
+        self.launch_transmit_and_wait(info_ack, self.get_data_timeout(), mode=FREEDV_MODE.signalling)
         if not self.abort:
             self.set_state(IRS_State.INFO_ACK_SENT)
         return None, None
 
+    def store_data(self, offset, data_part):
+        # the buffer has the size of the transfer, frames are written to their offset without regrowing it
+        self.spool.write(offset, data_part)
+        self.received_ranges.add(offset, offset + len(data_part))
+        contiguous = self.received_ranges.contiguous(0)
+        if contiguous > self.received_bytes:
+            # data in front of received_bytes doesn't change anymore
+            self.received_crc = self.spool.update_crc(self.received_crc, self.received_bytes, contiguous)
+            self.received_bytes = contiguous
+            self.spool.set_offset(self.received_bytes)
+
+    def get_data_part(self, frame):
+        # frames are padded, we only want the data up to the end of the transfer
+        return memoryview(frame['data'])[:max(0, self.total_length - frame['offset'])]
+
     def process_incoming_data(self, frame):
-        if frame['offset'] != self.received_bytes:
-            # TODO: IF WE HAVE AN OFFSET BECAUSE OF A SPEED LEVEL CHANGE FOR EXAMPLE,
-            # TODO: WE HAVE TO DISCARD THE LAST BYTES, BUT NOT returning False!!
-            # CASE: ACK is going lost.
-            self.log(f"Discarding data offset: Offset = {frame['offset']} | Already received: {self.received_bytes}", isWarning=True)
-            self.received_bytes = frame['offset']
-
-            #return False
-
-        remaining_data_length = self.total_length - self.received_bytes
-        self.log(f"Remaining data: {remaining_data_length}", isWarning=True)
-        # Is this the last data part?
-        if remaining_data_length <= len(frame['data']):
-            # we only want the remaining length, not the entire frame data
-            data_part = frame['data'][:remaining_data_length]
-        else:
-            # we want the entire frame data
-            data_part = frame['data']
+        offset = frame['offset']
+        data_part = self.get_data_part(frame)
+        # the ISS repeats a frame if it missed our ack, maybe with a smaller frame of a lower speed level
+        self.record_burst_frame(frame, repeated=self.received_ranges.contains(offset, offset + len(data_part)))
+
+        if offset != self.received_bytes:
+            # data we already have stays valid, the ISS sends the same bytes again
+            self.log(f"Data offset {offset} differs from received bytes {self.received_bytes}", isWarning=True)
 
-        self.received_data[frame['offset']:] = data_part
-        #self.received_bytes += len(data_part)
-        self.received_bytes = len(self.received_data)
+        self.store_data(offset, data_part)
         self.log(f"Received {self.received_bytes}/{self.total_length} bytes")
-        self.event_manager.send_arq_session_progress(
-            False, self.id, self.dxcall, self.received_bytes, self.total_length, self.state.name, self.speed_level, self.calculate_session_statistics(self.received_bytes, self.total_length))
+        self.send_progress(self.received_bytes, self.total_length)
 
         return True
 
+    def process_selective_repeat_data(self, frame):
+        # frames may arrive in any order, we keep track of the received byte ranges
+        offset = frame['offset']
+        data_part = self.get_data_part(frame)
+        self.record_burst_frame(frame, repeated=self.received_ranges.contains(offset, offset + len(data_part)))
+        self.store_data(offset, data_part)
+        self.burst_frame_size = len(frame['data'])
+        self.last_burst_frame = frame
+
+        self.log(f"Received {self.received_bytes}/{self.total_length} bytes, ranges {self.received_ranges.ranges()}")
+        self.send_progress(self.received_bytes, self.total_length)
+
+    def build_burst_ack(self, flag_final=False, flag_checksum=False, flag_abort=False):
+        if not self.selective_repeat:
+            return self.frame_factory.build_arq_burst_ack(self.id, self.speed_level,
+                                                          flag_final=flag_final,
+                                                          flag_checksum=flag_checksum,
+                                                          flag_abort=flag_abort)
+
+        bitmap = arq_selective_repeat.encode_bitmap(self.received_ranges, self.received_bytes,
+                                                    self.burst_frame_size, self.total_length)
+        return self.frame_factory.build_arq_burst_ack_sr(self.id, self.speed_level, self.received_bytes,
+                                                         self.burst_frame_size, bitmap,
+                                                         flag_final=flag_final,
+                                                         flag_checksum=flag_checksum,
+                                                         flag_abort=flag_abort)
+
+    def get_burst_ack_mode(self):
+        # the selective repeat ack doesn't fit into a signalling ack frame
+        return FREEDV_MODE.signalling if self.selective_repeat else FREEDV_MODE.signalling_ack
+
+    def repeat_final_ack(self) -> bool:
+        """
+        Answer a burst of a finished transfer again, the ISS missed our final ack
+
+        :return: True if the transfer is finished and the burst has been answered
+        :rtype: bool
+        """
+        if self.state == IRS_State.ENDED:
+            # the data has already been delivered
+            flag_checksum = True
+        elif self.spool is None:
+            # the data failed its checksum and has been discarded
+            flag_checksum = False
+        else:
+            return False
+        self.transmit_frame(self.build_burst_ack(flag_final=True, flag_checksum=flag_checksum),
+                            mode=self.get_burst_ack_mode())
+        return True
+
+    def receive_data_selective_repeat(self, burst_frame):
+        with self.burst_ack_lock:
+            if self.burst_ack_timer:
+                self.burst_ack_timer.cancel()
+            self.burst_ack_generation += 1
+
+            if self.repeat_final_ack():
+                return None, None
+
+            self.process_selective_repeat_data(burst_frame)
+            self.update_histograms(self.received_bytes, self.total_length)
+
+            if self.all_data_received():
+                return self.finish_transmission()
+
+            # we answer after the last frame of the burst, or when it should have been received
+            if burst_frame['frames_remaining'] == 0:
+                self.send_burst_ack()
+            else:
+                delay = (burst_frame['frames_remaining'] *
+                         self.SPEED_LEVEL_DICT[burst_frame['speed_level']]['duration_per_frame'] +
+                         self.BURST_ACK_GUARD)
+                self.burst_ack_timer = self.scheduler.call_later(delay, self.on_burst_end, self.burst_ack_generation)
+        return None, None
+
+    def on_burst_end(self, generation):
+        with self.burst_ack_lock:
+            # another frame has been received in the meantime
+            if generation != self.burst_ack_generation or self.state == IRS_State.ABORTED:
+                return
+            self.send_burst_ack()
+
+    def send_burst_ack(self):
+        # frames missing in front of the last one we got have been lost
+        if self.burst_frame_size:
+            highest = self.received_ranges.ranges()[-1][1]
+            for start in range(self.received_bytes, highest, self.burst_frame_size):
+                if not self.received_ranges.contains(start, min(start + self.burst_frame_size, highest)):
+                    self.speed_controller.record_frame(self.last_burst_frame['speed_level'], False)
+        self.calibrate_speed_settings(burst_frame=self.last_burst_frame)
+        ack = self.build_burst_ack(flag_abort=self.abort)
+
+        self.set_state(IRS_State.BURST_REPLY_SENT)
+        self.send_progress(self.received_bytes, self.total_length)
+        self.launch_transmit_and_wait(ack, self.get_data_timeout(), mode=self.get_burst_ack_mode())
+
     def receive_data(self, burst_frame):
+        if self.selective_repeat:
+            return self.receive_data_selective_repeat(burst_frame)
+
+        if self.repeat_final_ack():
+            return None, None
+
         self.process_incoming_data(burst_frame)
         # update statistics
         self.update_histograms(self.received_bytes, self.total_length)
@@ -201,59 +375,58 @@ class ARQSessionIRS(arq_session.ARQSession):
             )
 
             self.set_state(IRS_State.BURST_REPLY_SENT)
-            self.event_manager.send_arq_session_progress(False, self.id, self.dxcall, self.received_bytes,
-                                                         self.total_length, self.state.name, self.speed_level,
-                                                         statistics=self.calculate_session_statistics(
-                                                             self.received_bytes, self.total_length))
+            self.send_progress(self.received_bytes, self.total_length)
 
-            self.launch_transmit_and_wait(ack, self.TIMEOUT_DATA, mode=FREEDV_MODE.signalling_ack)
+            self.launch_transmit_and_wait(ack, self.get_data_timeout(), mode=FREEDV_MODE.signalling_ack)
             return None, None
 
+        return self.finish_transmission()
+
+    def finish_transmission(self):
         if self.final_crc_matches():
             self.log("All data received successfully!")
-            ack = self.frame_factory.build_arq_burst_ack(self.id,
-                                                         self.speed_level,
-                                                         flag_final=True,
-                                                         flag_checksum=True)
-            self.transmit_frame(ack, mode=FREEDV_MODE.signalling_ack)
+            ack = self.build_burst_ack(flag_final=True, flag_checksum=True)
+            self.transmit_frame(ack, mode=self.get_burst_ack_mode())
             self.log("ACK sent")
-            self.session_ended = time.time()
+            self.session_ended = self.clock.time()
             self.set_state(IRS_State.ENDED)
+            received_data = self.spool.read()
+            self.close_spool(delete=True)
 
-            return self.received_data, self.type_byte
+            return received_data, self.type_byte
         else:
-            ack = self.frame_factory.build_arq_burst_ack(self.id,
-                                                         self.speed_level,
-                                                         flag_final=True,
-                                                         flag_checksum=False)
-            self.transmit_frame(ack, mode=FREEDV_MODE.signalling_ack)
+            ack = self.build_burst_ack(flag_final=True, flag_checksum=False)
+            self.transmit_frame(ack, mode=self.get_burst_ack_mode())
             self.log("CRC fail at the end of transmission!")
+            # don't resume from corrupt data
+            self.close_spool(delete=True)
             return self.transmission_failed()
 
+    def record_burst_frame(self, burst_frame, repeated=False):
+        # feed the speed level controller with the snr and the result of the exchange
+        self.speed_controller.update_snr(self.snr)
+        received_speed_level = burst_frame['speed_level']
+        if received_speed_level < self.speed_level:
+            # the ISS fell back to a lower speed level after missing our acks
+            self.speed_controller.record_frame(self.speed_level, False)
+        self.speed_controller.record_frame(received_speed_level, not repeated)
+
     def calibrate_speed_settings(self, burst_frame=None):
         if burst_frame:
-            received_speed_level = burst_frame['speed_level']
+            self.speed_controller.end_burst()
         else:
-            received_speed_level = 0
+            # the session info is the first frame we get from the ISS
+            self.speed_controller.update_snr(self.snr)
 
         latest_snr = self.snr if self.snr else -10
-        appropriate_speed_level = self.get_appropriate_speed_level(latest_snr, self.maximum_bandwidth)
+        appropriate_speed_level = self.speed_controller.select(self.get_available_speed_levels(self.maximum_bandwidth))
         modes_to_decode = {}
 
         # Log the latest SNR, current, appropriate speed levels, and the previous speed level
         self.log(
-            f"Latest SNR: {latest_snr}, Current Speed Level: {self.speed_level}, Appropriate Speed Level: {appropriate_speed_level}, Previous Speed Level: {self.previous_speed_level}",
+            f"Latest SNR: {latest_snr}, Current Speed Level: {self.speed_level}, Appropriate Speed Level: {appropriate_speed_level}, Previous Speed Level: {self.previous_speed_level}, Controller: {self.speed_controller.summary()}",
             isWarning=True)
 
-        # Adjust the speed level by one step towards the appropriate level, if needed
-        #if appropriate_speed_level > self.speed_level and self.speed_level < len(self.SPEED_LEVEL_DICT) - 1:
-        #    # we need to ensure, the received data is equal to our speed level before changing it
-        #    if received_speed_level == self.speed_level:
-        #        self.speed_level += 1
-        #elif appropriate_speed_level < self.speed_level and self.speed_level > 0:
-        #    #if received_speed_level == self.speed_level:
-        #    #    self.speed_level -= 1
-
         # Always decode the current mode
         current_mode = self.get_mode_by_speed_level(self.speed_level).value
         modes_to_decode[current_mode] = True
@@ -285,13 +458,13 @@ class ARQSessionIRS(arq_session.ARQSession):
 
     def send_stop_ack(self, stop_frame):
         stop_ack = self.frame_factory.build_arq_stop_ack(self.id)
-        self.launch_transmit_and_wait(stop_ack, self.TIMEOUT_CONNECT, mode=FREEDV_MODE.signalling_ack)
+        timeout = self.get_iss_timeout(FREEDV_MODE.signalling, FREEDV_MODE.signalling_ack, ARQSessionISS.RETRIES_STOP)
+        self.launch_transmit_and_wait(stop_ack, timeout, mode=FREEDV_MODE.signalling_ack)
         self.set_state(IRS_State.ABORTED)
         self.states.setARQ(False)
         session_stats = self.calculate_session_statistics(self.received_bytes, self.total_length)
 
-        self.event_manager.send_arq_session_finished(
-                False, self.id, self.dxcall, False, self.state.name, statistics=session_stats)
+        self.send_session_finished(False, False, session_stats)
         if self.config['STATION']['enable_stats']:
             self.statistics.push(self.state.name, session_stats, self.dxcall)
 
@@ -299,29 +472,32 @@ class ARQSessionIRS(arq_session.ARQSession):
 
     def transmission_failed(self, irs_frame=None):
         # final function for failed transmissions
-        self.session_ended = time.time()
+        self.session_ended = self.clock.time()
         self.set_state(IRS_State.FAILED)
         self.log("Transmission failed!")
         #self.modem.demodulator.set_decode_mode()
         session_stats = self.calculate_session_statistics(self.received_bytes, self.total_length)
 
-        self.event_manager.send_arq_session_finished(True, self.id, self.dxcall,False, self.state.name, statistics=session_stats)
+        self.send_session_finished(True, False, session_stats)
         if self.config['STATION']['enable_stats']:
             self.statistics.push(self.state.name, session_stats, self.dxcall)
 
+        # keep what we got completely, for types supporting it. A complete transfer failed its checksum.
+        if self.type_byte is not None and 0 < self.received_bytes < self.total_length:
+            self.arq_data_type_handler.received_partial(self.type_byte, self.spool.read(self.received_bytes), session_stats)
+
         self.states.setARQ(False)
         return None, None
 
     def transmission_aborted(self):
         self.log("session aborted")
-        self.session_ended = time.time()
+        self.session_ended = self.clock.time()
         self.set_state(IRS_State.ABORTED)
         # break actual retries
-        self.event_frame_received.set()
+        self.stop_waiting()
 
 
         #self.modem.demodulator.set_decode_mode()
-        self.event_manager.send_arq_session_finished(
-            True, self.id, self.dxcall, False, self.state.name, statistics=self.calculate_session_statistics(self.received_bytes, self.total_length))
+        self.send_session_finished(True, False, self.calculate_session_statistics(self.received_bytes, self.total_length))
         self.states.setARQ(False)
         return None, None
\ No newline at end of file
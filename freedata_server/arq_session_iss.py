@@ -1,12 +1,11 @@
-import threading
-import data_frame_factory
 import random
 from codec2 import FREEDV_MODE
 from modem_frametypes import FRAME_TYPE
 import arq_session
+import arq_selective_repeat
+import arq_timeouts
 import helpers
 from enum import Enum
-import time
 import stats
 
 class ISS_State(Enum):
@@ -26,11 +25,9 @@ class ARQSessionISS(arq_session.ARQSession):
     RETRIES_DATA = 25
     RETRIES_STOP = 5
 
-    # DJ2LS: 3 seconds seems to be too small for radios with a too slow PTT toggle time
-    # DJ2LS: 3.5 seconds is working well WITHOUT a channel busy detection delay
+    # timeouts for replies are derived from their airtime and the turnaround of the IRS, see arq_timeouts
     TIMEOUT_CHANNEL_BUSY = 0
-    TIMEOUT_CONNECT_ACK = 3.5 + TIMEOUT_CHANNEL_BUSY
-    TIMEOUT_TRANSFER = 2.5 + TIMEOUT_CHANNEL_BUSY
+    # waiting time before sending a stop frame for avoiding collisions
     TIMEOUT_STOP_ACK = 3.5 + TIMEOUT_CHANNEL_BUSY
 
     STATE_TRANSITION = {
@@ -44,6 +41,7 @@ class ARQSessionISS(arq_session.ARQSession):
         ISS_State.BURST_SENT: {
             FRAME_TYPE.ARQ_SESSION_INFO_ACK.value: 'send_data',
             FRAME_TYPE.ARQ_BURST_ACK.value: 'send_data',
+            FRAME_TYPE.ARQ_BURST_ACK_SR.value: 'send_data',
         },
         ISS_State.FAILED:{
             FRAME_TYPE.ARQ_STOP_ACK.value: 'transmission_aborted'
@@ -61,11 +59,15 @@ class ARQSessionISS(arq_session.ARQSession):
         super().__init__(config, modem, dxcall, state_manager)
         self.state_manager = state_manager
         self.data = data
+        # frames are sliced from a view, the frame factory copies the payload directly into the frame
+        self.data_view = memoryview(data)
         self.total_length = len(data)
         self.data_crc = helpers.get_crc_32(self.data)
         self.type_byte = type_byte
         self.confirmed_bytes = 0
         self.expected_byte_offset = 0
+        # byte ranges acknowledged by a selective repeat IRS
+        self.acknowledged = arq_selective_repeat.RangeMap()
 
         self.state = ISS_State.NEW
         self.state_enum = ISS_State # needed for access State enum from outside
@@ -76,8 +78,6 @@ class ARQSessionISS(arq_session.ARQSession):
         # enable decoder for signalling ACK bursts
         self.modem.demodulator.set_decode_mode(modes_to_decode=None, is_irs=False)
 
-        self.frame_factory = data_frame_factory.DataFrameFactory(self.config)
-
     def generate_id(self):
 
         # Iterate through existing sessions to find a matching CRC
@@ -107,43 +107,48 @@ class ARQSessionISS(arq_session.ARQSession):
                 # Return False if all possible session IDs are exhausted
                 return False
 
-    def transmit_wait_and_retry(self, frame_or_burst, timeout, retries, mode, isARQBurst=False):
-        while retries > 0 and self.state not in [ISS_State.ABORTED, ISS_State.ABORTING]:
-            self.event_frame_received = threading.Event()
-            if isinstance(frame_or_burst, list): burst = frame_or_burst
-            else: burst = [frame_or_burst]
-            for f in burst:
-                self.transmit_frame(f, mode)
-            self.event_frame_received.clear()
-            self.log(f"Waiting {timeout} seconds...")
-            if self.event_frame_received.wait(timeout):
-                return
-            self.log("Timeout!")
-            retries = retries - 1
-
-            # TODO TEMPORARY TEST FOR SENDING IN LOWER SPEED LEVEL IF WE HAVE TWO FAILED TRANSMISSIONS!!!
-            if retries == self.RETRIES_DATA - 2 and isARQBurst and self.speed_level > 0 and self.state not in [ISS_State.ABORTED, ISS_State.ABORTING]:
-                self.log("SENDING IN FALLBACK SPEED LEVEL", isWarning=True)
-                self.speed_level = 0
-                print(f" CONFIRMED BYTES: {self.confirmed_bytes}")
-                self.send_data({'flag':{'ABORT': False, 'FINAL': False}, 'speed_level': self.speed_level}, fallback=True)
-
-                return
+    def launch_twr(self, frame_or_burst, reply_mode, retries, mode, isARQBurst=False, reply_delay=0):
+        if self.state in [ISS_State.ABORTED, ISS_State.ABORTING]:
+            self.set_state(ISS_State.FAILED)
+            self.transmission_failed()
+            return
+        # all frames of a burst go out within a single transmission
+        if isinstance(frame_or_burst, list) and len(frame_or_burst) == 1:
+            frame_or_burst = frame_or_burst[0]
+        # the timeout follows the airtime of the reply and the measured turnaround
+        self.launch_transmission(frame_or_burst, mode,
+                                 lambda: self.get_reply_timeout(reply_mode) + self.TIMEOUT_CHANNEL_BUSY,
+                                 self.retry_after_timeout, reply_mode=reply_mode, reply_delay=reply_delay,
+                                 retries=retries, is_arq_burst=isARQBurst)
+
+    def retry_after_timeout(self, pending):
+        self.log("Timeout!")
+        self.turnaround.on_timeout()
+        pending['retries'] -= 1
+        aborting = self.state in [ISS_State.ABORTED, ISS_State.ABORTING]
+
+        # TODO TEMPORARY TEST FOR SENDING IN LOWER SPEED LEVEL IF WE HAVE TWO FAILED TRANSMISSIONS!!!
+        if pending['retries'] == self.RETRIES_DATA - 2 and pending['is_arq_burst'] and self.speed_level > 0 and not aborting:
+            self.log("SENDING IN FALLBACK SPEED LEVEL", isWarning=True)
+            self.speed_level = 0
+            print(f" CONFIRMED BYTES: {self.confirmed_bytes}")
+            self.send_data({'flag':{'ABORT': False, 'FINAL': False}, 'speed_level': self.speed_level}, fallback=True)
+            return
+
+        if pending['retries'] > 0 and not aborting:
+            self.retransmit(pending)
+            return
 
         self.set_state(ISS_State.FAILED)
         self.transmission_failed()
 
-    def launch_twr(self, frame_or_burst, timeout, retries, mode, isARQBurst=False):
-        twr = threading.Thread(target = self.transmit_wait_and_retry, args=[frame_or_burst, timeout, retries, mode, isARQBurst], daemon=True)
-        twr.start()
-
     def start(self):
         maximum_bandwidth = self.config['MODEM']['maximum_bandwidth']
         print(maximum_bandwidth)
         self.event_manager.send_arq_session_new(
             True, self.id, self.dxcall, self.total_length, self.state.name)
         session_open_frame = self.frame_factory.build_arq_session_open(self.dxcall, self.id, maximum_bandwidth, self.protocol_version)
-        self.launch_twr(session_open_frame, self.TIMEOUT_CONNECT_ACK, self.RETRIES_CONNECT, mode=FREEDV_MODE.signalling)
+        self.launch_twr(session_open_frame, FREEDV_MODE.signalling, self.RETRIES_CONNECT, mode=FREEDV_MODE.signalling)
         self.set_state(ISS_State.OPEN_SENT)
 
     def update_speed_level(self, frame):
@@ -173,11 +178,16 @@ class ARQSessionISS(arq_session.ARQSession):
         if irs_frame["flag"]["ABORT"]:
             return self.transmission_aborted(irs_frame=irs_frame)
 
+        # use selective repeat if the IRS supports it, older stations answer with version 1
+        self.selective_repeat = (self.window > 1 and
+                                 irs_frame['version'] >= arq_selective_repeat.SELECTIVE_REPEAT_VERSION)
+
         info_frame = self.frame_factory.build_arq_session_info(self.id, self.total_length,
                                                                self.data_crc,
-                                                               self.snr, self.type_byte)
+                                                               self.snr, self.type_byte,
+                                                               flag_selective_repeat=self.selective_repeat)
 
-        self.launch_twr(info_frame, self.TIMEOUT_CONNECT_ACK, self.RETRIES_INFO, mode=FREEDV_MODE.signalling)
+        self.launch_twr(info_frame, FREEDV_MODE.signalling, self.RETRIES_INFO, mode=FREEDV_MODE.signalling)
         self.set_state(ISS_State.INFO_SENT)
 
         return None, None
@@ -197,13 +207,18 @@ class ARQSessionISS(arq_session.ARQSession):
         self.update_histograms(self.confirmed_bytes, self.total_length)
         self.update_speed_level(irs_frame)
 
-        if self.expected_byte_offset > self.total_length:
+        if self.selective_repeat:
+            self.update_acknowledged_ranges(irs_frame)
+        elif self.expected_byte_offset > self.total_length:
+            self.confirmed_bytes = self.total_length
+        elif irs_frame["flag"]["FINAL"] and irs_frame["flag"]["CHECKSUM"]:
+            # the IRS verified the data, it may have had data beyond our last frame after a fallback
             self.confirmed_bytes = self.total_length
         elif not fallback:
             self.confirmed_bytes = self.expected_byte_offset
 
         self.log(f"IRS confirmed {self.confirmed_bytes}/{self.total_length} bytes")
-        self.event_manager.send_arq_session_progress(True, self.id, self.dxcall, self.confirmed_bytes, self.total_length, self.state.name, self.speed_level, statistics=self.calculate_session_statistics(self.confirmed_bytes, self.total_length))
+        self.send_progress(self.confirmed_bytes, self.total_length)
 
         # check if we received an abort flag
         if irs_frame["flag"]["ABORT"]:
@@ -218,12 +233,20 @@ class ARQSessionISS(arq_session.ARQSession):
                 self.transmission_failed()
             return None, None
 
+        if self.selective_repeat:
+            # the IRS answers with a signalling frame, a little later if the last frames got lost
+            burst = self.build_selective_repeat_burst()
+            self.launch_twr(burst, FREEDV_MODE.signalling, self.RETRIES_DATA, mode='auto', isARQBurst=True,
+                            reply_delay=self.BURST_ACK_GUARD)
+            self.set_state(ISS_State.BURST_SENT)
+            return None, None
+
         payload_size = self.get_data_payload_size()
         burst = []
         for _ in range(0, self.frames_per_burst):
             offset = self.confirmed_bytes
             #self.expected_byte_offset = offset
-            payload = self.data[offset : offset + payload_size]
+            payload = self.data_view[offset : offset + payload_size]
             #self.expected_byte_offset = offset + payload_size
             self.expected_byte_offset = offset + len(payload)
             #print(f"EXPECTED----------------------{self.expected_byte_offset}")
@@ -231,20 +254,52 @@ class ARQSessionISS(arq_session.ARQSession):
                 self.SPEED_LEVEL_DICT[self.speed_level]["mode"],
                 self.id, offset, payload, self.speed_level)
             burst.append(data_frame)
-        self.launch_twr(burst, self.TIMEOUT_TRANSFER, self.RETRIES_DATA, mode='auto', isARQBurst=True)
+        self.launch_twr(burst, FREEDV_MODE.signalling_ack, self.RETRIES_DATA, mode='auto', isARQBurst=True)
         self.set_state(ISS_State.BURST_SENT)
         return None, None
 
+    def update_acknowledged_ranges(self, irs_frame):
+        frame_type = irs_frame.get('frame_type_int')
+        if frame_type == FRAME_TYPE.ARQ_SESSION_INFO_ACK.value:
+            self.frames_per_burst = max(1, min(self.window, irs_frame['frames_per_burst']))
+            self.acknowledged.add(0, min(irs_frame['offset'], self.total_length))
+        elif frame_type == FRAME_TYPE.ARQ_BURST_ACK_SR.value:
+            acknowledged = arq_selective_repeat.decode_bitmap(
+                irs_frame['offset'], irs_frame['frame_size'], irs_frame['bitmap'], self.total_length)
+            for start, end in acknowledged.ranges():
+                self.acknowledged.add(start, end)
+        self.confirmed_bytes = self.acknowledged.contiguous(0)
+
+    def build_selective_repeat_burst(self):
+        # frames not acknowledged yet, as far as the bitmap of the IRS reaches
+        payload_size = self.get_data_payload_size()
+        mode = self.SPEED_LEVEL_DICT[self.speed_level]["mode"]
+        limit = min(self.total_length, self.confirmed_bytes + arq_selective_repeat.BITMAP_BITS * payload_size)
+        ranges = []
+        offset = self.confirmed_bytes
+        while offset < limit and len(ranges) < self.frames_per_burst:
+            end = min(offset + payload_size, self.total_length)
+            if not self.acknowledged.contains(offset, end):
+                ranges.append((offset, end))
+            offset = end
+
+        burst = []
+        for index, (offset, end) in enumerate(ranges):
+            burst.append(self.frame_factory.build_arq_burst_frame_sr(
+                mode, self.id, offset, self.data_view[offset:end], self.speed_level, len(ranges) - index - 1))
+        self.log(f"Sending {len(burst)} frames, window {self.frames_per_burst}")
+        return burst
+
     def transmission_ended(self, irs_frame):
         # final function for sucessfully ended transmissions
-        self.session_ended = time.time()
+        self.session_ended = self.clock.time()
         self.set_state(ISS_State.ENDED)
         self.log(f"All data transfered! flag_final={irs_frame['flag']['FINAL']}, flag_checksum={irs_frame['flag']['CHECKSUM']}")
-        self.event_manager.send_arq_session_finished(True, self.id, self.dxcall,True, self.state.name, statistics=self.calculate_session_statistics(self.confirmed_bytes, self.total_length))
+        session_stats = self.calculate_session_statistics(self.confirmed_bytes, self.total_length)
+        self.send_session_finished(True, True, session_stats)
 
         #print(self.state_manager.p2p_connection_sessions)
         #print(self.arq_data_type_handler.state_manager.p2p_connection_sessions)
-        session_stats = self.calculate_session_statistics(self.confirmed_bytes, self.total_length)
         self.arq_data_type_handler.transmitted(self.type_byte, self.data, session_stats)
 
         self.state_manager.remove_arq_iss_session(self.id)
@@ -253,15 +308,16 @@ class ARQSessionISS(arq_session.ARQSession):
 
     def transmission_failed(self, irs_frame=None):
         # final function for failed transmissions
-        self.session_ended = time.time()
+        self.session_ended = self.clock.time()
         self.set_state(ISS_State.FAILED)
         self.log("Transmission failed!")
         session_stats=self.calculate_session_statistics(self.confirmed_bytes, self.total_length)
-        self.event_manager.send_arq_session_finished(True, self.id, self.dxcall,False, self.state.name, session_stats)
+        self.send_session_finished(True, False, session_stats)
 
         self.states.setARQ(False)
 
-        self.arq_data_type_handler.failed(self.type_byte, self.data, statistics=self.calculate_session_statistics(self.confirmed_bytes, self.total_length))
+        self.arq_data_type_handler.failed(self.type_byte, self.data, statistics=session_stats,
+                                          confirmed_bytes=self.confirmed_bytes)
         return None, None
 
     def abort_transmission(self, send_stop=False, irs_frame=None):
@@ -269,42 +325,40 @@ class ARQSessionISS(arq_session.ARQSession):
         self.log("aborting transmission...")
         self.set_state(ISS_State.ABORTING)
 
-        self.event_manager.send_arq_session_finished(
-            True, self.id, self.dxcall, False, self.state.name, statistics=self.calculate_session_statistics(self.confirmed_bytes, self.total_length))
+        self.send_session_finished(True, False, self.calculate_session_statistics(self.confirmed_bytes, self.total_length))
 
         # clear audio out queue
         self.modem.audio_out_queue.queue.clear()
 
         # break actual retries
-        self.event_frame_received.set()
+        self.stop_waiting()
 
         # wait for transmit function to be ready before setting event
         while self.states.isTransmitting():
-            threading.Event().wait(0.100)
+            self.clock.sleep(0.100)
 
         # break actual retries
-        self.event_frame_received.set()
+        self.stop_waiting()
 
         if send_stop:
             # sleep some time for avoiding packet collission
-            threading.Event().wait(self.TIMEOUT_STOP_ACK)
+            self.clock.sleep(self.TIMEOUT_STOP_ACK)
             self.send_stop()
 
         self.states.setARQ(False)
 
     def send_stop(self):
         stop_frame = self.frame_factory.build_arq_stop(self.id)
-        self.launch_twr(stop_frame, self.TIMEOUT_STOP_ACK, self.RETRIES_STOP, mode=FREEDV_MODE.signalling)
+        self.launch_twr(stop_frame, FREEDV_MODE.signalling_ack, self.RETRIES_STOP, mode=FREEDV_MODE.signalling)
 
     def transmission_aborted(self, irs_frame=None):
         self.log("session aborted")
-        self.session_ended = time.time()
+        self.session_ended = self.clock.time()
         self.set_state(ISS_State.ABORTED)
         # break actual retries
-        self.event_frame_received.set()
+        self.stop_waiting()
 
-        self.event_manager.send_arq_session_finished(
-            True, self.id, self.dxcall, False, self.state.name, statistics=self.calculate_session_statistics(self.confirmed_bytes, self.total_length))
+        self.send_session_finished(True, False, self.calculate_session_statistics(self.confirmed_bytes, self.total_length))
         #self.state_manager.remove_arq_iss_session(self.id)
         self.states.setARQ(False)
         return None, None
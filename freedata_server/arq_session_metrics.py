@@ -0,0 +1,126 @@
+"""
+Telemetry of ARQ sessions.
+
+Sessions used to keep their histograms in lists, which were copied for every
+frame to keep the last entries, and rebuilt the statistics with all histograms
+for each progress event. SessionMetrics keeps the histograms in fixed-size
+deques, so adding a sample has a constant cost.
+
+Progress events are coalesced by a ProgressThrottle: within an interval only
+the latest progress is sent. They carry the histogram entries added since the
+previous event, keyed by the number of the sample, the first event of a
+session is marked as such. The complete histograms are part of the statistics
+at the end of a session.
+"""
+import collections
+import datetime
+import threading
+
+# entries kept per histogram
+HISTOGRAM_SIZE = 20
+
+HISTOGRAMS = ['time_histogram', 'snr_histogram', 'bpm_histogram', 'bps_histogram']
+
+
+class SessionMetrics:
+    """
+    Histograms of a session
+    """
+
+    def __init__(self, size: int = HISTOGRAM_SIZE):
+        self.histograms = {name: collections.deque(maxlen=size) for name in HISTOGRAMS}
+        # number of samples added, and how many of them have been reported
+        self.samples = 0
+        self.reported = 0
+        # delayed progress is built by the scheduler while frames add samples
+        self.lock = threading.Lock()
+
+    def add(self, snr, bytes_per_minute: int, bits_per_second: int, timestamp: str = None) -> None:
+        """
+        Add a sample, the oldest one is dropped if the histograms are full
+        """
+        timestamp = timestamp or datetime.datetime.now().isoformat()
+        with self.lock:
+            self.histograms['time_histogram'].append(timestamp)
+            self.histograms['snr_histogram'].append(snr)
+            self.histograms['bpm_histogram'].append(bytes_per_minute)
+            self.histograms['bps_histogram'].append(bits_per_second)
+            self.samples += 1
+
+    def get_histograms(self) -> dict:
+        """
+        All kept entries, numbered from 0
+        """
+        with self.lock:
+            return {name: dict(enumerate(values)) for name, values in self.histograms.items()}
+
+    def get_delta(self) -> dict:
+        """
+        Entries added since the previous call, keyed by the number of the sample
+        """
+        with self.lock:
+            # number of the oldest kept sample
+            oldest = self.samples - len(self.histograms['time_histogram'])
+            delta = {}
+            for name, values in self.histograms.items():
+                delta[name] = {oldest + index: value for index, value in enumerate(values)
+                               if oldest + index >= self.reported}
+            self.reported = self.samples
+            return delta
+
+
+class ProgressThrottle:
+    """
+    Sends the latest progress at most once per interval
+    """
+
+    def __init__(self, scheduler, interval: float, send):
+        """
+        :param scheduler: SessionScheduler for sending delayed progress
+        :param interval: minimum seconds between two progress events, 0 for no coalescing
+        :type interval: float
+        :param send: function sending the progress, called with the arguments of the latest update
+        """
+        self.scheduler = scheduler
+        self.interval = interval
+        self.send = send
+        self.lock = threading.Lock()
+        self.timer = None
+        self.latest = None
+        self.last_sent = None
+        self.coalesced = 0
+
+    def update(self, *args) -> None:
+        with self.lock:
+            if self.latest is not None:
+                self.coalesced += 1
+            self.latest = args
+            if self.timer:
+                return
+            now = self.scheduler.time()
+            if self.last_sent is None or now - self.last_sent >= self.interval:
+                self.flush_locked()
+            else:
+                self.timer = self.scheduler.call_later(self.last_sent + self.interval - now, self.flush)
+
+    def flush(self) -> None:
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self) -> None:
+        self.timer = None
+        if self.latest is None:
+            return
+        args, self.latest = self.latest, None
+        self.last_sent = self.scheduler.time()
+        self.send(*args)
+
+    def cancel(self) -> None:
+        """
+        Drop progress not sent yet, e.g. when the session has ended
+        """
+        with self.lock:
+            if self.timer:
+                self.timer.cancel()
+                self.timer = None
+            self.latest = None
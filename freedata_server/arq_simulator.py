@@ -0,0 +1,304 @@
+"""
+Simulated ARQ transfers between two stations.
+
+Both stations run the ARQ stack as in operation: frame factory, dispatcher,
+frame handlers and sessions. They share a SessionScheduler with a
+VirtualClock, so airtime and timeouts pass without waiting. Instead of a sound
+card, the simulated modems hand their frames to a ChannelModel. The model
+decides which frames get lost, from the SNR and fades of the channel. It
+delivers the other frames to the peer station after their airtime and the
+decoder delay.
+
+A transfer of minutes simulates in well under a second. That makes it a
+regression benchmark for protocol changes, reporting goodput and retries:
+
+FreeDATA % python3 tools/benchmarks/arq_simulation.py
+"""
+import collections
+import copy
+import math
+import queue
+import random
+import codec2
+from codec2 import FREEDV_MODE
+from event_manager import EventManager
+from state_manager import StateManager
+from frame_dispatcher import DISPATCHER
+from session_clock import VirtualClock
+from session_scheduler import SessionScheduler
+from arq_data_type_handler import ARQDataTypeHandler, ARQ_SESSION_TYPES
+from arq_session_iss import ARQSessionISS, ISS_State
+from modem_frametypes import FRAME_TYPE
+
+# data frames of the ISS, with session id and offset of their data in front of it
+BURST_FRAME_TYPES = [FRAME_TYPE.ARQ_BURST_FRAME.value, FRAME_TYPE.ARQ_BURST_FRAME_SR.value]
+
+# rough SNR in dB at which half of the frames of a mode get lost
+MODE_SNR_THRESHOLD = {
+    FREEDV_MODE.signalling: -12.0,
+    FREEDV_MODE.signalling_ack: -12.0,
+    FREEDV_MODE.datac4: -6.0,
+    FREEDV_MODE.data_ofdm_500: -1.0,
+    FREEDV_MODE.datac1: 2.0,
+    FREEDV_MODE.data_ofdm_2438: 7.0,
+}
+
+# dB per e-fold of the frame loss odds around the threshold
+LOSS_SLOPE = 1.0
+
+
+class ChannelModel:
+    """
+    HF channel with SNR dependent frame loss, fades and transmission delays
+
+    Fades follow a Gilbert-Elliott model: with each frame, a fade starts or
+    ends with a given probability, during a fade the SNR is lower.
+    """
+
+    def __init__(self, snr: float = 10.0, fade_probability: float = 0.0, fade_recovery: float = 0.5,
+                 fade_depth: float = 10.0, ptt_delay: float = 0.1, decode_delay: float = 0.3,
+                 jitter: float = 0.1, seed=None, drop_frame=None):
+        """
+        :param snr: SNR in dB outside of fades
+        :type snr: float
+        :param fade_probability: probability of a fade starting with a frame
+        :type fade_probability: float
+        :param fade_recovery: probability of a fade ending with a frame
+        :type fade_recovery: float
+        :param fade_depth: dB the SNR drops during a fade
+        :type fade_depth: float
+        :param ptt_delay: seconds from keying the transmitter to the first frame
+        :type ptt_delay: float
+        :param decode_delay: seconds from the end of a frame until the receiver has decoded it
+        :type decode_delay: float
+        :param jitter: maximum seconds added to the decode delay
+        :type jitter: float
+        :param seed: seed of the random losses, for reproducible runs
+        :param drop_frame: optional function returning True for frames to lose, called with each frame
+        """
+        self.snr = snr
+        self.fade_probability = fade_probability
+        self.fade_recovery = fade_recovery
+        self.fade_depth = fade_depth
+        self.ptt_delay = ptt_delay
+        self.decode_delay = decode_delay
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.drop_frame = drop_frame
+
+        self.fading = False
+        self.frames = 0
+        self.lost = 0
+        self.faded = 0
+
+    def get_airtime(self, mode) -> float:
+        return codec2.get_mode_parameters(mode)['airtime']
+
+    def get_loss_probability(self, mode, snr: float) -> float:
+        """
+        Probability of losing a frame of a mode at an SNR
+        """
+        odds = (snr - MODE_SNR_THRESHOLD.get(mode, 0.0)) / LOSS_SLOPE
+        # avoid overflows far from the threshold
+        return 1 / (1 + math.exp(max(-50.0, min(50.0, odds))))
+
+    def get_snr(self) -> float:
+        if self.fading:
+            self.fading = self.random.random() >= self.fade_recovery
+        else:
+            self.fading = self.random.random() < self.fade_probability
+        if self.fading:
+            self.faded += 1
+            return self.snr - self.fade_depth
+        return self.snr
+
+    def transmit_frame(self, mode, frame: bytes = b""):
+        """
+        Pass a frame through the channel
+
+        :return: True if the frame got lost, and the SNR it has been received with
+        """
+        snr = self.get_snr()
+        self.frames += 1
+        lost = self.random.random() < self.get_loss_probability(mode, snr)
+        if self.drop_frame and self.drop_frame(frame):
+            lost = True
+        if lost:
+            self.lost += 1
+        return lost, snr
+
+    def get_decode_delay(self) -> float:
+        return self.decode_delay + self.random.uniform(0, self.jitter)
+
+
+class SimulatedDemodulator:
+    """
+    Remembers the modes the sessions want to decode, every mode is decoded
+    """
+
+    def __init__(self):
+        self.modes_to_decode = None
+
+    def set_decode_mode(self, modes_to_decode=None, is_irs=False):
+        self.modes_to_decode = modes_to_decode
+
+
+class SimulatedModem:
+    """
+    Modem of a simulated station, transmitting through a ChannelModel
+    """
+
+    def __init__(self, channel: ChannelModel, scheduler: SessionScheduler, event_queue: queue.Queue):
+        self.channel = channel
+        self.scheduler = scheduler
+        self.clock = scheduler.clock
+        self.event_manager = EventManager([event_queue])
+        self.demodulator = SimulatedDemodulator()
+        self.data_queue_received = queue.Queue()
+        self.audio_out_queue = queue.Queue()
+
+        # set when both stations exist
+        self.peer = None
+        self.dispatcher = None
+
+        # our recent transmissions, we can't receive while transmitting
+        self.busy = collections.deque(maxlen=8)
+        self.sent_frames = set()
+        self.transmissions = 0
+        self.frames_sent = 0
+        self.retries = 0
+        self.collisions = 0
+
+    def transmit(self, mode, repeats: int, repeat_delay: int, frames) -> bool:
+        if not isinstance(frames, list):
+            frames = [frames]
+
+        start = self.clock.monotonic()
+        end = start + self.channel.ptt_delay
+        for frame in frames:
+            frame = bytes(frame)
+            if self.is_retry(frame):
+                self.retries += 1
+
+            frame_start = end
+            end += self.channel.get_airtime(mode)
+            lost, snr = self.channel.transmit_frame(mode, frame)
+            if not lost:
+                received = end + self.channel.get_decode_delay()
+                self.scheduler.call_later(received - self.clock.monotonic(), self.peer.receive,
+                                          frame, mode, snr, frame_start, end)
+
+        self.transmissions += 1
+        self.frames_sent += len(frames)
+        self.busy.append((start, end))
+        # the transmitting station is busy for the airtime
+        self.clock.sleep(end - start)
+        return True
+
+    def is_retry(self, frame: bytes) -> bool:
+        # data is repeated from an offset sent before, maybe with another frame size,
+        # other frames are repeated with the same bytes
+        if frame[0] in BURST_FRAME_TYPES and len(frame) >= 7:
+            key = (frame[1], frame[3:7])
+        else:
+            key = frame
+        if key in self.sent_frames:
+            return True
+        self.sent_frames.add(key)
+        return False
+
+    def receive(self, frame: bytes, mode, snr: float, frame_start: float, frame_end: float) -> None:
+        if any(start < frame_end and frame_start < end for start, end in self.busy):
+            self.collisions += 1
+            return
+        # the modem appends a crc16 to each frame
+        frame += bytes(2)
+        self.dispatcher.process_data(frame, None, len(frame), round(snr), 0, mode_name=mode.name.upper())
+
+
+class SimulatedStation:
+    """
+    State manager, modem and dispatcher of a simulated station
+    """
+
+    def __init__(self, config: dict, channel: ChannelModel, scheduler: SessionScheduler):
+        self.event_queue = queue.Queue()
+        self.states = StateManager(queue.Queue())
+        self.states.use_scheduler(scheduler)
+        self.states.set_channel_busy_condition_codec2(False)
+        self.modem = SimulatedModem(channel, scheduler, self.event_queue)
+        self.dispatcher = DISPATCHER(config, self.modem.event_manager, self.states, self.modem)
+        self.modem.dispatcher = self.dispatcher
+
+
+class ARQSimulator:
+    """
+    Two stations exchanging ARQ transfers over a simulated channel
+    """
+
+    def __init__(self, config: dict, channel: ChannelModel = None):
+        """
+        :param config: configuration of both stations
+        :type config: dict
+        :param channel: channel model, defaults to a good channel
+        :type channel: ChannelModel
+        """
+        self.config = copy.deepcopy(config)
+        # don't report simulated sessions
+        self.config['STATION']['enable_stats'] = False
+        self.channel = channel or ChannelModel()
+        self.clock = VirtualClock()
+        self.scheduler = SessionScheduler(clock=self.clock)
+
+        self.iss = SimulatedStation(self.config, self.channel, self.scheduler)
+        self.irs = SimulatedStation(self.config, self.channel, self.scheduler)
+        self.iss.modem.peer = self.irs.modem
+        self.irs.modem.peer = self.iss.modem
+        self.dxcall = f"{self.config['STATION']['mycall']}-{self.config['STATION']['myssid']}"
+
+    def run_transfer(self, data: bytes, session_type=ARQ_SESSION_TYPES.raw, timeout: float = 3600) -> dict:
+        """
+        Transfer data from the ISS to the IRS
+
+        :param data: payload of the transfer
+        :type data: bytes
+        :param session_type: ARQ_SESSION_TYPES of the transfer
+        :param timeout: simulated seconds after which the transfer is given up
+        :type timeout: float
+        :return: result and statistics of the transfer
+        :rtype: dict
+        """
+        handler = ARQDataTypeHandler(self.iss.modem.event_manager, self.iss.states)
+        prepared_data, type_byte = handler.prepare(data, session_type)
+
+        iss_modem = self.iss.modem
+        transmissions, frames_sent, retries = iss_modem.transmissions, iss_modem.frames_sent, iss_modem.retries
+        frames, lost = self.channel.frames, self.channel.lost
+        collisions = iss_modem.collisions + self.irs.modem.collisions
+
+        iss = ARQSessionISS(self.config, iss_modem, self.dxcall, self.iss.states, prepared_data, type_byte)
+        self.iss.states.register_arq_iss_session(iss)
+        started = self.clock.monotonic()
+        iss.start()
+        self.scheduler.run_until_idle(
+            until=started + timeout,
+            stop=lambda: iss.state in [ISS_State.ENDED, ISS_State.FAILED, ISS_State.ABORTED])
+
+        duration = self.clock.monotonic() - started
+        success = iss.state == ISS_State.ENDED
+        return {
+            "success": success,
+            "state": iss.state.name,
+            "bytes": len(prepared_data),
+            "duration": round(duration, 2),
+            # payload bits per second of simulated time
+            "goodput": round(len(prepared_data) * 8 / duration, 1) if success and duration else 0,
+            "transmissions": iss_modem.transmissions - transmissions,
+            "frames_sent": iss_modem.frames_sent - frames_sent,
+            "retries": iss_modem.retries - retries,
+            "frames_lost": self.channel.lost - lost,
+            "frames_total": self.channel.frames - frames,
+            "collisions": iss_modem.collisions + self.irs.modem.collisions - collisions,
+            "speed_level": iss.speed_level,
+            "turnaround": iss.turnaround.summary(),
+        }
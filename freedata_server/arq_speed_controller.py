@@ -0,0 +1,139 @@
+"""
+Speed level selection of ARQ sessions.
+
+The controller smooths the SNR of the received frames with an EWMA and keeps an
+EWMA of the frame success per speed level. It picks the level with the highest
+expected goodput, that is payload per frame duration times the probability of
+the frame getting through. Going up needs an SNR margin (hysteresis) and is done
+one level at a time, going down happens at once. After a number of bursts without
+losses the next level is probed, even if it failed before.
+"""
+import math
+
+# weight of the newest SNR value
+SNR_ALPHA = 0.3
+
+# weight of the newest frame result
+SUCCESS_ALPHA = 0.25
+
+# dB of SNR margin for the success probability to rise from 50% to 73%
+SNR_SCALE = 1.0
+
+
+class SpeedLevelController:
+    """
+    Chooses the speed level from the SNR history and the frame success per level
+    """
+
+    def __init__(self, speed_levels: dict, payload_sizes: dict, hysteresis: float = 0, probe_interval: int = 0):
+        """
+        :param speed_levels: ARQSession.SPEED_LEVEL_DICT
+        :type speed_levels: dict
+        :param payload_sizes: data bytes per frame for each speed level
+        :type payload_sizes: dict
+        :param hysteresis: dB of SNR above the minimum of a level before going up
+        :type hysteresis: float
+        :param probe_interval: bursts without losses before probing the next level, 0 disables probing
+        :type probe_interval: int
+        """
+        self.speed_levels = speed_levels
+        self.payload_sizes = payload_sizes
+        self.hysteresis = hysteresis
+        self.probe_interval = probe_interval
+
+        self.level = min(speed_levels)
+        self.snr = None
+        self.success = {}
+        self.good_bursts = 0
+        self.burst_failed = False
+
+    def update_snr(self, snr) -> None:
+        """
+        Add the SNR of a received frame
+        """
+        if not isinstance(snr, (int, float)):
+            return
+        if self.snr is None:
+            self.snr = float(snr)
+        else:
+            self.snr += SNR_ALPHA * (snr - self.snr)
+
+    def record_frame(self, level: int, success: bool) -> None:
+        """
+        Add the result of a frame sent with a speed level
+        """
+        if level not in self.speed_levels:
+            return
+        previous = self.success.get(level, self.estimate_success(level))
+        self.success[level] = previous + SUCCESS_ALPHA * (float(success) - previous)
+        if not success:
+            self.burst_failed = True
+
+    def end_burst(self) -> None:
+        """
+        Count bursts without losses for probing
+        """
+        self.good_bursts = 0 if self.burst_failed else self.good_bursts + 1
+        self.burst_failed = False
+
+    def estimate_success(self, level: int) -> float:
+        """
+        Frame success probability of a level estimated from the SNR margin
+        """
+        if self.snr is None:
+            return 1.0 if level == min(self.speed_levels) else 0.0
+        margin = self.snr - self.speed_levels[level]['min_snr']
+        return 1 / (1 + math.exp(-margin / SNR_SCALE))
+
+    def success_probability(self, level: int) -> float:
+        return self.success.get(level, self.estimate_success(level))
+
+    def expected_goodput(self, level: int) -> float:
+        """
+        Expected data bytes per second of a level
+        """
+        duration = self.speed_levels[level]['duration_per_frame']
+        return self.payload_sizes[level] / duration * self.success_probability(level)
+
+    def select(self, available_levels=None) -> int:
+        """
+        Choose the speed level for the next burst
+
+        :param available_levels: levels allowed by bandwidth and channel, defaults to all
+        :type available_levels: list
+        :return: speed level
+        :rtype: int
+        """
+        levels = sorted(available_levels or self.speed_levels)
+        if self.level not in levels:
+            self.level = max([level for level in levels if level < self.level] or [levels[0]])
+
+        best = max(levels, key=self.expected_goodput)
+        if best < self.level:
+            self.level = best
+            self.good_bursts = 0
+            return self.level
+
+        # one level at a time and only with enough SNR margin
+        upper = [level for level in levels if level > self.level]
+        if not upper or self.snr is None:
+            return self.level
+        next_level = upper[0]
+        min_snr = self.speed_levels[next_level]['min_snr']
+
+        if best > self.level and self.snr >= min_snr + self.hysteresis:
+            self.level = next_level
+            self.good_bursts = 0
+        elif self.probe_interval and self.good_bursts >= self.probe_interval and self.snr >= min_snr:
+            # forget about earlier failures of the next level and give it another try
+            self.success.pop(next_level, None)
+            self.level = next_level
+            self.good_bursts = 0
+        return self.level
+
+    def summary(self) -> dict:
+        return {
+            "level": self.level,
+            "snr": self.snr,
+            "success": dict(self.success),
+        }
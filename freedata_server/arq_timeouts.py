@@ -0,0 +1,100 @@
+"""
+Timeouts of ARQ sessions.
+
+Waiting for a reply takes the airtime of the reply plus the turnaround of the
+other station: processing, PTT and tx delay, decoder latency. The airtime is
+known from the mode, the turnaround is measured from our own exchanges and
+smoothed like TCP does with its round trip time (RFC 6298, Jacobson/Karels):
+
+    rttvar = (1 - BETA) * rttvar + BETA * |srtt - sample|
+    srtt = (1 - ALPHA) * srtt + ALPHA * sample
+    timeout = airtime + srtt + K * rttvar
+
+Only replies to a frame sent once are measured (Karn's algorithm), a timeout
+doubles the turnaround margin until the next measurement.
+"""
+import codec2
+
+ALPHA = 1 / 8
+BETA = 1 / 4
+K = 4
+
+# seconds of turnaround assumed before the first measurement
+INITIAL_TURNAROUND = 0.5
+
+# limits of the turnaround margin added to the airtime of a reply
+MIN_MARGIN = 0.5
+MAX_MARGIN = 8.0
+
+
+def get_airtime(mode, frames: int = 1) -> float:
+    """
+    Airtime of a number of frames of a mode in seconds
+
+    :param mode: FREEDV_MODE
+    :param frames: number of frames
+    :type frames: int
+    :return: airtime in seconds
+    :rtype: float
+    """
+    return codec2.get_mode_parameters(mode)['airtime'] * frames
+
+
+class TurnaroundEstimator:
+    """
+    Smoothed turnaround and its variation of the other station
+    """
+
+    def __init__(self, initial: float = INITIAL_TURNAROUND):
+        self.srtt = initial
+        self.rttvar = initial / 2
+        self.backoff = 1
+        self.samples = 0
+
+    def add_sample(self, turnaround: float) -> None:
+        """
+        Add a measured turnaround, the time between the end of our transmission
+        and the start of the reply
+
+        :param turnaround: turnaround in seconds
+        :type turnaround: float
+        """
+        turnaround = max(0.0, turnaround)
+        if self.samples == 0:
+            self.srtt = turnaround
+            self.rttvar = turnaround / 2
+        else:
+            self.rttvar = (1 - BETA) * self.rttvar + BETA * abs(self.srtt - turnaround)
+            self.srtt = (1 - ALPHA) * self.srtt + ALPHA * turnaround
+        self.samples += 1
+        self.backoff = 1
+
+    def on_timeout(self) -> None:
+        """
+        Back off after a missing reply, our estimate may be too low
+        """
+        if self.get_margin() < MAX_MARGIN:
+            self.backoff *= 2
+
+    def get_margin(self) -> float:
+        margin = (self.srtt + K * self.rttvar) * self.backoff
+        return min(MAX_MARGIN, max(MIN_MARGIN, margin))
+
+    def get_timeout(self, reply_airtime: float) -> float:
+        """
+        Seconds to wait for a reply after the end of our transmission
+
+        :param reply_airtime: airtime of the expected reply
+        :type reply_airtime: float
+        :return: timeout in seconds
+        :rtype: float
+        """
+        return reply_airtime + self.get_margin()
+
+    def summary(self) -> dict:
+        return {
+            "srtt": round(self.srtt, 3),
+            "rttvar": round(self.rttvar, 3),
+            "margin": round(self.get_margin(), 3),
+            "samples": self.samples,
+        }
@@ -5,7 +5,6 @@ import multiprocessing
 import sounddevice as sd
 import structlog
 import numpy as np
-import queue
 import helpers
 
 log = structlog.get_logger("audio")
@@ -127,7 +126,7 @@ def get_device_index_from_crc(crc, isInput: bool):
         log.warning(f"Audio device {crc} not detected ", devices=detected_devices, isInput=isInput)
         return [None, None]
 
-def test_audio_devices(input_id: str, output_id: str) -> list:
+def test_audio_devices(input_id: str, output_id: str, samplerate: int = 48000) -> list:
     test_result = [False, False]
     try:
         result = get_device_index_from_crc(input_id, True)
@@ -140,7 +139,7 @@ def test_audio_devices(input_id: str, output_id: str) -> list:
                 device=in_dev_index,
                 channels=1,
                 dtype="int16",
-                samplerate=48000,
+                samplerate=samplerate,
             )
             test_result[0] = True
     except (sd.PortAudioError, ValueError) as e:
@@ -157,7 +156,7 @@ def test_audio_devices(input_id: str, output_id: str) -> list:
                 device=out_dev_index,
                 channels=1,
                 dtype="int16",
-                samplerate=48000,
+                samplerate=samplerate,
             )
             test_result[1] = True
 
@@ -205,171 +204,6 @@ def set_audio_volume(datalist: np.ndarray, dB: float) -> np.ndarray:
     return np.clip(scaled_data, -32768, 32767).astype(np.int16)
 
 
-RMS_COUNTER = 0
-CHANNEL_BUSY_DELAY = 0
-SLOT_DELAY = [0, 0, 0, 0, 0]
-
-
-def prepare_data_for_fft(data, target_length_samples=400):
-    """
-    Prepare data array for FFT by padding if necessary to match the target length.
-    Center the data if it's shorter than the target length.
-
-    Parameters:
-    - data: numpy array of np.int16, representing the input data.
-    - target_length_samples: int, the target length of the data in samples.
-
-    Returns:
-    - numpy array of np.int16, padded and/or centered if necessary.
-    """
-    # Calculate the current length in samples
-    current_length_samples = data.size
-
-    # Check if padding is needed
-    if current_length_samples < target_length_samples:
-        # Calculate total padding needed
-        total_pad_length = target_length_samples - current_length_samples
-        # Calculate padding on each side
-        pad_before = total_pad_length // 2
-        pad_after = total_pad_length - pad_before
-        # Pad the data to center it
-        data_padded = np.pad(data, (pad_before, pad_after), 'constant', constant_values=(0,))
-        return data_padded
-    else:
-        # No padding needed, return original data
-        return data
-
-def calculate_fft(data, fft_queue, states) -> None:
-    """
-    Calculate an average signal strength of the channel to assess
-    whether the channel is "busy."
-    """
-    # Initialize dbfs counter
-    # rms_counter = 0
-
-    # https://gist.github.com/ZWMiller/53232427efc5088007cab6feee7c6e4c
-    # Fast Fourier Transform, 10*log10(abs) is to scale it to dB
-    # and make sure it's not imaginary
-
-    global RMS_COUNTER, CHANNEL_BUSY_DELAY
-
-    try:
-        data = prepare_data_for_fft(data, target_length_samples=800)
-        fftarray = np.fft.rfft(data)
-
-        # Set value 0 to 1 to avoid division by zero
-        fftarray[fftarray == 0] = 1
-        dfft = 10.0 * np.log10(abs(fftarray))
-
-        # get average of dfft
-        avg = np.mean(dfft)
-
-        # Detect signals which are higher than the
-        # average + 10 (+10 smoothes the output).
-        # Data higher than the average must be a signal.
-        # Therefore we are setting it to 100 so it will be highlighted
-        # Have to do this when we are not transmitting so our
-        # own sending data will not affect this too much
-        if not states.isTransmitting():
-            dfft[dfft > avg + 15] = 100
-
-            # Calculate audio dbfs
-            # https://stackoverflow.com/a/9763652
-            # calculate dbfs every 50 cycles for reducing CPU load
-            RMS_COUNTER += 1
-            if RMS_COUNTER > 5:
-                d = np.frombuffer(data, np.int16).astype(np.float32)
-                # calculate RMS and then dBFS
-                # https://dsp.stackexchange.com/questions/8785/how-to-compute-dbfs
-                # try except for avoiding runtime errors by division/0
-                try:
-                    rms = int(np.sqrt(np.max(d ** 2)))
-                    if rms == 0:
-                        raise ZeroDivisionError
-                    audio_dbfs = 20 * np.log10(rms / 32768)
-                    states.set("audio_dbfs", audio_dbfs)
-                except Exception as e:
-                    states.set("audio_dbfs", -100)
-
-                RMS_COUNTER = 0
-
-        # Convert data to int to decrease size
-        dfft = dfft.astype(int)
-
-        # Create list of dfft
-        dfftlist = dfft.tolist()
-
-        # Reduce area where the busy detection is enabled
-        # We want to have this in correlation with mode bandwidth
-        # TODO This is not correctly and needs to be checked for correct maths
-        # dfftlist[0:1] = 10,15Hz
-        # Bandwidth[Hz] / 10,15
-        # narrowband = 563Hz = 56
-        # wideband = 1700Hz = 167
-        # 1500Hz = 148
-        # 2700Hz = 266
-        # 3200Hz = 315
-        # Initialize slot delay counters
-        DELAY_INCREMENT = 2
-        MAX_DELAY = 200
-
-        # Main logic
-        slot = 0
-        slot1 = [0, 65]
-        slot2 = [65, 120]
-        slot3 = [120, 176]
-        slot4 = [176, 231]
-        slot5 = [231, len(dfftlist)]
-        slotbusy = [False, False, False, False, False]
-
-        # Set to true if we should increment delay count; else false to decrement
-        addDelay = False
-
-        for range in [slot1, slot2, slot3, slot4, slot5]:
-            range_start = range[0]
-            range_end = range[1]
-            # define the area, we are detecting busy state
-            slotdfft = dfft[range_start:range_end]
-            # Check for signals higher than average by checking for "100"
-            # If we have a signal, increment our channel_busy delay counter
-            # so we have a smoother state toggle
-            if np.sum(slotdfft[slotdfft > avg + 15]) >= 200 and not states.isTransmitting() and not states.is_receiving_codec2_signal():
-                addDelay = True
-                slotbusy[slot] = True
-                SLOT_DELAY[slot] = min(SLOT_DELAY[slot] + DELAY_INCREMENT, MAX_DELAY)
-            else:
-                SLOT_DELAY[slot] = max(SLOT_DELAY[slot] - 1, 0)
-
-                if SLOT_DELAY[slot] == 0:
-                    slotbusy[slot] = False
-                else:
-                    slotbusy[slot] = True
-
-            # increment slot
-            slot += 1
-        states.set_channel_slot_busy(slotbusy)
-
-        if addDelay:
-            # Limit delay counter to a maximum of 200. The higher this value,
-            # the longer we will wait until releasing state
-            states.set_channel_busy_condition_traffic(True)
-            CHANNEL_BUSY_DELAY = min(CHANNEL_BUSY_DELAY + DELAY_INCREMENT, MAX_DELAY)
-        else:
-            # Decrement channel busy counter if no signal has been detected.
-            CHANNEL_BUSY_DELAY = max(CHANNEL_BUSY_DELAY - 1, 0)
-            # When our channel busy counter reaches 0, toggle state to False
-            if CHANNEL_BUSY_DELAY == 0:
-                states.set_channel_busy_condition_traffic(False)
-
-        # erase queue if greater than 3
-        if fft_queue.qsize() >= 1:
-            fft_queue = queue.Queue()
-
-        fft_queue.put(dfftlist[:315])  # 315 --> bandwidth 3200
-
-    except Exception as err:
-        print(f"[MDM] calculate_fft: Exception: {err}")
-
 def terminate():
     log.warning("[SHUTDOWN] terminating audio instance...")
     if sd._initialized:
@@ -0,0 +1,184 @@
+"""
+Sample rate conversion between the sound card and the 8kHz codec2 modem.
+
+At 48kHz we use the codec2 resampler. For other device rates, like 44.1kHz
+or 96kHz, a rational polyphase resampler converts directly to and from 8kHz,
+so we don't depend on PortAudio or the OS for resampling.
+"""
+from math import gcd
+import numpy as np
+import structlog
+import codec2
+
+log = structlog.get_logger("audio_resampler")
+
+MODEM_SAMPLE_RATE = codec2.api.FREEDV_FS_8000
+CODEC2_DEVICE_SAMPLE_RATE = MODEM_SAMPLE_RATE * codec2.api.FDMDV_OS_48
+
+
+def design_lowpass(up: int, down: int, zero_crossings: int = 10, beta: float = 5.0) -> np.ndarray:
+    """
+    Design the anti-aliasing/anti-imaging filter of a rational resampler
+
+    Kaiser windowed sinc at the upsampled rate, with the cutoff at the Nyquist
+    frequency of the lower of both rates.
+
+    :param up: interpolation factor
+    :type up: int
+    :param down: decimation factor
+    :type down: int
+    :param zero_crossings: zero crossings of the sinc on each side
+    :type zero_crossings: int
+    :param beta: kaiser window beta
+    :type beta: float
+    :return: filter taps at the upsampled rate, scaled by up
+    :rtype: np.ndarray
+    """
+    max_rate = max(up, down)
+    half_length = zero_crossings * max_rate
+    n = np.arange(-half_length, half_length + 1)
+    taps = np.sinc(n / max_rate) / max_rate
+    taps *= np.kaiser(len(taps), beta)
+    # normalise dc gain, then compensate for the zeros inserted by upsampling
+    return taps / np.sum(taps) * up
+
+
+class PolyphaseResampler:
+    """
+    Rational up/down polyphase FIR resampler for continuous int16 audio streams
+
+    The filter is split into `up` phases once. Each block is filtered together
+    with the tail of the previous block, and the output phase is carried over,
+    so a stream can be fed in blocks of any length.
+    """
+
+    def __init__(self, rate_in: int, rate_out: int, zero_crossings: int = 10):
+        divisor = gcd(rate_in, rate_out)
+        self.rate_in = rate_in
+        self.rate_out = rate_out
+        self.up = rate_out // divisor
+        self.down = rate_in // divisor
+
+        taps = design_lowpass(self.up, self.down, zero_crossings)
+        # pad the filter to a multiple of up and split it into its phases
+        self.taps_per_phase = -(-len(taps) // self.up)
+        taps = np.concatenate([taps, np.zeros(self.taps_per_phase * self.up - len(taps))])
+        # bank[p, m] weights input sample i - (taps_per_phase - 1) + m for an output at phase p
+        self.bank = taps.reshape(self.taps_per_phase, self.up).T[:, ::-1].astype(np.float32).copy()
+        self.window_offsets = np.arange(self.taps_per_phase)
+
+        # the last taps_per_phase - 1 input samples of the previous block
+        self.history = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+        # position of the next output sample at the upsampled rate, relative to the block start
+        self.next_position = 0
+
+        log.debug(
+            "[AUD] Create polyphase resampler", rate_in=rate_in, rate_out=rate_out,
+            up=self.up, down=self.down, taps_per_phase=self.taps_per_phase
+        )
+
+    def output_length(self, input_length: int) -> int:
+        """
+        Number of samples the next call will return for input_length input samples
+
+        :param input_length: length of the next input block
+        :type input_length: int
+        :return: number of output samples
+        :rtype: int
+        """
+        remaining = input_length * self.up - self.next_position
+        return max(0, -(-remaining // self.down))
+
+    def resample(self, samples: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """
+        Resample the next block of the stream
+
+        :param samples: int16 input samples at rate_in
+        :type samples: np.ndarray
+        :param out: optional int16 array receiving the result
+        :type out: np.ndarray
+        :return: int16 samples at rate_out, a view of out if given
+        :rtype: np.ndarray
+        """
+        n_out = self.output_length(len(samples))
+        buffer = np.concatenate([self.history, samples.astype(np.float32)])
+
+        positions = self.next_position + np.arange(n_out) * self.down
+        phases = positions % self.up
+        # index of the first input sample of each output window in buffer
+        starts = positions // self.up
+        windows = buffer[starts[:, None] + self.window_offsets]
+        result = np.einsum('ij,ij->i', self.bank[phases], windows)
+
+        self.history = buffer[len(buffer) - len(self.history):]
+        self.next_position += n_out * self.down - len(samples) * self.up
+
+        if out is None:
+            out = np.empty(n_out, dtype=np.int16)
+        out = out[:n_out]
+        assert len(out) == n_out and out.dtype == np.int16
+        np.clip(np.rint(result), -32768, 32767, out=result)
+        out[:] = result
+        return out
+
+
+class AudioResampler:
+    """
+    Converts audio between the sound card rate and the 8kHz modem rate
+
+    Keeps the codec2 resampler for 48kHz devices and uses polyphase resamplers
+    for all other rates.
+    """
+
+    def __init__(self, device_sample_rate: int = CODEC2_DEVICE_SAMPLE_RATE, max_block: int = 4800):
+        self.device_sample_rate = device_sample_rate
+        self.max_block = max_block
+        if device_sample_rate == CODEC2_DEVICE_SAMPLE_RATE:
+            self.codec2_resampler = codec2.resampler(max_block_48=max_block)
+            self.to_modem = None
+            self.to_device = None
+        else:
+            self.codec2_resampler = None
+            self.to_modem = PolyphaseResampler(device_sample_rate, MODEM_SAMPLE_RATE)
+            self.to_device = PolyphaseResampler(MODEM_SAMPLE_RATE, device_sample_rate)
+
+    def modem_block_size(self, device_block_size: int) -> int:
+        """
+        Upper limit of modem samples we get out of a block of device samples
+
+        :param device_block_size: block length at the device rate
+        :type device_block_size: int
+        :return: block length at the modem rate
+        :rtype: int
+        """
+        return device_block_size * MODEM_SAMPLE_RATE // self.device_sample_rate + 1
+
+    def resample_to_modem(self, samples: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """
+        Resample device audio to 8kHz
+
+        :param samples: int16 audio at the device rate
+        :type samples: np.ndarray
+        :param out: optional int16 array receiving the result
+        :type out: np.ndarray
+        :return: int16 audio at 8kHz
+        :rtype: np.ndarray
+        """
+        if self.codec2_resampler:
+            return self.codec2_resampler.resample48_to_8(samples, out=out)
+        return self.to_modem.resample(samples, out=out)
+
+    def resample_to_device(self, samples: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """
+        Resample 8kHz modem audio to the device rate
+
+        :param samples: int16 audio at 8kHz
+        :type samples: np.ndarray
+        :param out: optional int16 array receiving the result
+        :type out: np.ndarray
+        :return: int16 audio at the device rate
+        :rtype: np.ndarray
+        """
+        if self.codec2_resampler:
+            return self.codec2_resampler.resample8_to_48(samples, out=out)
+        return self.to_device.resample(samples, out=out)
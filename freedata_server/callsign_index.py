@@ -0,0 +1,95 @@
+"""
+Index of callsign CRCs.
+
+Frames address stations by the CRC-24 of their full callsign. The index holds
+the CRCs of our own callsign with every configured SSID, so checking if a frame
+is for us is a single lookup, and resolves CRCs of other stations we've heard
+back to their full callsign.
+"""
+import functools
+import threading
+from collections import OrderedDict
+import helpers
+
+# number of callsigns of other stations kept for resolving CRCs
+MAX_HEARD_CALLSIGNS = 1024
+
+
+class CallsignIndex:
+    """
+    Lookup of CRC-24 checksums to full callsigns
+    """
+
+    def __init__(self, mycall: str, myssid: int, ssid_list):
+        """
+        :param mycall: our callsign without SSID
+        :type mycall: str
+        :param myssid: our SSID
+        :type myssid: int
+        :param ssid_list: further SSIDs we accept frames for
+        :type ssid_list: list
+        """
+        ssids = sorted({int(ssid) for ssid in ssid_list} | {int(myssid)})
+        # crc as hex string, like in deconstructed frames: full callsign
+        self.own = {
+            helpers.get_crc_24(f"{mycall}-{ssid}").hex(): f"{mycall}-{ssid}"
+            for ssid in ssids
+        }
+        self.heard = OrderedDict()
+        self.lock = threading.Lock()
+
+    def is_mine(self, crc: str) -> bool:
+        """
+        Check if a CRC belongs to our callsign with one of our SSIDs
+
+        :param crc: CRC-24 as hex string
+        :type crc: str
+        :rtype: bool
+        """
+        return crc in self.own
+
+    def add(self, callsign: str) -> None:
+        """
+        Remember the callsign of a station we heard
+
+        :param callsign: full callsign with SSID
+        :type callsign: str
+        """
+        crc = helpers.get_crc_24(callsign).hex()
+        with self.lock:
+            self.heard[crc] = callsign
+            self.heard.move_to_end(crc)
+            if len(self.heard) > MAX_HEARD_CALLSIGNS:
+                self.heard.popitem(last=False)
+
+    def lookup(self, crc: str):
+        """
+        Resolve a CRC to a full callsign
+
+        :param crc: CRC-24 as hex string
+        :type crc: str
+        :return: full callsign or None if unknown
+        :rtype: str
+        """
+        if crc in self.own:
+            return self.own[crc]
+        with self.lock:
+            return self.heard.get(crc)
+
+
+@functools.lru_cache(maxsize=4)
+def get_index(mycall: str, myssid: int, ssid_list: tuple) -> CallsignIndex:
+    return CallsignIndex(mycall, myssid, ssid_list)
+
+
+def for_config(config: dict) -> CallsignIndex:
+    """
+    Index of a configuration. Handlers of the same configuration share one index,
+    a changed callsign or SSID list results in a new one.
+
+    :param config: freedata_server configuration
+    :type config: dict
+    :rtype: CallsignIndex
+    """
+    station = config['STATION']
+    return get_index(station['mycall'], station['myssid'], tuple(station['ssid_list']))
@@ -115,68 +115,76 @@ if api is None or "api" not in locals():
     log.critical("[C2 ] Error:  Libcodec2 not loaded - Exiting")
     sys.exit(1)
 
-#log.info("[C2 ] Libcodec2 loaded...", path=file)
-# ctypes function init
-
-# api.freedv_set_tuning_range.restype = ctypes.c_int
-# api.freedv_set_tuning_range.argype = [ctypes.c_void_p, ctypes.c_float, ctypes.c_float]
-
-api.freedv_open.argype = [ctypes.c_int]  # type: ignore
-api.freedv_open.restype = ctypes.c_void_p
-
-api.freedv_set_sync.argype = [ctypes.c_void_p, ctypes.c_int]  # type: ignore
-api.freedv_set_sync.restype = ctypes.c_void_p
-
-api.freedv_open_advanced.argtype = [ctypes.c_int, ctypes.c_void_p]  # type: ignore
-api.freedv_open_advanced.restype = ctypes.c_void_p
-
-api.freedv_get_bits_per_modem_frame.argtype = [ctypes.c_void_p]  # type: ignore
-api.freedv_get_bits_per_modem_frame.restype = ctypes.c_int
-
-api.freedv_get_modem_extended_stats.argtype = [ctypes.c_void_p, ctypes.c_void_p]
-api.freedv_get_modem_extended_stats.restype = ctypes.c_int
-
-api.freedv_nin.argtype = [ctypes.c_void_p]  # type: ignore
-api.freedv_nin.restype = ctypes.c_int
-
-api.freedv_rawdatarx.argtype = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p]  # type: ignore
-api.freedv_rawdatarx.restype = ctypes.c_int
-
-api.freedv_rawdatatx.argtype = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p]  # type: ignore
-api.freedv_rawdatatx.restype = ctypes.c_int
-
-api.freedv_rawdatapostambletx.argtype = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p]  # type: ignore
-api.freedv_rawdatapostambletx.restype = ctypes.c_int
-
-api.freedv_rawdatapreambletx.argtype = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p]  # type: ignore
-api.freedv_rawdatapreambletx.restype = ctypes.c_int
-
-api.freedv_get_n_max_modem_samples.argtype = [ctypes.c_void_p]  # type: ignore
-api.freedv_get_n_max_modem_samples.restype = ctypes.c_int
-
-api.freedv_set_frames_per_burst.argtype = [ctypes.c_void_p, ctypes.c_int]  # type: ignore
-api.freedv_set_frames_per_burst.restype = ctypes.c_void_p
-
-api.freedv_get_rx_status.argtype = [ctypes.c_void_p]  # type: ignore
-api.freedv_get_rx_status.restype = ctypes.c_int
-
-api.freedv_get_modem_stats.argtype = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p]  # type: ignore
-api.freedv_get_modem_stats.restype = ctypes.c_int
-
-api.freedv_get_n_tx_postamble_modem_samples.argtype = [ctypes.c_void_p]  # type: ignore
-api.freedv_get_n_tx_postamble_modem_samples.restype = ctypes.c_int
-
-api.freedv_get_n_tx_preamble_modem_samples.argtype = [ctypes.c_void_p]  # type: ignore
-api.freedv_get_n_tx_preamble_modem_samples.restype = ctypes.c_int
+# ------- TYPED BINDINGS
+# argtypes and restype of every libcodec2 symbol we use. Without argtypes
+# ctypes falls back to its default int conversion for every argument, which
+# is slower and truncates pointers on some 64 bit platforms.
+# Audio buffers are passed as numpy arrays, checked by ndpointer.
+int16_array = np.ctypeslib.ndpointer(dtype=np.int16, ndim=1, flags="C_CONTIGUOUS")
+
+API_SIGNATURES = {
+    # name: (argtypes, restype)
+    "freedv_open": ([ctypes.c_int], ctypes.c_void_p),
+    "freedv_close": ([ctypes.c_void_p], None),
+    "freedv_set_sync": ([ctypes.c_void_p, ctypes.c_int], None),
+    "freedv_set_frames_per_burst": ([ctypes.c_void_p, ctypes.c_int], None),
+    "freedv_get_bits_per_modem_frame": ([ctypes.c_void_p], ctypes.c_int),
+    "freedv_get_n_max_modem_samples": ([ctypes.c_void_p], ctypes.c_int),
+    "freedv_get_n_nom_modem_samples": ([ctypes.c_void_p], ctypes.c_int),
+    "freedv_get_n_tx_modem_samples": ([ctypes.c_void_p], ctypes.c_int),
+    "freedv_get_n_tx_preamble_modem_samples": ([ctypes.c_void_p], ctypes.c_int),
+    "freedv_get_n_tx_postamble_modem_samples": ([ctypes.c_void_p], ctypes.c_int),
+    "freedv_nin": ([ctypes.c_void_p], ctypes.c_int),
+    "freedv_get_rx_status": ([ctypes.c_void_p], ctypes.c_int),
+    "freedv_get_modem_stats": (
+        [ctypes.c_void_p, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_float)], None
+    ),
+    # struct MODEM_STATS is passed by reference
+    "freedv_get_modem_extended_stats": ([ctypes.c_void_p, ctypes.c_void_p], None),
+    "freedv_rawdatarx": ([ctypes.c_void_p, ctypes.c_char_p, int16_array], ctypes.c_int),
+    "freedv_rawdatatx": ([ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p], None),
+    "freedv_rawdatapreambletx": ([ctypes.c_void_p, ctypes.c_void_p], ctypes.c_int),
+    "freedv_rawdatapostambletx": ([ctypes.c_void_p, ctypes.c_void_p], ctypes.c_int),
+    "freedv_gen_crc16": ([ctypes.c_char_p, ctypes.c_int], ctypes.c_ushort),
+    "fdmdv_8_to_48_short": ([int16_array, int16_array, ctypes.c_int], None),
+    "fdmdv_48_to_8_short": ([int16_array, int16_array, ctypes.c_int], None),
+}
 
-api.freedv_get_n_tx_modem_samples.argtype = [ctypes.c_void_p]  # type: ignore
-api.freedv_get_n_tx_modem_samples.restype = ctypes.c_int
+# symbols we can live without, depending on how libcodec2 has been built
+OPTIONAL_API_SIGNATURES = {
+    "freedv_ofdm_print_info": ([ctypes.c_void_p], None),
+    "freedv_set_tuning_range": ([ctypes.c_void_p, ctypes.c_float, ctypes.c_float], None),
+    "freedv_get_sync": ([ctypes.c_void_p], ctypes.c_int),
+    "freedv_set_verbose": ([ctypes.c_void_p, ctypes.c_int], None),
+}
 
-api.freedv_get_n_max_modem_samples.argtype = [ctypes.c_void_p]  # type: ignore
-api.freedv_get_n_max_modem_samples.restype = ctypes.c_int
+# name -> True if the loaded library provides the optional symbol
+OPTIONAL_API_SYMBOLS = {}
 
-api.freedv_ofdm_print_info.argtype = [ctypes.c_void_p]  # type: ignore
-api.freedv_ofdm_print_info.restype = ctypes.c_void_p
+for name, (argtypes, restype) in API_SIGNATURES.items():
+    try:
+        function = getattr(api, name)
+    except AttributeError:
+        log.critical("[C2 ] Error:  Libcodec2 misses required symbol - Exiting", symbol=name)
+        sys.exit(1)
+    function.argtypes = argtypes
+    function.restype = restype
+
+for name, (argtypes, restype) in OPTIONAL_API_SIGNATURES.items():
+    try:
+        function = getattr(api, name)
+    except AttributeError:
+        OPTIONAL_API_SYMBOLS[name] = False
+        continue
+    function.argtypes = argtypes
+    function.restype = restype
+    OPTIONAL_API_SYMBOLS[name] = True
+
+log.info(
+    "[C2 ] Libcodec2 optional symbols",
+    available=[name for name, found in OPTIONAL_API_SYMBOLS.items() if found],
+    missing=[name for name, found in OPTIONAL_API_SYMBOLS.items() if not found],
+)
 
 api.FREEDV_FS_8000 = 8000  # type: ignore
 
@@ -216,6 +224,47 @@ class MODEMSTATS(ctypes.Structure):
     ]
 
 
+class modem_stats_buffer:
+    """
+    Preallocated output arguments for the modem stats calls of a codec2 instance
+
+    MODEMSTATS is large, so we allocate it and its byref objects once and let
+    codec2 fill them again on each call. Not thread safe, use one per decoder.
+    """
+
+    def __init__(self):
+        self.extended = MODEMSTATS()
+        self.sync = ctypes.c_int()
+        self.snr = ctypes.c_float()
+        self.extended_ref = ctypes.byref(self.extended)
+        self.sync_ref = ctypes.byref(self.sync)
+        self.snr_ref = ctypes.byref(self.snr)
+
+    def update(self, freedv: ctypes.c_void_p) -> tuple:
+        """
+        Read sync and snr estimate of the instance
+
+        :param freedv: codec2 instance to query
+        :type freedv: ctypes.c_void_p
+        :return: sync flag, snr estimate
+        :rtype: tuple
+        """
+        api.freedv_get_modem_stats(freedv, self.sync_ref, self.snr_ref)
+        return self.sync.value, self.snr.value
+
+    def update_extended(self, freedv: ctypes.c_void_p) -> MODEMSTATS:
+        """
+        Read the extended modem stats of the instance
+
+        :param freedv: codec2 instance to query
+        :type freedv: ctypes.c_void_p
+        :return: the refreshed extended stats structure
+        :rtype: MODEMSTATS
+        """
+        api.freedv_get_modem_extended_stats(freedv, self.extended_ref)
+        return self.extended
+
+
 # Return code flags for freedv_get_rx_status() function
 api.FREEDV_RX_TRIAL_SYNC = 0x1  # type: ignore # demodulator has trial sync
 api.FREEDV_RX_SYNC = 0x2  # type: ignore # demodulator has sync
@@ -300,80 +349,128 @@ api.FDMDV_OS_48 = 6  # type: ignore
 api.FDMDV_OS_TAPS_48K = 48  # type: ignore
 # Number of oversampling filter taps at 8kHz
 api.FDMDV_OS_TAPS_48_8K = api.FDMDV_OS_TAPS_48K // api.FDMDV_OS_48  # type: ignore
-api.fdmdv_8_to_48_short.argtype = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int]  # type: ignore
-api.fdmdv_48_to_8_short.argtype = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int]  # type: ignore
 
 
 class resampler:
     """
     Re-sampler class
+
+    Work and output buffers are allocated once, sized for the largest block
+    seen so far, so realtime audio callbacks can resample without allocating.
     """
 
     # Re-sample an array of variable length, we just store the filter memories here
     MEM8 = api.FDMDV_OS_TAPS_48_8K
     MEM48 = api.FDMDV_OS_TAPS_48K
 
-    def __init__(self):
-        log.debug("[C2 ] Create 48<->8 kHz resampler")
-        self.filter_mem8 = np.zeros(self.MEM8, dtype=np.int16)
-        self.filter_mem48 = np.zeros(self.MEM48)
+    def __init__(self, max_block_48: int = 4800):
+        log.debug("[C2 ] Create 48<->8 kHz resampler", max_block_48=max_block_48)
+        # the filter memory is kept at the start of the work buffers, followed by
+        # the samples of the current block, like in48_mem in the codec2 C demos
+        self.in48_mem = np.zeros(0, dtype=np.int16)
+        self.in8_mem = np.zeros(0, dtype=np.int16)
+        self.out8 = np.zeros(0, dtype=np.int16)
+        self.out48 = np.zeros(0, dtype=np.int16)
+        self.allocate_buffers(max_block_48)
+        # 48 kHz samples left over from the last block, not yet a multiple of FDMDV_OS_48
+        self.n_remainder48 = 0
+
+    def allocate_buffers(self, max_block_48: int) -> None:
+        """
+        (Re)allocate the work and output buffers for blocks up to max_block_48 samples at 48kHz,
+        keeping the filter memory and a pending remainder
+
+        Args:
+            max_block_48: largest expected block length at 48kHz
+        """
+        max_block_8 = max_block_48 // api.FDMDV_OS_48 + 1  # type: ignore
+
+        in48_mem = np.zeros(self.MEM48 + max_block_48 + api.FDMDV_OS_48, dtype=np.int16)  # type: ignore
+        in48_mem[: len(self.in48_mem)] = self.in48_mem[: len(in48_mem)]
+        self.in48_mem = in48_mem
+
+        in8_mem = np.zeros(self.MEM8 + max_block_8, dtype=np.int16)
+        in8_mem[: self.MEM8] = self.in8_mem[: self.MEM8] if len(self.in8_mem) else 0
+        self.in8_mem = in8_mem
+
+        self.out8 = np.zeros(max_block_8, dtype=np.int16)
+        self.out48 = np.zeros(max_block_8 * api.FDMDV_OS_48, dtype=np.int16)  # type: ignore
+
+    @property
+    def filter_mem48(self):
+        return self.in48_mem[: self.MEM48]
 
-    def resample48_to_8(self, in48):
+    @property
+    def filter_mem8(self):
+        return self.in8_mem[: self.MEM8]
+
+    def resample48_to_8(self, in48, out=None):
         """
         Audio resampler integration from codec2
         Downsample audio from 48000Hz to 8000Hz
+
+        Samples which don't fill a multiple of api.FDMDV_OS_48 are kept and
+        used with the next block, so any block length can be passed in.
+
         Args:
             in48: input data as np.int16
+            out: optional np.int16 array receiving the result, needs room for
+                 (remainder + len(in48)) // 6 samples
 
         Returns:
-            Downsampled 8000Hz data as np.int16
+            Downsampled 8000Hz data as np.int16, a view of out if given
         """
         assert in48.dtype == np.int16
-        # Length of input vector must be an integer multiple of api.FDMDV_OS_48
-        assert len(in48) % api.FDMDV_OS_48 == 0  # type: ignore
+        n_total = self.n_remainder48 + len(in48)
+        if self.MEM48 + n_total > len(self.in48_mem):
+            self.allocate_buffers(n_total)
 
-        # Concatenate filter memory and input samples
-        in48_mem = np.zeros(self.MEM48 + len(in48), dtype=np.int16)
-        in48_mem[: self.MEM48] = self.filter_mem48
-        in48_mem[self.MEM48 :] = in48
+        # Append input samples to filter memory and remainder
+        self.in48_mem[self.MEM48 + self.n_remainder48 : self.MEM48 + n_total] = in48
 
-        # In C: pin48=&in48_mem[MEM48]
-        pin48 = ctypes.byref(np.ctypeslib.as_ctypes(in48_mem), 2 * self.MEM48)
-        n8 = int(len(in48) / api.FDMDV_OS_48)  # type: ignore
-        out8 = np.zeros(n8, dtype=np.int16)
-        api.fdmdv_48_to_8_short(out8.ctypes, pin48, n8)  # type: ignore
+        n8 = n_total // api.FDMDV_OS_48  # type: ignore
+        n48 = n8 * api.FDMDV_OS_48  # type: ignore
+        out8 = self.out8[:n8] if out is None else out[:n8]
+        assert len(out8) == n8 and out8.dtype == np.int16
+        if n8:
+            # In C: pin48=&in48_mem[MEM48], the filter reads the memory in front of it
+            api.fdmdv_48_to_8_short(out8, self.in48_mem[self.MEM48 :], n8)  # type: ignore
 
-        # Store memory for next time
-        self.filter_mem48 = in48_mem[: self.MEM48]
+        # codec2 has already moved the last MEM48 used samples to the filter memory,
+        # so we only need to move the remainder behind it
+        self.n_remainder48 = n_total - n48
+        self.in48_mem[self.MEM48 : self.MEM48 + self.n_remainder48] = self.in48_mem[self.MEM48 + n48 : self.MEM48 + n_total]
 
-        return out8
+        return out8.copy() if out is None else out8
 
-    def resample8_to_48(self, in8):
+    def resample8_to_48(self, in8, out=None):
         """
         Audio resampler integration from codec2
         Re-sample audio from 8000Hz to 48000Hz
         Args:
             in8: input data as np.int16
+            out: optional np.int16 array receiving the result, needs room for 6 * len(in8) samples
 
         Returns:
-            48000Hz audio as np.int16
+            48000Hz audio as np.int16, a view of out if given
         """
         assert in8.dtype == np.int16
+        n8 = len(in8)
+        if self.MEM8 + n8 > len(self.in8_mem):
+            self.allocate_buffers(n8 * api.FDMDV_OS_48)  # type: ignore
 
-        # Concatenate filter memory and input samples
-        in8_mem = np.zeros(self.MEM8 + len(in8), dtype=np.int16)
-        in8_mem[: self.MEM8] = self.filter_mem8
-        in8_mem[self.MEM8 :] = in8
+        # Append input samples to filter memory
+        self.in8_mem[self.MEM8 : self.MEM8 + n8] = in8
 
-        # In C: pin8=&in8_mem[MEM8]
-        pin8 = ctypes.byref(np.ctypeslib.as_ctypes(in8_mem), 2 * self.MEM8)
-        out48 = np.zeros(api.FDMDV_OS_48 * len(in8), dtype=np.int16)  # type: ignore
-        api.fdmdv_8_to_48_short(out48.ctypes, pin8, len(in8))  # type: ignore
+        n48 = api.FDMDV_OS_48 * n8  # type: ignore
+        out48 = self.out48[:n48] if out is None else out[:n48]
+        assert len(out48) == n48 and out48.dtype == np.int16
+        if n8:
+            # In C: pin8=&in8_mem[MEM8], the filter reads the memory in front of it
+            # codec2 updates the filter memory in front of pin8 on its own
+            api.fdmdv_8_to_48_short(out48, self.in8_mem[self.MEM8 :], n8)  # type: ignore
 
-        # Store memory for next time
-        self.filter_mem8 = in8_mem[: self.MEM8]
-
-        return out48
+        return out48.copy() if out is None else out48
 
 
 def open_instance(mode: int) -> ctypes.c_void_p:
@@ -393,6 +490,173 @@ def open_instance(mode: int) -> ctypes.c_void_p:
             return ctypes.cast(api.freedv_open(mode), ctypes.c_void_p)
 
 
+# ------- INSTANCE POOL
+class instance_pool:
+    """
+    Owner of the long-lived codec2 instances, keyed by (mode, direction)
+
+    Instances are opened on first use and handed back to the pool on release,
+    so a modem restart reuses them instead of opening a new set each time.
+    """
+
+    RX = "rx"
+    TX = "tx"
+
+    def __init__(self):
+        # (mode, direction) -> list of released instances
+        self.free = {}
+        # instance address -> (mode, direction, instance)
+        self.in_use = {}
+        self.mutex = Lock()
+
+    def acquire(self, mode: int, direction: str) -> ctypes.c_void_p:
+        """
+        Hand out an instance for mode and direction, opening one if the pool has none left
+
+        :param mode: Codec2 mode value
+        :type mode: int
+        :param direction: instance_pool.RX or instance_pool.TX
+        :type direction: str
+        :return: codec2 instance
+        :rtype: ctypes.c_void_p
+        """
+        if isinstance(mode, FREEDV_MODE):
+            mode = mode.value
+        key = (mode, direction)
+        with self.mutex:
+            released = self.free.get(key)
+            freedv = released.pop() if released else None
+        if freedv is None:
+            freedv = open_instance(mode)
+            log.debug("[C2 ] Opened codec2 instance", mode=FREEDV_MODE(mode).name, direction=direction)
+        else:
+            self.reset(freedv, direction)
+        with self.mutex:
+            self.in_use[freedv.value] = (mode, direction, freedv)
+        return freedv
+
+    def reset(self, freedv: ctypes.c_void_p, direction: str) -> None:
+        """
+        Bring a reused instance back to the state of a freshly opened one
+
+        :param freedv: codec2 instance
+        :type freedv: ctypes.c_void_p
+        :param direction: instance_pool.RX or instance_pool.TX
+        :type direction: str
+        """
+        if direction == self.RX:
+            # 0 == UNSYNC, forces the sync state machine back to search
+            api.freedv_set_sync(freedv, 0)
+            api.freedv_set_frames_per_burst(freedv, 1)
+
+    def release(self, freedv: ctypes.c_void_p) -> None:
+        """
+        Hand an instance back to the pool. Releasing an instance twice is a no-op.
+
+        :param freedv: codec2 instance
+        :type freedv: ctypes.c_void_p
+        """
+        if freedv is None:
+            return
+        with self.mutex:
+            entry = self.in_use.pop(freedv.value, None)
+            if entry is None:
+                return
+            mode, direction, freedv = entry
+            self.free.setdefault((mode, direction), []).append(freedv)
+
+    def close_all(self) -> None:
+        """
+        Close all released instances. Instances which are still in use are left
+        untouched, as a decoder thread might still be working with them.
+        """
+        with self.mutex:
+            for instances in self.free.values():
+                for freedv in instances:
+                    api.freedv_close(freedv)
+            self.free = {}
+            if self.in_use:
+                log.warning("[C2 ] Instances still in use while closing pool", in_use=len(self.in_use))
+
+
+INSTANCE_POOL = instance_pool()
+
+
+# ------- MODE PARAMETER REGISTRY
+# Static parameters of every FREEDV_MODE, keyed by mode value. They are
+# collected once from a temporary codec2 instance per mode, which is closed
+# afterwards, so hot paths never need to open an instance for a lookup.
+MODE_PARAMETERS = {}
+mode_parameters_lock = Lock()
+
+
+def collect_mode_parameters(mode: int) -> dict:
+    """
+    Open a temporary codec2 instance and read its static parameters
+
+    :param mode: Codec2 mode value to query
+    :type mode: int
+    :return: Parameters of the supplied codec2 mode
+    :rtype: dict
+    """
+    freedv = open_instance(mode)
+    try:
+        bytes_per_frame = int(api.freedv_get_bits_per_modem_frame(freedv) / 8)
+        n_tx_preamble_modem_samples = api.freedv_get_n_tx_preamble_modem_samples(freedv)
+        n_tx_modem_samples = api.freedv_get_n_tx_modem_samples(freedv)
+        n_tx_postamble_modem_samples = api.freedv_get_n_tx_postamble_modem_samples(freedv)
+        n_max_modem_samples = api.freedv_get_n_max_modem_samples(freedv)
+        n_nom_modem_samples = api.freedv_get_n_nom_modem_samples(freedv)
+    finally:
+        api.freedv_close(freedv)
+
+    n_tx_samples = n_tx_preamble_modem_samples + n_tx_modem_samples + n_tx_postamble_modem_samples
+    return {
+        'name': FREEDV_MODE(mode).name,
+        'bytes_per_frame': bytes_per_frame,
+        # 2 bytes are used by the CRC16 checksum
+        'payload_per_frame': bytes_per_frame - 2,
+        'n_tx_preamble_modem_samples': n_tx_preamble_modem_samples,
+        'n_tx_modem_samples': n_tx_modem_samples,
+        'n_tx_postamble_modem_samples': n_tx_postamble_modem_samples,
+        'n_max_modem_samples': n_max_modem_samples,
+        'n_nom_modem_samples': n_nom_modem_samples,
+        # nominal airtime of a single frame including pre- and postamble
+        'airtime': n_tx_samples / api.FREEDV_FS_8000,
+    }
+
+
+def init_mode_parameters() -> dict:
+    """
+    Build the mode parameter registry for all FREEDV_MODEs, if not done yet
+
+    :return: The mode parameter registry
+    :rtype: dict
+    """
+    with mode_parameters_lock:
+        if not MODE_PARAMETERS:
+            for mode in FREEDV_MODE:
+                MODE_PARAMETERS[mode.value] = collect_mode_parameters(mode.value)
+            log.debug("[C2 ] Mode parameters initialised", modes=len(MODE_PARAMETERS))
+    return MODE_PARAMETERS
+
+
+def get_mode_parameters(mode) -> dict:
+    """
+    Get the static parameters of a codec2 mode from the registry
+
+    :param mode: Codec2 mode to query
+    :type mode: FREEDV_MODE or int
+    :return: Parameters of the supplied codec2 mode
+    :rtype: dict
+    """
+    if isinstance(mode, FREEDV_MODE):
+        mode = mode.value
+    if mode not in MODE_PARAMETERS:
+        init_mode_parameters()
+    return MODE_PARAMETERS[mode]
+
+
 def get_bytes_per_frame(mode: int) -> int:
     """
     Provide bytes per frame information for accessing from data handler
@@ -402,10 +666,7 @@ def get_bytes_per_frame(mode: int) -> int:
     :return: Bytes per frame of the supplied codec2 data mode
     :rtype: int
     """
-    freedv = open_instance(mode)
-    # TODO add close session
-    # get number of bytes per frame for mode
-    return int(api.freedv_get_bits_per_modem_frame(freedv) / 8)
+    return get_mode_parameters(mode)['bytes_per_frame']
 
 
 MAX_UW_BITS = 64#192
@@ -4,7 +4,7 @@ import base64
 from queue import Queue
 from arq_session_iss import ARQSessionISS
 from message_p2p import MessageP2P
-from arq_data_type_handler import ARQ_SESSION_TYPES
+from arq_data_type_handler import ARQ_SESSION_TYPES, BATCH_MAX_MESSAGES
 from message_system_db_manager import DatabaseManager
 from message_system_db_messages import DatabaseManagerMessages
 import threading
@@ -37,9 +37,9 @@ class SendMessageCommand(TxCommand):
             return
         try:
             self.log(f"Queued message found: {first_queued_message['id']}")
-            DatabaseManagerMessages(self.event_manager).update_message(first_queued_message["id"], update_data={'status': 'transmitting'}, frequency=self.state_manager.radio_frequency)
-            message_dict = DatabaseManagerMessages(self.event_manager).get_message_by_id(first_queued_message["id"])
-            message = MessageP2P.from_api_params(message_dict['origin'], message_dict)
+            batch = self.collect_batch(first_queued_message)
+            for message_id, _ in batch:
+                DatabaseManagerMessages(self.event_manager).update_message(message_id, update_data={'status': 'transmitting'}, frequency=self.state_manager.radio_frequency)
 
             # wait some random time and wait if we have an ongoing codec2 transmission
             # on our channel. This should prevent some packet collision
@@ -48,13 +48,16 @@ class SendMessageCommand(TxCommand):
             while self.state_manager.is_receiving_codec2_signal():
                 threading.Event().wait(0.1)
 
-            # Convert JSON string to bytes (using UTF-8 encoding)
-            payload = message.to_payload().encode('utf-8')
-            json_bytearray = bytearray(payload)
-            data, data_type = self.arq_data_type_handler.prepare(json_bytearray, ARQ_SESSION_TYPES.p2pmsg_zlib)
+            if len(batch) == 1:
+                # Convert JSON string to bytes (using UTF-8 encoding)
+                json_bytearray = bytearray(batch[0][1])
+                data, data_type = self.arq_data_type_handler.prepare(json_bytearray, ARQ_SESSION_TYPES.p2pmsg_zlib)
+            else:
+                self.log(f"Sending {len(batch)} messages within a single session")
+                data, data_type = self.arq_data_type_handler.prepare([payload for _, payload in batch], ARQ_SESSION_TYPES.p2pmsg_batch_zlib)
             iss = ARQSessionISS(self.config,
                                 modem,
-                                self.message.destination,
+                                first_queued_message['destination'],
                                 self.state_manager,
                                 data,
                                 data_type
@@ -63,3 +66,34 @@ class SendMessageCommand(TxCommand):
             iss.start()
         except Exception as e:
             self.log(f"Error starting ARQ session: {e}", isWarning=True)
+
+    def collect_batch(self, first_queued_message):
+        """
+        Collect queued messages for the destination of the first queued message
+
+        Messages are taken oldest first, as long as their payloads stay within the
+        batch size limit. The first message is always taken, a limit of 0 disables
+        batching.
+
+        :param first_queued_message: oldest queued message
+        :type first_queued_message: dict
+        :return: list of (message id, payload) tuples
+        :rtype: list
+        """
+        limit = self.config['MESSAGES'].get('batch_size_limit', 0)
+        candidates = [first_queued_message]
+        if limit > 0:
+            candidates += [message for message in
+                           DatabaseManagerMessages(self.event_manager).get_queued_messages_for_destination(first_queued_message['destination'])
+                           if message['id'] != first_queued_message['id']]
+
+        batch = []
+        size = 0
+        for message_dict in candidates[:BATCH_MAX_MESSAGES]:
+            message = MessageP2P.from_api_params(message_dict['origin'], message_dict)
+            payload = message.to_payload().encode('utf-8')
+            if batch and size + len(payload) > limit:
+                break
+            batch.append((message_dict['id'], payload))
+            size += len(payload)
+        return batch
@@ -30,6 +30,7 @@ class CONFIG:
             'output_device': str,
             'rx_audio_level': int,
             'tx_audio_level': int,
+            'samplerate': int,
         },
         'RADIO': {
             'control': str,
@@ -66,6 +67,15 @@ class CONFIG:
             'maximum_bandwidth': int,
             'tx_delay': int,
             'enable_socket_interface': bool,
+            'tx_duty_cycle_limit': int,
+            'frame_capture_file': str,
+            'duplicate_frame_window': int,
+            'arq_window': int,
+            'arq_speed_hysteresis': int,
+            'arq_probe_interval': int,
+            'arq_spool_directory': str,
+            'arq_spool_max_age': int,
+            'arq_progress_interval': int,
         },
         'SOCKET_INTERFACE': {
             'enable' : bool,
@@ -78,9 +88,12 @@ class CONFIG:
             'enable_auto_repeat': bool,
             'adif_log_host': str,
             'adif_log_port': int,
+            'batch_size_limit': int,
         },
         'GUI':{
             'auto_run_browser': bool,
+            'waterfall_fps': int,
+            'waterfall_history_minutes': int,
         }
     }
 
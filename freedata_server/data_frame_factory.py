@@ -1,8 +1,134 @@
+from collections.abc import MutableMapping
+import functools
+import struct
 from modem_frametypes import FRAME_TYPE as FR_TYPE
 import helpers
 import codec2
 import maidenhead
 
+
+# the grid is completed randomly if it has less than 6 characters, so do this once per grid
+full_maidenhead = functools.lru_cache(maxsize=16)(maidenhead.generate_full_maidenhead)
+
+
+class DecodedFrame(MutableMapping):
+    """
+    Dictionary like record of a received frame
+
+    Integer fields are decoded right away, fields like callsigns, grid squares
+    or flags only when they are accessed the first time.
+    """
+
+    __slots__ = ("values", "pending")
+
+    def __init__(self, values: dict, pending: dict):
+        # decoded fields
+        self.values = values
+        # fields not decoded yet, key: (decoder, raw value)
+        self.pending = pending
+
+    def __getitem__(self, key):
+        try:
+            return self.values[key]
+        except KeyError:
+            decoder, raw = self.pending.pop(key)
+            value = self.values[key] = decoder(raw)
+            return value
+
+    def __setitem__(self, key, value):
+        self.pending.pop(key, None)
+        self.values[key] = value
+
+    def __delitem__(self, key):
+        if key in self.pending:
+            del self.pending[key]
+        else:
+            del self.values[key]
+
+    def __contains__(self, key):
+        return key in self.values or key in self.pending
+
+    def __iter__(self):
+        return iter(list(self.values) + list(self.pending))
+
+    def __len__(self):
+        return len(self.values) + len(self.pending)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class FrameTemplate:
+    """
+    Frame template compiled to structs for packing and unpacking the fixed fields
+
+    Fields with a "dynamic" length follow the fixed fields and take the rest
+    of the frame, except for the CRC16.
+    """
+
+    # fields decoded as big endian unsigned integers
+    INT_FIELDS = ["session_id", "speed_level", "frames_per_burst", "version", "offset",
+                  "total_length", "state", "type", "maximum_bandwidth", "protocol_version", "flag",
+                  "frame_size", "bitmap", "frames_remaining"]
+    INT_FORMATS = {1: "B", 2: "H", 4: "I"}
+
+    def __init__(self, frametype: FR_TYPE, template: dict, decoders: dict):
+        self.frametype = frametype
+        self.frame_length = template["frame_length"]
+        # ARQ_BURST_ACK is sent without frame type for saving a byte
+        self.offset = 0 if frametype in [FR_TYPE.ARQ_BURST_ACK] else 1
+
+        fields = [(key, length) for key, length in template.items() if key != "frame_length"]
+        fixed_fields = [(key, length) for key, length in fields if isinstance(length, int)]
+        dynamic_fields = [key for key, length in fields if not isinstance(length, int)]
+        self.dynamic_field = dynamic_fields[0] if dynamic_fields else None
+
+        self.keys = [key for key, _ in fixed_fields]
+        self.pack_struct = struct.Struct(">" + "".join(f"{length}s" for _, length in fixed_fields))
+        self.unpack_struct = struct.Struct(">" + "".join(
+            self.INT_FORMATS[length] if key in self.INT_FIELDS and length in self.INT_FORMATS else f"{length}s"
+            for key, length in fixed_fields
+        ))
+        self.header_length = self.offset + self.pack_struct.size
+        # received frames always start with the frame type, deconstruct adds it if needed
+        self.unpack_header_length = 1 + self.pack_struct.size
+        self.decoders = [decoders.get(key) for key in self.keys]
+
+    def pack(self, content: dict, frame_length: int) -> bytearray:
+        if self.frame_length is not None:
+            frame_length = self.frame_length
+        else:
+            frame_length -= 2
+
+        if self.header_length > frame_length:
+            raise OverflowError("Frame data overflow!")
+        frame = bytearray(frame_length)
+        if self.offset:
+            frame[0] = self.frametype.value
+        self.pack_struct.pack_into(frame, self.offset, *[content[key] for key in self.keys])
+
+        if self.dynamic_field:
+            data = content[self.dynamic_field]
+            end = self.header_length + len(data)
+            if end > frame_length:
+                raise OverflowError("Frame data overflow!")
+            frame[self.header_length:end] = data
+        return frame
+
+    def unpack(self, frame) -> DecodedFrame:
+        values = {"frame_type": self.frametype.name, "frame_type_int": self.frametype.value}
+        pending = {}
+        for key, decoder, value in zip(self.keys, self.decoders, self.unpack_struct.unpack_from(frame, 1)):
+            if decoder:
+                pending[key] = (decoder, value)
+            else:
+                values[key] = value
+
+        # data is always on the last payload slots
+        if self.dynamic_field:
+            values[self.dynamic_field] = frame[self.unpack_header_length:-2]
+        return DecodedFrame(values, pending)
+
 class DataFrameFactory:
 
     LENGTH_SIG0_FRAME = 14
@@ -19,59 +145,113 @@ class DataFrameFactory:
         'CHECKSUM': 2,  # Bit-position for indicating the CHECKSUM is correct or not
     }
 
+    ARQ_SESSION_INFO_FLAGS = {
+        'SELECTIVE_REPEAT': 0,  # Bit-position for requesting selective repeat ARQ
+    }
+
     BEACON_FLAGS = {
         'AWAY_FROM_KEY': 0,  # Bit-position for indicating the AWAY FROM KEY state
     }
 
+    # table for holding our frame templates, shared by all instances
+    template_list = {}
+
+    # templates compiled for packing and unpacking frames
+    compiled_templates = {}
+
+    # available data payload per (frame type, mode)
+    available_payload = {}
+
     def __init__(self, config):
 
         self.myfullcall = f"{config['STATION']['mycall']}-{config['STATION']['myssid']}"
-        self.mygrid = maidenhead.generate_full_maidenhead(config["STATION"]["mygrid"])
+        self.mygrid = full_maidenhead(config["STATION"]["mygrid"])
+
+    @classmethod
+    def load_templates(cls):
+        cls._load_broadcast_templates()
+        cls._load_ping_templates()
+        cls._load_arq_templates()
+        cls._load_p2p_connection_templates()
+
+        for frametype, template in cls.template_list.items():
+            cls.compiled_templates[frametype] = FrameTemplate(
+                FR_TYPE(frametype), template, cls.field_decoders(frametype)
+            )
+
+    @classmethod
+    def field_decoders(cls, frametype):
+        """
+        Decoders of the fields which aren't kept as bytes or int
+        """
+        decoders = {
+            "origin": cls.decode_callsign,
+            "destination": cls.decode_callsign,
+            "origin_crc": bytes.hex,
+            "destination_crc": bytes.hex,
+            "total_crc": bytes.hex,
+            "gridsquare": helpers.decode_grid,
+            "snr": helpers.snr_from_bytes,
+        }
+        # check for frametype for selecting the corresponding flag dictionary
+        if frametype in [FR_TYPE.ARQ_SESSION_OPEN_ACK.value, FR_TYPE.ARQ_SESSION_INFO_ACK.value,
+                         FR_TYPE.ARQ_BURST_ACK.value, FR_TYPE.ARQ_BURST_ACK_SR.value]:
+            decoders["flag"] = functools.partial(cls.decode_flags, flag_dict=cls.ARQ_FLAGS)
+        elif frametype in [FR_TYPE.ARQ_SESSION_INFO.value]:
+            decoders["flag"] = functools.partial(cls.decode_flags, flag_dict=cls.ARQ_SESSION_INFO_FLAGS)
+        elif frametype in [FR_TYPE.BEACON.value]:
+            decoders["flag"] = functools.partial(cls.decode_flags, flag_dict=cls.BEACON_FLAGS)
+        else:
+            decoders["flag"] = functools.partial(cls.decode_flags, flag_dict={})
+        return decoders
 
-        # table for holding our frame templates
-        self.template_list = {}
+    @staticmethod
+    def decode_callsign(data):
+        return helpers.bytes_to_callsign(data).decode()
 
-        self._load_broadcast_templates()
-        self._load_ping_templates()
-        self._load_arq_templates()
-        self._load_p2p_connection_templates()
+    @staticmethod
+    def decode_flags(data, flag_dict):
+        # get_flag returns True or False based on the bit value at the flag's position
+        return {flag: helpers.get_flag(data, flag, flag_dict) for flag in flag_dict}
 
-    def _load_broadcast_templates(self):
+    @classmethod
+    def _load_broadcast_templates(cls):
         # cq frame
-        self.template_list[FR_TYPE.CQ.value] = {
-            "frame_length": self.LENGTH_SIG0_FRAME,
+        cls.template_list[FR_TYPE.CQ.value] = {
+            "frame_length": cls.LENGTH_SIG0_FRAME,
             "origin": 6,
             "gridsquare": 4
         }
 
         # qrv frame
-        self.template_list[FR_TYPE.QRV.value] = {
-            "frame_length": self.LENGTH_SIG0_FRAME,
+        cls.template_list[FR_TYPE.QRV.value] = {
+            "frame_length": cls.LENGTH_SIG0_FRAME,
             "origin": 6,
             "gridsquare": 4,
             "snr": 1
         }
 
         # beacon frame
-        self.template_list[FR_TYPE.BEACON.value] = {
-            "frame_length": self.LENGTH_SIG0_FRAME,
+        cls.template_list[FR_TYPE.BEACON.value] = {
+            "frame_length": cls.LENGTH_SIG0_FRAME,
             "origin": 6,
             "gridsquare": 4,
             "flag": 1
         }
 
-    def _load_ping_templates(self):
+    @classmethod
+    def _load_ping_templates(cls):
         # ping frame
-        self.template_list[FR_TYPE.PING.value] = {
-            "frame_length": self.LENGTH_SIG0_FRAME,
+        cls.template_list[FR_TYPE.PING.value] = {
+            "frame_length": cls.LENGTH_SIG0_FRAME,
             "destination_crc": 3,
             "origin_crc": 3,
             "origin": 6
         }
 
         # ping ack
-        self.template_list[FR_TYPE.PING_ACK.value] = {
-            "frame_length": self.LENGTH_SIG0_FRAME,
+        cls.template_list[FR_TYPE.PING_ACK.value] = {
+            "frame_length": cls.LENGTH_SIG0_FRAME,
             "destination_crc": 3,
             "origin_crc": 3,
             "gridsquare": 4,
@@ -79,10 +259,11 @@ class DataFrameFactory:
         }
 
 
-    def _load_arq_templates(self):
+    @classmethod
+    def _load_arq_templates(cls):
 
-        self.template_list[FR_TYPE.ARQ_SESSION_OPEN.value] = {
-            "frame_length": self.LENGTH_SIG0_FRAME,
+        cls.template_list[FR_TYPE.ARQ_SESSION_OPEN.value] = {
+            "frame_length": cls.LENGTH_SIG0_FRAME,
             "destination_crc": 3,
             "origin": 6,
             "session_id": 1,
@@ -90,8 +271,8 @@ class DataFrameFactory:
             "protocol_version" : 1
         }
 
-        self.template_list[FR_TYPE.ARQ_SESSION_OPEN_ACK.value] = {
-            "frame_length": self.LENGTH_SIG0_FRAME,
+        cls.template_list[FR_TYPE.ARQ_SESSION_OPEN_ACK.value] = {
+            "frame_length": cls.LENGTH_SIG0_FRAME,
             "session_id": 1,
             "origin": 6,
             "destination_crc": 3,
@@ -100,8 +281,8 @@ class DataFrameFactory:
             "flag": 1,
         }
 
-        self.template_list[FR_TYPE.ARQ_SESSION_INFO.value] = {
-            "frame_length": self.LENGTH_SIG0_FRAME,
+        cls.template_list[FR_TYPE.ARQ_SESSION_INFO.value] = {
+            "frame_length": cls.LENGTH_SIG0_FRAME,
             "session_id": 1,
             "total_length": 4,
             "total_crc": 4,
@@ -110,8 +291,8 @@ class DataFrameFactory:
             "type": 1,
         }
 
-        self.template_list[FR_TYPE.ARQ_SESSION_INFO_ACK.value] = {
-            "frame_length": self.LENGTH_SIG0_FRAME,
+        cls.template_list[FR_TYPE.ARQ_SESSION_INFO_ACK.value] = {
+            "frame_length": cls.LENGTH_SIG0_FRAME,
             "session_id": 1,
             "offset": 4,
             "snr": 1,
@@ -120,28 +301,38 @@ class DataFrameFactory:
             "flag": 1,
         }
 
-        self.template_list[FR_TYPE.ARQ_STOP.value] = {
-            "frame_length": self.LENGTH_SIG0_FRAME,
+        cls.template_list[FR_TYPE.ARQ_STOP.value] = {
+            "frame_length": cls.LENGTH_SIG0_FRAME,
             "session_id": 1,
         }
 
-        self.template_list[FR_TYPE.ARQ_STOP_ACK.value] = {
-            "frame_length": self.LENGTH_SIG0_FRAME,
+        cls.template_list[FR_TYPE.ARQ_STOP_ACK.value] = {
+            "frame_length": cls.LENGTH_SIG0_FRAME,
             "session_id": 1,
         }
 
         # arq burst frame
-        self.template_list[FR_TYPE.ARQ_BURST_FRAME.value] = {
+        cls.template_list[FR_TYPE.ARQ_BURST_FRAME.value] = {
+            "frame_length": None,
+            "session_id": 1,
+            "speed_level": 1,
+            "offset": 4,
+            "data": "dynamic",
+        }
+
+        # arq burst frame of selective repeat sessions, telling the IRS when the burst ends
+        cls.template_list[FR_TYPE.ARQ_BURST_FRAME_SR.value] = {
             "frame_length": None,
             "session_id": 1,
             "speed_level": 1,
             "offset": 4,
+            "frames_remaining": 1,
             "data": "dynamic",
         }
 
         # arq burst ack
-        self.template_list[FR_TYPE.ARQ_BURST_ACK.value] = {
-            "frame_length": self.LENGTH_ACK_FRAME,
+        cls.template_list[FR_TYPE.ARQ_BURST_ACK.value] = {
+            "frame_length": cls.LENGTH_ACK_FRAME,
             "session_id": 1,
             #"offset":4,
             "speed_level": 1,
@@ -149,38 +340,51 @@ class DataFrameFactory:
             #"snr": 1,
             "flag": 1,
         }
+
+        # arq burst ack of selective repeat sessions, acknowledging the contiguously
+        # received bytes and a bitmap of the following frames
+        cls.template_list[FR_TYPE.ARQ_BURST_ACK_SR.value] = {
+            "frame_length": cls.LENGTH_SIG0_FRAME,
+            "session_id": 1,
+            "speed_level": 1,
+            "flag": 1,
+            "offset": 4,
+            "frame_size": 2,
+            "bitmap": 4,
+        }
     
-    def _load_p2p_connection_templates(self):
+    @classmethod
+    def _load_p2p_connection_templates(cls):
         # p2p connect request
-        self.template_list[FR_TYPE.P2P_CONNECTION_CONNECT.value] = {
-            "frame_length": self.LENGTH_SIG1_FRAME,
+        cls.template_list[FR_TYPE.P2P_CONNECTION_CONNECT.value] = {
+            "frame_length": cls.LENGTH_SIG1_FRAME,
             "destination_crc": 3,
             "origin": 6,
             "session_id": 1,
         }
         
         # connect ACK
-        self.template_list[FR_TYPE.P2P_CONNECTION_CONNECT_ACK.value] = {
-            "frame_length": self.LENGTH_SIG1_FRAME,
+        cls.template_list[FR_TYPE.P2P_CONNECTION_CONNECT_ACK.value] = {
+            "frame_length": cls.LENGTH_SIG1_FRAME,
             "destination_crc": 3,
             "origin": 6,
             "session_id": 1,
         }
         
         # heartbeat for "is alive"
-        self.template_list[FR_TYPE.P2P_CONNECTION_HEARTBEAT.value] = {
-            "frame_length": self.LENGTH_SIG1_FRAME,
+        cls.template_list[FR_TYPE.P2P_CONNECTION_HEARTBEAT.value] = {
+            "frame_length": cls.LENGTH_SIG1_FRAME,
             "session_id": 1,
         }
 
         # ack heartbeat
-        self.template_list[FR_TYPE.P2P_CONNECTION_HEARTBEAT_ACK.value] = {
-            "frame_length": self.LENGTH_SIG1_FRAME,
+        cls.template_list[FR_TYPE.P2P_CONNECTION_HEARTBEAT_ACK.value] = {
+            "frame_length": cls.LENGTH_SIG1_FRAME,
             "session_id": 1,
         }
 
         # p2p payload frames
-        self.template_list[FR_TYPE.P2P_CONNECTION_PAYLOAD.value] = {
+        cls.template_list[FR_TYPE.P2P_CONNECTION_PAYLOAD.value] = {
             "frame_length": None,
             "session_id": 1,
             "sequence_id": 1,
@@ -188,138 +392,57 @@ class DataFrameFactory:
         }
 
         # p2p payload frame ack
-        self.template_list[FR_TYPE.P2P_CONNECTION_PAYLOAD_ACK.value] = {
-            "frame_length": self.LENGTH_SIG1_FRAME,
+        cls.template_list[FR_TYPE.P2P_CONNECTION_PAYLOAD_ACK.value] = {
+            "frame_length": cls.LENGTH_SIG1_FRAME,
             "session_id": 1,
             "sequence_id": 1,
         }
         
         # heartbeat for "is alive"
-        self.template_list[FR_TYPE.P2P_CONNECTION_DISCONNECT.value] = {
-            "frame_length": self.LENGTH_SIG1_FRAME,
+        cls.template_list[FR_TYPE.P2P_CONNECTION_DISCONNECT.value] = {
+            "frame_length": cls.LENGTH_SIG1_FRAME,
             "session_id": 1,
         }
 
         # ack heartbeat
-        self.template_list[FR_TYPE.P2P_CONNECTION_DISCONNECT_ACK.value] = {
-            "frame_length": self.LENGTH_SIG1_FRAME,
+        cls.template_list[FR_TYPE.P2P_CONNECTION_DISCONNECT_ACK.value] = {
+            "frame_length": cls.LENGTH_SIG1_FRAME,
             "session_id": 1,
         }
 
 
 
     def construct(self, frametype, content, frame_length = LENGTH_SIG1_FRAME):
-        frame_template = self.template_list[frametype.value]
-
-        if isinstance(frame_template["frame_length"], int):
-            frame_length = frame_template["frame_length"]
-        else:
-            frame_length -= 2
-
-        frame = bytearray(frame_length)
-        if frametype in [FR_TYPE.ARQ_BURST_ACK]:
-            buffer_position = 0
-        else:
-            frame[:1] = bytes([frametype.value])
-            buffer_position = 1
-        for key, item_length in frame_template.items():
-            if key == "frame_length":
-                continue
-
-            if not isinstance(item_length, int):
-                item_length = len(content[key])
-            if buffer_position + item_length > frame_length:
-                raise OverflowError("Frame data overflow!")
-            frame[buffer_position: buffer_position + item_length] = content[key]
-            buffer_position += item_length
-
-        return frame
+        return self.compiled_templates[frametype.value].pack(content, frame_length)
 
     def deconstruct(self, frame, mode_name=None):
-
-        buffer_position = 1
-        # Handle the case where the frame type is not recognized
-        #raise ValueError(f"Unknown frame type: {frametype}")
         if mode_name in ["SIGNALLING_ACK"]:
             frametype = FR_TYPE.ARQ_BURST_ACK.value
-            frame_template = self.template_list.get(frametype)
             frame = bytes([frametype]) + frame
         else:
             # Extract frametype and get the corresponding template
             frametype = int.from_bytes(frame[:1], "big")
-            frame_template = self.template_list.get(frametype)
-
-        extracted_data = {"frame_type": FR_TYPE(frametype).name, "frame_type_int": frametype}
-
-        for key, item_length in frame_template.items():
-            if key == "frame_length":
-                continue
-
-            # data is always on the last payload slots
-            if item_length in ["dynamic"] and key in["data"]:
-                print(len(frame))
-                data = frame[buffer_position:-2]
-                item_length = len(data)
-            else:
-                data = frame[buffer_position: buffer_position + item_length]
-
-            # Process the data based on the key
-            if key in ["origin", "destination"]:
-                extracted_data[key] = helpers.bytes_to_callsign(data).decode()
-
-            elif key in ["origin_crc", "destination_crc", "total_crc"]:
-                extracted_data[key] = data.hex()
-
-            elif key == "gridsquare":
-                extracted_data[key] = helpers.decode_grid(data)
-
-            elif key in ["session_id", "speed_level", 
-                            "frames_per_burst", "version",
-                            "offset", "total_length", "state", "type", "maximum_bandwidth", "protocol_version"]:
-                extracted_data[key] = int.from_bytes(data, 'big')
-
-            elif key in ["snr"]:
-                extracted_data[key] = helpers.snr_from_bytes(data)
-
-            elif key == "flag":
 
-                data = int.from_bytes(data, "big")
-                extracted_data[key] = {}
-                # check for frametype for selecting the correspinding flag dictionary
-                if frametype in [FR_TYPE.ARQ_SESSION_OPEN_ACK.value, FR_TYPE.ARQ_SESSION_INFO_ACK.value, FR_TYPE.ARQ_BURST_ACK.value]:
-                    flag_dict = self.ARQ_FLAGS
-                    for flag in flag_dict:
-                        # Update extracted_data with the status of each flag
-                        # get_flag returns True or False based on the bit value at the flag's position
-                        extracted_data[key][flag] = helpers.get_flag(data, flag, flag_dict)
-
-                if frametype in [FR_TYPE.BEACON.value]:
-                    flag_dict = self.BEACON_FLAGS
-                    for flag in flag_dict:
-                        # Update extracted_data with the status of each flag
-                        # get_flag returns True or False based on the bit value at the flag's position
-                        extracted_data[key][flag] = helpers.get_flag(data, flag, flag_dict)
-
-
-            else:
-                extracted_data[key] = data
-
-            buffer_position += item_length
-
-        return extracted_data
+        template = self.compiled_templates.get(frametype)
+        if template is None:
+            # frame types we can't decode, let the dispatcher decide
+            return DecodedFrame({"frame_type": FR_TYPE(frametype).name, "frame_type_int": frametype}, {})
+        return template.unpack(frame)
 
     def get_bytes_per_frame(self, mode: codec2.FREEDV_MODE) -> int:
-        freedv = codec2.open_instance(mode.value)
-        bytes_per_frame = int(codec2.api.freedv_get_bits_per_modem_frame(freedv) / 8)
-        return bytes_per_frame
+        return codec2.get_mode_parameters(mode)['bytes_per_frame']
     
     def get_available_data_payload_for_mode(self, type: FR_TYPE, mode:codec2.FREEDV_MODE):
-        whole_frame_length = self.get_bytes_per_frame(mode)
-        available = whole_frame_length - 2 # 2Bytes CRC16
+        # payload per frame type only depends on the static template and mode, so we compute it once
+        if (type, mode) in self.available_payload:
+            return self.available_payload[(type, mode)]
+
+        available = codec2.get_mode_parameters(mode)['payload_per_frame'] # without 2Bytes CRC16
         available -= 1 # Frame Type
         for field, length in self.template_list[type.value].items():
             if field != 'frame_length' and isinstance(length, int):
                 available -= length
+        self.available_payload[(type, mode)] = available
         return available
 
     def build_ping(self, destination):
@@ -423,8 +546,10 @@ class DataFrameFactory:
         }
         return self.construct(FR_TYPE.ARQ_SESSION_OPEN_ACK, payload)
     
-    def build_arq_session_info(self, session_id: int, total_length: int, total_crc: bytes, snr, type):
+    def build_arq_session_info(self, session_id: int, total_length: int, total_crc: bytes, snr, type, flag_selective_repeat=False):
         flag = 0b00000000
+        if flag_selective_repeat:
+            flag = helpers.set_flag(flag, 'SELECTIVE_REPEAT', True, self.ARQ_SESSION_INFO_FLAGS)
 
         payload = {
             "session_id": session_id.to_bytes(1, 'big'),
@@ -478,6 +603,19 @@ class DataFrameFactory:
             FR_TYPE.ARQ_BURST_FRAME, payload, self.get_bytes_per_frame(freedv_mode)
         )
 
+    def build_arq_burst_frame_sr(self, freedv_mode: codec2.FREEDV_MODE, session_id: int, offset: int, data: bytes,
+                                 speed_level: int, frames_remaining: int):
+        payload = {
+            "session_id": session_id.to_bytes(1, 'big'),
+            "speed_level": speed_level.to_bytes(1, 'big'),
+            "offset": offset.to_bytes(4, 'big'),
+            "frames_remaining": frames_remaining.to_bytes(1, 'big'),
+            "data": data,
+        }
+        return self.construct(
+            FR_TYPE.ARQ_BURST_FRAME_SR, payload, self.get_bytes_per_frame(freedv_mode)
+        )
+
     def build_arq_burst_ack(self, session_id: bytes, speed_level: int, flag_final=False, flag_checksum=False, flag_abort=False):
         flag = 0b00000000
         if flag_final:
@@ -495,6 +633,28 @@ class DataFrameFactory:
             "flag": flag.to_bytes(1, 'big'),
         }
         return self.construct(FR_TYPE.ARQ_BURST_ACK, payload)
+
+    def build_arq_burst_ack_sr(self, session_id: int, speed_level: int, offset: int, frame_size: int, bitmap: int,
+                               flag_final=False, flag_checksum=False, flag_abort=False):
+        flag = 0b00000000
+        if flag_final:
+            flag = helpers.set_flag(flag, 'FINAL', True, self.ARQ_FLAGS)
+
+        if flag_checksum:
+            flag = helpers.set_flag(flag, 'CHECKSUM', True, self.ARQ_FLAGS)
+
+        if flag_abort:
+            flag = helpers.set_flag(flag, 'ABORT', True, self.ARQ_FLAGS)
+
+        payload = {
+            "session_id": session_id.to_bytes(1, 'big'),
+            "speed_level": speed_level.to_bytes(1, 'big'),
+            "flag": flag.to_bytes(1, 'big'),
+            "offset": offset.to_bytes(4, 'big'),
+            "frame_size": frame_size.to_bytes(2, 'big'),
+            "bitmap": bitmap.to_bytes(4, 'big'),
+        }
+        return self.construct(FR_TYPE.ARQ_BURST_ACK_SR, payload)
     
     def build_p2p_connection_connect(self, destination, origin, session_id):
         payload = {
@@ -554,3 +714,6 @@ class DataFrameFactory:
             "session_id": session_id.to_bytes(1, 'big'),
         }
         return self.construct(FR_TYPE.P2P_CONNECTION_DISCONNECT_ACK, payload)
+
+
+DataFrameFactory.load_templates()
@@ -4,12 +4,20 @@ import ctypes
 import structlog
 import threading
 import audio
+import spectrum_analyzer
 import itertools
 
 TESTMODE = False
 
 class Demodulator():
 
+    # modes which are always decoded, all others are opened on first use
+    PRELOAD_MODES = [
+        codec2.FREEDV_MODE.signalling.value,
+        codec2.FREEDV_MODE.signalling_ack.value,
+        codec2.FREEDV_MODE.datac4.value,
+    ]
+
     MODE_DICT = {}
     # Iterate over the FREEDV_MODE enum members
     for mode in codec2.FREEDV_MODE:
@@ -20,6 +28,7 @@ class Demodulator():
                 'audio_buffer': None,
                 'nin': None,
                 'instance': None,
+                'modem_stats': None,
                 'state_buffer': [],
                 'name': mode.name.upper(),
                 'decoding_thread': None
@@ -44,6 +53,9 @@ class Demodulator():
         self.event_manager = event_manager
 
         self.fft_queue = fft_queue
+        self.spectrum_analyzer = spectrum_analyzer.SpectrumAnalyzer(
+            self.states, self.fft_queue, history=self.states.spectrum_history
+        )
 
         # Audio Stream object
         self.stream = None
@@ -60,9 +72,16 @@ class Demodulator():
 
 
     def init_codec2(self):
-        # Open codec2 instances
-        for mode in codec2.FREEDV_MODE:
-            self.init_codec2_mode(mode.value)
+        # MODE_DICT is shared between restarts, so drop what a previous run left behind
+        self.release_codec2()
+        for mode in self.MODE_DICT:
+            self.MODE_DICT[mode]["instance"] = None
+            self.MODE_DICT[mode]["audio_buffer"] = None
+            self.MODE_DICT[mode]["decoding_thread"] = None
+
+        # Get codec2 instances for the modes we always need
+        for mode in self.PRELOAD_MODES:
+            self.init_codec2_mode(mode)
 
     def init_tci(self):
         if self.config['RADIO']['control'] == "tci":
@@ -79,14 +98,11 @@ class Demodulator():
         Init codec2 and return some important parameters
         """
 
-        # create codec2 instance
-        #c2instance = ctypes.cast(
-        c2instance = codec2.open_instance(mode)
+        # get codec2 instance from pool
+        c2instance = codec2.INSTANCE_POOL.acquire(mode, codec2.instance_pool.RX)
 
         # get bytes per frame
-        bytes_per_frame = int(
-            codec2.api.freedv_get_bits_per_modem_frame(c2instance) / 8
-        )
+        bytes_per_frame = codec2.get_mode_parameters(mode)['bytes_per_frame']
         # create byte out buffer
         bytes_out = ctypes.create_string_buffer(bytes_per_frame)
 
@@ -99,6 +115,10 @@ class Demodulator():
         # get initial nin
         nin = codec2.api.freedv_nin(c2instance)
 
+        # preallocated buffers for the modem stats calls of this mode's decoder
+        if self.MODE_DICT[mode]["modem_stats"] is None:
+            self.MODE_DICT[mode]["modem_stats"] = codec2.modem_stats_buffer()
+
         # Additional Datac0-specific information - these are not referenced anywhere else.
         # self.signalling_datac0_payload_per_frame = self.signalling_datac0_bytes_per_frame - 2
         # self.signalling_datac0_n_nom_modem_samples = codec2.api.freedv_get_n_nom_modem_samples(
@@ -114,11 +134,21 @@ class Demodulator():
         #     codec2.api.freedv_get_n_tx_postamble_modem_samples(self.signalling_datac0_freedv)
         # )
 
-        self.MODE_DICT[mode]["instance"] = c2instance
         self.MODE_DICT[mode]["bytes_per_frame"] = bytes_per_frame
         self.MODE_DICT[mode]["bytes_out"] = bytes_out
-        self.MODE_DICT[mode]["audio_buffer"] = audio_buffer
         self.MODE_DICT[mode]["nin"] = nin
+        self.MODE_DICT[mode]["instance"] = c2instance
+        # set the audio buffer last, it enables pushing audio for this mode
+        self.MODE_DICT[mode]["audio_buffer"] = audio_buffer
+
+    def release_codec2(self) -> None:
+        """
+        Hand codec2 instances back to the pool, if no decoder thread is using them anymore
+        """
+        for mode in self.MODE_DICT:
+            thread = self.MODE_DICT[mode]["decoding_thread"]
+            if thread is None or not thread.is_alive():
+                codec2.INSTANCE_POOL.release(self.MODE_DICT[mode]["instance"])
 
     def start(self, stream):
         self.stream = stream
@@ -130,17 +160,19 @@ class Demodulator():
             )
             self.MODE_DICT[mode]['decoding_thread'].start()
 
-    def get_frequency_offset(self, freedv: ctypes.c_void_p) -> float:
+    def get_frequency_offset(self, freedv: ctypes.c_void_p, modem_stats=None) -> float:
         """
         Ask codec2 for the calculated (audio) frequency offset of the received signal.
 
         :param freedv: codec2 instance to query
         :type freedv: ctypes.c_void_p
+        :param modem_stats: preallocated stats buffers of the decoder, optional
+        :type modem_stats: codec2.modem_stats_buffer
         :return: Offset of audio frequency in Hz
         :rtype: float
         """
-        modemStats = codec2.MODEMSTATS()
-        codec2.api.freedv_get_modem_extended_stats(freedv, ctypes.byref(modemStats))
+        modem_stats = modem_stats or codec2.modem_stats_buffer()
+        modemStats = modem_stats.update_extended(freedv)
         offset = round(modemStats.foff) * (-1)
         return offset
 
@@ -150,20 +182,28 @@ class Demodulator():
         Decoded audio is placed into `bytes_out`.
         """
 
-        audiobuffer = self.MODE_DICT[mode]["audio_buffer"]
-        nin = self.MODE_DICT[mode]["nin"]
         freedv = self.MODE_DICT[mode]["instance"]
-        bytes_out = self.MODE_DICT[mode]["bytes_out"]
-        bytes_per_frame= self.MODE_DICT[mode]["bytes_per_frame"]
+        modem_stats = self.MODE_DICT[mode]["modem_stats"]
         state_buffer = self.MODE_DICT[mode]["state_buffer"]
         mode_name = self.MODE_DICT[mode]["name"]
         try:
             while self.stream and self.stream.active and not self.shutdown_flag.is_set():
                 threading.Event().wait(0.01)
+                if freedv is None:
+                    # rarely used modes get their codec2 instance once we need to decode them
+                    if not self.MODE_DICT[mode]["decode"]:
+                        continue
+                    self.init_codec2_mode(mode)
+                    freedv = self.MODE_DICT[mode]["instance"]
+                    modem_stats = self.MODE_DICT[mode]["modem_stats"]
+                audiobuffer = self.MODE_DICT[mode]["audio_buffer"]
+                bytes_out = self.MODE_DICT[mode]["bytes_out"]
+                bytes_per_frame = self.MODE_DICT[mode]["bytes_per_frame"]
+                nin = self.MODE_DICT[mode]["nin"]
                 if audiobuffer.nbuffer >= nin and not self.shutdown_flag.is_set():
                     # demodulate audio
                     nbytes = codec2.api.freedv_rawdatarx(
-                        freedv, bytes_out, audiobuffer.buffer.ctypes
+                        freedv, bytes_out, audiobuffer.buffer
                     )
                     # get current freedata_server states and write to list
                     # 1 trial
@@ -190,20 +230,20 @@ class Demodulator():
                         state_buffer.append(rx_status)
 
                     audiobuffer.pop(nin)
-                    nin = codec2.api.freedv_nin(freedv)
+                    self.MODE_DICT[mode]["nin"] = codec2.api.freedv_nin(freedv)
                     if nbytes == bytes_per_frame:
                         self.log.debug(
                             "[MDM] [demod_audio] Pushing received data to received_queue", nbytes=nbytes, mode_name=mode_name
                         )
-                        snr = self.calculate_snr(freedv)
-                        self.get_scatter(freedv)
+                        snr = self.calculate_snr(freedv, modem_stats)
+                        self.get_scatter(freedv, modem_stats)
 
                         item = {
                             'payload': bytes_out,
                             'freedv': freedv,
                             'bytes_per_frame': bytes_per_frame,
                             'snr': snr,
-                            'frequency_offset': self.get_frequency_offset(freedv),
+                            'frequency_offset': self.get_frequency_offset(freedv, modem_stats),
                             'mode_name': mode_name
                         }
 
@@ -221,6 +261,12 @@ class Demodulator():
                     "[MDM] [demod_audio] demod loop ended", mode=mode_name, e=e
                 )
                 audio.sd._terminate()
+        finally:
+            # the instance is free for the next modem start
+            if freedv is not None and self.MODE_DICT[mode]["instance"] is freedv:
+                self.MODE_DICT[mode]["audio_buffer"] = None
+                self.MODE_DICT[mode]["instance"] = None
+            codec2.INSTANCE_POOL.release(freedv)
 
     def tci_rx_callback(self) -> None:
         """
@@ -235,7 +281,7 @@ class Demodulator():
             audio_48k = self.audio_received_queue.get()
             audio_48k = np.frombuffer(audio_48k, dtype=np.int16)
 
-            audio.calculate_fft(audio_48k, self.fft_queue, self.states)
+            self.spectrum_analyzer.process(audio_48k)
 
             length_audio_48k = len(audio_48k)
             index = 0
@@ -269,25 +315,21 @@ class Demodulator():
         codec2.api.freedv_set_frames_per_burst(self.dat0_datac3_freedv, frames_per_burst)
         codec2.api.freedv_set_frames_per_burst(self.dat0_datac4_freedv, frames_per_burst)
 
-    def calculate_snr(self, freedv: ctypes.c_void_p) -> float:
+    def calculate_snr(self, freedv: ctypes.c_void_p, modem_stats=None) -> float:
         """
         Ask codec2 for data about the received signal and calculate
         the signal-to-noise ratio.
 
         :param freedv: codec2 instance to query
         :type freedv: ctypes.c_void_p
+        :param modem_stats: preallocated stats buffers of the decoder, optional
+        :type modem_stats: codec2.modem_stats_buffer
         :return: Signal-to-noise ratio of the decoded data
         :rtype: float
         """
         try:
-            modem_stats_snr = ctypes.c_float()
-            modem_stats_sync = ctypes.c_int()
-
-            codec2.api.freedv_get_modem_stats(
-                freedv, ctypes.byref(modem_stats_sync), ctypes.byref(modem_stats_snr)
-            )
-            modem_stats_snr = modem_stats_snr.value
-            modem_stats_sync = modem_stats_sync.value
+            modem_stats = modem_stats or codec2.modem_stats_buffer()
+            modem_stats_sync, modem_stats_snr = modem_stats.update(freedv)
 
             snr = round(modem_stats_snr, 1)
             self.log.info("[MDM] calculate_snr: ", snr=snr)
@@ -299,19 +341,18 @@ class Demodulator():
             self.log.error(f"[MDM] calculate_snr: Exception: {err}")
             return 0
 
-    def get_scatter(self, freedv: ctypes.c_void_p) -> None:
+    def get_scatter(self, freedv: ctypes.c_void_p, modem_stats=None) -> None:
         """
         Ask codec2 for data about the received signal and calculate the scatter plot.
 
         :param freedv: codec2 instance to query
         :type freedv: ctypes.c_void_p
+        :param modem_stats: preallocated stats buffers of the decoder, optional
+        :type modem_stats: codec2.modem_stats_buffer
         """
-       
-        modemStats = codec2.MODEMSTATS()
-        ctypes.cast(
-            codec2.api.freedv_get_modem_extended_stats(freedv, ctypes.byref(modemStats)),
-            ctypes.c_void_p,
-        )
+
+        modem_stats = modem_stats or codec2.modem_stats_buffer()
+        modemStats = modem_stats.update_extended(freedv)
 
         scatterdata = []
         # original function before itertool
@@ -346,7 +387,8 @@ class Demodulator():
         :type frames_per_burst: int
         """
         for mode in self.MODE_DICT:
-            codec2.api.freedv_set_sync(self.MODE_DICT[mode]["instance"], 0)
+            if self.MODE_DICT[mode]["instance"] is not None:
+                codec2.api.freedv_set_sync(self.MODE_DICT[mode]["instance"], 0)
 
     def set_decode_mode(self, modes_to_decode=None, is_irs=False):
         # Reset all modes to not decode
@@ -375,4 +417,6 @@ class Demodulator():
         print("shutting down demodulators...")
         self.shutdown_flag.set()
         for mode in self.MODE_DICT:
-            self.MODE_DICT[mode]['decoding_thread'].join(3)
\ No newline at end of file
+            if self.MODE_DICT[mode]['decoding_thread']:
+                self.MODE_DICT[mode]['decoding_thread'].join(3)
+        self.release_codec2()
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+Lanes for handling received frames in parallel.
+
+Frames belonging to an ARQ or P2P session are handled in the session lane,
+everything else like beacons, CQ, QRV and ping bookkeeping in the bulk lane.
+Slow database writes or transmissions in the bulk lane therefore can't delay
+the handling of session frames like ARQ_BURST_ACK.
+
+Each lane consists of one or more workers with a bounded queue. Session frames
+are assigned to a worker by their session id, so frames of a session are
+always handled in order of reception.
+"""
+import bisect
+import queue
+import threading
+import time
+import structlog
+
+# upper bounds of the latency histogram buckets in milliseconds, the last bucket is unbounded
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+SESSION_LANE_WORKERS = 2
+SESSION_LANE_QUEUE_SIZE = 64
+BULK_LANE_WORKERS = 1
+BULK_LANE_QUEUE_SIZE = 32
+
+
+class LatencyHistogram:
+    """
+    Histogram of the time from reception until a frame has been handled
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, latency_ms: float) -> None:
+        with self.lock:
+            self.counts[bisect.bisect_left(self.buckets, latency_ms)] += 1
+            self.total += 1
+            self.sum_ms += latency_ms
+            self.max_ms = max(self.max_ms, latency_ms)
+
+    def percentile(self, percent: float):
+        """
+        Estimate a percentile by the upper bound of its bucket
+
+        :param percent: percentile, 0 to 100
+        :type percent: float
+        :return: upper bound in ms, the maximum for the unbounded bucket, None without data
+        :rtype: float
+        """
+        with self.lock:
+            if not self.total:
+                return None
+            rank = self.total * percent / 100
+            count = 0
+            for index, bucket_count in enumerate(self.counts):
+                count += bucket_count
+                if count >= rank and bucket_count:
+                    return self.buckets[index] if index < len(self.buckets) else self.max_ms
+            return self.max_ms
+
+    def summary(self) -> dict:
+        p50 = self.percentile(50)
+        p95 = self.percentile(95)
+        with self.lock:
+            labels = [f"<={bucket}ms" for bucket in self.buckets] + [f">{self.buckets[-1]}ms"]
+            return {
+                "count": self.total,
+                "mean_ms": round(self.sum_ms / self.total, 2) if self.total else None,
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "max_ms": round(self.max_ms, 2),
+                "buckets": dict(zip(labels, self.counts)),
+            }
+
+
+class DispatchLane:
+    """
+    Workers with bounded queues handling frames of one kind of traffic
+    """
+
+    def __init__(self, name: str, handle, workers: int = 1, queue_size: int = 32):
+        """
+        :param name: name of the lane, used for logging and thread names
+        :type name: str
+        :param handle: callable handling a queued item
+        :param workers: number of workers, each with its own queue
+        :type workers: int
+        :param queue_size: maximum queued items per worker
+        :type queue_size: int
+        """
+        self.log = structlog.get_logger("DispatchLane")
+        self.name = name
+        self.handle = handle
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(max(1, workers))]
+        self.latency = LatencyHistogram()
+        self.dropped = 0
+        self.stop_event = threading.Event()
+        self.threads = []
+
+    def start(self) -> None:
+        self.stop_event.clear()
+        for index, work_queue in enumerate(self.queues):
+            thread = threading.Thread(target=self.worker, args=(work_queue,),
+                                      name=f"Dispatch {self.name} {index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def submit(self, item, key=None, received=None) -> bool:
+        """
+        Queue an item for handling
+
+        :param item: item passed to the handle callable
+        :param key: items with the same key are handled in order by the same worker
+        :param received: time.monotonic() of the reception, defaults to now
+        :type received: float
+        :return: False if the queue was full and the item has been dropped
+        :rtype: bool
+        """
+        received = time.monotonic() if received is None else received
+        work_queue = self.queues[hash(key) % len(self.queues)] if key is not None else self.shortest_queue()
+        try:
+            work_queue.put_nowait((received, item))
+        except queue.Full:
+            self.dropped += 1
+            self.log.warning("[DISPATCHER] lane full, dropping frame", lane=self.name, dropped=self.dropped)
+            return False
+        return True
+
+    def shortest_queue(self) -> queue.Queue:
+        return min(self.queues, key=lambda work_queue: work_queue.qsize())
+
+    def worker(self, work_queue: queue.Queue) -> None:
+        while not self.stop_event.is_set():
+            try:
+                received, item = work_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                self.handle(item)
+            except Exception as e:
+                self.log.warning("[DISPATCHER] error handling frame", lane=self.name, e=e)
+            self.latency.add((time.monotonic() - received) * 1000)
+
+    def summary(self) -> dict:
+        return {
+            "workers": len(self.queues),
+            "queued": [work_queue.qsize() for work_queue in self.queues],
+            "queue_size": self.queues[0].maxsize,
+            "dropped": self.dropped,
+            "latency": self.latency.summary(),
+        }
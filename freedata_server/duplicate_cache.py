@@ -0,0 +1,73 @@
+"""
+Short-lived cache for detecting duplicate frames.
+
+Retries of the other station mean we often decode the very same frame several
+times. A frame is a duplicate if the same bytes have been received with the same
+mode within the window since the last copy.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+
+# upper bound of remembered frames, regardless of the window
+MAX_ENTRIES = 256
+
+
+class DuplicateCache:
+    """
+    Remembers recently received frames by their bytes and mode
+    """
+
+    def __init__(self, window: float, max_entries: int = MAX_ENTRIES):
+        """
+        :param window: seconds a frame is remembered after its last copy, 0 disables the cache
+        :type window: float
+        :param max_entries: maximum number of remembered frames
+        :type max_entries: int
+        """
+        self.window = window
+        self.max_entries = max_entries
+        # (bytes, mode): time of the last copy, oldest first
+        self.seen = OrderedDict()
+        self.duplicates = Counter()
+        self.lock = threading.Lock()
+
+    def check(self, payload: bytes, mode_name, frame_type: str = "UNKNOWN", now=None) -> bool:
+        """
+        Remember a frame and check if it's a duplicate
+
+        :param payload: raw frame
+        :type payload: bytes
+        :param mode_name: name of the mode the frame was received with
+        :type mode_name: str
+        :param frame_type: name of the frame type, for counting duplicates
+        :type frame_type: str
+        :param now: time.monotonic() of the reception, defaults to now
+        :type now: float
+        :return: True if the frame has been received before within the window
+        :rtype: bool
+        """
+        if not self.window:
+            return False
+        now = time.monotonic() if now is None else now
+        key = (bytes(payload), mode_name)
+        with self.lock:
+            while self.seen and next(iter(self.seen.values())) < now - self.window:
+                self.seen.popitem(last=False)
+
+            duplicate = key in self.seen
+            self.seen[key] = now
+            self.seen.move_to_end(key)
+            if len(self.seen) > self.max_entries:
+                self.seen.popitem(last=False)
+
+            if duplicate:
+                self.duplicates[frame_type] += 1
+            return duplicate
+
+    def summary(self) -> dict:
+        """
+        Duplicates per frame type
+        """
+        with self.lock:
+            return dict(self.duplicates)
@@ -0,0 +1,261 @@
+"""
+Capture of received and transmitted frames.
+
+Frames are appended to a binary file by a background writer, so capturing
+doesn't slow down the receive and transmit paths. If the writer can't keep up,
+frames are dropped instead of growing the memory.
+
+File layout, little endian:
+
+    magic b"FDCAP", version (uint8),
+    records of
+        timestamp (float64, time.monotonic()), direction (uint8, 0 rx, 1 tx, 2 run),
+        snr (float32, NaN if unknown), frequency offset (float32, NaN if unknown),
+        session id (int16, -1 if unknown), mode name length (uint8), payload length (uint32),
+        mode name (ascii), payload
+
+Monotonic time starts anew with every run of the server, so each opening of
+the capture starts with a run record. Its payload is the wall clock time
+(float64, time.time()) at its timestamp. Timestamps are only comparable
+within a run.
+"""
+import math
+import queue
+import struct
+import threading
+import time
+import structlog
+import airtime_accounting
+
+MAGIC = b"FDCAP"
+VERSION = 2
+# version 1 had no run records
+SUPPORTED_VERSIONS = (1, 2)
+FILE_HEADER = struct.Struct("<5sB")
+RECORD_HEADER = struct.Struct("<dBffhBI")
+RUN_PAYLOAD = struct.Struct("<d")
+
+DIRECTION_RX = 0
+DIRECTION_TX = 1
+DIRECTION_RUN = 2
+
+DEFAULT_QUEUE_SIZE = 1024
+
+
+def get_session_id(payload: bytes, mode_name=None) -> int:
+    """
+    Session id of a frame
+
+    :param payload: raw frame
+    :type payload: bytes
+    :param mode_name: name of the mode the frame was received with
+    :type mode_name: str
+    :return: session id or -1 if the frame doesn't belong to a session
+    :rtype: int
+    """
+    if not payload:
+        return -1
+    # ARQ_BURST_ACK is sent without frame type
+    if mode_name and mode_name.upper() == "SIGNALLING_ACK":
+        return payload[0]
+    if payload[0] in airtime_accounting.SESSION_FRAME_TYPES and len(payload) > 1:
+        return payload[1]
+    return -1
+
+
+def pack_record(direction, payload, mode_name, snr=None, frequency_offset=None) -> bytes:
+    mode = (mode_name or "").encode("ascii", "replace")[:255]
+    payload = bytes(payload)
+    header = RECORD_HEADER.pack(
+        time.monotonic(),
+        direction,
+        math.nan if snr is None else snr,
+        math.nan if frequency_offset is None else frequency_offset,
+        get_session_id(payload, mode_name),
+        len(mode),
+        len(payload),
+    )
+    return b"".join([header, mode, payload])
+
+
+class FrameCapture:
+    """
+    Append-only capture file with a background writer
+    """
+
+    def __init__(self, path: str, queue_size: int = DEFAULT_QUEUE_SIZE):
+        """
+        :param path: capture file, frames are appended if it exists
+        :type path: str
+        :param queue_size: maximum number of frames waiting for the writer
+        :type queue_size: int
+        """
+        self.log = structlog.get_logger("FrameCapture")
+        self.path = path
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.written = 0
+
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+        # frames of a previous run may be in the file already
+        self.file.write(pack_record(DIRECTION_RUN, RUN_PAYLOAD.pack(time.time()), None))
+
+        self.stop_event = threading.Event()
+        self.writer_thread = threading.Thread(target=self.writer, name="Frame capture writer", daemon=True)
+        self.writer_thread.start()
+        self.log.info("[CAPTURE] capturing frames", path=path)
+
+    def record_rx(self, payload: bytes, mode_name, snr=None, frequency_offset=None) -> bool:
+        """
+        Capture a received frame
+
+        :param payload: raw frame as decoded
+        :type payload: bytes
+        :param mode_name: name of the mode
+        :type mode_name: str
+        :param snr: snr of the frame
+        :type snr: float
+        :param frequency_offset: frequency offset of the frame
+        :type frequency_offset: float
+        :return: False if the frame was dropped
+        :rtype: bool
+        """
+        return self.record(DIRECTION_RX, payload, mode_name, snr, frequency_offset)
+
+    def record_tx(self, payload: bytes, mode_name) -> bool:
+        """
+        Capture a transmitted frame
+
+        :param payload: raw frame as transmitted
+        :type payload: bytes
+        :param mode_name: name of the mode
+        :type mode_name: str
+        :return: False if the frame was dropped
+        :rtype: bool
+        """
+        return self.record(DIRECTION_TX, payload, mode_name)
+
+    def record(self, direction, payload, mode_name, snr=None, frequency_offset=None) -> bool:
+        try:
+            self.queue.put_nowait(pack_record(direction, payload, mode_name, snr, frequency_offset))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def writer(self) -> None:
+        while not self.stop_event.is_set() or not self.queue.empty():
+            try:
+                records = [self.queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            # write everything waiting at once
+            while True:
+                try:
+                    records.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.file.write(b"".join(records))
+                self.file.flush()
+                self.written += len(records)
+            except Exception as e:
+                self.log.warning("[CAPTURE] error writing frames", e=e)
+
+    def close(self) -> None:
+        """
+        Write the remaining frames and close the file
+        """
+        self.stop_event.set()
+        self.writer_thread.join()
+        self.file.close()
+        self.log.info("[CAPTURE] closed", path=self.path, written=self.written, dropped=self.dropped)
+
+
+def read_capture(path: str):
+    """
+    Read the frames of a capture file
+
+    :param path: capture file
+    :type path: str
+    :return: generator of frames as dict
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+
+    magic, version = FILE_HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a frame capture")
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f"unsupported frame capture version {version}")
+
+    # number of the run and its timestamp at wall clock time,
+    # frames of version 1 in front of the first run record belong to a run of their own
+    run = 0
+    run_start = None
+    run_empty = True
+    offset = FILE_HEADER.size
+    while offset + RECORD_HEADER.size <= len(data):
+        timestamp, direction, snr, frequency_offset, session_id, mode_length, payload_length = \
+            RECORD_HEADER.unpack_from(data, offset)
+        offset += RECORD_HEADER.size
+        mode_name = data[offset:offset + mode_length].decode("ascii")
+        offset += mode_length
+        payload = data[offset:offset + payload_length]
+        offset += payload_length
+        if len(payload) < payload_length:
+            # last record has been cut off
+            break
+        if direction == DIRECTION_RUN:
+            if not run_empty:
+                run += 1
+            run_start = (timestamp, RUN_PAYLOAD.unpack_from(payload)[0])
+            run_empty = True
+            continue
+        run_empty = False
+        yield {
+            "timestamp": timestamp,
+            "run": run,
+            "wall_time": None if run_start is None else run_start[1] + timestamp - run_start[0],
+            "direction": "rx" if direction == DIRECTION_RX else "tx",
+            "mode_name": mode_name or None,
+            "snr": None if math.isnan(snr) else snr,
+            "frequency_offset": None if math.isnan(frequency_offset) else frequency_offset,
+            "session_id": None if session_id < 0 else session_id,
+            "payload": payload,
+        }
+
+
+def replay(path: str, dispatcher, speed: float = 1.0, sleep=time.sleep) -> int:
+    """
+    Feed the received frames of a capture into a frame dispatcher
+
+    :param path: capture file
+    :type path: str
+    :param dispatcher: frame_dispatcher.DISPATCHER
+    :param speed: speedup against the original timing, 0 for as fast as possible
+    :type speed: float
+    :param sleep: function for waiting between frames
+    :return: number of replayed frames
+    :rtype: int
+    """
+    replayed = 0
+    run = None
+    for frame in read_capture(path):
+        if frame["direction"] != "rx":
+            continue
+        # the timing starts anew with each run, without the pause in between
+        if frame["run"] != run:
+            run = frame["run"]
+            first_timestamp = frame["timestamp"]
+            start = time.monotonic()
+        if speed:
+            delay = (frame["timestamp"] - first_timestamp) / speed - (time.monotonic() - start)
+            if delay > 0:
+                sleep(delay)
+        dispatcher.process_data(frame["payload"], None, len(frame["payload"]),
+                                frame["snr"] or 0, frame["frequency_offset"] or 0, frame["mode_name"])
+        replayed += 1
+    return replayed
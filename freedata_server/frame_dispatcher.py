@@ -4,10 +4,14 @@ FRAME DISPATCHER - We are dispatching the received frames to the needed function
 
 """
 import threading
+import time
+import codec2
 import structlog
 from modem_frametypes import FRAME_TYPE as FR_TYPE
 import event_manager
 from data_frame_factory import DataFrameFactory
+import dispatch_lanes
+import duplicate_cache
 
 from frame_handler import FrameHandler
 from frame_handler_ping import PingFrameHandler
@@ -41,7 +45,9 @@ class DISPATCHER():
         FR_TYPE.ARQ_STOP_ACK.value: {"class": ARQFrameHandler, "name": "ARQ STOP ACK"},
         FR_TYPE.BEACON.value: {"class": BeaconFrameHandler, "name": "BEACON"},
         FR_TYPE.ARQ_BURST_FRAME.value:{"class": ARQFrameHandler, "name": "BURST FRAME"},
+        FR_TYPE.ARQ_BURST_FRAME_SR.value:{"class": ARQFrameHandler, "name": "BURST FRAME SR"},
         FR_TYPE.ARQ_BURST_ACK.value: {"class": ARQFrameHandler, "name":  "BURST ACK"},
+        FR_TYPE.ARQ_BURST_ACK_SR.value: {"class": ARQFrameHandler, "name":  "BURST ACK SR"},
         FR_TYPE.CQ.value: {"class": CQFrameHandler, "name":  "CQ"},
         FR_TYPE.PING_ACK.value: {"class": FrameHandler, "name":  "PING ACK"},
         FR_TYPE.PING.value: {"class": PingFrameHandler, "name":  "PING"},
@@ -51,6 +57,9 @@ class DISPATCHER():
         #FR_TYPE.FEC_WAKEUP.value: {"class": FrameHandler, "name":  "FEC WAKEUP"},
     }
 
+    # handlers of session frames, which are dispatched to the session lane
+    SESSION_HANDLERS = (ARQFrameHandler, P2PConnectionFrameHandler)
+
     def __init__(self, config, event_manager, states, modem):
         self.log = structlog.get_logger("frame_dispatcher")
 
@@ -68,18 +77,39 @@ class DISPATCHER():
 
         self.arq_sessions = []
 
+        self.handlers = self._initialize_routing_table()
+        self.duplicates = duplicate_cache.DuplicateCache(config['MODEM'].get('duplicate_frame_window', 0))
+
+        self.session_lane = dispatch_lanes.DispatchLane("session", self.handle_frame,
+                                                        dispatch_lanes.SESSION_LANE_WORKERS,
+                                                        dispatch_lanes.SESSION_LANE_QUEUE_SIZE)
+        self.bulk_lane = dispatch_lanes.DispatchLane("bulk", self.handle_frame,
+                                                     dispatch_lanes.BULK_LANE_WORKERS,
+                                                     dispatch_lanes.BULK_LANE_QUEUE_SIZE)
+
 
     def _initialize_handlers(self, config, states):
         """Initializes various data handlers."""
 
         self.frame_factory = DataFrameFactory(config)
 
+    def _initialize_routing_table(self):
+        """Creates one long-lived handler per frame type."""
+        return {
+            frametype: entry['class'](entry['name'], self.config, self.states, self.event_manager, self.modem)
+            for frametype, entry in self.FRAME_HANDLER.items()
+        }
+
     def start(self):
         """Starts worker threads for transmit and receive operations."""
+        self.session_lane.start()
+        self.bulk_lane.start()
         threading.Thread(target=self.worker_receive, name="Receive Worker", daemon=True).start()
 
     def stop(self):
         self.stop_event.set()
+        self.session_lane.stop()
+        self.bulk_lane.stop()
 
     def worker_receive(self) -> None:
         """Queue received data for processing"""
@@ -87,7 +117,10 @@ class DISPATCHER():
             try:
                 data = self.data_queue_received.get(timeout=1)
                 if data:
-                    self.process_data(
+                    if self.states.frame_capture:
+                        self.states.frame_capture.record_rx(
+                            data['payload'], data['mode_name'], data['snr'], data['frequency_offset'])
+                    self.dispatch_data(
                         data['payload'],
                         data['freedv'],
                         data['bytes_per_frame'],
@@ -98,23 +131,66 @@ class DISPATCHER():
             except Exception:
                 continue
 
-    def process_data(self, bytes_out, freedv, bytes_per_frame: int, snr, frequency_offset, mode_name) -> None:
+    def decode_frame(self, bytes_out, mode_name):
+        """Decode a frame and find its handler, None if the frame doesn't need handling"""
         # get frame as dictionary
         deconstructed_frame = self.frame_factory.deconstruct(bytes_out, mode_name=mode_name)
         frametype = deconstructed_frame["frame_type_int"]
-        if frametype not in self.FRAME_HANDLER:
+        self.account_airtime(deconstructed_frame, mode_name)
+        handler: FrameHandler = self.handlers.get(frametype)
+        if handler is None:
             self.log.warning(
                 "[DISPATCHER] ARQ - other frame type", frametype=FR_TYPE(frametype).name)
+            return deconstructed_frame, None, False
+
+        duplicate = self.duplicates.check(bytes_out, mode_name, deconstructed_frame["frame_type"],
+                                          now=self.states.clock.monotonic())
+        if duplicate and handler.SKIP_DUPLICATES:
+            self.log.debug("[DISPATCHER] skipping duplicate frame", frametype=deconstructed_frame["frame_type"])
+            return deconstructed_frame, None, True
+        return deconstructed_frame, handler, duplicate
+
+    def dispatch_data(self, bytes_out, freedv, bytes_per_frame: int, snr, frequency_offset, mode_name) -> bool:
+        """Decode a frame and queue it in the lane of its handler"""
+        received = time.monotonic()
+        deconstructed_frame, handler, duplicate = self.decode_frame(bytes_out, mode_name)
+        if handler is None:
+            return False
+
+        item = (handler, deconstructed_frame, snr, frequency_offset, freedv, bytes_per_frame, duplicate)
+        if isinstance(handler, self.SESSION_HANDLERS):
+            return self.session_lane.submit(item, key=deconstructed_frame.get('session_id'), received=received)
+        return self.bulk_lane.submit(item, received=received)
+
+    def handle_frame(self, item) -> None:
+        handler, deconstructed_frame, snr, frequency_offset, freedv, bytes_per_frame, duplicate = item
+        handler.handle(deconstructed_frame, snr, frequency_offset, freedv, bytes_per_frame, duplicate)
+
+    def process_data(self, bytes_out, freedv, bytes_per_frame: int, snr, frequency_offset, mode_name) -> None:
+        """Decode and handle a frame right away, bypassing the lanes"""
+        deconstructed_frame, handler, duplicate = self.decode_frame(bytes_out, mode_name)
+        if handler is None:
+            return
+        handler.handle(deconstructed_frame, snr, frequency_offset, freedv, bytes_per_frame, duplicate)
+
+    def get_lane_statistics(self) -> dict:
+        return {
+            "session": self.session_lane.summary(),
+            "bulk": self.bulk_lane.summary(),
+            "duplicates": self.duplicates.summary(),
+        }
+
+    def account_airtime(self, frame, mode_name):
+        if not mode_name:
+            return
+        station = frame.get("origin")
+        if not station and "session_id" in frame:
+            station = self.states.get_dxcall_by_session_id(frame["session_id"])
+        try:
+            seconds = codec2.get_mode_parameters(codec2.FREEDV_MODE[mode_name.lower()])['airtime']
+        except KeyError:
             return
-        
-        # instantiate handler
-        handler_class = self.FRAME_HANDLER[frametype]['class']
-        handler: FrameHandler = handler_class(self.FRAME_HANDLER[frametype]['name'],
-                                self.config,
-                                self.states,
-                                self.event_manager,
-                                self.modem)
-        handler.handle(deconstructed_frame, snr, frequency_offset, freedv, bytes_per_frame)
+        self.states.airtime.record_rx(seconds, mode_name.lower(), frame["frame_type"], station)
 
     def get_id_from_frame(self, data):
         if data[:1] == FR_TYPE.ARQ_SESSION_OPEN:
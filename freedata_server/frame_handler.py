@@ -1,4 +1,5 @@
 import helpers
+import callsign_index
 from event_manager import EventManager
 from state_manager import StateManager
 import structlog
@@ -14,6 +15,9 @@ TESTMODE = False
 
 class FrameHandler():
 
+    # skip duplicates of a frame entirely, if handling it again is only bookkeeping
+    SKIP_DUPLICATES = True
+
     def __init__(self, name: str, config, states: StateManager, event_manager: EventManager, 
                  modem) -> None:
         
@@ -24,48 +28,42 @@ class FrameHandler():
         self.modem = modem
         self.logger = structlog.get_logger("Frame Handler")
 
-        self.details = {
-            'frame' : None, 
-            'snr' : 0, 
-            'frequency_offset': 0,
-            'freedv_inst': None, 
-            'bytes_per_frame': 0
-        }
+        # handlers live as long as the dispatcher, so keep database managers around
+        self.databases = {}
+        self.callsign_index = callsign_index.for_config(config)
+
+    def get_database(self, manager_class):
+        if manager_class not in self.databases:
+            self.databases[manager_class] = manager_class(self.event_manager)
+        return self.databases[manager_class]
 
-    def is_frame_for_me(self):
-        call_with_ssid = self.config['STATION']['mycall'] + "-" + str(self.config['STATION']['myssid'])
-        ft = self.details['frame']['frame_type']
+    def is_frame_for_me(self, details):
+        ft = details['frame']['frame_type']
         valid = False
                 
         # Check for callsign checksum
         if ft in ['ARQ_SESSION_OPEN', 'ARQ_SESSION_OPEN_ACK', 'PING', 'PING_ACK', 'P2P_CONNECTION_CONNECT']:
-            valid, mycallsign = helpers.check_callsign(
-                call_with_ssid,
-                self.details["frame"]["destination_crc"],
-                self.config['STATION']['ssid_list'])
+            valid = self.callsign_index.is_mine(details["frame"]["destination_crc"])
 
         # Check for session id on IRS side
-        elif ft in ['ARQ_SESSION_INFO', 'ARQ_BURST_FRAME', 'ARQ_STOP']:
-            session_id = self.details['frame']['session_id']
+        elif ft in ['ARQ_SESSION_INFO', 'ARQ_BURST_FRAME', 'ARQ_BURST_FRAME_SR', 'ARQ_STOP']:
+            session_id = details['frame']['session_id']
             if session_id in self.states.arq_irs_sessions:
                 valid = True
 
         # Check for session id on ISS side
-        elif ft in ['ARQ_SESSION_INFO_ACK', 'ARQ_BURST_ACK', 'ARQ_STOP_ACK']:
-            session_id = self.details['frame']['session_id']
+        elif ft in ['ARQ_SESSION_INFO_ACK', 'ARQ_BURST_ACK', 'ARQ_BURST_ACK_SR', 'ARQ_STOP_ACK']:
+            session_id = details['frame']['session_id']
             if session_id in self.states.arq_iss_sessions:
                 valid = True
 
         # check for p2p connection
         elif ft in ['P2P_CONNECTION_CONNECT']:
-            valid, mycallsign = helpers.check_callsign(
-                call_with_ssid,
-                self.details["frame"]["destination_crc"],
-                self.config['STATION']['ssid_list'])
+            valid = self.callsign_index.is_mine(details["frame"]["destination_crc"])
 
         #check for p2p connection
         elif ft in ['P2P_CONNECTION_CONNECT_ACK', 'P2P_CONNECTION_PAYLOAD', 'P2P_CONNECTION_PAYLOAD_ACK', 'P2P_CONNECTION_DISCONNECT', 'P2P_CONNECTION_DISCONNECT_ACK']:
-            session_id = self.details['frame']['session_id']
+            session_id = details['frame']['session_id']
             if session_id in self.states.p2p_connection_sessions:
                 valid = True
 
@@ -77,11 +75,11 @@ class FrameHandler():
 
         return valid
 
-    def should_respond(self):
-        return self.is_frame_for_me()
+    def should_respond(self, details):
+        return self.is_frame_for_me(details)
 
-    def is_origin_on_blacklist(self):
-        origin_callsign = self.details["frame"]["origin"]
+    def is_origin_on_blacklist(self, details):
+        origin_callsign = details["frame"]["origin"]
 
         # Remove the suffix after the hyphen if it exists
         if '-' in origin_callsign:
@@ -95,13 +93,13 @@ class FrameHandler():
         return False
 
 
-    def add_to_activity_list(self):
-        frame = self.details['frame']
+    def add_to_activity_list(self, details):
+        frame = details['frame']
 
         activity = {
             "direction": "received",
-            "snr": self.details['snr'],
-            "frequency_offset": self.details['frequency_offset'],
+            "snr": details['snr'],
+            "frequency_offset": details['frequency_offset'],
             "activity_type": frame["frame_type"]
         }
         if "origin" in frame:
@@ -122,8 +120,8 @@ class FrameHandler():
 
         self.states.add_activity(activity)
 
-    def add_to_heard_stations(self):
-        frame = self.details['frame']
+    def add_to_heard_stations(self, details):
+        frame = details['frame']
 
         if 'origin' not in frame:
             return
@@ -140,53 +138,52 @@ class FrameHandler():
             distance_miles = distance_dict['miles']
 
         away_from_key = False
-        if "flag" in self.details['frame']:
-            if "AWAY_FROM_KEY" in self.details['frame']["flag"]:
-                away_from_key = self.details['frame']["flag"]["AWAY_FROM_KEY"]
+        if "flag" in details['frame']:
+            if "AWAY_FROM_KEY" in details['frame']["flag"]:
+                away_from_key = details['frame']["flag"]["AWAY_FROM_KEY"]
 
         helpers.add_to_heard_stations(
             frame['origin'],
             dxgrid,
             self.name,
-            self.details['snr'],
-            self.details['frequency_offset'],
+            details['snr'],
+            details['frequency_offset'],
             self.states.radio_frequency,
             self.states.heard_stations,
             distance_km=distance_km,  # Pass the kilometer distance
             distance_miles=distance_miles,  # Pass the miles distance
             away_from_key=away_from_key
         )
-    def make_event(self):
+    def make_event(self, details):
 
         event = {
             "type": "frame-handler",
-            "received": self.details['frame']['frame_type'],
+            "received": details['frame']['frame_type'],
             "timestamp": int(time.time()),
             "mycallsign": self.config['STATION']['mycall'],
             "myssid": self.config['STATION']['myssid'],
-            "snr": str(self.details['snr']),
+            "snr": str(details['snr']),
         }
-        if 'origin' in self.details['frame']:
-            event['dxcallsign'] = self.details['frame']['origin']
+        if 'origin' in details['frame']:
+            event['dxcallsign'] = details['frame']['origin']
 
-        if 'gridsquare' in self.details['frame']:
-            event['gridsquare'] = self.details['frame']['gridsquare']
+        if 'gridsquare' in details['frame']:
+            event['gridsquare'] = details['frame']['gridsquare']
             if event['gridsquare'] != "------":
-                distance = maidenhead.distance_between_locators(self.config['STATION']['mygrid'], self.details['frame']['gridsquare'])
+                distance = maidenhead.distance_between_locators(self.config['STATION']['mygrid'], details['frame']['gridsquare'])
                 event['distance_kilometers'] = distance['kilometers']
                 event['distance_miles'] = distance['miles']
             else:
                 event['distance_kilometers'] = 0
                 event['distance_miles'] = 0
 
-        if "flag" in self.details['frame'] and "AWAY_FROM_KEY" in self.details['frame']["flag"]:
-            event['away_from_key'] = self.details['frame']["flag"]["AWAY_FROM_KEY"]
+        if "flag" in details['frame'] and "AWAY_FROM_KEY" in details['frame']["flag"]:
+            event['away_from_key'] = details['frame']["flag"]["AWAY_FROM_KEY"]
 
         return event
 
-    def emit_event(self):
-        event_data = self.make_event()
-        print(event_data)
+    def emit_event(self, details):
+        event_data = self.make_event(details)
         self.event_manager.broadcast(event_data)
 
     def get_tx_mode(self):
@@ -198,58 +195,66 @@ class FrameHandler():
         else:
             self.event_manager.broadcast(frame)
 
-    def follow_protocol(self):
+    def follow_protocol(self, details):
         pass
 
-    def log(self):
-        self.logger.info(f"[Frame Handler] Handling frame {self.details['frame']['frame_type']}")
-
-    def handle(self, frame, snr, frequency_offset, freedv_inst, bytes_per_frame):
-        self.details['frame'] = frame
-        self.details['snr'] = snr
-        self.details['frequency_offset'] = frequency_offset
-        self.details['freedv_inst'] = freedv_inst
-        self.details['bytes_per_frame'] = bytes_per_frame
-
-        print(self.details)
+    def log(self, details):
+        self.logger.info(f"[Frame Handler] Handling frame {details['frame']['frame_type']}")
+
+    def handle(self, frame, snr, frequency_offset, freedv_inst, bytes_per_frame, duplicate=False):
+        details = {
+            'frame': frame,
+            'snr': snr,
+            'frequency_offset': frequency_offset,
+            'freedv_inst': freedv_inst,
+            'bytes_per_frame': bytes_per_frame,
+            'duplicate': duplicate,
+        }
 
-        if 'origin' not in self.details['frame'] and 'session_id' in self.details['frame']:
-            dxcall = self.states.get_dxcall_by_session_id(self.details['frame']['session_id'])
+        if 'origin' not in details['frame'] and 'session_id' in details['frame']:
+            dxcall = self.states.get_dxcall_by_session_id(details['frame']['session_id'])
             if dxcall:
-                self.details['frame']['origin'] = dxcall
+                details['frame']['origin'] = dxcall
 
-        # look in database for a full callsign if only crc is present
-        if 'origin' not in self.details['frame'] and 'origin_crc' in self.details['frame']:
-            self.details['frame']['origin'] = DatabaseManager(self.event_manager).get_callsign_by_checksum(frame['origin_crc'])
+        # look for a full callsign if only crc is present, first in stations we've heard, then in the database
+        if 'origin' not in details['frame'] and 'origin_crc' in details['frame']:
+            origin = self.callsign_index.lookup(frame['origin_crc'])
+            if not origin:
+                origin = self.get_database(DatabaseManager).get_callsign_by_checksum(frame['origin_crc'])
+            details['frame']['origin'] = origin
+        elif details['frame'].get('origin'):
+            self.callsign_index.add(details['frame']['origin'])
 
-        if "location" in self.details['frame'] and "gridsquare" in self.details['frame']['location']:
-            DatabaseManagerStations(self.event_manager).update_station_location(self.details['frame']['origin'], frame['gridsquare'])
+        if "location" in details['frame'] and "gridsquare" in details['frame']['location']:
+            self.get_database(DatabaseManagerStations).update_station_location(details['frame']['origin'], frame['gridsquare'])
 
 
-        if 'origin' in self.details['frame']:
+        if 'origin' in details['frame']:
             # try to find station info in database
             try:
-                station = DatabaseManagerStations(self.event_manager).get_station(self.details['frame']['origin'])
+                station = self.get_database(DatabaseManagerStations).get_station(details['frame']['origin'])
                 if station and station["location"] and "gridsquare" in station["location"]:
                     dxgrid = station["location"]["gridsquare"]
                 else:
                     dxgrid = "------"
 
                 # overwrite gridsquare only if not provided by frame
-                if "gridsquare" not in self.details['frame']:
-                    self.details['frame']['gridsquare'] = dxgrid
+                if "gridsquare" not in details['frame']:
+                    details['frame']['gridsquare'] = dxgrid
 
             except Exception as e:
                 self.logger.info(f"[Frame Handler] Error getting gridsquare from callsign info: {e}")
 
         # check if callsign is blacklisted
         if self.config["STATION"]["enable_callsign_blacklist"]:
-            if self.is_origin_on_blacklist():
-                self.logger.info(f"[Frame Handler] Callsign blocked: {self.details['frame']['origin']}")
+            if self.is_origin_on_blacklist(details):
+                self.logger.info(f"[Frame Handler] Callsign blocked: {details['frame']['origin']}")
                 return False
 
-        self.log()
-        self.add_to_heard_stations()
-        self.add_to_activity_list()
-        self.emit_event()
-        self.follow_protocol()
+        self.log(details)
+        # a duplicate has been accounted already, but the protocol may need to answer again
+        if not duplicate:
+            self.add_to_heard_stations(details)
+            self.add_to_activity_list(details)
+            self.emit_event(details)
+        self.follow_protocol(details)
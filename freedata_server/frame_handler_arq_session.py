@@ -10,15 +10,18 @@ from arq_session_irs import IRS_State
 
 class ARQFrameHandler(frame_handler.FrameHandler):
 
-    def follow_protocol(self):
+    # the other station repeats its frame if our answer got lost
+    SKIP_DUPLICATES = False
 
-        if not self.should_respond():
+    def follow_protocol(self, details):
+
+        if not self.should_respond(details):
             return
 
-        frame = self.details['frame']
+        frame = details['frame']
         session_id = frame['session_id']
-        snr = self.details["snr"]
-        frequency_offset = self.details["frequency_offset"]
+        snr = details["snr"]
+        frequency_offset = details["frequency_offset"]
 
         if frame['frame_type_int'] == FR.ARQ_SESSION_OPEN.value:
             print("Received ARQ_SESSION_OPEN frame")
@@ -63,6 +66,7 @@ class ARQFrameHandler(frame_handler.FrameHandler):
         elif frame['frame_type_int'] in [
             FR.ARQ_SESSION_INFO.value,
             FR.ARQ_BURST_FRAME.value,
+            FR.ARQ_BURST_FRAME_SR.value,
             FR.ARQ_STOP.value,
         ]:
             print("Received ARQ frame of type: INFO, BURST, or STOP.")
@@ -72,6 +76,7 @@ class ARQFrameHandler(frame_handler.FrameHandler):
             FR.ARQ_SESSION_OPEN_ACK.value,
             FR.ARQ_SESSION_INFO_ACK.value,
             FR.ARQ_BURST_ACK.value,
+            FR.ARQ_BURST_ACK_SR.value,
             FR.ARQ_STOP_ACK.value
         ]:
             print("Received ARQ ACK frame of type: OPEN_ACK, INFO_ACK, BURST_ACK, or STOP_ACK.")
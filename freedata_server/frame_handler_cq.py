@@ -13,21 +13,21 @@ class CQFrameHandler(frame_handler.FrameHandler):
     #    self.logger.debug(f"Respond to CQ: {self.config['MODEM']['respond_to_cq']}")
     #    return bool(self.config['MODEM']['respond_to_cq'] and not self.states.getARQ())
 
-    def follow_protocol(self):
+    def follow_protocol(self, details):
 
         if self.states.getARQ():
             return
 
         self.logger.debug(
-            f"[Modem] Responding to request from [{self.details['frame']['origin']}]",
-            snr=self.details['snr'],
+            f"[Modem] Responding to request from [{details['frame']['origin']}]",
+            snr=details['snr'],
         )
 
-        self.send_ack()
+        self.send_ack(details)
 
-    def send_ack(self):
+    def send_ack(self, details):
         factory = data_frame_factory.DataFrameFactory(self.config)
-        qrv_frame = factory.build_qrv(self.details['snr'])
+        qrv_frame = factory.build_qrv(details['snr'])
 
         # wait some random time and wait if we have an ongoing codec2 transmission
         # on our channel. This should prevent some packet collision
@@ -39,4 +39,4 @@ class CQFrameHandler(frame_handler.FrameHandler):
 
         if self.config["MESSAGES"]["enable_auto_repeat"]:
             # set message to queued if CQ received
-            DatabaseManagerMessages(self.event_manager).set_message_to_queued_for_callsign(self.details['frame']["origin"])
+            self.get_database(DatabaseManagerMessages).set_message_to_queued_for_callsign(details['frame']["origin"])
@@ -7,15 +7,18 @@ from p2p_connection import P2PConnection
 
 class P2PConnectionFrameHandler(frame_handler.FrameHandler):
 
-    def follow_protocol(self):
+    # the other station repeats its frame if our answer got lost
+    SKIP_DUPLICATES = False
 
-        if not self.should_respond():
+    def follow_protocol(self, details):
+
+        if not self.should_respond(details):
             return
 
-        frame = self.details['frame']
+        frame = details['frame']
         session_id = frame['session_id']
-        snr = self.details["snr"]
-        frequency_offset = self.details["frequency_offset"]
+        snr = details["snr"]
+        frequency_offset = details["frequency_offset"]
 
         if frame['frame_type_int'] == FR.P2P_CONNECTION_CONNECT.value:
 
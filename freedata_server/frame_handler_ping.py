@@ -6,6 +6,9 @@ from message_system_db_messages import DatabaseManagerMessages
 
 class PingFrameHandler(frame_handler.FrameHandler):
 
+    # the other station repeats its frame if our answer got lost
+    SKIP_DUPLICATES = False
+
     #def is_frame_for_me(self):
     #    call_with_ssid = self.config['STATION']['mycall'] + "-" + str(self.config['STATION']['myssid'])
     #    valid, mycallsign = helpers.check_callsign(
@@ -18,30 +21,31 @@ class PingFrameHandler(frame_handler.FrameHandler):
     #        self.logger.info(f"[Modem] {ft} received but not for us.")
     #    return valid
 
-    def follow_protocol(self):
-        if not bool(self.is_frame_for_me() and not self.states.getARQ()):
+    def follow_protocol(self, details):
+        if not bool(self.is_frame_for_me(details) and not self.states.getARQ()):
             return
         self.logger.debug(
-            f"[Modem] Responding to request from [{self.details['frame']['origin']}]",
-            snr=self.details['snr'],
+            f"[Modem] Responding to request from [{details['frame']['origin']}]",
+            snr=details['snr'],
         )
 
-        self.send_ack()
+        self.send_ack(details)
 
-        self.check_for_queued_message()
+        if not details['duplicate']:
+            self.check_for_queued_message(details)
 
-    def send_ack(self):
+    def send_ack(self, details):
         factory = data_frame_factory.DataFrameFactory(self.config)
         ping_ack_frame = factory.build_ping_ack(
-            self.details['frame']['origin_crc'], 
-            self.details['snr']
+            details['frame']['origin_crc'], 
+            details['snr']
         )
         self.transmit(ping_ack_frame)
 
-    def check_for_queued_message(self):
+    def check_for_queued_message(self, details):
 
         # only check for queued messages, if we have enabled this and if we have a minimum snr received
-        if self.config["MESSAGES"]["enable_auto_repeat"] and self.details["snr"] >= -2:
+        if self.config["MESSAGES"]["enable_auto_repeat"] and details["snr"] >= -2:
             # set message to queued if beacon received
-            DatabaseManagerMessages(self.event_manager).set_message_to_queued_for_callsign(
-                self.details['frame']["origin"])
\ No newline at end of file
+            self.get_database(DatabaseManagerMessages).set_message_to_queued_for_callsign(
+                details['frame']["origin"])
\ No newline at end of file
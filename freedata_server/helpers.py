@@ -4,6 +4,7 @@ Created on Fri Dec 25 21:25:14 2020
 
 @author: DJ2LS
 """
+import functools
 import time
 from datetime import datetime,timezone
 import structlog
@@ -11,6 +12,7 @@ import numpy as np
 import threading
 import hashlib
 import hmac
+import zlib
 import os
 import sys
 from pathlib import Path
@@ -23,6 +25,32 @@ import glob
 log = structlog.get_logger("helpers")
 
 
+def memoize(maxsize=256):
+    """
+    Cache results of a function with a single bytes or str argument.
+    bytearray and memoryview arguments are converted to bytes, so they can be cached too.
+
+    Args:
+        maxsize: maximum number of cached results
+
+    Returns:
+        decorator
+    """
+    def decorator(function):
+        cached = functools.lru_cache(maxsize=maxsize)(function)
+
+        @functools.wraps(function)
+        def wrapper(data):
+            if isinstance(data, (bytearray, memoryview)):
+                data = bytes(data)
+            return cached(data)
+
+        wrapper.cache_info = cached.cache_info
+        wrapper.cache_clear = cached.cache_clear
+        return wrapper
+    return decorator
+
+
 def wait(seconds: float) -> bool:
     """
 
@@ -99,6 +127,7 @@ def get_crc_16(data: str) -> bytes:
     return crc.to_bytes(2, byteorder="big")
 
 
+@memoize()
 def get_crc_24(data: str) -> bytes:
     """
     Calculate CRC-24-OPENPGP checksum for the given data using the provided specification.
@@ -134,51 +163,32 @@ def get_crc_32(data: str) -> bytes:
     """
     Calculate CRC-32 checksum for the given data using the Ethernet specification.
 
+    This is the reflected CRC-32 with an initial value and final xor of 0xFFFFFFFF,
+    computed by zlib. zlib.crc32 can continue a running value, see update_crc_32.
+
     Args:
         data (str): Input data as a string.
 
     Returns:
         bytes: CRC-32 checksum of the provided data.
     """
+    if isinstance(data, str):
+        data = bytes(data, "utf-8")
+    return zlib.crc32(data).to_bytes(4, byteorder="big")
 
-    def reflect(data, width):
-        """
-        Reflects the bits in the given data.
-
-        Args:
-            data (int): The data to reflect.
-            width (int): The bit width of the data.
-
-        Returns:
-            int: The reflected data.
-        """
-        reflected_data = 0
-        for i in range(width):
-            if data & (1 << i):
-                reflected_data |= (1 << (width - 1 - i))
-        return reflected_data
-
-    crc = 0xFFFFFFFF
-    polynomial = 0x04C11DB7
-    xor_out = 0
 
-    if not isinstance(data, (bytes, bytearray)):
-        data = bytes(data, "utf-8")
+def update_crc_32(crc: int, data) -> int:
+    """
+    Continue a CRC-32 checksum with more data.
 
-    for byte in data:
-        byte = reflect(byte, 8)
-        crc ^= byte << 24
-        for _ in range(8):
-            if crc & 0x80000000:
-                crc = (crc << 1) ^ polynomial
-            else:
-                crc <<= 1
-            crc &= 0xFFFFFFFF
+    Args:
+        crc (int): Checksum of the data so far, 0 for no data.
+        data (bytes): Following data, any bytes-like object.
 
-    crc = reflect(crc, 32)
-    crc ^= 0xFFFFFFFF
-    crc ^= xor_out
-    return crc.to_bytes(4, byteorder="big")
+    Returns:
+        int: CRC-32 checksum, get_crc_32 of all data as integer.
+    """
+    return zlib.crc32(data, crc)
 
 
 from datetime import datetime, timezone
@@ -222,6 +232,7 @@ def add_to_heard_stations(dxcallsign, dxgrid, datatype, snr, offset, frequency,
                 break
 
 
+@memoize()
 def callsign_to_bytes(callsign: str) -> bytes:
     """
 
@@ -284,6 +295,7 @@ def callsign_to_bytes(callsign: str) -> bytes:
     # return bytes(bytestring)
 
 
+@memoize()
 def bytes_to_callsign(bytestring: bytes) -> bytes:
     """
     Convert our callsign, received by a frame to a callsign in a human readable format
@@ -344,7 +356,6 @@ def check_callsign(callsign: str, crc_to_check: bytes, ssid_list):
         [True, Callsign + SSID]
         False
     """
-    print(callsign)
     if not isinstance(callsign, (bytes)):
         callsign = bytes(callsign,'utf-8')
 
@@ -361,8 +372,9 @@ def check_callsign(callsign: str, crc_to_check: bytes, ssid_list):
         log.debug("[HLP] check_callsign: Error converting to bytes:", e=err)
 
     # ensure, we are always have the own ssid in ssid_list even if it is empty
+    # without modifying the list of the caller
     if ssid not in ssid_list:
-        ssid_list.append(str(ssid))
+        ssid_list = [*ssid_list, str(ssid)]
 
     for ssid in ssid_list:
         call_with_ssid = callsign + b'-' + (str(ssid)).encode('utf-8')
@@ -11,7 +11,11 @@ def message_received(event_manager, state_manager, data, statistics):
     decompressed_json_string = data.decode('utf-8')
     received_message_obj = MessageP2P.from_payload(decompressed_json_string)
     received_message_dict = MessageP2P.to_dict(received_message_obj)
-    DatabaseManagerMessages(event_manager).add_message(received_message_dict, statistics, direction='receive', status='received', is_read=False, frequency=state_manager.radio_frequency)
+    database = DatabaseManagerMessages(event_manager)
+    # the IRS may have stored it already, from a partially received batch resumed by a later session
+    if database.get_message_by_id(received_message_dict['id']):
+        return None
+    return database.add_message(received_message_dict, statistics, direction='receive', status='received', is_read=False, frequency=state_manager.radio_frequency)
 
 def message_transmitted(event_manager, state_manager, data, statistics):
     decompressed_json_string = data.decode('utf-8')
@@ -30,6 +34,15 @@ def message_failed(event_manager, state_manager, data, statistics):
     DatabaseManagerMessages(event_manager).update_message(payload_message["id"], update_data={'status': 'failed'})
     DatabaseManagerMessages(event_manager).update_message(payload_message["id"], update_data={'statistics': statistics}, frequency=state_manager.radio_frequency)
 
+def message_requeued(event_manager, state_manager, data, statistics):
+    decompressed_json_string = data.decode('utf-8')
+    payload_message_obj = MessageP2P.from_payload(decompressed_json_string)
+    payload_message = MessageP2P.to_dict(payload_message_obj)
+    # other messages of the batch went through, so try this one again with the next session
+    database = DatabaseManagerMessages(event_manager)
+    database.increment_message_attempts(payload_message["id"])
+    database.update_message(payload_message["id"], update_data={'status': 'queued', 'statistics': statistics}, frequency=state_manager.radio_frequency)
+
 class MessageP2P:
     def __init__(self, id: str, origin: str, destination: str, body: str, attachments: list) -> None:
         self.id = id
@@ -304,6 +304,25 @@ class DatabaseManagerMessages(DatabaseManager):
         finally:
             session.remove()
 
+    def get_queued_messages_for_destination(self, destination):
+        session = self.get_thread_scoped_session()
+        try:
+            queued_status = session.query(Status).filter_by(name='queued').first()
+            if not queued_status:
+                self.log("Queued status not found", isWarning=True)
+                return []
+            # oldest first, like get_first_queued_message
+            messages = session.query(P2PMessage)\
+                .filter_by(status=queued_status, destination_callsign=destination)\
+                .order_by(P2PMessage.timestamp)\
+                .all()
+            return [message.to_dict() for message in messages]
+        except Exception as e:
+            self.log(f"Error fetching queued messages for {destination}: {e}", isWarning=True)
+            return []
+        finally:
+            session.remove()
+
     def increment_message_attempts(self, message_id, session=None):
         own_session = False
         if not session:
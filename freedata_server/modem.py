@@ -18,6 +18,9 @@ import structlog
 import tci
 import cw
 import audio
+import audio_resampler
+import airtime_accounting
+import spectrum_analyzer
 import demodulator
 import modulator
 
@@ -57,7 +60,8 @@ class RF:
         self.ptt_state = False
         self.enqueuing_audio = False # set to True, while we are processing audio
 
-        self.AUDIO_SAMPLE_RATE = 48000
+        # sound card sample rate, 48kHz uses the codec2 resampler
+        self.AUDIO_SAMPLE_RATE = config['AUDIO'].get('samplerate') or audio_resampler.CODEC2_DEVICE_SAMPLE_RATE
         self.modem_sample_rate = codec2.api.FREEDV_FS_8000
 
         # 8192 Let's do some tests with very small chunks for TX
@@ -69,12 +73,20 @@ class RF:
 
         self.audio_out_queue = queue.Queue()
 
-        # Make sure our resampler will work
-        assert (self.AUDIO_SAMPLE_RATE / self.modem_sample_rate) == codec2.api.FDMDV_OS_48  # type: ignore
+        # 100ms blocks for RX, 50ms for TX
+        self.AUDIO_FRAMES_PER_BUFFER_RX = self.AUDIO_SAMPLE_RATE // 10
+        self.AUDIO_FRAMES_PER_BUFFER_TX = self.AUDIO_SAMPLE_RATE // 20
 
         self.audio_received_queue = queue.Queue()
         self.data_queue_received = queue.Queue()
         self.fft_queue = fft_queue
+        self.spectrum_analyzer = spectrum_analyzer.SpectrumAnalyzer(
+            self.states, self.fft_queue, history=self.states.spectrum_history
+        )
+        # the TX monitor only feeds the waterfall, our own signal must not mark the channel busy
+        self.spectrum_analyzer_tx = spectrum_analyzer.SpectrumAnalyzer(
+            self.states, self.fft_queue, update_channel_state=False, history=self.states.spectrum_history
+        )
 
         self.demodulator = demodulator.Demodulator(self.config, 
                                             self.audio_received_queue, 
@@ -120,6 +132,10 @@ class RF:
         except Exception as e:
             self.log.error("[MDM] Error stopping freedata_server", e=e)
 
+        # hand codec2 instances back to the pool, so a restart can reuse them
+        self.modulator.release_codec2()
+        self.demodulator.release_codec2()
+
     def init_audio(self):
         self.log.info(f"[MDM] init: get audio devices", input_device=self.audio_input_device,
                       output_device=self.audio_output_device)
@@ -143,8 +159,14 @@ class RF:
             sd.default.samplerate = self.AUDIO_SAMPLE_RATE
             sd.default.device = (in_dev_index, out_dev_index)
 
-            # init codec2 resampler
-            self.resampler = codec2.resampler()
+            # init resampler, transmit and the output stream get their own as the
+            # resamplers carry filter memory from block to block and grow their
+            # buffers for larger blocks, while the input callback is using them
+            self.resampler = audio_resampler.AudioResampler(self.AUDIO_SAMPLE_RATE, self.AUDIO_FRAMES_PER_BUFFER_RX)
+            self.resampler_tx = audio_resampler.AudioResampler(self.AUDIO_SAMPLE_RATE, self.AUDIO_FRAMES_PER_BUFFER_TX)
+            self.resampler_tx_fft = audio_resampler.AudioResampler(self.AUDIO_SAMPLE_RATE, self.AUDIO_FRAMES_PER_BUFFER_TX)
+            # preallocated 8kHz block of the input stream
+            self.audio_8k_rx = np.zeros(self.resampler.modem_block_size(self.AUDIO_FRAMES_PER_BUFFER_RX), dtype=np.int16)
 
             # SoundDevice audio input stream
             self.sd_input_stream = sd.InputStream(
@@ -153,7 +175,7 @@ class RF:
                 callback=self.sd_input_audio_callback,
                 device=in_dev_index,
                 samplerate=self.AUDIO_SAMPLE_RATE,
-                blocksize=4800,
+                blocksize=self.AUDIO_FRAMES_PER_BUFFER_RX,
             )
             self.sd_input_stream.start()
 
@@ -163,7 +185,7 @@ class RF:
                 callback=self.sd_output_audio_callback,
                 device=out_dev_index,
                 samplerate=self.AUDIO_SAMPLE_RATE,
-                blocksize=2400,
+                blocksize=self.AUDIO_FRAMES_PER_BUFFER_TX,
             )
             self.sd_output_stream.start()
 
@@ -198,7 +220,7 @@ class RF:
         start_of_transmission = time.time()
 
         f0 = 1500  # Frequency of sine wave in Hz
-        fs = 48000  # Sample rate in Hz
+        fs = self.AUDIO_SAMPLE_RATE  # Sample rate in Hz
         max_duration = 30  # Maximum duration in seconds
 
         # Create sine wave signal
@@ -218,6 +240,7 @@ class RF:
         end_of_transmission = time.time()
         transmission_time = end_of_transmission - start_of_transmission
         self.states.setTransmitting(False)
+        self.states.airtime.record_tx(transmission_time, "SINE", "SINE")
 
         self.log.debug("[MDM] ON AIR TIME", time=transmission_time)
 
@@ -237,7 +260,8 @@ class RF:
         )
         start_of_transmission = time.time()
 
-        txbuffer_out = cw.MorseCodePlayer().text_to_signal(self.config['STATION'].mycall)
+        txbuffer_out = cw.MorseCodePlayer(fs=self.AUDIO_SAMPLE_RATE).text_to_signal(self.config['STATION'].mycall)
+        self.states.airtime.record_tx(len(txbuffer_out) / self.AUDIO_SAMPLE_RATE, "MORSE", "MORSE")
 
         # transmit audio
         self.enqueue_audio_out(txbuffer_out)
@@ -260,12 +284,20 @@ class RF:
         start_of_transmission = time.time()
         txbuffer = self.modulator.create_burst(mode, repeats, repeat_delay, frames)
 
-        # Re-sample back up to 48k (resampler works on np.int16)
+        # Re-sample back up to the device rate (resampler works on np.int16)
         x = np.frombuffer(txbuffer, dtype=np.int16)
         x = audio.set_audio_volume(x, self.tx_audio_level)
 
+        frame_type, session = airtime_accounting.describe_frame(frames)
+        self.states.airtime.record_tx(
+            len(x) / audio_resampler.MODEM_SAMPLE_RATE, getattr(mode, "name", str(mode)), frame_type, session
+        )
+        if self.states.frame_capture:
+            for frame in frames if isinstance(frames, list) else [frames]:
+                self.states.frame_capture.record_tx(frame, getattr(mode, "name", str(mode)))
+
         if self.radiocontrol not in ["tci"]:
-            txbuffer_out = self.resampler.resample8_to_48(x)
+            txbuffer_out = self.resampler_tx.resample_to_device(x)
         else:
             txbuffer_out = x
 
@@ -317,8 +349,8 @@ class RF:
         try:
             if not self.audio_out_queue.empty() and not self.enqueuing_audio:
                 chunk = self.audio_out_queue.get_nowait()
-                audio_8k = self.resampler.resample48_to_8(chunk)
-                audio.calculate_fft(audio_8k, self.fft_queue, self.states)
+                audio_8k = self.resampler_tx_fft.resample_to_modem(chunk)
+                self.spectrum_analyzer_tx.process(audio_8k)
                 outdata[:] = chunk.reshape(outdata.shape)
 
             else:
@@ -341,12 +373,12 @@ class RF:
                 return
             try:
                 audio_48k = np.frombuffer(indata, dtype=np.int16)
-                audio_8k = self.resampler.resample48_to_8(audio_48k)
+                audio_8k = self.resampler.resample_to_modem(audio_48k, out=self.audio_8k_rx)
 
                 audio_8k_level_adjusted = audio.set_audio_volume(audio_8k, self.rx_audio_level)
 
                 if not self.states.isTransmitting():
-                    audio.calculate_fft(audio_8k_level_adjusted, self.fft_queue, self.states)
+                    self.spectrum_analyzer.process(audio_8k_level_adjusted)
 
                 length_audio_8k_level_adjusted = len(audio_8k_level_adjusted)
                 # Avoid buffer overflow by filling only if buffer for
@@ -14,6 +14,8 @@ class FRAME_TYPE(Enum):
     ARQ_SESSION_INFO_ACK = 15
     ARQ_BURST_FRAME = 20
     ARQ_BURST_ACK = 21
+    ARQ_BURST_ACK_SR = 22
+    ARQ_BURST_FRAME_SR = 23
     P2P_CONNECTION_CONNECT = 30
     P2P_CONNECTION_CONNECT_ACK = 31
     P2P_CONNECTION_HEARTBEAT = 32
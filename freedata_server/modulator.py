@@ -11,29 +11,41 @@ class Modulator:
         self.tx_delay = config['MODEM']['tx_delay']
         self.modem_sample_rate = codec2.api.FREEDV_FS_8000
 
+        # make sure the mode parameter registry is ready before the first burst
+        codec2.init_mode_parameters()
+
         # Initialize codec2, rig control, and data threads
         self.init_codec2()
 
     def init_codec2(self):
-        # Open codec2 instances
-
-        # INIT TX MODES - here we need all modes.
-        self.freedv_datac0_tx = codec2.open_instance(codec2.FREEDV_MODE.datac0.value)
-        self.freedv_datac1_tx = codec2.open_instance(codec2.FREEDV_MODE.datac1.value)
-        self.freedv_datac3_tx = codec2.open_instance(codec2.FREEDV_MODE.datac3.value)
-        self.freedv_datac4_tx = codec2.open_instance(codec2.FREEDV_MODE.datac4.value)
-        self.freedv_datac13_tx = codec2.open_instance(codec2.FREEDV_MODE.datac13.value)
-        self.freedv_datac14_tx = codec2.open_instance(codec2.FREEDV_MODE.datac14.value)
-        self.data_ofdm_500_tx = codec2.open_instance(codec2.FREEDV_MODE.data_ofdm_500.value)
-        self.data_ofdm_2438_tx = codec2.open_instance(codec2.FREEDV_MODE.data_ofdm_2438.value)
-        #self.freedv_qam16c2_tx = codec2.open_instance(codec2.FREEDV_MODE.qam16c2.value)
-        #self.data_qam_2438_tx = codec2.open_instance(codec2.FREEDV_MODE.data_qam_2438.value)
-
-    def transmit_add_preamble(self, buffer, freedv):
+        # codec2 TX instances by mode value, taken from the instance pool.
+        # Signalling modes are needed right away, all others are opened on first use.
+        self.tx_instances = {}
+        for mode in [codec2.FREEDV_MODE.signalling, codec2.FREEDV_MODE.signalling_ack]:
+            self.get_instance(mode)
+
+    def get_instance(self, mode):
+        """
+        Get the TX instance for a mode, acquiring it from the instance pool on first use
+
+        :param mode: Codec2 mode
+        :type mode: codec2.FREEDV_MODE
+        :return: codec2 instance
+        :rtype: ctypes.c_void_p
+        """
+        if mode.value not in self.tx_instances:
+            self.tx_instances[mode.value] = codec2.INSTANCE_POOL.acquire(mode.value, codec2.instance_pool.TX)
+        return self.tx_instances[mode.value]
+
+    def release_codec2(self):
+        # Hand TX instances back to the pool for the next modem start
+        for freedv in self.tx_instances.values():
+            codec2.INSTANCE_POOL.release(freedv)
+        self.tx_instances = {}
+
+    def transmit_add_preamble(self, buffer, freedv, mode):
         # Init buffer for preample
-        n_tx_preamble_modem_samples = codec2.api.freedv_get_n_tx_preamble_modem_samples(
-            freedv
-        )
+        n_tx_preamble_modem_samples = codec2.get_mode_parameters(mode)['n_tx_preamble_modem_samples']
         mod_out_preamble = ctypes.create_string_buffer(n_tx_preamble_modem_samples * 2)
 
         # Write preamble to txbuffer
@@ -41,11 +53,9 @@ class Modulator:
         buffer += bytes(mod_out_preamble)
         return buffer
 
-    def transmit_add_postamble(self, buffer, freedv):
+    def transmit_add_postamble(self, buffer, freedv, mode):
         # Init buffer for postamble
-        n_tx_postamble_modem_samples = (
-            codec2.api.freedv_get_n_tx_postamble_modem_samples(freedv)
-        )
+        n_tx_postamble_modem_samples = codec2.get_mode_parameters(mode)['n_tx_postamble_modem_samples']
         mod_out_postamble = ctypes.create_string_buffer(
             n_tx_postamble_modem_samples * 2
         )
@@ -61,13 +71,14 @@ class Modulator:
         buffer += bytes(mod_out_silence)
         return buffer
 
-    def transmit_create_frame(self, txbuffer, freedv, frame):
+    def transmit_create_frame(self, txbuffer, freedv, frame, mode):
         # Get number of bytes per frame for mode
-        bytes_per_frame = int(codec2.api.freedv_get_bits_per_modem_frame(freedv) / 8)
-        payload_bytes_per_frame = bytes_per_frame - 2
+        mode_parameters = codec2.get_mode_parameters(mode)
+        bytes_per_frame = mode_parameters['bytes_per_frame']
+        payload_bytes_per_frame = mode_parameters['payload_per_frame']
         #print(payload_bytes_per_frame)
         # Init buffer for data
-        n_tx_modem_samples = codec2.api.freedv_get_n_tx_modem_samples(freedv)
+        n_tx_modem_samples = mode_parameters['n_tx_modem_samples']
         mod_out = ctypes.create_string_buffer(n_tx_modem_samples * 2)
 
         # Create buffer for data
@@ -110,22 +121,8 @@ class Modulator:
 
 
         # get freedv instance by mode
-        mode_transition = {
-            codec2.FREEDV_MODE.signalling_ack: self.freedv_datac14_tx,
-            codec2.FREEDV_MODE.signalling: self.freedv_datac13_tx,
-            codec2.FREEDV_MODE.datac0: self.freedv_datac0_tx,
-            codec2.FREEDV_MODE.datac1: self.freedv_datac1_tx,
-            codec2.FREEDV_MODE.datac3: self.freedv_datac3_tx,
-            codec2.FREEDV_MODE.datac4: self.freedv_datac4_tx,
-            codec2.FREEDV_MODE.datac13: self.freedv_datac13_tx,
-            codec2.FREEDV_MODE.datac14: self.freedv_datac14_tx,
-            codec2.FREEDV_MODE.data_ofdm_500: self.data_ofdm_500_tx,
-            codec2.FREEDV_MODE.data_ofdm_2438: self.data_ofdm_2438_tx,
-            #codec2.FREEDV_MODE.qam16c2: self.freedv_qam16c2_tx,
-            #codec2.FREEDV_MODE.data_qam_2438: self.freedv_data_qam_2438_tx,
-        }
-        if mode in mode_transition:
-            freedv = mode_transition[mode]
+        if isinstance(mode, codec2.FREEDV_MODE):
+            freedv = self.get_instance(mode)
         else:
             print("wrong mode.................")
             print(mode)
@@ -150,9 +147,9 @@ class Modulator:
 
             # Create modulation for all frames in the list
             for frame in frames:
-                txbuffer = self.transmit_add_preamble(txbuffer, freedv)
-                txbuffer = self.transmit_create_frame(txbuffer, freedv, frame)
-                txbuffer = self.transmit_add_postamble(txbuffer, freedv)
+                txbuffer = self.transmit_add_preamble(txbuffer, freedv, mode)
+                txbuffer = self.transmit_create_frame(txbuffer, freedv, frame, mode)
+                txbuffer = self.transmit_add_postamble(txbuffer, freedv, mode)
 
             # Add delay to end of frames
             txbuffer = self.transmit_add_silence(txbuffer, repeat_delay)
@@ -6,7 +6,6 @@ import data_frame_factory
 import structlog
 import random
 from queue import Queue
-import time
 from command_arq_raw import ARQRawCommand
 import numpy as np
 import base64
@@ -84,6 +83,12 @@ class P2PConnection:
 
         self.event_frame_received = threading.Event()
 
+        # transmissions and timeouts are driven by the scheduler of the state manager
+        self.scheduler = self.state_manager.session_scheduler
+        self.clock = self.state_manager.clock
+        self.retry_timer = None
+        self.retry_generation = 0
+
         self.RETRIES_CONNECT = 5
         self.TIMEOUT_CONNECT = 5
         self.TIMEOUT_DATA = 5
@@ -92,29 +97,22 @@ class P2PConnection:
 
         self.is_ISS = False # Indicator, if we are ISS or IRS
 
-        self.last_data_timestamp= time.time()
+        self.last_data_timestamp= self.clock.time()
         self.start_data_processing_worker()
 
 
     def start_data_processing_worker(self):
-        """Starts a worker thread to monitor the transmit data queue and process data."""
-
-        def data_processing_worker():
-            while True:
-                if time.time() > self.last_data_timestamp + self.ENTIRE_CONNECTION_TIMEOUT and self.state is not States.ARQ_SESSION:
-                    self.disconnect()
-                    return
-
-                if not self.p2p_data_tx_queue.empty() and self.state == States.CONNECTED:
-                    self.process_data_queue()
-                threading.Event().wait(0.1)
-
-
+        """Starts monitoring the transmit data queue by a periodic job of the session scheduler."""
+        self.scheduler.call_later(0.1, self.process_data_periodically)
 
+    def process_data_periodically(self):
+        if self.clock.time() > self.last_data_timestamp + self.ENTIRE_CONNECTION_TIMEOUT and self.state is not States.ARQ_SESSION:
+            self.disconnect()
+            return
 
-        # Create and start the worker thread
-        worker_thread = threading.Thread(target=data_processing_worker, daemon=True)
-        worker_thread.start()
+        if not self.p2p_data_tx_queue.empty() and self.state == States.CONNECTED:
+            self.process_data_queue()
+        self.scheduler.call_later(0.1, self.process_data_periodically)
 
     def generate_id(self):
         while True:
@@ -142,8 +140,10 @@ class P2PConnection:
         self.state = state
 
     def on_frame_received(self, frame):
-        self.last_data_timestamp = time.time()
+        self.last_data_timestamp = self.clock.time()
         self.event_frame_received.set()
+        if self.retry_timer:
+            self.retry_timer.cancel()
         self.log(f"Received {frame['frame_type']}")
         frame_type = frame['frame_type_int']
         if self.state in self.STATE_TRANSITION:
@@ -162,26 +162,36 @@ class P2PConnection:
 
         self.modem.transmit(mode, 1, 1, frame)
 
-    def transmit_wait_and_retry(self, frame_or_burst, timeout, retries, mode):
-        while retries > 0:
-            self.event_frame_received = threading.Event()
-            if isinstance(frame_or_burst, list): burst = frame_or_burst
-            else: burst = [frame_or_burst]
-            for f in burst:
-                self.transmit_frame(f, mode)
-            self.event_frame_received.clear()
-            self.log(f"Waiting {timeout} seconds...")
-            if self.event_frame_received.wait(timeout):
-                return
-            self.log("Timeout!")
-            retries = retries - 1
+    def transmit_wait_and_retry(self, generation, frame_or_burst, timeout, retries, mode):
+        if generation != self.retry_generation:
+            return
+        if isinstance(frame_or_burst, list): burst = frame_or_burst
+        else: burst = [frame_or_burst]
+        for f in burst:
+            self.transmit_frame(f, mode)
+        self.event_frame_received.clear()
+        self.log(f"Waiting {timeout} seconds...")
+        self.retry_timer = self.scheduler.call_later(timeout, self.retry_after_timeout,
+                                                     generation, frame_or_burst, timeout, retries, mode)
+
+    def retry_after_timeout(self, generation, frame_or_burst, timeout, retries, mode):
+        if generation != self.retry_generation or self.event_frame_received.is_set():
+            return
+        self.log("Timeout!")
+        retries = retries - 1
+        if retries > 0:
+            self.transmit_wait_and_retry(generation, frame_or_burst, timeout, retries, mode)
+            return
 
         #self.connected_iss() # override connection state for simulation purposes
         self.session_failed()
 
     def launch_twr(self, frame_or_burst, timeout, retries, mode):
-        twr = threading.Thread(target = self.transmit_wait_and_retry, args=[frame_or_burst, timeout, retries, mode], daemon=True)
-        twr.start()
+        # a new transmission replaces the retries of the previous one
+        self.retry_generation += 1
+        if self.retry_timer:
+            self.retry_timer.cancel()
+        self.scheduler.submit(self.transmit_wait_and_retry, self.retry_generation, frame_or_burst, timeout, retries, mode)
 
     def transmit_and_wait_irs(self, frame, timeout, mode):
         self.event_frame_received.clear()
@@ -192,9 +202,7 @@ class P2PConnection:
         #    self.transmission_failed()
 
     def launch_twr_irs(self, frame, timeout, mode):
-        thread_wait = threading.Thread(target = self.transmit_and_wait_irs,
-                                       args = [frame, timeout, mode], daemon=True)
-        thread_wait.start()
+        self.scheduler.submit(self.transmit_and_wait_irs, frame, timeout, mode)
 
     def connect(self):
         self.set_state(States.CONNECTING)
@@ -305,11 +313,11 @@ class P2PConnection:
             return iss
 
     def transmitted_arq(self):
-        self.last_data_timestamp = time.time()
+        self.last_data_timestamp = self.clock.time()
         self.set_state(States.CONNECTED)
 
     def received_arq(self, data):
-        self.last_data_timestamp = time.time()
+        self.last_data_timestamp = self.clock.time()
         self.set_state(States.CONNECTED)
         self.p2p_data_rx_queue.put(data)
 
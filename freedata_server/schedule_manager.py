@@ -1,5 +1,4 @@
 import sched
-import time
 import threading
 
 import command_message_send
@@ -7,6 +6,7 @@ from message_system_db_manager import DatabaseManager
 from message_system_db_messages import DatabaseManagerMessages
 from message_system_db_beacon import DatabaseManagerBeacon
 import explorer
+import arq_receive_spool
 import command_beacon
 import atexit
 import numpy as np
@@ -24,13 +24,16 @@ class ScheduleManager:
         self.event_manager = event_manager
         self.config = self.config_manager.read()
 
-        self.scheduler = sched.scheduler(time.time, threading.Event().wait)
+        # a virtual clock of the state manager lets simulations run the events without waiting
+        self.clock = self.state_manager.clock
+        self.scheduler = sched.scheduler(self.clock.time, self.clock.sleep)
         self.events = {
             'check_for_queued_messages': {'function': self.check_for_queued_messages, 'interval': 5},
             'explorer_publishing': {'function': self.push_to_explorer, 'interval': 60},
             'transmitting_beacon': {'function': self.transmit_beacon, 'interval': 600},
             'beacon_cleanup': {'function': self.delete_beacons, 'interval': 600},
             'update_transmission_state': {'function': self.update_transmission_state, 'interval': 10},
+            'spool_cleanup': {'function': self.delete_spools, 'interval': 600},
         }
         self.running = False  # Flag to control the running state
         self.scheduler_thread = None  # Reference to the scheduler thread
@@ -73,9 +76,17 @@ class ScheduleManager:
         if self.scheduler_thread:
             self.scheduler_thread.join(1)
         self.log.warning("[SHUTDOWN] schedule manager stopped")
+
+    def is_duty_cycle_exceeded(self):
+        limit = self.config_manager.read()['MODEM'].get('tx_duty_cycle_limit')
+        if self.state_manager.airtime.is_duty_cycle_exceeded(limit):
+            self.log.debug("[SCHEDULE] duty cycle limit reached, deferring transmission", limit=limit)
+            return True
+        return False
+
     def transmit_beacon(self):
         try:
-            if not self.state_manager.getARQ() and self.state_manager.is_beacon_running and self.state_manager.is_modem_running:
+            if not self.state_manager.getARQ() and self.state_manager.is_beacon_running and self.state_manager.is_modem_running and not self.is_duty_cycle_exceeded():
                     cmd = command_beacon.BeaconCommand(self.config, self.state_manager, self.event_manager)
                     cmd.run(self.event_manager, self.modem)
         except Exception as e:
@@ -87,6 +98,15 @@ class ScheduleManager:
         except Exception as e:
             print(e)
 
+    def delete_spools(self):
+        try:
+            modem_config = self.config_manager.read()['MODEM']
+            max_age = modem_config.get('arq_spool_max_age') or arq_receive_spool.DEFAULT_MAX_AGE
+            if deleted := arq_receive_spool.expire_spools(modem_config.get('arq_spool_directory'), max_age):
+                self.log.info("[SCHEDULE] deleted expired ARQ spool files", count=deleted)
+        except Exception as e:
+            print(e)
+
     def push_to_explorer(self):
         self.config = self.config_manager.read()
         if self.config['STATION']['enable_explorer'] and self.state_manager.is_modem_running:
@@ -97,6 +117,8 @@ class ScheduleManager:
 
     def check_for_queued_messages(self):
         if not self.state_manager.getARQ() and not self.state_manager.is_receiving_codec2_signal() and self.state_manager.is_modem_running:
+            if self.is_duty_cycle_exceeded():
+                return
             try:
                 if first_queued_message := DatabaseManagerMessages(
                     self.event_manager
@@ -116,7 +138,7 @@ class ScheduleManager:
             session = self.state_manager.arq_irs_sessions[session_id]
 
             # set an IRS session to RESUME for being ready getting the data again
-            if session.is_IRS and session.last_state_change_timestamp + 90 < time.time():
+            if session.is_IRS and session.last_state_change_timestamp + session.TIMEOUT_RESUME < self.clock.time():
                 try:
                     # if session state is already RESUME, don't set it again for avoiding a flooded cli
                     if session.state not in [session.state_enum.RESUME]:
@@ -134,7 +156,7 @@ class ScheduleManager:
 
         for session_id in self.state_manager.arq_iss_sessions:
             session = self.state_manager.arq_iss_sessions[session_id]
-            if not session.is_IRS and session.last_state_change_timestamp + 90 < time.time() and session.state in [
+            if not session.is_IRS and session.last_state_change_timestamp + 90 < self.clock.time() and session.state in [
                 ISS_State.ABORTED, ISS_State.FAILED]:
                 session_to_be_deleted.add(session)
 
@@ -10,7 +10,7 @@ import asyncio
 import webbrowser
 import platform
 from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
@@ -19,9 +19,12 @@ import threading
 import serial_ports
 from config import CONFIG
 import audio
+import codec2
 import service_manager
 import state_manager
 import websocket_manager
+import waterfall_publisher
+import spectrum_history
 import api_validations as validations
 import command_cq
 import command_beacon
@@ -643,6 +646,163 @@ async def get_modem_state():
     return app.state_manager.sendState()
 
 
+@app.get("/modem/airtime", summary="Get Airtime Statistics", tags=["Modem"], responses={
+    200: {
+        "description": "Airtime and channel utilization for the last minute, hour and day.",
+        "content": {
+            "application/json": {
+                "example": {
+                    "1m": {
+                        "tx_seconds": 4.2,
+                        "tx_duty_cycle": 7.0,
+                        "tx_by_mode": {"signalling": 1.2, "datac4": 3.0},
+                        "tx_by_frame_type": {"ARQ_SESSION_OPEN": 1.2, "ARQ_BURST_FRAME": 3.0},
+                        "tx_by_session": {"ARQ-105": 4.2},
+                        "rx_seconds": 2.4,
+                        "rx_by_mode": {"signalling": 2.4},
+                        "rx_by_frame_type": {"ARQ_BURST_ACK": 2.4},
+                        "rx_by_station": {"AA1AAA-1": 2.4},
+                        "channel_busy": 23.5,
+                        "slot_busy": [0.0, 12.0, 23.5, 10.0, 0.0]
+                    },
+                    "1h": {},
+                    "24h": {}
+                }
+            }
+        }
+    }
+})
+async def get_modem_airtime():
+    """
+    Retrieve airtime of our own and decoded transmissions and the channel busy duty cycle.
+
+    Returns:
+        dict: Statistics per window, times in seconds and duty cycles in percent.
+    """
+    return api_response(app.state_manager.airtime.summary())
+
+
+@app.get("/modem/spectrum_history", summary="Get Spectrum History", tags=["Modem"], responses={
+    200: {
+        "description": "Spectra and busy slots of a time range as binary block, see spectrum_history.py for the layout.",
+        "content": {
+            "application/octet-stream": {}
+        }
+    },
+    404: {
+        "description": "Spectrum history is disabled.",
+        "content": {
+            "application/json": {
+                "example": {
+                    "error": "Spectrum history disabled."
+                }
+            }
+        }
+    }
+})
+async def get_modem_spectrum_history(start: float = None, end: float = None):
+    """
+    Retrieve the recorded spectra and busy slots for backfilling the waterfall.
+
+    Parameters:
+        start (float): Unix time of the first row, defaults to the oldest row.
+        end (float): Unix time of the last row, defaults to the newest row.
+
+    Returns:
+        Response: Binary block with timestamps, busy slot bitmaps and quantized spectra.
+    """
+    if app.state_manager.spectrum_history is None:
+        api_abort("Spectrum history disabled.", 404)
+    return Response(content=app.state_manager.spectrum_history.export(start, end), media_type="application/octet-stream")
+
+
+@app.get("/modem/dispatcher", summary="Get Frame Dispatcher Statistics", tags=["Modem"], responses={
+    200: {
+        "description": "Queue state and handling latency of the frame dispatcher lanes.",
+        "content": {
+            "application/json": {
+                "example": {
+                    "session": {
+                        "workers": 2,
+                        "queued": [0, 1],
+                        "queue_size": 64,
+                        "dropped": 0,
+                        "latency": {
+                            "count": 120,
+                            "mean_ms": 3.1,
+                            "p50_ms": 2,
+                            "p95_ms": 10,
+                            "max_ms": 14.2,
+                            "buckets": {"<=1ms": 20, "<=2ms": 50, "<=5ms": 40, "<=10ms": 8, "<=20ms": 2}
+                        }
+                    },
+                    "bulk": {},
+                    "duplicates": {"BEACON": 3, "ARQ_SESSION_OPEN": 1}
+                }
+            }
+        }
+    },
+    404: {
+        "description": "Modem not running.",
+        "content": {
+            "application/json": {
+                "example": {
+                    "error": "Modem not running."
+                }
+            }
+        }
+    }
+})
+async def get_modem_dispatcher():
+    """
+    Retrieve queue state and latency histograms of the frame dispatcher lanes and duplicate frame counts.
+
+    Returns:
+        dict: Statistics per lane, latencies in milliseconds from reception until the frame was handled,
+        and received duplicates per frame type.
+    """
+    dispatcher = getattr(app.service_manager, 'frame_dispatcher', None)
+    if not dispatcher:
+        api_abort("Modem not running.", 404)
+    return api_response(dispatcher.get_lane_statistics())
+
+
+@app.get("/modem/scheduler", summary="Get Session Scheduler Statistics", tags=["Modem"], responses={
+    200: {
+        "description": "Threads, pending timers and timer accuracy of the scheduler driving ARQ and P2P sessions.",
+        "content": {
+            "application/json": {
+                "example": {
+                    "threads": 5,
+                    "pending_timers": 1,
+                    "queued_jobs": 0,
+                    "fired": 42,
+                    "cancelled": 310,
+                    "jobs_done": 402,
+                    "errors": 0,
+                    "lateness": {
+                        "count": 42,
+                        "mean_ms": 0.4,
+                        "p50_ms": 1,
+                        "p95_ms": 1,
+                        "max_ms": 1.3,
+                        "buckets": {"<=1ms": 40, "<=2ms": 2}
+                    }
+                }
+            }
+        }
+    }
+})
+async def get_modem_scheduler():
+    """
+    Retrieve the state of the session scheduler.
+
+    Returns:
+        dict: Thread and timer counts, lateness of fired timers in milliseconds.
+    """
+    return api_response(app.state_manager.session_scheduler.summary())
+
+
 @app.post("/modem/cqcqcq", summary="Send CQ Command", tags=["Modem"], responses={
     200: {
         "description": "CQ command sent successfully.",
@@ -2261,7 +2421,12 @@ async def websocket_events(websocket: WebSocket):
 @app.websocket("/fft")
 async def websocket_fft(websocket: WebSocket):
     await websocket.accept()
-    await app.wsm.handle_connection(websocket, app.wsm.fft_client_list, app.modem_fft)
+    await app.wsm.waterfall.serve(websocket, binary=False)
+
+@app.websocket("/waterfall")
+async def websocket_waterfall(websocket: WebSocket, bins: int = waterfall_publisher.MAX_BINS, fps: float = 0):
+    await websocket.accept()
+    await app.wsm.waterfall.serve(websocket, binary=True, bins=bins, fps=fps)
 
 @app.websocket("/states")
 async def websocket_states(websocket: WebSocket):
@@ -2304,6 +2469,7 @@ def stop_server():
         app.socket_interface_manager.stop_servers()
     if hasattr(app, 'socket_interface_manager') and app.socket_interface_manager:
         app.socket_interface_manager.stop_servers()
+    codec2.INSTANCE_POOL.close_all()
     audio.terminate()
     logger.warning("[SHUTDOWN] Shutdown completed")
     try:
@@ -2334,6 +2500,9 @@ def main():
     app.modem_service = queue.Queue()
     app.event_manager = event_manager.EventManager([app.modem_events])
     app.state_manager = state_manager.StateManager(app.state_queue)
+    history_minutes = app.config_manager.read()['GUI'].get('waterfall_history_minutes')
+    if history_minutes:
+        app.state_manager.spectrum_history = spectrum_history.SpectrumHistory(history_minutes)
     app.schedule_manager = ScheduleManager(app.MODEM_VERSION, app.config_manager, app.state_manager, app.event_manager)
     app.service_manager = service_manager.SM(app)
     app.modem_service.put("start")
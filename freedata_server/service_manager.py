@@ -1,5 +1,6 @@
 import threading
 import frame_dispatcher
+import frame_capture
 import modem
 import structlog
 import audio
@@ -12,6 +13,7 @@ class SM:
         self.log = structlog.get_logger("service manager")
         self.app = app
         self.modem = False
+        self.frame_dispatcher = False
         self.app.radio_manager = False
         self.config = self.app.config_manager.read()
         self.modem_fft = app.modem_fft
@@ -110,6 +112,9 @@ class SM:
                                                             self.modem)
         self.frame_dispatcher.start()
 
+        if self.config['MODEM'].get('frame_capture_file'):
+            self.state_manager.frame_capture = frame_capture.FrameCapture(self.config['MODEM']['frame_capture_file'])
+
         self.event_manager.modem_started()
         self.state_manager.set("is_modem_running", True)
         self.modem.start_modem()
@@ -133,17 +138,22 @@ class SM:
         except AttributeError:
             pass
         try:
-            if self.frame_dispatcher and hasattr(self.app, 'frame_dispatcher'):
+            if self.frame_dispatcher:
                 self.frame_dispatcher.stop()
+                self.frame_dispatcher = False
         except AttributeError:
             pass
+        if self.state_manager.frame_capture:
+            self.state_manager.frame_capture.close()
+            self.state_manager.frame_capture = None
 
         self.event_manager.modem_stopped()
 
     def test_audio(self):
         try:
             audio_test = audio.test_audio_devices(self.config['AUDIO']['input_device'],
-                                                  self.config['AUDIO']['output_device'])
+                                                  self.config['AUDIO']['output_device'],
+                                                  self.config['AUDIO'].get('samplerate') or 48000)
             self.log.info("tested audio devices", result=audio_test)
 
             return audio_test
@@ -0,0 +1,66 @@
+"""
+Clocks of ARQ sessions, P2P connections and the schedule manager.
+
+They take their time from the clock of the state manager instead of the time
+module. The real Clock is used in operation. A VirtualClock only advances when
+a simulation advances it, see SessionScheduler.run_until_idle and
+arq_simulator, so timeouts of minutes pass without waiting for them.
+"""
+import threading
+import time
+
+
+class Clock:
+    """
+    Wall clock time
+    """
+
+    # timers are run by threads at their due time
+    realtime = True
+
+    def time(self) -> float:
+        """
+        Seconds since the epoch, like time.time()
+        """
+        return time.time()
+
+    def monotonic(self) -> float:
+        """
+        Seconds for measuring durations, like time.monotonic()
+        """
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        threading.Event().wait(seconds)
+
+
+class VirtualClock(Clock):
+    """
+    Simulated time, advanced by sleeping and by running due timers
+    """
+
+    realtime = False
+
+    def __init__(self, start: float = None):
+        """
+        :param start: epoch seconds the simulation starts at, defaults to now
+        :type start: float
+        """
+        self.epoch = time.time() if start is None else start
+        self.now = 0.0
+
+    def time(self) -> float:
+        return self.epoch + self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        # the caller is busy for this time, e.g. a transmitting modem
+        self.now += max(0.0, seconds)
+
+    def advance_to(self, monotonic: float) -> None:
+        """
+        Advance to a point in time, the clock never runs backwards
+        """
+        self.now = max(self.now, monotonic)
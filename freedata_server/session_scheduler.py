@@ -0,0 +1,189 @@
+"""
+Scheduler driving transmissions, timeouts and retries of ARQ and P2P sessions.
+
+Sessions used to start a thread for every frame they sent, which transmitted
+the frame and then slept until the reply or the timeout. Now they hand their
+transmissions to a fixed pool of workers and register a timer for the timeout.
+A single timer thread keeps the timers in a heap ordered by their due time and
+passes due timers on to the workers, as callbacks may transmit and block for
+the airtime of a frame. The number of threads doesn't depend on the number of
+sessions or frames.
+
+With a virtual clock there are no threads. run_until_idle runs the timers in
+the order of their due time and advances the clock to it.
+"""
+import heapq
+import itertools
+import queue
+import threading
+import structlog
+import session_clock
+from dispatch_lanes import LatencyHistogram
+
+WORKERS = 4
+
+
+class Timer:
+    """
+    Handle of a scheduled callback
+    """
+
+    def __init__(self, due: float, callback, args: tuple):
+        self.due = due
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def run(self) -> None:
+        if not self.cancelled:
+            self.callback(*self.args)
+
+
+class SessionScheduler:
+    """
+    One timer thread and a fixed pool of workers shared by all sessions
+    """
+
+    def __init__(self, workers: int = WORKERS, clock: session_clock.Clock = None):
+        """
+        :param workers: number of threads running jobs and due timers
+        :type workers: int
+        :param clock: time of the timers, defaults to the wall clock
+        :type clock: session_clock.Clock
+        """
+        self.log = structlog.get_logger("SessionScheduler")
+        self.clock = clock or session_clock.Clock()
+        self.workers = max(1, workers)
+        self.timers = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.jobs = queue.Queue()
+        self.threads = []
+
+        # time from the due time until a timer has been taken from the heap
+        self.lateness = LatencyHistogram()
+        self.fired = 0
+        self.cancelled = 0
+        self.jobs_done = 0
+        self.errors = 0
+
+    def start(self) -> None:
+        # threads are started with the first job, many state managers never schedule anything
+        if not self.clock.realtime:
+            return
+        with self.condition:
+            if self.threads:
+                return
+            self.threads.append(threading.Thread(target=self.timer_loop, name="Session timers", daemon=True))
+            for index in range(self.workers):
+                self.threads.append(threading.Thread(target=self.worker, name=f"Session worker {index}", daemon=True))
+            for thread in self.threads:
+                thread.start()
+
+    def time(self) -> float:
+        """
+        Current time of the scheduler, due times of timers refer to it
+        """
+        return self.clock.monotonic()
+
+    def submit(self, callback, *args) -> None:
+        """
+        Run a callback by one of the workers as soon as possible
+        """
+        if not self.clock.realtime:
+            self.call_later(0, callback, *args)
+            return
+        self.start()
+        self.jobs.put((callback, args))
+
+    def call_later(self, delay: float, callback, *args) -> Timer:
+        """
+        Run a callback by one of the workers after a delay
+
+        :param delay: seconds from now
+        :type delay: float
+        :return: handle for cancelling the timer
+        :rtype: Timer
+        """
+        self.start()
+        timer = Timer(self.time() + max(0.0, delay), callback, args)
+        with self.condition:
+            heapq.heappush(self.timers, (timer.due, next(self.sequence), timer))
+            self.condition.notify()
+        return timer
+
+    def timer_loop(self) -> None:
+        while True:
+            with self.condition:
+                while True:
+                    # cancelled timers are removed once they reach the top of the heap
+                    while self.timers and self.timers[0][2].cancelled:
+                        heapq.heappop(self.timers)
+                        self.cancelled += 1
+                    now = self.time()
+                    if self.timers and self.timers[0][0] <= now:
+                        break
+                    self.condition.wait(self.timers[0][0] - now if self.timers else None)
+                _, _, timer = heapq.heappop(self.timers)
+                self.fired += 1
+            self.lateness.add((self.time() - timer.due) * 1000)
+            self.jobs.put((timer.run, ()))
+
+    def worker(self) -> None:
+        while True:
+            callback, args = self.jobs.get()
+            self.run_job(callback, args)
+
+    def run_job(self, callback, args: tuple) -> None:
+        try:
+            callback(*args)
+        except Exception as e:
+            self.errors += 1
+            self.log.warning("[SCHEDULER] job failed", callback=getattr(callback, '__qualname__', callback), e=e)
+        self.jobs_done += 1
+
+    def run_until_idle(self, until: float = None, stop=None) -> int:
+        """
+        Run the timers of a virtual clock in the order of their due time
+
+        :param until: clock time at which to stop, by default when no timer is left
+        :type until: float
+        :param stop: function called after each timer, returning True for stopping
+        :return: number of timers run
+        :rtype: int
+        """
+        ran = 0
+        while True:
+            with self.condition:
+                while self.timers and self.timers[0][2].cancelled:
+                    heapq.heappop(self.timers)
+                    self.cancelled += 1
+                if not self.timers or (until is not None and self.timers[0][0] > until):
+                    break
+                _, _, timer = heapq.heappop(self.timers)
+                self.fired += 1
+            # a job may have kept the clock busy beyond the due time
+            self.clock.advance_to(timer.due)
+            self.lateness.add((self.time() - timer.due) * 1000)
+            self.run_job(timer.run, ())
+            ran += 1
+            if stop and stop():
+                break
+        return ran
+
+    def summary(self) -> dict:
+        with self.condition:
+            pending = sum(1 for _, _, timer in self.timers if not timer.cancelled)
+        return {
+            "threads": len(self.threads),
+            "pending_timers": pending,
+            "queued_jobs": self.jobs.qsize(),
+            "fired": self.fired,
+            "cancelled": self.cancelled,
+            "jobs_done": self.jobs_done,
+            "errors": self.errors,
+            "lateness": self.lateness.summary(),
+        }
@@ -0,0 +1,206 @@
+"""
+Spectrum and channel busy detection for a single audio stream.
+"""
+import time
+import numpy as np
+import structlog
+
+log = structlog.get_logger("spectrum_analyzer")
+
+
+class SpectrumAnalyzer:
+    """
+    Calculates the spectrum of an 8kHz audio stream for the waterfall and
+    assesses whether the channel, and which of its slots, is busy.
+
+    Every audio stream gets its own analyzer, so counters and the noise
+    floor of e.g. the TX monitor and the RX stream don't interfere.
+    """
+
+    # 800 samples at 8kHz, 10Hz per bin
+    FFT_LENGTH = 800
+    # bins sent to the waterfall, 315 --> bandwidth 3150Hz
+    FFT_BINS_OUT = 315
+
+    # slot borders in bins. Bandwidth[Hz] / 10Hz
+    # narrowband = 563Hz = 56
+    # wideband = 1700Hz = 167
+    # 1500Hz = 148
+    # 2700Hz = 266
+    # 3200Hz = 315
+    SLOT_STARTS = [0, 65, 120, 176, 231]
+
+    # a bin carries a signal if it's this far above its noise floor
+    SIGNAL_THRESHOLD_DB = 15
+    # a slot is busy if at least this many bins carry a signal
+    SIGNAL_BINS_PER_SLOT = 2
+    # value of signal bins in the waterfall for highlighting them
+    SIGNAL_HIGHLIGHT = 100
+
+    # noise floor follows lower levels quickly and higher levels slowly, so
+    # bursts don't raise it. At 10 frames/s, rising takes about a minute.
+    NOISE_FLOOR_FALL = 0.5
+    NOISE_FLOOR_RISE = 0.0015
+
+    # Initialize slot delay counters. The higher MAX_DELAY, the longer we
+    # will wait until releasing the busy state
+    DELAY_INCREMENT = 2
+    MAX_DELAY = 200
+
+    # calculate dbfs every 6 cycles for reducing CPU load
+    DBFS_INTERVAL = 6
+
+    def __init__(self, states, fft_queue, update_channel_state=True, history=None):
+        """
+        :param states: state manager
+        :type states: StateManager
+        :param fft_queue: queue receiving the waterfall data
+        :type fft_queue: queue.Queue
+        :param update_channel_state: whether this stream decides about the channel busy state
+        :type update_channel_state: bool
+        :param history: optional history recording the spectra
+        :type history: SpectrumHistory
+        """
+        self.states = states
+        self.fft_queue = fft_queue
+        self.update_channel_state = update_channel_state
+        self.history = history
+
+        self.window = np.hanning(self.FFT_LENGTH).astype(np.float32)
+        self.fft_input = np.zeros(self.FFT_LENGTH, dtype=np.float32)
+        self.n_bins = self.FFT_LENGTH // 2 + 1
+        self.slot_starts = np.array(self.SLOT_STARTS)
+
+        self.noise_floor = None
+        self.slot_delay = np.zeros(len(self.SLOT_STARTS), dtype=np.int32)
+        self.channel_busy_delay = 0
+        self.signal_detected = False
+        self.dbfs_counter = 0
+
+    def load_fft_input(self, data: np.ndarray) -> None:
+        """
+        Copy audio into the windowed FFT input buffer. Shorter blocks are
+        centered and zero padded, longer blocks are cut to their most recent samples.
+        """
+        data = data[-self.FFT_LENGTH:]
+        pad_before = (self.FFT_LENGTH - len(data)) // 2
+        self.fft_input.fill(0)
+        self.fft_input[pad_before:pad_before + len(data)] = data
+        self.fft_input *= self.window
+
+    def spectrum(self, data: np.ndarray) -> np.ndarray:
+        """
+        Calculate the spectrum of an audio block in dB
+
+        :param data: audio samples at 8kHz
+        :type data: np.ndarray
+        :return: level per bin in dB
+        :rtype: np.ndarray
+        """
+        self.load_fft_input(data)
+        magnitude = np.abs(np.fft.rfft(self.fft_input))
+        # Set value 0 to 1 to avoid log of zero
+        magnitude[magnitude == 0] = 1
+        return 10.0 * np.log10(magnitude)
+
+    def update_noise_floor(self, dfft: np.ndarray) -> None:
+        """
+        Track the per bin noise floor with an exponential average
+        """
+        if self.noise_floor is None:
+            # start from the median level, so a signal present in the
+            # very first block doesn't end up in the noise floor
+            self.noise_floor = np.full(self.n_bins, np.median(dfft), dtype=np.float32)
+            return
+        alpha = np.where(dfft < self.noise_floor, self.NOISE_FLOOR_FALL, self.NOISE_FLOOR_RISE).astype(np.float32)
+        self.noise_floor += alpha * (dfft - self.noise_floor)
+
+    def update_slots(self, signal_bins: np.ndarray, detecting: bool) -> np.ndarray:
+        """
+        Decide which slots are busy, with a delay for a smoother state toggle
+
+        :param signal_bins: True for bins carrying a signal
+        :type signal_bins: np.ndarray
+        :param detecting: False while we must not detect signals, e.g. while transmitting
+        :type detecting: bool
+        :return: busy state per slot
+        :rtype: np.ndarray
+        """
+        signals_per_slot = np.add.reduceat(signal_bins, self.slot_starts)
+        detected = (signals_per_slot >= self.SIGNAL_BINS_PER_SLOT) & detecting
+
+        self.slot_delay = np.where(
+            detected,
+            np.minimum(self.slot_delay + self.DELAY_INCREMENT, self.MAX_DELAY),
+            np.maximum(self.slot_delay - 1, 0),
+        )
+
+        self.signal_detected = bool(detected.any())
+        if self.signal_detected:
+            self.channel_busy_delay = min(self.channel_busy_delay + self.DELAY_INCREMENT, self.MAX_DELAY)
+        else:
+            # Decrement channel busy counter if no signal has been detected.
+            self.channel_busy_delay = max(self.channel_busy_delay - 1, 0)
+
+        return detected | (self.slot_delay > 0)
+
+    def update_dbfs(self, data: np.ndarray) -> None:
+        """
+        Calculate the audio level in dBFS from the peak of the block
+        """
+        self.dbfs_counter += 1
+        if self.dbfs_counter < self.DBFS_INTERVAL:
+            return
+        self.dbfs_counter = 0
+        # https://dsp.stackexchange.com/questions/8785/how-to-compute-dbfs
+        peak = int(np.max(np.abs(data.astype(np.int32)))) if len(data) else 0
+        if peak == 0:
+            self.states.set("audio_dbfs", -100)
+        else:
+            self.states.set("audio_dbfs", 20 * np.log10(peak / 32768))
+
+    def publish(self, dfft: np.ndarray) -> None:
+        """
+        Push waterfall data, replacing data the consumer hasn't picked up yet
+        """
+        with self.fft_queue.mutex:
+            self.fft_queue.queue.clear()
+        self.fft_queue.put(dfft[:self.FFT_BINS_OUT].copy())
+
+    def process(self, data: np.ndarray) -> None:
+        """
+        Analyze the next audio block of the stream
+
+        :param data: audio samples at 8kHz as np.int16
+        :type data: np.ndarray
+        """
+        try:
+            dfft = self.spectrum(data)
+            self.update_noise_floor(dfft)
+            signal_bins = dfft > self.noise_floor + self.SIGNAL_THRESHOLD_DB
+
+            # Have to do this when we are not transmitting so our
+            # own sending data will not affect this too much
+            transmitting = self.states.isTransmitting()
+            if not transmitting:
+                dfft[signal_bins] = self.SIGNAL_HIGHLIGHT
+                if self.update_channel_state:
+                    self.update_dbfs(data)
+
+            slot_busy = None
+            if self.update_channel_state:
+                detecting = not transmitting and not self.states.is_receiving_codec2_signal()
+                slot_busy = self.update_slots(signal_bins, detecting)
+                self.states.set_channel_slot_busy(slot_busy.tolist())
+                if self.signal_detected:
+                    self.states.set_channel_busy_condition_traffic(True)
+                elif self.channel_busy_delay == 0:
+                    # When our channel busy counter reaches 0, toggle state to False
+                    self.states.set_channel_busy_condition_traffic(False)
+
+            self.publish(dfft)
+            if self.history is not None:
+                self.history.append(time.time(), dfft, slot_busy)
+
+        except Exception as err:
+            log.warning("[AUD] spectrum analysis failed", e=err)
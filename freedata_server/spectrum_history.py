@@ -0,0 +1,162 @@
+"""
+Fixed size history of spectra and busy slots, so clients can backfill their
+waterfall and look back at the channel activity.
+
+Spectra are stored quantized like the binary waterfall frames. Frames arriving
+faster than the history rate are merged into one row by their maximum, so short
+bursts don't get lost.
+
+A range of the history is exported as one binary block, little endian:
+
+    version (uint8), bins (uint16), slots (uint16), rows (uint32),
+    rows * timestamp (float64, unix time),
+    rows * busy slots (uint8, bit n set if slot n was busy),
+    rows * bins * level (uint8, see waterfall_publisher)
+"""
+import struct
+import threading
+import numpy as np
+import structlog
+import waterfall_publisher
+
+EXPORT_VERSION = 1
+EXPORT_HEADER = struct.Struct("<BHHI")
+
+DEFAULT_ROWS_PER_SECOND = 5
+
+
+class SpectrumHistory:
+    """
+    Ring buffer of the last minutes of spectra and busy slots
+    """
+
+    def __init__(self, minutes: float, rows_per_second: float = DEFAULT_ROWS_PER_SECOND,
+                 bins: int = waterfall_publisher.MAX_BINS, slots: int = 5):
+        """
+        :param minutes: time span to keep
+        :type minutes: float
+        :param rows_per_second: time resolution of the history
+        :type rows_per_second: float
+        :param bins: bins per spectrum
+        :type bins: int
+        :param slots: number of busy detection slots
+        :type slots: int
+        """
+        self.log = structlog.get_logger("SpectrumHistory")
+        self.bins = bins
+        self.slots = slots
+        self.row_interval = 1 / rows_per_second
+        self.size = max(1, int(minutes * 60 * rows_per_second))
+
+        self.timestamps = np.zeros(self.size, dtype=np.float64)
+        self.busy = np.zeros(self.size, dtype=np.uint8)
+        self.spectra = np.zeros((self.size, bins), dtype=np.uint8)
+        self.slot_bits = (1 << np.arange(slots)).astype(np.uint8)
+
+        # index of the next row to write and number of valid rows
+        self.index = 0
+        self.rows = 0
+        self.lock = threading.Lock()
+
+        # row collecting frames until row_interval has passed
+        self.pending_start = None
+        self.pending_spectrum = np.zeros(bins, dtype=np.uint8)
+        self.pending_busy = 0
+
+        self.log.info("[HISTORY] spectrum history", rows=self.size, memory=self.memory_usage())
+
+    def memory_usage(self) -> int:
+        """
+        Bytes used by the ring buffer
+        """
+        return self.timestamps.nbytes + self.busy.nbytes + self.spectra.nbytes
+
+    def append(self, timestamp: float, dfft: np.ndarray, slot_busy=None) -> None:
+        """
+        Add a spectrum to the history
+
+        :param timestamp: unix time of the spectrum
+        :type timestamp: float
+        :param dfft: level per bin in dB
+        :type dfft: np.ndarray
+        :param slot_busy: busy state per slot, None if unknown
+        :type slot_busy: list
+        """
+        levels = waterfall_publisher.quantize(dfft[:self.bins])
+        busy = int(np.dot(np.asarray(slot_busy, dtype=bool), self.slot_bits)) if slot_busy is not None else 0
+
+        with self.lock:
+            # allow some jitter of the audio blocks
+            if self.pending_start is not None and timestamp - self.pending_start >= self.row_interval * 0.9:
+                self.commit_pending()
+
+            if self.pending_start is None:
+                self.pending_start = timestamp
+                self.pending_spectrum.fill(0)
+                self.pending_busy = 0
+            np.maximum(self.pending_spectrum[:len(levels)], levels, out=self.pending_spectrum[:len(levels)])
+            self.pending_busy |= busy
+
+    def commit_pending(self) -> None:
+        self.timestamps[self.index] = self.pending_start
+        self.busy[self.index] = self.pending_busy
+        self.spectra[self.index] = self.pending_spectrum
+        self.index = (self.index + 1) % self.size
+        self.rows = min(self.rows + 1, self.size)
+        self.pending_start = None
+
+    def get_range(self, start: float = None, end: float = None):
+        """
+        Rows of a time range, oldest first
+
+        :param start: unix time of the first row, None for the oldest
+        :type start: float
+        :param end: unix time of the last row, None for the newest
+        :type end: float
+        :return: timestamps, busy slot bitmaps, spectra
+        :rtype: tuple
+        """
+        with self.lock:
+            # roll the ring so the oldest row comes first
+            order = (np.arange(self.rows) + self.index - self.rows) % self.size
+            timestamps = self.timestamps[order]
+            first = 0 if start is None else np.searchsorted(timestamps, start, side="left")
+            last = self.rows if end is None else np.searchsorted(timestamps, end, side="right")
+            selection = order[first:last]
+            return self.timestamps[selection], self.busy[selection], self.spectra[selection]
+
+    def export(self, start: float = None, end: float = None) -> bytes:
+        """
+        Export a time range as binary block
+
+        :param start: unix time of the first row, None for the oldest
+        :type start: float
+        :param end: unix time of the last row, None for the newest
+        :type end: float
+        :return: header and rows
+        :rtype: bytes
+        """
+        timestamps, busy, spectra = self.get_range(start, end)
+        header = EXPORT_HEADER.pack(EXPORT_VERSION, self.bins, self.slots, len(timestamps))
+        return b"".join([header, timestamps.astype("<f8").tobytes(), busy.tobytes(), spectra.tobytes()])
+
+
+def parse_export(data: bytes):
+    """
+    Split an exported history block into its arrays
+
+    :param data: exported block
+    :type data: bytes
+    :return: timestamps, busy slot bitmaps, spectra
+    :rtype: tuple
+    """
+    version, bins, slots, rows = EXPORT_HEADER.unpack_from(data)
+    if version != EXPORT_VERSION:
+        raise ValueError(f"unsupported spectrum history version {version}")
+    offset = EXPORT_HEADER.size
+    timestamps = np.frombuffer(data, dtype="<f8", count=rows, offset=offset)
+    offset += timestamps.nbytes
+    busy = np.frombuffer(data, dtype=np.uint8, count=rows, offset=offset)
+    offset += busy.nbytes
+    spectra = np.frombuffer(data, dtype=np.uint8, count=rows * bins, offset=offset).reshape(rows, bins)
+    return timestamps, busy, spectra
@@ -1,8 +1,13 @@
 import time
 import threading
 import numpy as np
+import structlog
+import airtime_accounting
+import session_clock
+import session_scheduler
 class StateManager:
     def __init__(self, statequeue):
+        self.logger = structlog.get_logger("StateManager")
 
         # state related settings
         self.statequeue = statequeue
@@ -17,6 +22,15 @@ class StateManager:
         self.channel_busy_event = threading.Event()
         self.channel_busy_condition_traffic = threading.Event()
         self.channel_busy_condition_codec2 = threading.Event()
+        # spectrum_history.SpectrumHistory, if enabled
+        self.spectrum_history = None
+        # frame_capture.FrameCapture, if enabled
+        self.frame_capture = None
+        self.airtime = airtime_accounting.AirtimeAccounting()
+        # time of sessions and the schedule manager, a virtual clock when simulating
+        self.clock = session_clock.Clock()
+        # transmissions, timeouts and retries of ARQ and P2P sessions
+        self.session_scheduler = session_scheduler.SessionScheduler(clock=self.clock)
 
         self.is_modem_running = False
 
@@ -81,6 +95,7 @@ class StateManager:
             self.sendStateUpdate(new_radio)
 
     def set_channel_slot_busy(self, array):
+        self.airtime.record_channel_state(array)
         for i in range(0,len(array),1):
             if not array[i] == self.channel_busy_slot[i]:
                 self.channel_busy_slot = array
@@ -133,6 +148,15 @@ class StateManager:
         else:
             self.transmitting_event.set()
 
+    def use_scheduler(self, scheduler):
+        """
+        Drive sessions by another scheduler and its clock, e.g. one shared by simulated stations
+
+        :param scheduler: session_scheduler.SessionScheduler
+        """
+        self.session_scheduler = scheduler
+        self.clock = scheduler.clock
+
     def setARQ(self, busy):
         if busy:
             self.is_modem_busy.clear()
@@ -286,3 +310,11 @@ class StateManager:
         except KeyError:
             self.log(f"Error retrieving session ID {session_id}", isError=True)
             return None
+
+    def log(self, message, isWarning=False, isError=False):
+        if isError:
+            self.logger.error(message)
+        elif isWarning:
+            self.logger.warning(message)
+        else:
+            self.logger.info(message)
@@ -0,0 +1,299 @@
+"""
+Rate limited distribution of waterfall frames to websocket clients.
+
+The spectrum analyzers put a frame per audio block on the fft queue. A single
+publisher thread takes them from there, limits them to the configured frame
+rate and hands them to the clients. Every client has its own frame rate and
+bin count and gets the latest frame only, so a slow client never delays the
+others or builds up a backlog.
+
+Binary frames consist of a little endian header followed by one uint8 per bin:
+
+    version (uint8), bins (uint16), sequence (uint32), bins * level (uint8)
+
+with level = dB / DB_STEP, clipped to 0..255. Bins are reduced by taking the
+maximum of neighbouring bins, so narrow signals stay visible.
+"""
+import asyncio
+import json
+import queue
+import struct
+import threading
+import time
+import numpy as np
+import structlog
+
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("<BHI")
+DB_STEP = 0.5
+
+DEFAULT_FPS = 10
+MIN_BINS = 16
+MAX_BINS = 315
+
+
+def quantize(dfft: np.ndarray) -> np.ndarray:
+    """
+    Quantize a spectrum in dB to uint8 levels of DB_STEP
+
+    :param dfft: level per bin in dB
+    :type dfft: np.ndarray
+    :return: level per bin
+    :rtype: np.ndarray
+    """
+    return np.clip(np.rint(np.asarray(dfft, dtype=np.float32) / DB_STEP), 0, 255).astype(np.uint8)
+
+
+def decimate(levels: np.ndarray, bins: int) -> np.ndarray:
+    """
+    Reduce a spectrum to bins bins, keeping the peak of each group
+
+    :param levels: level per bin
+    :type levels: np.ndarray
+    :param bins: number of bins to return
+    :type bins: int
+    :return: reduced spectrum
+    :rtype: np.ndarray
+    """
+    if bins >= len(levels):
+        return levels
+    group_starts = (np.arange(bins) * len(levels)) // bins
+    return np.maximum.reduceat(levels, group_starts)
+
+
+def encode_frame(levels: np.ndarray, sequence: int) -> bytes:
+    """
+    Build a binary waterfall frame
+
+    :param levels: quantized level per bin
+    :type levels: np.ndarray
+    :param sequence: frame counter of the publisher
+    :type sequence: int
+    :return: frame
+    :rtype: bytes
+    """
+    return FRAME_HEADER.pack(FRAME_VERSION, len(levels), sequence & 0xFFFFFFFF) + levels.tobytes()
+
+
+def decode_frame(frame: bytes):
+    """
+    Split a binary waterfall frame into its sequence and levels
+
+    :param frame: binary frame
+    :type frame: bytes
+    :return: sequence, level per bin
+    :rtype: tuple
+    """
+    version, bins, sequence = FRAME_HEADER.unpack_from(frame)
+    if version != FRAME_VERSION:
+        raise ValueError(f"unsupported waterfall frame version {version}")
+    levels = np.frombuffer(frame, dtype=np.uint8, offset=FRAME_HEADER.size, count=bins)
+    return sequence, levels
+
+
+class WaterfallClient:
+    """
+    Connection state of a single waterfall client
+
+    The publisher thread offers frames, the client's sender task running in
+    the event loop of its websocket sends them. Only the latest frame is
+    kept, older ones are dropped.
+    """
+
+    def __init__(self, websocket, loop, binary=True, bins=MAX_BINS, fps=DEFAULT_FPS, max_fps=DEFAULT_FPS):
+        self.websocket = websocket
+        self.loop = loop
+        self.binary = binary
+        self.max_fps = max_fps
+        self.bins = MAX_BINS
+        self.interval = 1 / max_fps
+        self.configure(bins, fps)
+
+        self.pending = None
+        self.pending_lock = threading.Lock()
+        self.frame_ready = asyncio.Event()
+        self.last_offer = float("-inf")
+        self.frames_sent = 0
+        self.frames_dropped = 0
+
+    def configure(self, bins=None, fps=None):
+        """
+        Change bin count and frame rate, limited to what the publisher provides
+
+        :param bins: number of bins per frame
+        :type bins: int
+        :param fps: frames per second
+        :type fps: float
+        """
+        if bins:
+            self.bins = min(max(int(bins), MIN_BINS), MAX_BINS)
+        if fps:
+            self.interval = 1 / min(max(float(fps), 0.1), self.max_fps)
+
+    def encoding(self):
+        """
+        Key of the payload this client needs, shared by clients with the same settings
+        """
+        return ("binary", self.bins) if self.binary else ("json",)
+
+    def is_due(self, now: float) -> bool:
+        # allow some jitter of the audio blocks
+        return now - self.last_offer >= self.interval * 0.9
+
+    def offer(self, payload, now: float) -> None:
+        """
+        Hand a frame to the client, replacing a frame not sent yet.
+        Called from the publisher thread.
+        """
+        self.last_offer = now
+        with self.pending_lock:
+            if self.pending is not None:
+                self.frames_dropped += 1
+            self.pending = payload
+        self.loop.call_soon_threadsafe(self.frame_ready.set)
+
+    async def sender(self) -> None:
+        """
+        Send the latest offered frame whenever there is one
+        """
+        while True:
+            await self.frame_ready.wait()
+            self.frame_ready.clear()
+            with self.pending_lock:
+                payload = self.pending
+                self.pending = None
+            if payload is None:
+                continue
+            if self.binary:
+                await self.websocket.send_bytes(payload)
+            else:
+                await self.websocket.send_text(payload)
+            self.frames_sent += 1
+
+
+class WaterfallPublisher:
+    """
+    Takes waterfall frames from the fft queue and distributes them to the clients
+    """
+
+    def __init__(self, fft_queue, fps=DEFAULT_FPS):
+        self.log = structlog.get_logger("WaterfallPublisher")
+        self.fft_queue = fft_queue
+        self.fps = fps or DEFAULT_FPS
+        self.interval = 1 / self.fps
+
+        self.clients = set()
+        self.clients_lock = threading.Lock()
+        self.sequence = 0
+        self.last_publish = float("-inf")
+
+        self.shutdown_flag = threading.Event()
+        self.thread = None
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self.worker, name="waterfall publisher", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.shutdown_flag.set()
+        if self.thread:
+            self.thread.join(0.5)
+
+    def add_client(self, client: WaterfallClient) -> None:
+        with self.clients_lock:
+            self.clients.add(client)
+
+    def remove_client(self, client: WaterfallClient) -> None:
+        with self.clients_lock:
+            self.clients.discard(client)
+
+    def worker(self) -> None:
+        while not self.shutdown_flag.is_set():
+            try:
+                dfft = self.fft_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                self.publish(dfft, time.monotonic())
+            except Exception as e:
+                self.log.warning("[WATERFALL] publishing frame failed", e=e)
+
+    def publish(self, dfft, now: float) -> bool:
+        """
+        Distribute a frame to all clients due for a new frame
+
+        :param dfft: level per bin in dB
+        :type dfft: np.ndarray
+        :param now: monotonic time of the frame
+        :type now: float
+        :return: True if the frame wasn't dropped by the rate limit
+        :rtype: bool
+        """
+        if now - self.last_publish < self.interval * 0.9:
+            return False
+        self.last_publish = now
+        self.sequence += 1
+
+        with self.clients_lock:
+            clients = [client for client in self.clients if client.is_due(now)]
+        if not clients:
+            return True
+
+        dfft = np.asarray(dfft)
+        levels = None
+        payloads = {}
+        for client in clients:
+            encoding = client.encoding()
+            if encoding not in payloads:
+                if client.binary:
+                    if levels is None:
+                        levels = quantize(dfft)
+                    payloads[encoding] = encode_frame(decimate(levels, client.bins), self.sequence)
+                else:
+                    payloads[encoding] = json.dumps(dfft.astype(int).tolist())
+            try:
+                client.offer(payloads[encoding], now)
+            except Exception as e:
+                # event loop of the client is gone
+                self.log.debug("[WATERFALL] removing client", e=e)
+                self.remove_client(client)
+        return True
+
+    async def serve(self, websocket, binary=True, bins=MAX_BINS, fps=None) -> None:
+        """
+        Serve an accepted websocket until it disconnects
+
+        Binary clients can change their settings by sending e.g. {"bins": 128, "fps": 5}
+
+        :param websocket: accepted websocket
+        :param binary: send binary frames instead of json lists
+        :type binary: bool
+        :param bins: number of bins per frame
+        :type bins: int
+        :param fps: frames per second, defaults to the publisher rate
+        :type fps: float
+        """
+        client = WaterfallClient(
+            websocket, asyncio.get_running_loop(), binary=binary,
+            bins=bins, fps=fps or self.fps, max_fps=self.fps
+        )
+        sender = asyncio.create_task(client.sender())
+        self.add_client(client)
+        try:
+            while not self.shutdown_flag.is_set():
+                message = await websocket.receive_text()
+                if not binary:
+                    continue
+                try:
+                    settings = json.loads(message)
+                    client.configure(settings.get("bins"), settings.get("fps"))
+                except (ValueError, AttributeError, TypeError) as e:
+                    self.log.warning("[WATERFALL] invalid client settings", message=message, e=e)
+        except Exception as e:
+            self.log.warning("Client connection lost", e=e)
+        finally:
+            self.remove_client(client)
+            sender.cancel()
+            self.log.debug(
+                "[WATERFALL] client closed", frames_sent=client.frames_sent, frames_dropped=client.frames_dropped
+            )
@@ -2,6 +2,7 @@ import threading
 import json
 import asyncio
 import structlog
+import waterfall_publisher
 
 
 class wsm:
@@ -11,12 +12,11 @@ class wsm:
 
         # WebSocket client sets
         self.events_client_list = set()
-        self.fft_client_list = set()
         self.states_client_list = set()
 
         self.events_thread = None
         self.states_thread = None
-        self.fft_thread = None
+        self.waterfall = None
         
     async def handle_connection(self, websocket, client_list, event_queue):
         client_list.add(websocket)
@@ -56,13 +56,14 @@ class wsm:
         self.states_thread = threading.Thread(target=self.transmit_sock_data_worker, daemon=True, args=(self.states_client_list, app.state_queue))
         self.states_thread.start()
 
-        self.fft_thread = threading.Thread(target=self.transmit_sock_data_worker, daemon=True, args=(self.fft_client_list, app.modem_fft))
-        self.fft_thread.start()
+        fps = app.config_manager.read()['GUI'].get('waterfall_fps')
+        self.waterfall = waterfall_publisher.WaterfallPublisher(app.modem_fft, fps)
+        self.waterfall.start()
         
     def shutdown(self):
         self.log.warning("[SHUTDOWN] closing websockets...")
         self.shutdown_flag.set()
         self.events_thread.join(0.5)
         self.states_thread.join(0.5)
-        self.fft_thread.join(0.5)
+        self.waterfall.stop()
         self.log.warning("[SHUTDOWN] websockets closed")
\ No newline at end of file
@@ -0,0 +1,90 @@
+import sys
+sys.path.append('freedata_server')
+
+import unittest
+import airtime_accounting
+from modem_frametypes import FRAME_TYPE as FR_TYPE
+
+
+class TestAirtimeAccounting(unittest.TestCase):
+
+    def setUp(self):
+        self.accounting = airtime_accounting.AirtimeAccounting()
+
+    def testDescribeFrame(self):
+        self.assertEqual(airtime_accounting.describe_frame(bytes([FR_TYPE.ARQ_BURST_FRAME.value, 105, 0])),
+                         ("ARQ_BURST_FRAME", "ARQ-105"))
+        self.assertEqual(airtime_accounting.describe_frame(bytes([FR_TYPE.P2P_CONNECTION_PAYLOAD.value, 7])),
+                         ("P2P_CONNECTION_PAYLOAD", "P2P-7"))
+        self.assertEqual(airtime_accounting.describe_frame(bytes([FR_TYPE.BEACON.value, 1])), ("BEACON", None))
+        self.assertEqual(airtime_accounting.describe_frame(bytes([99])), ("UNKNOWN", None))
+        self.assertEqual(airtime_accounting.describe_frame(b""), ("UNKNOWN", None))
+
+    def testTxWindows(self):
+        now = 100000.0
+        self.accounting.record_tx(2.0, "signalling", "ARQ_SESSION_OPEN", "ARQ-1", timestamp=now - 30)
+        self.accounting.record_tx(6.0, "datac1", "ARQ_BURST_FRAME", "ARQ-1", timestamp=now - 10)
+        self.accounting.record_tx(3.0, "signalling", "BEACON", timestamp=now - 1800)
+        self.accounting.record_tx(5.0, "signalling", "BEACON", timestamp=now - 7200)
+
+        summary = self.accounting.summary(now)
+        self.assertEqual(summary["1m"]["tx_seconds"], 8.0)
+        self.assertEqual(summary["1m"]["tx_duty_cycle"], round(8 / 60 * 100, 2))
+        self.assertEqual(summary["1m"]["tx_by_mode"], {"signalling": 2.0, "datac1": 6.0})
+        self.assertEqual(summary["1m"]["tx_by_session"], {"ARQ-1": 8.0})
+        self.assertEqual(summary["1h"]["tx_seconds"], 11.0)
+        self.assertEqual(summary["1h"]["tx_by_frame_type"]["BEACON"], 3.0)
+        self.assertEqual(summary["24h"]["tx_seconds"], 16.0)
+
+    def testEventsPruned(self):
+        self.accounting.record_tx(1.0, "signalling", timestamp=0)
+        self.accounting.record_rx(1.0, "signalling", timestamp=0)
+        self.accounting.record_tx(1.0, "signalling", timestamp=90000)
+        self.accounting.record_rx(1.0, "signalling", timestamp=90000)
+        self.assertEqual(len(self.accounting.tx_events), 1)
+        self.assertEqual(len(self.accounting.rx_events), 1)
+
+    def testRxByStation(self):
+        now = 1000.0
+        self.accounting.record_rx(1.5, "signalling", "CQ", "AA1AAA-1", timestamp=now - 5)
+        self.accounting.record_rx(1.5, "signalling", "PING", "AA1AAA-1", timestamp=now - 4)
+        self.accounting.record_rx(4.0, "datac1", "ARQ_BURST_FRAME", None, timestamp=now - 3)
+        summary = self.accounting.summary(now)["1m"]
+        self.assertEqual(summary["rx_seconds"], 7.0)
+        self.assertEqual(summary["rx_by_station"], {"AA1AAA-1": 3.0})
+        self.assertEqual(summary["rx_by_mode"], {"signalling": 3.0, "datac1": 4.0})
+
+    def testChannelBusy(self):
+        start = 50000.0
+        # slot 2 busy for 6 seconds in blocks of 100ms, then idle for 4 seconds
+        for i in range(100):
+            busy = i < 60
+            self.accounting.record_channel_state([False, False, busy, False, False], timestamp=start + i * 0.1)
+        summary = self.accounting.summary(start + 10)["1m"]
+        self.assertAlmostEqual(summary["channel_busy"], 10.0, delta=0.1)
+        self.assertAlmostEqual(summary["slot_busy"][2], 10.0, delta=0.1)
+        self.assertEqual(summary["slot_busy"][0], 0)
+
+        # busy state isn't accounted across gaps, e.g. while the modem was stopped
+        self.accounting.record_channel_state([True] * 5, timestamp=start + 10)
+        self.accounting.record_channel_state([False] * 5, timestamp=start + 40)
+        summary = self.accounting.summary(start + 40)["1m"]
+        self.assertAlmostEqual(summary["channel_busy"], 7 / 60 * 100, delta=0.2)
+
+        # old buckets don't count
+        summary = self.accounting.summary(start + 3600)["1m"]
+        self.assertEqual(summary["channel_busy"], 0)
+
+    def testDutyCycleLimit(self):
+        now = 10000.0
+        self.assertFalse(self.accounting.is_duty_cycle_exceeded(10, now))
+        self.accounting.record_tx(350.0, "datac1", timestamp=now - 100)
+        self.assertFalse(self.accounting.is_duty_cycle_exceeded(10, now))
+        self.accounting.record_tx(10.0, "datac1", timestamp=now - 50)
+        self.assertTrue(self.accounting.is_duty_cycle_exceeded(10, now))
+        self.assertFalse(self.accounting.is_duty_cycle_exceeded(0, now))
+        self.assertFalse(self.accounting.is_duty_cycle_exceeded(10, now + 3600))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import sys
+sys.path.append('freedata_server')
+
+import os
+import tempfile
+import time
+import unittest
+import arq_receive_spool
+import helpers
+from arq_receive_spool import ReceiveSpool
+
+
+class TestARQReceiveSpool(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def testMemorySpool(self):
+        spool = arq_receive_spool.open_spool('', 'AA1AAA-1', 'a1b2c3d4', 10)
+        self.assertIsNone(spool.path)
+        self.assertEqual(spool.offset, 0)
+        self.assertEqual(spool.write(6, b'ghijkl'), 4)
+        spool.write(0, b'abcdef')
+        spool.set_offset(10)
+        self.assertEqual(spool.read(), bytearray(b'abcdefghij'))
+        self.assertEqual(spool.read(3), bytearray(b'abc'))
+        spool.close()
+
+    def testUpdateCRC(self):
+        data = bytes(range(256)) * 4
+        spool = arq_receive_spool.open_spool('', 'AA1AAA-1', 'a1b2c3d4', len(data))
+        spool.write(0, data)
+        crc = spool.update_crc(0, 0, 100)
+        crc = spool.update_crc(crc, 100, len(data))
+        self.assertEqual(crc.to_bytes(4, 'big'), helpers.get_crc_32(data))
+        # no views left open
+        spool.close()
+
+    def testResume(self):
+        # a restarted IRS continues with the persisted offset
+        spool = arq_receive_spool.open_spool(self.directory.name, 'AA1AAA-1', 'a1b2c3d4', 1000)
+        spool.write(0, b'x' * 400)
+        spool.set_offset(400)
+        # received, but not contiguous yet
+        spool.write(600, b'z' * 100)
+        spool.close()
+
+        spool = arq_receive_spool.open_spool(self.directory.name, 'AA1AAA-1', 'a1b2c3d4', 1000)
+        self.assertEqual(spool.offset, 400)
+        self.assertEqual(spool.read(400), bytearray(b'x' * 400))
+
+        # another transfer of the same station
+        other = arq_receive_spool.open_spool(self.directory.name, 'AA1AAA-1', 'deadbeef', 1000)
+        self.assertEqual(other.offset, 0)
+        other.close()
+
+        spool.delete()
+        self.assertFalse(os.path.exists(spool.path))
+
+    def testLengthMismatch(self):
+        path = arq_receive_spool.get_spool_path(self.directory.name, 'AA1AAA-1', 'a1b2c3d4')
+        spool = ReceiveSpool(100, path)
+        spool.write(0, b'x' * 100)
+        spool.set_offset(100)
+        spool.close()
+
+        spool = ReceiveSpool(200, path)
+        self.assertEqual(spool.offset, 0)
+        self.assertEqual(os.path.getsize(path), arq_receive_spool.SPOOL_HEADER.size + 200)
+        spool.close()
+
+        # not a spool file
+        with open(path, 'wb') as file:
+            file.write(b'garbage' * 50)
+        spool = ReceiveSpool(200, path)
+        self.assertEqual(spool.offset, 0)
+        spool.close()
+
+    def testSpoolPath(self):
+        path = arq_receive_spool.get_spool_path(self.directory.name, '../AA1AAA-1', 'a1b2c3d4')
+        self.assertEqual(os.path.dirname(path), self.directory.name)
+        self.assertTrue(path.endswith('AA1AAA-1_a1b2c3d4.spool'))
+
+    def testExpiry(self):
+        old = arq_receive_spool.open_spool(self.directory.name, 'AA1AAA-1', '00000001', 10)
+        new = arq_receive_spool.open_spool(self.directory.name, 'AA1AAA-1', '00000002', 10)
+        old.close()
+        new.close()
+        other_file = os.path.join(self.directory.name, 'notes.txt')
+        open(other_file, 'w').close()
+        day_ago = time.time() - 24 * 3600
+        for path in [old.path, other_file]:
+            os.utime(path, (day_ago, day_ago))
+
+        self.assertEqual(arq_receive_spool.expire_spools(self.directory.name, 3600), 1)
+        self.assertFalse(os.path.exists(old.path))
+        self.assertTrue(os.path.exists(new.path))
+        self.assertTrue(os.path.exists(other_file))
+        self.assertEqual(arq_receive_spool.expire_spools('', 3600), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
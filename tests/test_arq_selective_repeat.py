@@ -0,0 +1,88 @@
+import sys
+sys.path.append('freedata_server')
+
+import unittest
+from config import CONFIG
+from data_frame_factory import DataFrameFactory
+from modem_frametypes import FRAME_TYPE as FR_TYPE
+import arq_selective_repeat
+import codec2
+from arq_selective_repeat import RangeMap
+
+
+class TestARQSelectiveRepeat(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        config_manager = CONFIG('freedata_server/config.ini.example')
+        cls.config = config_manager.read()
+        cls.frame_factory = DataFrameFactory(cls.config)
+
+    def testRangeMap(self):
+        ranges = RangeMap()
+        ranges.add(100, 200)
+        ranges.add(300, 400)
+        ranges.add(0, 50)
+        self.assertEqual(ranges.ranges(), [(0, 50), (100, 200), (300, 400)])
+        self.assertEqual(ranges.contiguous(0), 50)
+        self.assertTrue(ranges.contains(120, 200))
+        self.assertFalse(ranges.contains(150, 250))
+
+        # adjacent and overlapping ranges are merged
+        ranges.add(50, 100)
+        ranges.add(150, 350)
+        self.assertEqual(ranges.ranges(), [(0, 400)])
+        self.assertEqual(len(ranges), 400)
+
+        ranges.add(500, 500)
+        self.assertEqual(ranges.ranges(), [(0, 400)])
+
+    def testBitmap(self):
+        received = RangeMap()
+        received.add(0, 100)
+        received.add(150, 200)
+        # last frame is shorter than the frame size
+        received.add(250, 270)
+
+        bitmap = arq_selective_repeat.encode_bitmap(received, 100, 50, 270)
+        self.assertEqual(bitmap, 0b1010)
+
+        acknowledged = arq_selective_repeat.decode_bitmap(100, 50, bitmap, 270)
+        self.assertEqual(acknowledged.ranges(), received.ranges())
+
+    def testBurstAckFrame(self):
+        frame = self.frame_factory.build_arq_burst_ack_sr(42, 2, 1200, 503, 0b101, flag_final=True)
+        self.assertEqual(len(frame), DataFrameFactory.LENGTH_SIG0_FRAME)
+
+        decoded = self.frame_factory.deconstruct(bytes(frame) + bytes(2))
+        self.assertEqual(decoded['frame_type_int'], FR_TYPE.ARQ_BURST_ACK_SR.value)
+        self.assertEqual(decoded['session_id'], 42)
+        self.assertEqual(decoded['offset'], 1200)
+        self.assertEqual(decoded['frame_size'], 503)
+        self.assertEqual(decoded['bitmap'], 0b101)
+        self.assertTrue(decoded['flag']['FINAL'])
+        self.assertFalse(decoded['flag']['CHECKSUM'])
+
+    def testBurstFrame(self):
+        mode = codec2.FREEDV_MODE.datac1
+        payload_size = self.frame_factory.get_available_data_payload_for_mode(FR_TYPE.ARQ_BURST_FRAME_SR, mode)
+        data = bytes(range(100))
+        frame = self.frame_factory.build_arq_burst_frame_sr(mode, 42, 5000, data, 2, 3)
+
+        decoded = self.frame_factory.deconstruct(bytes(frame) + bytes(2))
+        self.assertEqual(decoded['frame_type_int'], FR_TYPE.ARQ_BURST_FRAME_SR.value)
+        self.assertEqual(decoded['offset'], 5000)
+        self.assertEqual(decoded['frames_remaining'], 3)
+        self.assertEqual(len(decoded['data']), payload_size)
+        self.assertEqual(bytes(decoded['data'][:100]), data)
+
+    def testSessionInfoFlag(self):
+        for selective_repeat in [False, True]:
+            frame = self.frame_factory.build_arq_session_info(42, 1000, bytes(4), 5, 1,
+                                                              flag_selective_repeat=selective_repeat)
+            decoded = self.frame_factory.deconstruct(bytes(frame) + bytes(2))
+            self.assertEqual(decoded['flag']['SELECTIVE_REPEAT'], selective_repeat)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,6 +14,7 @@ from state_manager import StateManager
 from frame_dispatcher import DISPATCHER
 import random
 import structlog
+import session_scheduler
 import numpy as np
 from event_manager import EventManager
 from state_manager import StateManager
@@ -29,12 +30,7 @@ class TestModem:
         self.states = StateManager(state_q)
 
     def getFrameTransmissionTime(self, mode):
-        samples = 0
-        c2instance = codec2.open_instance(mode.value)
-        samples += codec2.api.freedv_get_n_tx_preamble_modem_samples(c2instance)
-        samples += codec2.api.freedv_get_n_tx_modem_samples(c2instance)
-        samples += codec2.api.freedv_get_n_tx_postamble_modem_samples(c2instance)
-        time = samples / 8000
+        time = codec2.get_mode_parameters(mode)['airtime']
         #print(mode)
         #if mode == codec2.FREEDV_MODE.signalling:
         #    time = 0.69
@@ -43,16 +39,21 @@ class TestModem:
 
     def transmit(self, mode, repeats: int, repeat_delay: int, frames: bytearray) -> bool:
 
-        # Simulate transmission time
-        tx_time = self.getFrameTransmissionTime(mode) + 0.1 # PTT
-        self.logger.info(f"TX {tx_time} seconds...")
-        threading.Event().wait(tx_time)
+        # a burst of frames is received frame by frame
+        if not isinstance(frames, list):
+            frames = [frames]
 
-        transmission = {
-            'mode': mode,
-            'bytes': frames,
-        }
-        self.data_queue_received.put(transmission)
+        for frame in frames:
+            # Simulate transmission time
+            tx_time = self.getFrameTransmissionTime(mode) + 0.1 # PTT
+            self.logger.info(f"TX {tx_time} seconds...")
+            threading.Event().wait(tx_time)
+
+            transmission = {
+                'mode': mode,
+                'bytes': frame,
+            }
+            self.data_queue_received.put(transmission)
 
 class TestARQSession(unittest.TestCase):
 
@@ -176,6 +177,75 @@ class TestARQSession(unittest.TestCase):
         self.waitAndCloseChannels()
         del cmd
 
+        # no thread per transmitted frame anymore
+        for state_manager in [self.iss_state_manager, self.irs_state_manager]:
+            summary = state_manager.session_scheduler.summary()
+            self.assertEqual(summary['threads'], session_scheduler.WORKERS + 1)
+            self.assertEqual(summary['errors'], 0)
+
+    def testIRSRewind(self):
+        # the ISS missed our ack and repeats from an earlier offset with a smaller frame
+        data = np.random.bytes(300)
+        session = arq_session_irs.ARQSessionIRS(self.config, self.irs_modem, 'AA1AAA-1',
+                                                random.randint(0, 255), self.irs_state_manager)
+        session.total_length = len(data)
+        session.total_crc = helpers.get_crc_32(data).hex()
+        session.open_spool()
+
+        def frame(offset, length):
+            # the last frame is padded to the frame size
+            padding = bytes(10) if offset + length >= len(data) else b''
+            return {'offset': offset, 'data': data[offset:offset + length] + padding, 'speed_level': 0}
+
+        session.process_incoming_data(frame(0, 100))
+        session.process_incoming_data(frame(100, 150))
+        session.process_incoming_data(frame(100, 50))
+        self.assertEqual(session.received_bytes, 250)
+        self.assertEqual(session.received_ranges.ranges(), [(0, 250)])
+
+        session.process_incoming_data(frame(150, 150))
+        self.assertTrue(session.all_data_received())
+        self.assertTrue(session.final_crc_matches())
+        session.close_spool(delete=True)
+
+    def testIRSRepeatedBurstAfterCRCFail(self):
+        # the ISS missed our negative final ack and repeats its burst
+        data = np.random.bytes(100)
+        session = arq_session_irs.ARQSessionIRS(self.config, self.irs_modem, 'AA1AAA-1',
+                                                random.randint(0, 255), self.irs_state_manager)
+        session.total_length = len(data)
+        session.total_crc = helpers.get_crc_32(b'other data').hex()
+        session.open_spool()
+        session.transmit_frame = unittest.mock.Mock()
+
+        frame = {'offset': 0, 'data': data, 'speed_level': 0}
+        session.receive_data(frame)
+        self.assertEqual(session.state, arq_session_irs.IRS_State.FAILED)
+        self.assertIsNone(session.spool)
+
+        session.receive_data(frame)
+        self.assertEqual(session.state, arq_session_irs.IRS_State.FAILED)
+        self.assertEqual(session.transmit_frame.call_count, 2)
+        for call in session.transmit_frame.call_args_list:
+            self.assertEqual(call.args[0], session.build_burst_ack(flag_final=True, flag_checksum=False))
+
+    def testProgressHistogramDelta(self):
+        # the first progress of a session tells the GUI to start its charts anew
+        session = arq_session_irs.ARQSessionIRS(self.config, self.irs_modem, 'AA1AAA-1',
+                                                random.randint(0, 255), self.irs_state_manager)
+        session.event_manager = unittest.mock.Mock()
+        session.update_histograms(100, 300)
+        session.emit_progress(100, 300)
+        session.update_histograms(200, 300)
+        session.emit_progress(200, 300)
+
+        first, second = [call.kwargs['statistics'] for call in session.event_manager.send_arq_session_progress.call_args_list]
+        self.assertTrue(first['histogram_delta'])
+        self.assertTrue(first['histogram_reset'])
+        self.assertEqual(list(first['time_histogram']), [0])
+        self.assertFalse(second['histogram_reset'])
+        self.assertEqual(list(second['time_histogram']), [1])
+
     def DisabledtestARQSessionAbortTransmissionISS(self):
         # set Packet Error Rate (PER) / frame loss probability
         self.loss_probability = 0
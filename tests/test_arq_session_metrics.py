@@ -0,0 +1,81 @@
+import sys
+sys.path.append('freedata_server')
+
+import threading
+import unittest
+from arq_session_metrics import SessionMetrics, ProgressThrottle, HISTOGRAM_SIZE
+from session_scheduler import SessionScheduler
+
+
+class TestSessionMetrics(unittest.TestCase):
+
+    def testHistograms(self):
+        metrics = SessionMetrics()
+        for sample in range(HISTOGRAM_SIZE + 5):
+            metrics.add(sample, sample * 60, sample * 8, timestamp=str(sample))
+        histograms = metrics.get_histograms()
+        self.assertEqual(len(histograms['snr_histogram']), HISTOGRAM_SIZE)
+        # the oldest entries have been dropped, numbering starts at 0
+        self.assertEqual(histograms['snr_histogram'][0], 5)
+        self.assertEqual(histograms['bpm_histogram'][HISTOGRAM_SIZE - 1], (HISTOGRAM_SIZE + 4) * 60)
+        self.assertEqual(histograms['time_histogram'][0], "5")
+
+    def testDelta(self):
+        metrics = SessionMetrics(size=4)
+        metrics.add(1, 10, 1)
+        metrics.add(2, 20, 2)
+        self.assertEqual(metrics.get_delta()['snr_histogram'], {0: 1, 1: 2})
+        self.assertEqual(metrics.get_delta()['snr_histogram'], {})
+
+        metrics.add(3, 30, 3)
+        self.assertEqual(metrics.get_delta()['bpm_histogram'], {2: 30})
+
+        # more samples than kept, the delta has the kept ones
+        for sample in range(4, 10):
+            metrics.add(sample, sample * 10, sample)
+        self.assertEqual(metrics.get_delta()['snr_histogram'], {5: 6, 6: 7, 7: 8, 8: 9})
+
+
+class TestProgressThrottle(unittest.TestCase):
+
+    def testCoalescing(self):
+        scheduler = SessionScheduler(workers=1)
+        sent = []
+        done = threading.Event()
+
+        def send(received_bytes):
+            sent.append(received_bytes)
+            if received_bytes == 300:
+                done.set()
+
+        throttle = ProgressThrottle(scheduler, 0.2, send)
+        # the first progress goes out at once, the following ones are coalesced
+        for received_bytes in [100, 200, 300]:
+            throttle.update(received_bytes)
+        self.assertEqual(sent, [100])
+        self.assertTrue(done.wait(2))
+        self.assertEqual(sent, [100, 300])
+        self.assertEqual(throttle.coalesced, 1)
+
+    def testNoInterval(self):
+        sent = []
+        throttle = ProgressThrottle(SessionScheduler(), 0, sent.append)
+        for received_bytes in [100, 200, 300]:
+            throttle.update(received_bytes)
+        self.assertEqual(sent, [100, 200, 300])
+
+    def testCancel(self):
+        scheduler = SessionScheduler(workers=1)
+        sent = []
+        throttle = ProgressThrottle(scheduler, 0.1, sent.append)
+        throttle.update(100)
+        throttle.update(200)
+        throttle.cancel()
+        done = threading.Event()
+        scheduler.call_later(0.3, done.set)
+        self.assertTrue(done.wait(2))
+        self.assertEqual(sent, [100])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import sys
+sys.path.append('freedata_server')
+
+import random
+import time
+import unittest
+import uuid
+from config import CONFIG
+from arq_data_type_handler import ARQ_SESSION_TYPES
+from message_p2p import MessageP2P
+from message_system_db_messages import DatabaseManagerMessages
+from codec2 import FREEDV_MODE
+from modem_frametypes import FRAME_TYPE as FR_TYPE
+from arq_simulator import ARQSimulator, ChannelModel
+from session_clock import VirtualClock
+from session_scheduler import SessionScheduler
+
+
+class TestARQSimulator(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.config = CONFIG('freedata_server/config.ini.example').read()
+        # random.Random.randbytes needs Python 3.9
+        cls.payload = random.Random(1).getrandbits(8 * 3000).to_bytes(3000, 'big')
+
+    def testCleanChannel(self):
+        simulator = ARQSimulator(self.config, ChannelModel(snr=20, seed=1))
+        started = time.monotonic()
+        result = simulator.run_transfer(self.payload)
+        wall_time = time.monotonic() - started
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['bytes'], len(self.payload))
+        self.assertEqual(result['retries'], 0)
+        self.assertEqual(result['frames_lost'], 0)
+        self.assertGreater(result['goodput'], 0)
+        # a transfer of about a minute simulates much faster
+        self.assertGreater(result['duration'], 30)
+        self.assertLess(wall_time, result['duration'] / 10)
+
+    def testFadingChannel(self):
+        channel = ChannelModel(snr=15, fade_probability=0.3, fade_depth=25, seed=1)
+        result = ARQSimulator(self.config, channel).run_transfer(self.payload)
+
+        self.assertTrue(result['success'])
+        self.assertGreater(result['frames_lost'], 0)
+        self.assertGreater(result['retries'], 0)
+        self.assertGreater(channel.faded, 0)
+
+    def testSelectiveRepeat(self):
+        sent_offsets = []
+
+        def drop_second_burst_frame(frame):
+            if frame[0] != FR_TYPE.ARQ_BURST_FRAME_SR.value:
+                return False
+            sent_offsets.append(int.from_bytes(frame[3:7], 'big'))
+            return len(sent_offsets) == 2
+
+        channel = ChannelModel(snr=20, seed=1, drop_frame=drop_second_burst_frame)
+        result = ARQSimulator(self.config, channel).run_transfer(self.payload[:1500])
+        self.assertTrue(result['success'])
+        self.assertEqual(result['frames_lost'], 1)
+
+        # only the lost frame has been repeated
+        self.assertGreater(len(sent_offsets), 2)
+        self.assertEqual(sent_offsets.count(sent_offsets[1]), 2)
+        self.assertEqual(len(sent_offsets), len(set(sent_offsets)) + 1)
+        self.assertEqual(result['retries'], 1)
+
+    def testMessageBatch(self):
+        # all messages of a batch session are stored by the IRS
+        destination = f"BT{uuid.uuid4().hex[:4].upper()}-5"
+        messages = [MessageP2P.from_api_params('AA1AAA-1', {'destination': destination, 'body': f'Message {index} ' * 20})
+                    for index in range(3)]
+        simulator = ARQSimulator(self.config, ChannelModel(snr=20, seed=1))
+        result = simulator.run_transfer([message.to_payload().encode('utf-8') for message in messages],
+                                        session_type=ARQ_SESSION_TYPES.p2pmsg_batch_zlib)
+        self.assertTrue(result['success'])
+
+        database = DatabaseManagerMessages(simulator.irs.modem.event_manager)
+        for message in messages:
+            stored = database.get_message_by_id(message.id)
+            self.assertEqual(stored['direction'], 'receive')
+            self.assertEqual(stored['body'], message.body)
+            database.delete_message(message.id)
+
+    def testLossProbability(self):
+        channel = ChannelModel()
+        for mode in [FREEDV_MODE.signalling, FREEDV_MODE.datac4, FREEDV_MODE.datac1]:
+            losses = [channel.get_loss_probability(mode, snr) for snr in range(-20, 30, 5)]
+            self.assertEqual(losses, sorted(losses, reverse=True))
+            self.assertGreater(losses[0], 0.9)
+            self.assertLess(losses[-1], 0.01)
+        # faster modes need a better channel
+        self.assertGreater(channel.get_loss_probability(FREEDV_MODE.datac1, 0),
+                           channel.get_loss_probability(FREEDV_MODE.datac4, 0))
+
+
+class TestVirtualClock(unittest.TestCase):
+
+    def testRunUntilIdle(self):
+        clock = VirtualClock(start=1000)
+        scheduler = SessionScheduler(clock=clock)
+        fired = []
+        scheduler.call_later(60, lambda: fired.append(clock.monotonic()))
+        scheduler.call_later(5, lambda: fired.append(clock.monotonic()))
+        cancelled = scheduler.call_later(10, lambda: fired.append(None))
+        cancelled.cancel()
+
+        scheduler.run_until_idle()
+        self.assertEqual(fired, [5, 60])
+        self.assertEqual(clock.time(), 1060)
+
+
+if __name__ == '__main__':
+    unittest.main()
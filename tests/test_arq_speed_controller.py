@@ -0,0 +1,170 @@
+import sys
+sys.path.append('freedata_server')
+
+import math
+import random
+import unittest
+from config import CONFIG
+from data_frame_factory import DataFrameFactory
+from modem_frametypes import FRAME_TYPE
+from arq_session import ARQSession
+from arq_speed_controller import SpeedLevelController
+
+# seconds of ack and turnaround per exchange
+TURNAROUND = 3.0
+
+
+class LegacyPolicy:
+    """
+    Previous behaviour: highest speed level allowed by the latest snr
+    """
+
+    def __init__(self):
+        self.snr = None
+
+    def update(self, level, success, snr):
+        if snr is not None:
+            self.snr = snr
+
+    def select(self):
+        if self.snr is None:
+            return 0
+        levels = [level for level, details in ARQSession.SPEED_LEVEL_DICT.items() if self.snr >= details['min_snr']]
+        return max(levels or [0])
+
+
+class ControllerPolicy:
+    def __init__(self, payload_sizes):
+        self.controller = SpeedLevelController(ARQSession.SPEED_LEVEL_DICT, payload_sizes,
+                                               hysteresis=2, probe_interval=4)
+
+    def update(self, level, success, snr):
+        self.controller.update_snr(snr)
+        self.controller.record_frame(level, success)
+        self.controller.end_burst()
+
+    def select(self):
+        return self.controller.select()
+
+
+def simulate(policy, payload_sizes, mean_snr, exchanges=300, seed=1):
+    """
+    Stop and wait transfer over a slowly fading channel with noisy snr measurements
+
+    :return: goodput in bytes per second, levels used per exchange
+    """
+    rng = random.Random(seed)
+    fading = 0
+    duration = 0
+    delivered = 0
+    levels = []
+    for _ in range(exchanges):
+        fading = 0.9 * fading + rng.gauss(0, 0.7)
+        snr = mean_snr + fading
+
+        level = policy.select()
+        levels.append(level)
+        details = ARQSession.SPEED_LEVEL_DICT[level]
+        success = rng.random() < 1 / (1 + math.exp(-(snr - details['min_snr']) / 0.7))
+
+        duration += details['duration_per_frame'] + TURNAROUND
+        if success:
+            delivered += payload_sizes[level]
+        # we only get an snr of frames we could decode
+        policy.update(level, success, snr + rng.gauss(0, 1.5) if success else None)
+    return delivered / duration, levels
+
+
+def level_changes(levels):
+    return sum(1 for a, b in zip(levels, levels[1:]) if a != b)
+
+
+class TestSpeedLevelController(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        config = CONFIG('freedata_server/config.ini.example').read()
+        factory = DataFrameFactory(config)
+        cls.payload_sizes = {
+            level: factory.get_available_data_payload_for_mode(FRAME_TYPE.ARQ_BURST_FRAME, details['mode'])
+            for level, details in ARQSession.SPEED_LEVEL_DICT.items()
+        }
+
+    def testHysteresis(self):
+        controller = SpeedLevelController(ARQSession.SPEED_LEVEL_DICT, self.payload_sizes, hysteresis=2)
+        self.assertEqual(controller.select(), 0)
+
+        # just above the minimum of level 1, not enough for going up
+        controller.update_snr(1)
+        self.assertEqual(controller.select(), 0)
+
+        # one level at a time
+        for _ in range(20):
+            controller.update_snr(20)
+        self.assertEqual(controller.select(), 1)
+        self.assertEqual(controller.select(), 2)
+        self.assertEqual(controller.select(), 3)
+
+        # going down happens at once
+        for _ in range(20):
+            controller.update_snr(-5)
+        self.assertEqual(controller.select(), 0)
+
+        # unavailable levels are never chosen
+        for _ in range(20):
+            controller.update_snr(20)
+        for _ in range(4):
+            controller.select([0, 1])
+        self.assertEqual(controller.select([0, 1]), 1)
+
+    def testFailuresAndProbing(self):
+        controller = SpeedLevelController(ARQSession.SPEED_LEVEL_DICT, self.payload_sizes, hysteresis=0, probe_interval=3)
+        controller.update_snr(10)
+        for _ in range(3):
+            controller.select()
+        self.assertEqual(controller.level, 3)
+
+        # frames of level 3 keep failing, level 2 has a better goodput
+        for _ in range(5):
+            controller.record_frame(3, False)
+        self.assertEqual(controller.select(), 2)
+        controller.end_burst()
+        self.assertEqual(controller.select(), 2)
+
+        # after some good bursts, level 3 gets another chance
+        for _ in range(3):
+            controller.record_frame(2, True)
+            controller.end_burst()
+        self.assertEqual(controller.select(), 3)
+        self.assertNotIn(3, controller.success)
+
+    def testSimulation(self):
+        total_legacy = 0
+        total_controller = 0
+        for mean_snr in [-4, 2, 5, 8, 12]:
+            legacy = controlled = 0
+            legacy_changes = controlled_changes = 0
+            for seed in range(5):
+                goodput, levels = simulate(LegacyPolicy(), self.payload_sizes, mean_snr, seed=seed)
+                legacy += goodput
+                legacy_changes += level_changes(levels)
+                goodput, levels = simulate(ControllerPolicy(self.payload_sizes), self.payload_sizes, mean_snr, seed=seed)
+                controlled += goodput
+                controlled_changes += level_changes(levels)
+            total_legacy += legacy
+            total_controller += controlled
+
+            # no worse than the previous behaviour, with less flapping
+            self.assertGreaterEqual(controlled, legacy * 0.95, f"{mean_snr} dB")
+            self.assertLess(controlled_changes, legacy_changes, f"{mean_snr} dB")
+
+        self.assertGreater(total_controller, total_legacy)
+
+    def testConvergence(self):
+        # a strong, steady channel ends up on the highest level and stays there
+        _, levels = simulate(ControllerPolicy(self.payload_sizes), self.payload_sizes, 15)
+        self.assertEqual(levels[10:], [3] * (len(levels) - 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
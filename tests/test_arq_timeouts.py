@@ -0,0 +1,76 @@
+import sys
+sys.path.append('freedata_server')
+
+import random
+import unittest
+import arq_timeouts
+from arq_timeouts import TurnaroundEstimator
+from codec2 import FREEDV_MODE
+
+
+class TestARQTimeouts(unittest.TestCase):
+
+    def testInitialTimeout(self):
+        # before any measurement, timeouts are close to the former fixed values
+        estimator = TurnaroundEstimator()
+        self.assertAlmostEqual(estimator.get_timeout(arq_timeouts.get_airtime(FREEDV_MODE.signalling)), 3.5, delta=0.5)
+        self.assertAlmostEqual(estimator.get_timeout(arq_timeouts.get_airtime(FREEDV_MODE.signalling_ack)), 2.5, delta=0.5)
+        self.assertAlmostEqual(arq_timeouts.get_airtime(FREEDV_MODE.datac4, 3),
+                               3 * arq_timeouts.get_airtime(FREEDV_MODE.datac4))
+
+    def testSmoothing(self):
+        estimator = TurnaroundEstimator()
+        estimator.add_sample(0.4)
+        self.assertEqual(estimator.srtt, 0.4)
+        self.assertEqual(estimator.rttvar, 0.2)
+
+        estimator.add_sample(1.2)
+        self.assertAlmostEqual(estimator.rttvar, 0.75 * 0.2 + 0.25 * 0.8)
+        self.assertAlmostEqual(estimator.srtt, 0.875 * 0.4 + 0.125 * 1.2)
+        self.assertEqual(estimator.samples, 2)
+
+    def testSteadyTurnaround(self):
+        # a fast station gets a tight margin, a slow one a wider margin
+        fast = TurnaroundEstimator()
+        slow = TurnaroundEstimator()
+        for _ in range(50):
+            fast.add_sample(0.2)
+            slow.add_sample(2.5)
+        self.assertEqual(fast.get_margin(), arq_timeouts.MIN_MARGIN)
+        self.assertAlmostEqual(slow.get_margin(), 2.5, delta=0.1)
+
+    def testBackoff(self):
+        estimator = TurnaroundEstimator()
+        margin = estimator.get_margin()
+        estimator.on_timeout()
+        self.assertAlmostEqual(estimator.get_margin(), 2 * margin)
+        for _ in range(10):
+            estimator.on_timeout()
+        self.assertEqual(estimator.get_margin(), arq_timeouts.MAX_MARGIN)
+
+        # the next measurement ends the backoff
+        estimator.add_sample(0.5)
+        self.assertLess(estimator.get_margin(), arq_timeouts.MAX_MARGIN)
+
+    def testSlowRig(self):
+        # turnaround of a rig with a slow PTT, the fixed 2.5 seconds for a signalling ack are too short
+        rng = random.Random(1)
+        reply_airtime = arq_timeouts.get_airtime(FREEDV_MODE.signalling_ack)
+        estimator = TurnaroundEstimator()
+        spurious_fixed = 0
+        spurious_adaptive = 0
+        for _ in range(200):
+            turnaround = rng.uniform(1.6, 2.4)
+            if reply_airtime + turnaround > 2.5:
+                spurious_fixed += 1
+            if reply_airtime + turnaround > estimator.get_timeout(reply_airtime):
+                spurious_adaptive += 1
+                estimator.on_timeout()
+            else:
+                estimator.add_sample(turnaround)
+        self.assertGreater(spurious_fixed, 100)
+        self.assertLess(spurious_adaptive, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
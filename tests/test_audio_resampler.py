@@ -0,0 +1,76 @@
+import sys
+sys.path.append('freedata_server')
+
+import unittest
+import numpy as np
+import audio_resampler
+
+
+def tone(frequency, samplerate, seconds=1, amplitude=10000):
+    t = np.arange(int(samplerate * seconds)) / samplerate
+    return (np.sin(2 * np.pi * frequency * t) * amplitude).astype(np.int16)
+
+
+def peak_frequency(samples, samplerate):
+    spectrum = np.abs(np.fft.rfft(samples.astype(np.float64)))
+    return np.argmax(spectrum) * samplerate / len(samples)
+
+
+class TestPolyphaseResampler(unittest.TestCase):
+
+    def testArbitraryBlockSizes(self):
+        samples = tone(1500, 44100)
+        expected = audio_resampler.PolyphaseResampler(44100, 8000).resample(samples)
+
+        resampler = audio_resampler.PolyphaseResampler(44100, 8000)
+        blocks = []
+        index = 0
+        for block_size in [1, 7, 333, 4410, 4411, 10000]:
+            blocks.append(resampler.resample(samples[index:index + block_size]))
+            index += block_size
+        blocks.append(resampler.resample(samples[index:]))
+
+        self.assertEqual(len(expected), 8000)
+        self.assertTrue(np.array_equal(expected, np.concatenate(blocks)))
+
+    def testDownsampling(self):
+        for samplerate in [44100, 96000]:
+            audio_8k = audio_resampler.PolyphaseResampler(samplerate, 8000).resample(tone(1500, samplerate))
+            self.assertEqual(peak_frequency(audio_8k[2000:], 8000), 1500)
+            self.assertAlmostEqual(np.abs(audio_8k[2000:]).max(), 10000, delta=100)
+
+    def testAliasesAreSuppressed(self):
+        audio_8k = audio_resampler.PolyphaseResampler(44100, 8000).resample(tone(6000, 44100))
+        # more than 60dB below the input level
+        self.assertLess(np.abs(audio_8k[100:]).max(), 10)
+
+    def testUpsampling(self):
+        audio_44k = audio_resampler.PolyphaseResampler(8000, 44100).resample(tone(1500, 8000))
+        self.assertEqual(len(audio_44k), 44100)
+        self.assertEqual(peak_frequency(audio_44k[4410:], 44100), 1500)
+
+    def testOutBuffer(self):
+        resampler = audio_resampler.AudioResampler(96000, 9600)
+        out = np.zeros(resampler.modem_block_size(9600), dtype=np.int16)
+        audio_8k = resampler.resample_to_modem(tone(1500, 96000, 0.1), out=out)
+        self.assertEqual(len(audio_8k), 800)
+        self.assertIs(audio_8k.base, out)
+
+
+class TestAudioResampler(unittest.TestCase):
+
+    def testCodec2PathAt48k(self):
+        resampler = audio_resampler.AudioResampler(48000)
+        self.assertIsNotNone(resampler.codec2_resampler)
+        self.assertEqual(len(resampler.resample_to_modem(tone(1500, 48000, 0.1))), 800)
+        self.assertEqual(len(resampler.resample_to_device(tone(1500, 8000, 0.1))), 4800)
+
+    def testPolyphasePathAt44k(self):
+        resampler = audio_resampler.AudioResampler(44100)
+        self.assertIsNone(resampler.codec2_resampler)
+        self.assertEqual(len(resampler.resample_to_modem(tone(1500, 44100, 0.1))), 800)
+        self.assertEqual(len(resampler.resample_to_device(tone(1500, 8000, 0.1))), 4410)
+
+
+if __name__ == '__main__':
+    unittest.main()
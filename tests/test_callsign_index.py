@@ -0,0 +1,73 @@
+import sys
+sys.path.append('freedata_server')
+
+import unittest
+import callsign_index
+import helpers
+
+
+class TestCallsignIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = callsign_index.CallsignIndex("AA1AAA", 1, [0, 1, 2])
+
+    def testOwnCallsigns(self):
+        for ssid in [0, 1, 2]:
+            crc = helpers.get_crc_24(f"AA1AAA-{ssid}").hex()
+            self.assertTrue(self.index.is_mine(crc))
+            self.assertEqual(self.index.lookup(crc), f"AA1AAA-{ssid}")
+        self.assertFalse(self.index.is_mine(helpers.get_crc_24("AA1AAA-3").hex()))
+        self.assertFalse(self.index.is_mine(helpers.get_crc_24("BB1BBB-1").hex()))
+
+    def testMatchesCheckCallsign(self):
+        ssid_list = [0, 1, 2]
+        for ssid in range(5):
+            crc = helpers.get_crc_24(f"AA1AAA-{ssid}").hex()
+            valid, callsign = helpers.check_callsign("AA1AAA-1", crc, ssid_list)
+            self.assertEqual(self.index.is_mine(crc), valid)
+        # check_callsign must not modify the list of the caller anymore
+        self.assertEqual(ssid_list, [0, 1, 2])
+
+    def testOwnSsidAlwaysAccepted(self):
+        index = callsign_index.CallsignIndex("AA1AAA", 7, [])
+        self.assertEqual(list(index.own.values()), ["AA1AAA-7"])
+
+    def testHeardCallsigns(self):
+        crc = helpers.get_crc_24("BB1BBB-5").hex()
+        self.assertIsNone(self.index.lookup(crc))
+        self.index.add("BB1BBB-5")
+        self.assertEqual(self.index.lookup(crc), "BB1BBB-5")
+        self.assertFalse(self.index.is_mine(crc))
+
+        for i in range(callsign_index.MAX_HEARD_CALLSIGNS):
+            self.index.add(f"CC{i}CCC-0")
+        self.assertIsNone(self.index.lookup(crc))
+        self.assertEqual(len(self.index.heard), callsign_index.MAX_HEARD_CALLSIGNS)
+
+    def testSharedPerConfig(self):
+        config = {'STATION': {'mycall': "AA1AAA", 'myssid': 1, 'ssid_list': [0, 1]}}
+        index = callsign_index.for_config(config)
+        self.assertIs(callsign_index.for_config(config), index)
+        config['STATION']['ssid_list'] = [0, 1, 5]
+        changed = callsign_index.for_config(config)
+        self.assertIsNot(changed, index)
+        self.assertTrue(changed.is_mine(helpers.get_crc_24("AA1AAA-5").hex()))
+
+
+class TestCallsignMemoization(unittest.TestCase):
+
+    def testEncodeDecode(self):
+        encoded = helpers.callsign_to_bytes("AA1AAA-12")
+        self.assertEqual(helpers.bytes_to_callsign(encoded), b"AA1AAA-12")
+        # bytearray and memoryview arguments give the same results
+        self.assertEqual(helpers.bytes_to_callsign(bytearray(encoded)), b"AA1AAA-12")
+        self.assertEqual(helpers.bytes_to_callsign(memoryview(encoded)), b"AA1AAA-12")
+        self.assertEqual(helpers.get_crc_24(bytearray(b"AA1AAA-12")), helpers.get_crc_24("AA1AAA-12"))
+
+        hits = helpers.callsign_to_bytes.cache_info().hits
+        helpers.callsign_to_bytes("AA1AAA-12")
+        self.assertEqual(helpers.callsign_to_bytes.cache_info().hits, hits + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import sys
+sys.path.append('freedata_server')
+
+import unittest
+import ctypes
+import numpy as np
+import codec2
+from codec2 import FREEDV_MODE
+from config import CONFIG
+import modulator
+
+
+class TestCodec2ModeParameters(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        codec2.init_mode_parameters()
+
+    def testRegistryCoversAllModes(self):
+        for mode in FREEDV_MODE:
+            self.assertIn(mode.value, codec2.MODE_PARAMETERS)
+
+    def testBytesPerFrame(self):
+        self.assertEqual(codec2.get_bytes_per_frame(FREEDV_MODE.datac3), 128)
+        self.assertEqual(codec2.get_bytes_per_frame(FREEDV_MODE.datac1.value), 512)
+        self.assertEqual(codec2.get_mode_parameters(FREEDV_MODE.datac1)['payload_per_frame'], 510)
+
+    def testParametersMatchLiveInstance(self):
+        mode = FREEDV_MODE.datac4
+        parameters = codec2.get_mode_parameters(mode)
+        c2instance = codec2.open_instance(mode.value)
+        try:
+            samples = codec2.api.freedv_get_n_tx_preamble_modem_samples(c2instance)
+            samples += codec2.api.freedv_get_n_tx_modem_samples(c2instance)
+            samples += codec2.api.freedv_get_n_tx_postamble_modem_samples(c2instance)
+            self.assertEqual(parameters['n_max_modem_samples'], codec2.api.freedv_get_n_max_modem_samples(c2instance))
+        finally:
+            codec2.api.freedv_close(c2instance)
+        self.assertAlmostEqual(parameters['airtime'], samples / 8000)
+
+    def testRegistryIsStable(self):
+        first = codec2.get_mode_parameters(FREEDV_MODE.signalling)
+        codec2.init_mode_parameters()
+        self.assertIs(first, codec2.get_mode_parameters(FREEDV_MODE.signalling))
+
+
+class TestCodec2InstancePool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = codec2.instance_pool()
+
+    def tearDown(self):
+        self.pool.close_all()
+
+    def testReleasedInstanceIsReused(self):
+        freedv = self.pool.acquire(FREEDV_MODE.datac3.value, codec2.instance_pool.RX)
+        self.pool.release(freedv)
+        reused = self.pool.acquire(FREEDV_MODE.datac3, codec2.instance_pool.RX)
+        self.assertEqual(freedv.value, reused.value)
+        self.assertEqual(codec2.api.freedv_nin(reused), codec2.api.freedv_nin(freedv))
+        self.pool.release(reused)
+
+    def testInstancesAreKeyedByDirection(self):
+        rx = self.pool.acquire(FREEDV_MODE.datac4.value, codec2.instance_pool.RX)
+        self.pool.release(rx)
+        tx = self.pool.acquire(FREEDV_MODE.datac4.value, codec2.instance_pool.TX)
+        self.assertNotEqual(rx.value, tx.value)
+        self.pool.release(tx)
+
+    def testConcurrentUsersGetDifferentInstances(self):
+        first = self.pool.acquire(FREEDV_MODE.signalling.value, codec2.instance_pool.RX)
+        second = self.pool.acquire(FREEDV_MODE.signalling.value, codec2.instance_pool.RX)
+        self.assertNotEqual(first.value, second.value)
+        self.pool.release(first)
+        self.pool.release(second)
+
+    def testDoubleReleaseAndCloseAll(self):
+        freedv = self.pool.acquire(FREEDV_MODE.datac0.value, codec2.instance_pool.TX)
+        self.pool.release(freedv)
+        self.pool.release(freedv)
+        self.assertEqual(len(self.pool.free[(FREEDV_MODE.datac0.value, codec2.instance_pool.TX)]), 1)
+        self.pool.close_all()
+        self.assertEqual(self.pool.free, {})
+        self.assertEqual(self.pool.in_use, {})
+
+
+class TestCodec2Bindings(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        config = CONFIG('freedata_server/config.ini.example').read()
+        cls.modulator = modulator.Modulator(config)
+
+    def testRequiredSymbolsAreTyped(self):
+        for name in codec2.API_SIGNATURES:
+            self.assertIsNotNone(getattr(codec2.api, name).argtypes, name)
+
+    def testModulateDemodulate(self):
+        mode = FREEDV_MODE.datac4
+        payload = bytes(i % 256 for i in range(codec2.get_mode_parameters(mode)['payload_per_frame']))
+        txbuffer = self.modulator.create_burst(mode, 1, 0, [payload])
+        samples = np.concatenate([
+            np.frombuffer(txbuffer, dtype=np.int16),
+            np.zeros(16000, dtype=np.int16)
+        ])
+
+        freedv = codec2.open_instance(mode.value)
+        codec2.api.freedv_set_frames_per_burst(freedv, 1)
+        audiobuffer = codec2.audio_buffer(len(samples))
+        audiobuffer.push(samples)
+        bytes_out = ctypes.create_string_buffer(codec2.get_bytes_per_frame(mode))
+        modem_stats = codec2.modem_stats_buffer()
+        received = None
+        nin = codec2.api.freedv_nin(freedv)
+        while audiobuffer.nbuffer >= nin:
+            nbytes = codec2.api.freedv_rawdatarx(freedv, bytes_out, audiobuffer.buffer)
+            audiobuffer.pop(nin)
+            nin = codec2.api.freedv_nin(freedv)
+            if nbytes == codec2.get_bytes_per_frame(mode):
+                received = bytes(bytes_out)[:len(payload)]
+                sync, snr = modem_stats.update(freedv)
+                self.assertEqual(sync, 1)
+                self.assertGreater(snr, 10)
+        codec2.api.freedv_close(freedv)
+        self.assertEqual(received, payload)
+
+    def testResamplerRoundTrip(self):
+        resampler = codec2.resampler()
+        audio_48k = (np.sin(np.arange(4800) * 2 * np.pi * 1000 / 48000) * 10000).astype(np.int16)
+        audio_8k = resampler.resample48_to_8(audio_48k)
+        self.assertEqual(len(audio_8k), 800)
+        self.assertEqual(len(resampler.resample8_to_48(audio_8k)), 4800)
+
+
+class TestCodec2Resampler(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(1)
+        cls.audio_48k = (rng.standard_normal(48000) * 3000).astype(np.int16)
+
+    def resample_in_blocks(self, function, samples, block_sizes):
+        blocks = []
+        index = 0
+        for block_size in block_sizes:
+            blocks.append(function(samples[index:index + block_size]))
+            index += block_size
+        blocks.append(function(samples[index:]))
+        return np.concatenate(blocks)
+
+    def testArbitraryBlockSizes48to8(self):
+        expected = codec2.resampler(max_block_48=48000).resample48_to_8(self.audio_48k)
+        resampler = codec2.resampler()
+        received = self.resample_in_blocks(resampler.resample48_to_8, self.audio_48k, [1, 2, 3, 7, 47, 4801, 30000])
+        self.assertEqual(len(received), 8000)
+        self.assertTrue(np.array_equal(expected, received))
+        self.assertEqual(resampler.n_remainder48, 0)
+
+    def testArbitraryBlockSizes8to48(self):
+        audio_8k = self.audio_48k[:8000]
+        expected = codec2.resampler(max_block_48=48000).resample8_to_48(audio_8k)
+        resampler = codec2.resampler()
+        received = self.resample_in_blocks(resampler.resample8_to_48, audio_8k, [1, 3, 333, 4663])
+        self.assertTrue(np.array_equal(expected, received))
+
+    def testOutBuffer(self):
+        resampler = codec2.resampler()
+        out = np.zeros(801, dtype=np.int16)
+        audio_8k = resampler.resample48_to_8(self.audio_48k[:4803], out=out)
+        self.assertEqual(len(audio_8k), 800)
+        self.assertIs(audio_8k.base, out)
+        self.assertEqual(resampler.n_remainder48, 3)
+
+        # results without out= must not change with the next call
+        first = resampler.resample48_to_8(self.audio_48k[:4800])
+        copy = first.copy()
+        resampler.resample48_to_8(self.audio_48k[4800:9600])
+        self.assertTrue(np.array_equal(first, copy))
+
+
+if __name__ == '__main__':
+    unittest.main()
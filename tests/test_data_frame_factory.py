@@ -60,6 +60,52 @@ class TestDataFrameFactory(unittest.TestCase):
         self.assertRaises(OverflowError, self.factory.build_arq_burst_frame,
             FREEDV_MODE.datac3, session_id, offset, payload, 0)
         
+    def testBurstAck(self):
+        frame = self.factory.build_arq_burst_ack(123, 4, flag_final=True, flag_checksum=True)
+        self.assertEqual(len(frame), DataFrameFactory.LENGTH_ACK_FRAME)
+        # burst acks are sent without frame type
+        frame_data = self.factory.deconstruct(bytes(frame) + b"\x00\x00", mode_name="SIGNALLING_ACK")
+        self.assertEqual(frame_data['frame_type'], FRAME_TYPE.ARQ_BURST_ACK.name)
+        self.assertEqual(frame_data['session_id'], 123)
+        self.assertEqual(frame_data['speed_level'], 4)
+        self.assertEqual(frame_data['flag'], {'FINAL': True, 'ABORT': False, 'CHECKSUM': True})
+
+    def testSessionInfo(self):
+        frame = self.factory.build_arq_session_info(5, 123456, helpers.get_crc_32(b"test"), 0, 2)
+        frame_data = self.factory.deconstruct(frame)
+        self.assertEqual(frame_data['total_length'], 123456)
+        self.assertEqual(frame_data['total_crc'], helpers.get_crc_32(b"test").hex())
+        self.assertEqual(frame_data['type'], 2)
+        self.assertEqual(frame_data['flag'], {'SELECTIVE_REPEAT': False})
+
+    def testP2PPayload(self):
+        frame = self.factory.build_p2p_connection_payload(FREEDV_MODE.datac4, 12, 3, b"payload")
+        frame_data = self.factory.deconstruct(bytes(frame) + b"\x00\x00")
+        self.assertEqual(frame_data['session_id'], 12)
+        self.assertEqual(frame_data['sequence_id'], bytes([3]))
+        self.assertEqual(frame_data['data'][:7], b"payload")
+        self.assertEqual(len(frame_data['data']), len(frame) - 3)
+
+    def testDecodedFrame(self):
+        frame_data = self.factory.deconstruct(self.factory.build_beacon(flag_away_from_key=True))
+        self.assertIn('origin', frame_data.pending)
+        self.assertIn('origin', frame_data)
+        self.assertNotIn('destination', frame_data)
+        self.assertEqual(frame_data.get('destination', 'none'), 'none')
+        self.assertEqual(frame_data['flag'], {'AWAY_FROM_KEY': True})
+        self.assertEqual(frame_data['origin'], self.factory.myfullcall)
+        self.assertNotIn('origin', frame_data.pending)
+
+        frame_data['gridsquare'] = "JN48ea"
+        self.assertEqual(frame_data['gridsquare'], "JN48ea")
+        self.assertEqual(set(frame_data), {'frame_type', 'frame_type_int', 'origin', 'gridsquare', 'flag'})
+        self.assertEqual(dict(frame_data)['frame_type'], FRAME_TYPE.BEACON.name)
+
+    def testSharedTemplates(self):
+        config = CONFIG('freedata_server/config.ini.example').read()
+        self.assertIs(DataFrameFactory(config).compiled_templates, self.factory.compiled_templates)
+        self.assertEqual(DataFrameFactory(config).mygrid, self.factory.mygrid)
+
     def testAvailablePayload(self):
         avail = self.factory.get_available_data_payload_for_mode(FRAME_TYPE.ARQ_BURST_FRAME, FREEDV_MODE.datac3)
         self.assertEqual(avail, 119) # 128 bytes datac3 frame payload - BURST frame overhead
@@ -39,6 +39,27 @@ class TestDispatcher(unittest.TestCase):
         dispatched_data = self.arq_data_type_handler.dispatch(type_byte, formatted_data, statistics={})
         self.assertEqual(example_data, dispatched_data)
 
+    def testDataTypeHandlerP2PMessageBatch(self):
+        payloads = [bytes(f'{{"id": "{index}", "body": "{"Hello FreeDATA! " * index}"}}', 'utf-8') for index in range(1, 6)]
+        formatted_data, type_byte = self.arq_data_type_handler.prepare(payloads, ARQ_SESSION_TYPES.p2pmsg_batch_zlib)
+        self.assertEqual(type_byte, ARQ_SESSION_TYPES.p2pmsg_batch_zlib.value)
+        # messages share the compression history
+        self.assertLess(len(formatted_data), sum(map(len, payloads)))
+        self.assertEqual(self.arq_data_type_handler.unpack_p2pmsg_batch(formatted_data), payloads)
+
+        # a part of the batch contains the messages in front of it
+        header_size = 2 + 8 * len(payloads)
+        self.assertEqual(self.arq_data_type_handler.unpack_p2pmsg_batch(formatted_data, header_size), [])
+        complete = []
+        for available in range(header_size, len(formatted_data) + 1):
+            part = self.arq_data_type_handler.unpack_p2pmsg_batch(bytes(formatted_data[:available]))
+            self.assertEqual(part, payloads[:len(part)])
+            complete.append(len(part))
+        self.assertEqual(sorted(set(complete)), [0, 1, 2, 3, 4, 5])
+        self.assertEqual(complete, sorted(complete))
+
+        self.assertEqual(self.arq_data_type_handler.unpack_p2pmsg_batch(b"\x07\x01"), [])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,42 @@
+import sys
+sys.path.append('freedata_server')
+
+import unittest
+import duplicate_cache
+
+
+class TestDuplicateCache(unittest.TestCase):
+
+    def testWindow(self):
+        cache = duplicate_cache.DuplicateCache(window=10)
+        self.assertFalse(cache.check(b"frame", "SIGNALLING", "PING", now=100))
+        self.assertTrue(cache.check(b"frame", "SIGNALLING", "PING", now=105))
+        # the window starts again with every copy
+        self.assertTrue(cache.check(bytearray(b"frame"), "SIGNALLING", "PING", now=114))
+        self.assertFalse(cache.check(b"frame", "SIGNALLING", "PING", now=125))
+        self.assertEqual(cache.summary(), {"PING": 2})
+
+    def testKeyedOnBytesAndMode(self):
+        cache = duplicate_cache.DuplicateCache(window=10)
+        self.assertFalse(cache.check(b"frame", "SIGNALLING", now=0))
+        self.assertFalse(cache.check(b"frame", "DATAC4", now=1))
+        self.assertFalse(cache.check(b"other", "SIGNALLING", now=2))
+        self.assertTrue(cache.check(b"frame", "DATAC4", now=3))
+
+    def testDisabled(self):
+        cache = duplicate_cache.DuplicateCache(window=0)
+        self.assertFalse(cache.check(b"frame", "SIGNALLING", now=0))
+        self.assertFalse(cache.check(b"frame", "SIGNALLING", now=0))
+        self.assertEqual(cache.summary(), {})
+
+    def testBounded(self):
+        cache = duplicate_cache.DuplicateCache(window=1000, max_entries=10)
+        for i in range(100):
+            cache.check(bytes([i]), "SIGNALLING", now=i)
+        self.assertEqual(len(cache.seen), 10)
+        self.assertFalse(cache.check(bytes([0]), "SIGNALLING", now=101))
+        self.assertTrue(cache.check(bytes([99]), "SIGNALLING", now=101))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import sys
+sys.path.append('freedata_server')
+
+import os
+import queue
+import tempfile
+import unittest
+import unittest.mock
+from config import CONFIG
+from data_frame_factory import DataFrameFactory
+from event_manager import EventManager
+from frame_dispatcher import DISPATCHER
+from modem_frametypes import FRAME_TYPE as FR_TYPE
+from state_manager import StateManager
+import frame_capture
+
+
+class TestModem:
+    def __init__(self):
+        self.data_queue_received = queue.Queue()
+
+
+class TestFrameCapture(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        config_manager = CONFIG('freedata_server/config.ini.example')
+        cls.config = config_manager.read()
+        cls.frame_factory = DataFrameFactory(cls.config)
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".fdcap")
+        os.close(handle)
+        os.remove(self.path)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def write_capture(self):
+        capture = frame_capture.FrameCapture(self.path)
+        self.assertTrue(capture.record_rx(self.frame_factory.build_qrv(3), "SIGNALLING", 3.5, -12.0))
+        self.assertTrue(capture.record_tx(self.frame_factory.build_arq_session_info_ack(105, 4000, 5, 2, 1), "signalling"))
+        self.assertTrue(capture.record_rx(self.frame_factory.build_arq_burst_ack(105, 2), "SIGNALLING_ACK", -1.0, 4.0))
+        capture.close()
+        return capture
+
+    def testRoundtrip(self):
+        capture = self.write_capture()
+        self.assertEqual(capture.written, 3)
+        self.assertEqual(capture.dropped, 0)
+
+        frames = list(frame_capture.read_capture(self.path))
+        self.assertEqual([frame["direction"] for frame in frames], ["rx", "tx", "rx"])
+        self.assertEqual([frame["session_id"] for frame in frames], [None, 105, 105])
+        self.assertEqual(frames[0]["mode_name"], "SIGNALLING")
+        self.assertEqual(frames[0]["snr"], 3.5)
+        self.assertEqual(frames[0]["frequency_offset"], -12.0)
+        self.assertIsNone(frames[1]["snr"])
+        self.assertEqual(frames[0]["payload"], bytes(self.frame_factory.build_qrv(3)))
+        self.assertTrue(all(a["timestamp"] <= b["timestamp"] for a, b in zip(frames, frames[1:])))
+
+    def testAppendAndTruncated(self):
+        self.write_capture()
+        self.write_capture()
+        self.assertEqual(len(list(frame_capture.read_capture(self.path))), 6)
+
+        # a record cut off by a crash is ignored
+        with open(self.path, "r+b") as file:
+            file.truncate(os.path.getsize(self.path) - 2)
+        self.assertEqual(len(list(frame_capture.read_capture(self.path))), 5)
+
+        with open(self.path, "wb") as file:
+            file.write(b"something else")
+        with self.assertRaises(ValueError):
+            list(frame_capture.read_capture(self.path))
+
+    def testReplay(self):
+        self.write_capture()
+        dispatcher = DISPATCHER(self.config, EventManager([queue.Queue()]), StateManager(queue.Queue()), TestModem())
+        handled = []
+        for frametype in [FR_TYPE.QRV.value, FR_TYPE.ARQ_BURST_ACK.value]:
+            dispatcher.handlers[frametype].handle = \
+                lambda frame, snr, frequency_offset, freedv, bytes_per_frame, duplicate=False: \
+                handled.append((frame['frame_type'], snr, frequency_offset))
+
+        waits = []
+        replayed = frame_capture.replay(self.path, dispatcher, speed=0, sleep=waits.append)
+        self.assertEqual(replayed, 2)
+        self.assertEqual(waits, [])
+        self.assertEqual(handled, [("QRV", 3.5, -12.0), ("ARQ_BURST_ACK", -1.0, 4.0)])
+
+    def testReplayAcrossRuns(self):
+        # monotonic time starts anew with every run, here later than in the previous one
+        for monotonic in [5.0, 1000.0]:
+            clock = unittest.mock.Mock(monotonic=lambda: monotonic, time=lambda: 1700000000.0 + monotonic)
+            with unittest.mock.patch.object(frame_capture, 'time', clock):
+                self.write_capture()
+
+        frames = list(frame_capture.read_capture(self.path))
+        self.assertEqual([frame["run"] for frame in frames], [0, 0, 0, 1, 1, 1])
+        self.assertEqual(frames[3]["wall_time"], 1700001000.0)
+
+        dispatcher = DISPATCHER(self.config, EventManager([queue.Queue()]), StateManager(queue.Queue()), TestModem())
+        waits = []
+        self.assertEqual(frame_capture.replay(self.path, dispatcher, speed=1, sleep=waits.append), 4)
+        self.assertEqual(waits, [])
+
+    def testSessionId(self):
+        self.assertEqual(frame_capture.get_session_id(bytes([FR_TYPE.ARQ_BURST_FRAME.value, 7, 0])), 7)
+        self.assertEqual(frame_capture.get_session_id(bytes([7, 0x40]), "SIGNALLING_ACK"), 7)
+        self.assertEqual(frame_capture.get_session_id(bytes([FR_TYPE.BEACON.value, 7])), -1)
+        self.assertEqual(frame_capture.get_session_id(b""), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import sys
+sys.path.append('freedata_server')
+
+import queue
+import threading
+import time
+import unittest
+import dispatch_lanes
+from config import CONFIG
+from data_frame_factory import DataFrameFactory
+from event_manager import EventManager
+from frame_dispatcher import DISPATCHER
+from frame_handler import FrameHandler
+from modem_frametypes import FRAME_TYPE as FR_TYPE
+from state_manager import StateManager
+
+
+class TestModem:
+    def __init__(self):
+        self.data_queue_received = queue.Queue()
+
+
+class TestFrameDispatcher(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        config_manager = CONFIG('freedata_server/config.ini.example')
+        cls.config = config_manager.read()
+        cls.frame_factory = DataFrameFactory(cls.config)
+
+    def setUp(self):
+        self.states = StateManager(queue.Queue())
+        self.dispatcher = DISPATCHER(self.config, EventManager([queue.Queue()]), self.states, TestModem())
+
+    def testRoutingTable(self):
+        self.assertEqual(set(self.dispatcher.handlers), set(DISPATCHER.FRAME_HANDLER))
+        for frametype, handler in self.dispatcher.handlers.items():
+            self.assertIsInstance(handler, DISPATCHER.FRAME_HANDLER[frametype]['class'])
+            self.assertEqual(handler.name, DISPATCHER.FRAME_HANDLER[frametype]['name'])
+        self.assertIsInstance(self.dispatcher.handlers[FR_TYPE.QRV.value], FrameHandler)
+
+    def testHandlersAreReused(self):
+        handler = self.dispatcher.handlers[FR_TYPE.QRV.value]
+        for snr in [5, -3]:
+            frame = self.frame_factory.build_qrv(snr)
+            self.dispatcher.process_data(frame, None, len(frame), snr, 10, mode_name=None)
+        self.assertIs(self.dispatcher.handlers[FR_TYPE.QRV.value], handler)
+
+        # per frame details don't stick to the handler
+        self.assertFalse(hasattr(handler, 'details'))
+        activities = list(self.states.activities_list.values())
+        self.assertEqual([activity['snr'] for activity in activities[-2:]], [5, -3])
+        self.assertEqual(activities[-1]['activity_type'], 'QRV')
+
+    def testAckNotDelayedByBulkTraffic(self):
+        handled = {}
+
+        def slow_bulk(frame, snr, frequency_offset, freedv_inst, bytes_per_frame, duplicate=False):
+            time.sleep(0.3)
+            handled.setdefault(frame['frame_type'], []).append(time.monotonic())
+
+        def session(frame, snr, frequency_offset, freedv_inst, bytes_per_frame, duplicate=False):
+            handled.setdefault(frame['frame_type'], []).append(time.monotonic())
+
+        self.dispatcher.handlers[FR_TYPE.QRV.value].handle = slow_bulk
+        self.dispatcher.handlers[FR_TYPE.ARQ_BURST_ACK.value].handle = session
+        self.dispatcher.start()
+        try:
+            start = time.monotonic()
+            for snr in range(3):
+                frame = self.frame_factory.build_qrv(snr)
+                self.assertTrue(self.dispatcher.dispatch_data(frame, None, len(frame), 5, 0, None))
+            ack = self.frame_factory.build_arq_burst_ack(42, 1)
+            self.assertTrue(self.dispatcher.dispatch_data(ack, None, len(ack), 5, 0, "SIGNALLING_ACK"))
+
+            deadline = time.monotonic() + 5
+            while len(handled.get('QRV', [])) < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            self.dispatcher.stop()
+
+        self.assertLess(handled['ARQ_BURST_ACK'][0] - start, 0.2)
+        self.assertEqual(len(handled['QRV']), 3)
+        statistics = self.dispatcher.get_lane_statistics()
+        self.assertEqual(statistics['session']['latency']['count'], 1)
+        self.assertEqual(statistics['bulk']['latency']['count'], 3)
+        self.assertGreaterEqual(statistics['bulk']['latency']['max_ms'], 600)
+
+    def testDuplicates(self):
+        handled = []
+
+        def record(frame, snr, frequency_offset, freedv_inst, bytes_per_frame, duplicate=False):
+            handled.append((frame['frame_type'], duplicate))
+
+        self.dispatcher.handlers[FR_TYPE.BEACON.value].handle = record
+        self.dispatcher.handlers[FR_TYPE.PING.value].handle = record
+
+        beacon = self.frame_factory.build_beacon()
+        ping = self.frame_factory.build_ping("BB1BBB-1")
+        for frame in [beacon, ping, beacon, ping, ping]:
+            self.dispatcher.process_data(frame, None, len(frame), 0, 0, mode_name="SIGNALLING")
+
+        # bookkeeping only frames are dropped, protocol frames are flagged
+        self.assertEqual(handled, [("BEACON", False), ("PING", False), ("PING", True), ("PING", True)])
+        self.assertEqual(self.dispatcher.get_lane_statistics()['duplicates'], {"BEACON": 1, "PING": 2})
+
+
+class TestDispatchLanes(unittest.TestCase):
+
+    def testHistogram(self):
+        histogram = dispatch_lanes.LatencyHistogram([1, 10, 100])
+        self.assertIsNone(histogram.percentile(50))
+        for latency in [0.5, 0.7, 5, 8, 9, 50, 250]:
+            histogram.add(latency)
+        self.assertEqual(histogram.counts, [2, 3, 1, 1])
+        self.assertEqual(histogram.percentile(50), 10)
+        self.assertEqual(histogram.percentile(100), 250)
+        summary = histogram.summary()
+        self.assertEqual(summary['count'], 7)
+        self.assertEqual(summary['buckets'], {"<=1ms": 2, "<=10ms": 3, "<=100ms": 1, ">100ms": 1})
+
+    def testOrderPerKey(self):
+        handled = []
+        done = threading.Event()
+
+        def handle(item):
+            key, number = item
+            # handle later items of a key faster, so reordering would show
+            time.sleep(0.01 * (5 - number))
+            handled.append(item)
+            if len(handled) == 20:
+                done.set()
+
+        lane = dispatch_lanes.DispatchLane("test", handle, workers=3, queue_size=20)
+        lane.start()
+        for number in range(5):
+            for key in range(4):
+                self.assertTrue(lane.submit((key, number), key=key))
+        self.assertTrue(done.wait(5))
+        lane.stop()
+        for key in range(4):
+            self.assertEqual([number for item_key, number in handled if item_key == key], list(range(5)))
+
+    def testBoundedQueue(self):
+        lane = dispatch_lanes.DispatchLane("test", lambda item: None, workers=1, queue_size=2)
+        # not started, so nothing gets handled
+        self.assertTrue(lane.submit(1))
+        self.assertTrue(lane.submit(2))
+        self.assertFalse(lane.submit(3))
+        self.assertEqual(lane.summary()['dropped'], 1)
+        self.assertEqual(lane.summary()['queued'], [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
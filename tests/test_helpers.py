@@ -0,0 +1,57 @@
+import sys
+sys.path.append('freedata_server')
+
+import random
+import unittest
+import helpers
+
+
+def reference_crc_32(data: bytes) -> bytes:
+    # the former bitwise implementation, CRC-32 after the Ethernet specification
+    def reflect(value, width):
+        reflected = 0
+        for i in range(width):
+            if value & (1 << i):
+                reflected |= (1 << (width - 1 - i))
+        return reflected
+
+    crc = 0xFFFFFFFF
+    for byte in data:
+        crc ^= reflect(byte, 8) << 24
+        for _ in range(8):
+            if crc & 0x80000000:
+                crc = (crc << 1) ^ 0x04C11DB7
+            else:
+                crc <<= 1
+            crc &= 0xFFFFFFFF
+    return (reflect(crc, 32) ^ 0xFFFFFFFF).to_bytes(4, byteorder="big")
+
+
+def random_bytes(rng, length):
+    # random.Random.randbytes needs Python 3.9
+    return rng.getrandbits(8 * length).to_bytes(length, "big")
+
+
+class TestHelpers(unittest.TestCase):
+
+    def testCRC32(self):
+        rng = random.Random(1)
+        samples = [b"", b"test", b"123456789", bytes(100), bytes([0xFF]) * 100]
+        samples += [random_bytes(rng, rng.randint(1, 2000)) for _ in range(20)]
+        for data in samples:
+            self.assertEqual(helpers.get_crc_32(data), reference_crc_32(data))
+            self.assertEqual(helpers.get_crc_32(bytearray(data)), reference_crc_32(data))
+        self.assertEqual(helpers.get_crc_32("test"), reference_crc_32(b"test"))
+        # check value of the specification
+        self.assertEqual(helpers.get_crc_32(b"123456789").hex(), "cbf43926")
+
+    def testCRC32Incremental(self):
+        data = random_bytes(random.Random(2), 5000)
+        crc = 0
+        for start in range(0, len(data), 173):
+            crc = helpers.update_crc_32(crc, memoryview(data)[start:start + 173])
+        self.assertEqual(crc.to_bytes(4, byteorder="big"), helpers.get_crc_32(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
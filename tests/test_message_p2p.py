@@ -9,6 +9,14 @@ from message_system_db_messages import DatabaseManagerMessages
 from event_manager import EventManager
 import queue
 import base64
+import copy
+import uuid
+from state_manager import StateManager
+from command_message_send import SendMessageCommand
+from arq_data_type_handler import ARQDataTypeHandler, ARQ_SESSION_TYPES
+import arq_data_type_handler
+import message_p2p
+import unittest.mock
 
 class TestDataFrameFactory(unittest.TestCase):
 
@@ -69,8 +77,83 @@ class TestDataFrameFactory(unittest.TestCase):
         self.assertEqual(result["is_read"], True)
         self.assertEqual(result["destination"], message.destination)
 
+    def testCollectBatch(self):
+        # a callsign nobody else uses, the database is shared with other tests
+        destination = f"BT{uuid.uuid4().hex[:4].upper()}-5"
+        state_manager = StateManager(queue.Queue())
+        commands = [SendMessageCommand(self.config, state_manager, self.event_manager,
+                                       {'destination': destination, 'body': f'Message {index} ' * 20})
+                    for index in range(3)]
+        ids = [command.message.id for command in commands]
 
+        queued = self.database_manager.get_queued_messages_for_destination(destination)
+        self.assertEqual([message['id'] for message in queued], ids)
 
+        batch = commands[0].collect_batch(queued[0])
+        self.assertEqual([message_id for message_id, _ in batch], ids)
+
+        # the size limit cuts the batch, the first message is taken anyway
+        config = copy.deepcopy(self.config)
+        config['MESSAGES']['batch_size_limit'] = len(batch[0][1]) + len(batch[1][1])
+        self.assertEqual(len(SendMessageCommand(config, state_manager, self.event_manager, {'destination': destination, 'body': 'x'}).collect_batch(queued[0])), 2)
+        config['MESSAGES']['batch_size_limit'] = 0
+        self.assertEqual(len(SendMessageCommand(config, state_manager, self.event_manager, {'destination': destination, 'body': 'x'}).collect_batch(queued[0])), 1)
+
+        for message_id in self.database_manager.get_queued_messages_for_destination(destination):
+            self.database_manager.delete_message(message_id['id'])
+
+    def get_batch_part(self, handler, data, messages):
+        # the shortest part of a batch holding the first messages
+        return next(bytes(data[:available]) for available in range(len(data))
+                    if len(handler.unpack_p2pmsg_batch(data, available)) == messages)
+
+    def testFailedPartialBatch(self):
+        # the ISS marks the messages the IRS confirmed as transmitted and queues the others again
+        destination = f"BT{uuid.uuid4().hex[:4].upper()}-5"
+        state_manager = StateManager(queue.Queue())
+        commands = [SendMessageCommand(self.config, state_manager, self.event_manager,
+                                       {'destination': destination, 'body': f'Message {index} ' * 20})
+                    for index in range(3)]
+        batch = commands[0].collect_batch(self.database_manager.get_queued_messages_for_destination(destination)[0])
+        handler = ARQDataTypeHandler(self.event_manager, state_manager)
+        data, type_byte = handler.prepare([payload for _, payload in batch], ARQ_SESSION_TYPES.p2pmsg_batch_zlib)
+
+        confirmed_bytes = len(self.get_batch_part(handler, data, 1))
+        handler.failed(type_byte, data, statistics={}, confirmed_bytes=confirmed_bytes)
+        messages = [self.database_manager.get_message_by_id(message_id) for message_id, _ in batch]
+        self.assertEqual([message['status'] for message in messages], ['transmitted', 'queued', 'queued'])
+        self.assertEqual([message['attempt'] for message in messages], [0, 1, 1])
+
+        for message_id, _ in batch:
+            self.database_manager.delete_message(message_id)
+
+    def testReceivedPartialBatch(self):
+        # the IRS keeps the complete messages of a failed session, the ISS may complete the batch later on
+        destination = f"BT{uuid.uuid4().hex[:4].upper()}-5"
+        messages = [MessageP2P.from_api_params(self.mycall, {'destination': destination, 'body': f'Message {index} ' * 20})
+                    for index in range(3)]
+        payloads = [message.to_payload().encode('utf-8') for message in messages]
+        state_manager = StateManager(queue.Queue())
+        handler = ARQDataTypeHandler(self.event_manager, state_manager)
+        data, type_byte = handler.prepare(payloads, ARQ_SESSION_TYPES.p2pmsg_batch_zlib)
+
+        handler.received_partial(type_byte, self.get_batch_part(handler, data, 2), statistics={})
+        stored = [self.database_manager.get_message_by_id(message.id) for message in messages]
+        self.assertEqual([message is not None for message in stored], [True, True, False])
+        self.assertEqual(stored[0]['status'], 'received')
+
+        # only the rest of the batch is delivered
+        with unittest.mock.patch.object(arq_data_type_handler, 'message_received',
+                                        wraps=message_p2p.message_received) as received:
+            handler.dispatch(type_byte, data, statistics={})
+        self.assertEqual([call.args[2] for call in received.call_args_list], [payloads[2]])
+        self.assertIsNotNone(self.database_manager.get_message_by_id(messages[2].id))
+
+        # a later session resuming the batch doesn't store messages again
+        self.assertIsNone(message_p2p.message_received(self.event_manager, state_manager, payloads[0], {}))
+
+        for message in messages:
+            self.database_manager.delete_message(message.id)
 
 
 if __name__ == '__main__':
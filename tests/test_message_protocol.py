@@ -34,25 +34,25 @@ class TestModem:
         self.states = StateManager(state_q)
 
     def getFrameTransmissionTime(self, mode):
-        samples = 0
-        c2instance = codec2.open_instance(mode.value)
-        samples += codec2.api.freedv_get_n_tx_preamble_modem_samples(c2instance)
-        samples += codec2.api.freedv_get_n_tx_modem_samples(c2instance)
-        samples += codec2.api.freedv_get_n_tx_postamble_modem_samples(c2instance)
-        time = samples / 8000
+        time = codec2.get_mode_parameters(mode)['airtime']
         return time
 
     def transmit(self, mode, repeats: int, repeat_delay: int, frames: bytearray) -> bool:
-        # Simulate transmission time
-        tx_time = self.getFrameTransmissionTime(mode) + 0.1  # PTT
-        self.logger.info(f"TX {tx_time} seconds...")
-        threading.Event().wait(tx_time)
-
-        transmission = {
-            'mode': mode,
-            'bytes': frames,
-        }
-        self.data_queue_received.put(transmission)
+        # a burst of frames is received frame by frame
+        if not isinstance(frames, list):
+            frames = [frames]
+
+        for frame in frames:
+            # Simulate transmission time
+            tx_time = self.getFrameTransmissionTime(mode) + 0.1  # PTT
+            self.logger.info(f"TX {tx_time} seconds...")
+            threading.Event().wait(tx_time)
+
+            transmission = {
+                'mode': mode,
+                'bytes': frame,
+            }
+            self.data_queue_received.put(transmission)
 
 
 class TestMessageProtocol(unittest.TestCase):
@@ -119,7 +119,7 @@ class TestMessageProtocol(unittest.TestCase):
             ev = q.get()
             if key in ev and ('success' in ev[key] or 'ABORTED' in ev[key]):
                 self.logger.info(f"[{threading.current_thread().name}] {key} session ended.")
-                break
+                return ev[key]
 
     def establishChannels(self):
         self.channels_running = True
@@ -136,10 +136,11 @@ class TestMessageProtocol(unittest.TestCase):
         self.irs_to_iss_channel.start()
 
     def waitAndCloseChannels(self):
-        self.waitForSession(self.iss_event_queue, True)
+        outbound = self.waitForSession(self.iss_event_queue, True)
         self.channels_running = False
         self.waitForSession(self.irs_event_queue, False)
         self.channels_running = False
+        return outbound
 
     def testMessageViaSession(self):
         # set Packet Error Rate (PER) / frame loss probability
@@ -155,7 +156,8 @@ class TestMessageProtocol(unittest.TestCase):
         command = cmd_class(self.config, self.iss_state_manager, self.iss_event_manager, params)
         command.run(self.iss_event_manager, self.iss_modem)
 
-        self.waitAndCloseChannels()
+        outbound = self.waitAndCloseChannels()
+        self.assertTrue(outbound['success'])
 
 
 
@@ -0,0 +1,79 @@
+import sys
+sys.path.append('freedata_server')
+
+import threading
+import time
+import unittest
+from session_scheduler import SessionScheduler
+
+
+class TestSessionScheduler(unittest.TestCase):
+
+    def testTimersInOrder(self):
+        scheduler = SessionScheduler(workers=1)
+        fired = []
+        done = threading.Event()
+        scheduler.call_later(0.2, fired.append, 3)
+        scheduler.call_later(0.0, fired.append, 1)
+        scheduler.call_later(0.1, fired.append, 2)
+        scheduler.call_later(0.3, done.set)
+        self.assertTrue(done.wait(2))
+        self.assertEqual(fired, [1, 2, 3])
+
+    def testCancel(self):
+        scheduler = SessionScheduler()
+        fired = []
+        done = threading.Event()
+        timer = scheduler.call_later(0.05, fired.append, "cancelled")
+        scheduler.call_later(0.1, done.set)
+        timer.cancel()
+        self.assertTrue(done.wait(2))
+        self.assertEqual(fired, [])
+        self.assertEqual(scheduler.summary()['cancelled'], 1)
+
+    def testBoundedThreads(self):
+        scheduler = SessionScheduler(workers=2)
+        threads_before = threading.active_count()
+        done = threading.Semaphore(0)
+
+        # like sessions waiting for a reply, most timers get cancelled by the reply
+        timers = [scheduler.call_later(60, done.release) for _ in range(500)]
+        for timer in timers:
+            timer.cancel()
+        for _ in range(200):
+            scheduler.call_later(0.01, done.release)
+            scheduler.submit(done.release)
+        for _ in range(400):
+            self.assertTrue(done.acquire(timeout=2))
+
+        self.assertEqual(threading.active_count() - threads_before, 3)
+        summary = scheduler.summary()
+        self.assertEqual(summary['threads'], 3)
+        self.assertEqual(summary['pending_timers'], 0)
+        self.assertEqual(summary['fired'], 200)
+        self.assertEqual(summary['lateness']['count'], 200)
+        self.assertLess(summary['lateness']['p50_ms'], 100)
+
+    def testBlockingJob(self):
+        # a transmitting job doesn't delay the timers of other sessions
+        scheduler = SessionScheduler(workers=2)
+        release = threading.Event()
+        fired = threading.Event()
+        scheduler.submit(release.wait, 2)
+        started = time.monotonic()
+        scheduler.call_later(0.05, fired.set)
+        self.assertTrue(fired.wait(1))
+        self.assertLess(time.monotonic() - started, 1)
+        release.set()
+
+    def testFailingJob(self):
+        scheduler = SessionScheduler(workers=1)
+        done = threading.Event()
+        scheduler.submit(lambda: 1 / 0)
+        scheduler.submit(done.set)
+        self.assertTrue(done.wait(2))
+        self.assertEqual(scheduler.summary()['errors'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import sys
+sys.path.append('freedata_server')
+
+import queue
+import unittest
+import numpy as np
+import spectrum_analyzer
+
+
+class StatesRecorder:
+    """Records the calls of the analyzer to the state manager"""
+
+    def __init__(self):
+        self.transmitting = False
+        self.receiving_codec2_signal = False
+        self.channel_slot_busy = [False] * 5
+        self.channel_busy_traffic = []
+        self.values = {}
+
+    def isTransmitting(self):
+        return self.transmitting
+
+    def is_receiving_codec2_signal(self):
+        return self.receiving_codec2_signal
+
+    def set_channel_slot_busy(self, array):
+        self.channel_slot_busy = array
+
+    def set_channel_busy_condition_traffic(self, busy):
+        self.channel_busy_traffic.append(busy)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+def audio_block(frequency=None, amplitude=8000, length=800, seed=0):
+    rng = np.random.default_rng(seed)
+    samples = rng.normal(0, 30, length)
+    if frequency:
+        t = np.arange(length) / 8000
+        samples += np.sin(2 * np.pi * frequency * t) * amplitude
+    return samples.astype(np.int16)
+
+
+class TestSpectrumAnalyzer(unittest.TestCase):
+
+    def setUp(self):
+        self.states = StatesRecorder()
+        self.fft_queue = queue.Queue()
+        self.analyzer = spectrum_analyzer.SpectrumAnalyzer(self.states, self.fft_queue)
+
+    def feed(self, analyzer, blocks, **kwargs):
+        for i in range(blocks):
+            analyzer.process(audio_block(seed=i, **kwargs))
+
+    def testNoiseIsNotBusy(self):
+        self.feed(self.analyzer, 20)
+        self.assertEqual(self.states.channel_slot_busy, [False] * 5)
+        self.assertEqual(self.analyzer.channel_busy_delay, 0)
+        self.assertNotIn(True, self.states.channel_busy_traffic)
+
+    def testToneMarksSlotBusy(self):
+        self.feed(self.analyzer, 20)
+        # 1500Hz --> bin 150 --> third slot
+        self.feed(self.analyzer, 3, frequency=1500)
+        self.assertEqual(self.states.channel_slot_busy, [False, False, True, False, False])
+        self.assertTrue(self.states.channel_busy_traffic[-1])
+        self.assertIn(100, self.fft_queue.get_nowait()[145:155])
+
+    def testToneInFirstBlock(self):
+        self.feed(self.analyzer, 1, frequency=500)
+        self.assertEqual(self.states.channel_slot_busy, [True, False, False, False, False])
+
+    def testBusyDelay(self):
+        self.feed(self.analyzer, 5, frequency=1500)
+        self.assertEqual(self.analyzer.channel_busy_delay, 10)
+
+        self.feed(self.analyzer, 9)
+        self.assertTrue(self.states.channel_slot_busy[2])
+        self.assertTrue(self.states.channel_busy_traffic[-1])
+
+        self.feed(self.analyzer, 1)
+        self.assertEqual(self.states.channel_slot_busy, [False] * 5)
+        self.assertFalse(self.states.channel_busy_traffic[-1])
+
+    def testNoDetectionWhileTransmitting(self):
+        self.states.transmitting = True
+        self.feed(self.analyzer, 5, frequency=1500)
+        self.assertEqual(self.states.channel_slot_busy, [False] * 5)
+        self.assertEqual(self.analyzer.channel_busy_delay, 0)
+
+    def testNoDetectionWhileReceivingCodec2(self):
+        self.states.receiving_codec2_signal = True
+        self.feed(self.analyzer, 5, frequency=1500)
+        self.assertEqual(self.states.channel_slot_busy, [False] * 5)
+
+    def testQueueKeepsLatestFrame(self):
+        self.feed(self.analyzer, 10)
+        self.assertEqual(self.fft_queue.qsize(), 1)
+        self.assertEqual(len(self.fft_queue.get_nowait()), 315)
+
+    def testShortAndLongBlocks(self):
+        for length in [1, 100, 799, 800, 4800]:
+            self.analyzer.process(audio_block(frequency=1500, length=length))
+            self.assertEqual(len(self.fft_queue.get_nowait()), 315)
+
+    def testStreamsDontShareState(self):
+        tx_monitor = spectrum_analyzer.SpectrumAnalyzer(self.states, self.fft_queue, update_channel_state=False)
+        self.feed(self.analyzer, 10)
+        self.feed(tx_monitor, 10, frequency=1500)
+        self.assertEqual(self.states.channel_slot_busy, [False] * 5)
+        self.assertEqual(self.analyzer.channel_busy_delay, 0)
+        self.assertEqual(tx_monitor.channel_busy_delay, 0)
+
+        other_rx = spectrum_analyzer.SpectrumAnalyzer(StatesRecorder(), queue.Queue())
+        self.feed(other_rx, 5, frequency=1500)
+        self.assertEqual(other_rx.channel_busy_delay, 10)
+        self.assertEqual(self.analyzer.channel_busy_delay, 0)
+
+    def testAudioDbfs(self):
+        self.feed(self.analyzer, 6, frequency=1500, amplitude=16000)
+        self.assertAlmostEqual(self.states.values["audio_dbfs"], -6, delta=0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import sys
+sys.path.append('freedata_server')
+
+import queue
+import unittest
+import numpy as np
+import spectrum_history
+import spectrum_analyzer
+from test_spectrum_analyzer import StatesRecorder, audio_block
+
+
+def spectrum(level):
+    return np.full(315, level, dtype=np.float32)
+
+
+class TestSpectrumHistory(unittest.TestCase):
+
+    def testMemoryBounded(self):
+        history = spectrum_history.SpectrumHistory(minutes=1, rows_per_second=5)
+        self.assertEqual(history.size, 300)
+        self.assertEqual(history.memory_usage(), 300 * (315 + 1 + 8))
+
+        for i in range(1000):
+            history.append(i * 0.2, spectrum(i % 100))
+        timestamps, busy, spectra = history.get_range()
+        self.assertEqual(len(timestamps), 300)
+        self.assertTrue(np.all(np.diff(timestamps) > 0))
+        # the pending row isn't committed yet
+        self.assertAlmostEqual(timestamps[-1], 998 * 0.2)
+
+    def testFramesMergedIntoRows(self):
+        history = spectrum_history.SpectrumHistory(minutes=1, rows_per_second=5)
+        history.append(0.0, spectrum(10), [False, True, False, False, False])
+        history.append(0.1, spectrum(30), [False, False, False, False, True])
+        history.append(0.2, spectrum(20))
+
+        timestamps, busy, spectra = history.get_range()
+        self.assertEqual(timestamps.tolist(), [0.0])
+        self.assertEqual(busy.tolist(), [0b10010])
+        self.assertTrue(np.all(spectra[0] == 60))
+
+    def testRange(self):
+        history = spectrum_history.SpectrumHistory(minutes=5, rows_per_second=1)
+        for i in range(200):
+            history.append(1000.0 + i, spectrum(i % 100))
+
+        timestamps, busy, spectra = history.get_range(1100, 1110.5)
+        self.assertEqual(timestamps.tolist(), [1100.0 + i for i in range(11)])
+        self.assertEqual(spectra[:, 0].tolist(), [(i % 100) * 2 for i in range(100, 111)])
+
+        timestamps, busy, spectra = history.get_range(start=1197)
+        self.assertEqual(timestamps.tolist(), [1197.0, 1198.0])
+        self.assertEqual(len(history.get_range(end=900)[0]), 0)
+
+    def testExport(self):
+        history = spectrum_history.SpectrumHistory(minutes=1, rows_per_second=1)
+        for i in range(10):
+            history.append(float(i), spectrum(i), [i % 2 == 0, False, False, False, False])
+
+        data = history.export(2, 5)
+        self.assertEqual(len(data), spectrum_history.EXPORT_HEADER.size + 4 * (8 + 1 + 315))
+        timestamps, busy, spectra = spectrum_history.parse_export(data)
+        self.assertEqual(timestamps.tolist(), [2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(busy.tolist(), [1, 0, 1, 0])
+        self.assertEqual(spectra.shape, (4, 315))
+        self.assertEqual(spectra[:, 0].tolist(), [4, 6, 8, 10])
+
+        empty = spectrum_history.parse_export(history.export(100, 200))
+        self.assertEqual(empty[2].shape, (0, 315))
+
+    def testRecordedByAnalyzer(self):
+        history = spectrum_history.SpectrumHistory(minutes=0.001, rows_per_second=1e6)
+        analyzer = spectrum_analyzer.SpectrumAnalyzer(StatesRecorder(), queue.Queue(), history=history)
+        for i in range(10):
+            analyzer.process(audio_block(frequency=1500, seed=i))
+        timestamps, busy, spectra = history.get_range()
+        self.assertGreater(len(timestamps), 0)
+        self.assertEqual(busy[-1], 0b00100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import sys
+sys.path.append('freedata_server')
+
+import asyncio
+import json
+import queue
+import unittest
+import numpy as np
+import waterfall_publisher
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+    async def send_text(self, data):
+        self.sent.append(data)
+
+
+def spectrum(peak_bin=150):
+    dfft = np.full(315, 20.0, dtype=np.float32)
+    dfft[peak_bin] = 100
+    return dfft
+
+
+class TestWaterfallFrames(unittest.TestCase):
+
+    def testQuantize(self):
+        levels = waterfall_publisher.quantize(np.array([-10, 0, 20.2, 100, 200]))
+        self.assertEqual(levels.dtype, np.uint8)
+        self.assertEqual(levels.tolist(), [0, 0, 40, 200, 255])
+
+    def testDecimateKeepsPeaks(self):
+        levels = waterfall_publisher.quantize(spectrum(peak_bin=151))
+        for bins in [16, 64, 100, 314]:
+            reduced = waterfall_publisher.decimate(levels, bins)
+            self.assertEqual(len(reduced), bins)
+            self.assertEqual(reduced.max(), 200)
+            group_starts = np.arange(bins) * 315 // bins
+            self.assertEqual(np.argmax(reduced), np.searchsorted(group_starts, 151, side='right') - 1)
+        self.assertIs(waterfall_publisher.decimate(levels, 315), levels)
+
+    def testFrameRoundtrip(self):
+        levels = waterfall_publisher.quantize(spectrum())
+        frame = waterfall_publisher.encode_frame(levels, 42)
+        self.assertEqual(len(frame), waterfall_publisher.FRAME_HEADER.size + 315)
+        sequence, decoded = waterfall_publisher.decode_frame(frame)
+        self.assertEqual(sequence, 42)
+        self.assertTrue(np.array_equal(decoded, levels))
+
+
+class TestWaterfallPublisher(unittest.TestCase):
+
+    def run_clients(self, publisher, clients, frames, frame_interval):
+        async def run():
+            loop = asyncio.get_running_loop()
+            senders = []
+            for client in clients:
+                client.loop = loop
+                publisher.add_client(client)
+                senders.append(asyncio.create_task(client.sender()))
+            for i in range(frames):
+                publisher.publish(spectrum(), i * frame_interval)
+                await asyncio.sleep(0)
+                await asyncio.sleep(0)
+            for sender in senders:
+                sender.cancel()
+
+        asyncio.run(run())
+
+    def testRateLimit(self):
+        publisher = waterfall_publisher.WaterfallPublisher(queue.Queue(), fps=10)
+        published = [publisher.publish(spectrum(), i * 0.05) for i in range(20)]
+        self.assertEqual(sum(published), 10)
+
+    def testClientSettings(self):
+        publisher = waterfall_publisher.WaterfallPublisher(queue.Queue(), fps=10)
+        full = waterfall_publisher.WaterfallClient(FakeWebSocket(), None, max_fps=10)
+        slow = waterfall_publisher.WaterfallClient(FakeWebSocket(), None, bins=64, fps=2, max_fps=10)
+        legacy = waterfall_publisher.WaterfallClient(FakeWebSocket(), None, binary=False, max_fps=10)
+        self.run_clients(publisher, [full, slow, legacy], frames=20, frame_interval=0.1)
+
+        self.assertEqual(len(full.websocket.sent), 20)
+        self.assertEqual(len(slow.websocket.sent), 4)
+        self.assertEqual(len(waterfall_publisher.decode_frame(slow.websocket.sent[0])[1]), 64)
+        self.assertEqual(json.loads(legacy.websocket.sent[0]), spectrum().astype(int).tolist())
+
+    def testLimits(self):
+        client = waterfall_publisher.WaterfallClient(FakeWebSocket(), None, bins=5000, fps=100, max_fps=10)
+        self.assertEqual(client.bins, waterfall_publisher.MAX_BINS)
+        self.assertEqual(client.interval, 0.1)
+        client.configure(bins=1, fps=1)
+        self.assertEqual(client.bins, waterfall_publisher.MIN_BINS)
+        self.assertEqual(client.interval, 1)
+
+    def testLatestWins(self):
+        async def run():
+            client = waterfall_publisher.WaterfallClient(
+                FakeWebSocket(), asyncio.get_running_loop(), max_fps=10
+            )
+            # offered frames pile up while the sender doesn't get to run
+            for sequence in range(5):
+                client.offer(waterfall_publisher.encode_frame(np.zeros(16, dtype=np.uint8), sequence), sequence)
+            sender = asyncio.create_task(client.sender())
+            await asyncio.sleep(0.01)
+            sender.cancel()
+            return client
+
+        client = asyncio.run(run())
+        self.assertEqual(client.frames_dropped, 4)
+        self.assertEqual(len(client.websocket.sent), 1)
+        self.assertEqual(waterfall_publisher.decode_frame(client.websocket.sent[0])[0], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
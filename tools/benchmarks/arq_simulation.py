@@ -0,0 +1,46 @@
+"""
+Goodput and retries of simulated ARQ transfers over a channel model
+
+FreeDATA % python3 tools/benchmarks/arq_simulation.py
+
+"""
+import sys
+sys.path.append('freedata_server')
+
+import logging
+import random
+import time
+import structlog
+from config import CONFIG
+from arq_simulator import ARQSimulator, ChannelModel
+
+PAYLOAD_SIZE = 10000
+SEED = 1
+
+# the sessions log every frame
+structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.ERROR))
+
+config = CONFIG('freedata_server/config.ini.example').read()
+# random.Random.randbytes needs Python 3.9
+payload = random.Random(SEED).getrandbits(8 * PAYLOAD_SIZE).to_bytes(PAYLOAD_SIZE, 'big')
+
+
+def report(name, result, wall_time):
+    print(f"{name:24} {result['state']:8} {result['duration']:8.1f} s {result['goodput']:8.1f} bps "
+          f"{result['retries']:4} retries {result['frames_lost']:4}/{result['frames_total']:<4} lost "
+          f"{wall_time * 1000:8.1f} ms wall time")
+
+
+scenarios = {
+    "clean 20 dB": dict(snr=20),
+    "low snr 3 dB": dict(snr=3),
+    "fading 15 dB": dict(snr=15, fade_probability=0.2, fade_depth=20),
+}
+
+for name, channel in scenarios.items():
+    for window in [1, 4]:
+        config['MODEM']['arq_window'] = window
+        simulator = ARQSimulator(config, ChannelModel(seed=SEED, **channel))
+        started = time.perf_counter()
+        result = simulator.run_transfer(payload)
+        report(f"{name} window {window}", result, time.perf_counter() - started)
@@ -0,0 +1,79 @@
+"""
+Per call overhead of the libcodec2 bindings
+
+Compares the typed bindings in codec2.api against an untyped handle of the
+same library, which is how the functions were called before argtypes were set.
+
+FreeDATA % python3 tools/benchmarks/codec2_call_overhead.py
+
+"""
+import sys
+sys.path.append('freedata_server')
+
+import ctypes
+import timeit
+import numpy as np
+import codec2
+
+ITERATIONS = 20000
+MODE = codec2.FREEDV_MODE.datac4
+
+# a second handle of the same library, its functions have no argtypes set
+untyped_api = ctypes.CDLL(codec2.api._name)
+untyped_api.freedv_open.restype = ctypes.c_void_p
+
+
+def report(name, seconds_typed, seconds_untyped):
+    typed = seconds_typed / ITERATIONS * 1e6
+    untyped = seconds_untyped / ITERATIONS * 1e6
+    print(f"{name:24} typed {typed:8.2f} us/call   untyped {untyped:8.2f} us/call")
+
+
+freedv = codec2.open_instance(MODE.value)
+untyped_freedv = ctypes.c_void_p(untyped_api.freedv_open(MODE.value))
+
+# freedv_nin
+report(
+    "freedv_nin",
+    timeit.timeit(lambda: codec2.api.freedv_nin(freedv), number=ITERATIONS),
+    timeit.timeit(lambda: untyped_api.freedv_nin(untyped_freedv), number=ITERATIONS),
+)
+
+# freedv_rawdatarx, fed with silence so we measure the call, not a decode
+bytes_out = ctypes.create_string_buffer(codec2.get_bytes_per_frame(MODE))
+demod_in = np.zeros(codec2.get_mode_parameters(MODE)['n_max_modem_samples'], dtype=np.int16)
+report(
+    "freedv_rawdatarx",
+    timeit.timeit(lambda: codec2.api.freedv_rawdatarx(freedv, bytes_out, demod_in), number=ITERATIONS),
+    timeit.timeit(lambda: untyped_api.freedv_rawdatarx(untyped_freedv, bytes_out, demod_in.ctypes), number=ITERATIONS),
+)
+
+# fdmdv_48_to_8_short, one 100ms block of 48kHz audio
+n8 = 800
+in48_mem = np.zeros(codec2.api.FDMDV_OS_TAPS_48K + n8 * codec2.api.FDMDV_OS_48, dtype=np.int16)
+pin48 = in48_mem[codec2.api.FDMDV_OS_TAPS_48K:]
+out8 = np.zeros(n8, dtype=np.int16)
+untyped_pin48 = ctypes.byref(np.ctypeslib.as_ctypes(in48_mem), 2 * codec2.api.FDMDV_OS_TAPS_48K)
+report(
+    "fdmdv_48_to_8_short",
+    timeit.timeit(lambda: codec2.api.fdmdv_48_to_8_short(out8, pin48, n8), number=ITERATIONS),
+    timeit.timeit(lambda: untyped_api.fdmdv_48_to_8_short(out8.ctypes, untyped_pin48, n8), number=ITERATIONS),
+)
+
+# modem stats, allocating per call like before vs. preallocated buffers
+modem_stats = codec2.modem_stats_buffer()
+
+
+def allocating_stats():
+    stats = codec2.MODEMSTATS()
+    untyped_api.freedv_get_modem_extended_stats(untyped_freedv, ctypes.byref(stats))
+
+
+report(
+    "modem_extended_stats",
+    timeit.timeit(lambda: modem_stats.update_extended(freedv), number=ITERATIONS),
+    timeit.timeit(allocating_stats, number=ITERATIONS),
+)
+
+codec2.api.freedv_close(freedv)
+untyped_api.freedv_close(untyped_freedv)
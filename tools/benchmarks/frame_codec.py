@@ -0,0 +1,52 @@
+"""
+Frames per second of DataFrameFactory construct and deconstruct
+
+FreeDATA % python3 tools/benchmarks/frame_codec.py
+
+"""
+import sys
+sys.path.append('freedata_server')
+
+import timeit
+from config import CONFIG
+from data_frame_factory import DataFrameFactory
+from codec2 import FREEDV_MODE
+
+ITERATIONS = 20000
+
+config = CONFIG('freedata_server/config.ini.example').read()
+factory = DataFrameFactory(config)
+
+
+def report(name, seconds):
+    print(f"{name:32} {ITERATIONS / seconds:12.0f} frames/s")
+
+
+report("factory instantiation", timeit.timeit(lambda: DataFrameFactory(config), number=ITERATIONS))
+
+builders = {
+    "arq_session_open": lambda: factory.build_arq_session_open("DJ2LS-4", 123, 1700, 1),
+    "arq_session_info_ack": lambda: factory.build_arq_session_info_ack(123, 4000, 5, 2, 1),
+    "arq_burst_frame datac1": lambda: factory.build_arq_burst_frame(FREEDV_MODE.datac1, 123, 4000, bytes(400), 2),
+    "arq_burst_ack": lambda: factory.build_arq_burst_ack(123, 2, flag_final=True),
+    "beacon": lambda: factory.build_beacon(),
+}
+
+for name, builder in builders.items():
+    report(f"construct {name}", timeit.timeit(builder, number=ITERATIONS))
+
+for name, builder in builders.items():
+    frame = bytes(builder())
+    # the modem appends a crc16 to each frame
+    frame += b"\x00\x00"
+    mode_name = "SIGNALLING_ACK" if name == "arq_burst_ack" else None
+    report(f"deconstruct {name}", timeit.timeit(lambda: factory.deconstruct(frame, mode_name=mode_name), number=ITERATIONS))
+
+
+def deconstruct_and_read():
+    frame_data = factory.deconstruct(beacon, mode_name=None)
+    return frame_data["origin"], frame_data["gridsquare"], frame_data["flag"]
+
+
+beacon = bytes(factory.build_beacon()) + b"\x00\x00"
+report("deconstruct + read beacon", timeit.timeit(deconstruct_and_read, number=ITERATIONS))
@@ -0,0 +1,72 @@
+"""
+Per call cost of the 48<->8 kHz resampler for realtime block sizes
+
+Compares codec2.resampler with and without a caller supplied output buffer
+against the previous implementation, which allocated its work and output
+arrays on every call.
+
+FreeDATA % python3 tools/benchmarks/resampler_block.py
+
+"""
+import sys
+sys.path.append('freedata_server')
+
+import timeit
+import numpy as np
+import codec2
+
+ITERATIONS = 5000
+# 2400 and 4800 are the output and input stream block sizes of modem.RF
+BLOCK_SIZES_48 = [480, 2400, 4800, 4801]
+
+
+class allocating_resampler:
+    """ previous implementation, allocating on each call """
+
+    MEM48 = codec2.api.FDMDV_OS_TAPS_48K
+
+    def __init__(self):
+        self.filter_mem48 = np.zeros(self.MEM48)
+
+    def resample48_to_8(self, in48):
+        in48_mem = np.zeros(self.MEM48 + len(in48), dtype=np.int16)
+        in48_mem[: self.MEM48] = self.filter_mem48
+        in48_mem[self.MEM48:] = in48
+        n8 = int(len(in48) / codec2.api.FDMDV_OS_48)
+        out8 = np.zeros(n8, dtype=np.int16)
+        codec2.api.fdmdv_48_to_8_short(out8, in48_mem[self.MEM48:], n8)
+        self.filter_mem48 = in48_mem[: self.MEM48]
+        return out8
+
+
+for block_size in BLOCK_SIZES_48:
+    audio_48k = (np.random.default_rng(0).standard_normal(block_size) * 3000).astype(np.int16)
+
+    resampler = codec2.resampler(max_block_48=block_size)
+    out = np.zeros(block_size // codec2.api.FDMDV_OS_48 + 1, dtype=np.int16)
+    with_out = timeit.timeit(lambda: resampler.resample48_to_8(audio_48k, out=out), number=ITERATIONS)
+    without_out = timeit.timeit(lambda: resampler.resample48_to_8(audio_48k), number=ITERATIONS)
+
+    if block_size % codec2.api.FDMDV_OS_48 == 0:
+        legacy = allocating_resampler()
+        allocating = timeit.timeit(lambda: legacy.resample48_to_8(audio_48k), number=ITERATIONS)
+        allocating = f"{allocating / ITERATIONS * 1e6:8.2f} us"
+    else:
+        # the previous implementation asserted on these block sizes
+        allocating = "     n/a"
+
+    print(
+        f"48->8 block {block_size:5}   out= {with_out / ITERATIONS * 1e6:8.2f} us"
+        f"   copy {without_out / ITERATIONS * 1e6:8.2f} us   allocating {allocating}"
+    )
+
+for block_size in [400, 800]:
+    audio_8k = (np.random.default_rng(0).standard_normal(block_size) * 3000).astype(np.int16)
+    resampler = codec2.resampler(max_block_48=block_size * codec2.api.FDMDV_OS_48)
+    out = np.zeros(block_size * codec2.api.FDMDV_OS_48, dtype=np.int16)
+    with_out = timeit.timeit(lambda: resampler.resample8_to_48(audio_8k, out=out), number=ITERATIONS)
+    without_out = timeit.timeit(lambda: resampler.resample8_to_48(audio_8k), number=ITERATIONS)
+    print(
+        f"8->48 block {block_size:5}   out= {with_out / ITERATIONS * 1e6:8.2f} us"
+        f"   copy {without_out / ITERATIONS * 1e6:8.2f} us"
+    )
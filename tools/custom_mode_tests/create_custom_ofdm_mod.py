@@ -48,7 +48,7 @@ def demod(txbuffer):
     while audiobuffer.nbuffer >= nin:
         # demodulate audio
         nbytes = api.freedv_rawdatarx(
-            freedv, bytes_out, audiobuffer.buffer.ctypes
+            freedv, bytes_out, audiobuffer.buffer
         )
         # get current freedata_server states and write to list
         # 1 trial
@@ -87,9 +87,9 @@ txbuffer = bytearray()
 
 for frame in range(0,frames):
     #txbuffer = modulator.transmit_add_silence(txbuffer, 1000)
-    txbuffer = modulator.transmit_add_preamble(txbuffer, freedv)
-    txbuffer = modulator.transmit_create_frame(txbuffer, freedv, b'123')
-    txbuffer = modulator.transmit_add_postamble(txbuffer, freedv)
+    txbuffer = modulator.transmit_add_preamble(txbuffer, freedv, MODE)
+    txbuffer = modulator.transmit_create_frame(txbuffer, freedv, b'123', MODE)
+    txbuffer = modulator.transmit_add_postamble(txbuffer, freedv, MODE)
     txbuffer = modulator.transmit_add_silence(txbuffer, 1000)
 
 #sys.stdout.buffer.flush()
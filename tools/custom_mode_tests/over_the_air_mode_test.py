@@ -29,7 +29,7 @@ class FreeDV:
         threading.Event().wait(0.01)
 
         while audiobuffer.nbuffer >= nin:
-            nbytes = api.freedv_rawdatarx(self.freedv, bytes_out, audiobuffer.buffer.ctypes)
+            nbytes = api.freedv_rawdatarx(self.freedv, bytes_out, audiobuffer.buffer)
             rx_status = api.freedv_get_rx_status(self.freedv)
             nin = api.freedv_nin(self.freedv)
             print(f"{rx_status} - {nin}")
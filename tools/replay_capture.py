@@ -0,0 +1,69 @@
+"""
+Replay the received frames of a frame capture into the frame dispatcher,
+for reproducing protocol issues and measuring the frame handler throughput
+without a radio. Frames we would transmit in response are counted, not sent.
+
+Enable capturing with `frame_capture_file` in the MODEM section of the config.
+
+FreeDATA % python3 tools/replay_capture.py capture.fdcap --speed 10
+FreeDATA % python3 tools/replay_capture.py capture.fdcap --speed 0
+
+"""
+import sys
+sys.path.append('freedata_server')
+
+import argparse
+import queue
+import time
+from collections import Counter
+import structlog
+from config import CONFIG
+from event_manager import EventManager
+from state_manager import StateManager
+from frame_dispatcher import DISPATCHER
+import frame_capture
+
+
+class ReplayModem:
+    def __init__(self):
+        self.data_queue_received = queue.Queue()
+        self.transmitted = Counter()
+
+    def transmit(self, mode, repeats: int, repeat_delay: int, frames: bytearray) -> bool:
+        self.transmitted[getattr(mode, "name", str(mode))] += 1
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", help="frame capture file")
+    parser.add_argument("--config", default="freedata_server/config.ini.example",
+                        help="config of the station receiving the frames")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="speedup against the original timing, 0 for as fast as possible")
+    parser.add_argument("--quiet", action="store_true", help="only log warnings")
+    args = parser.parse_args()
+
+    if args.quiet:
+        structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(30))
+
+    config = CONFIG(args.config).read()
+    modem = ReplayModem()
+    states = StateManager(queue.Queue())
+    dispatcher = DISPATCHER(config, EventManager([queue.Queue()]), states, modem)
+
+    frames = list(frame_capture.read_capture(args.capture))
+    received = Counter(frame["mode_name"] for frame in frames if frame["direction"] == "rx")
+    runs = len(set(frame["run"] for frame in frames))
+    print(f"{len(frames)} frames of {runs} runs in capture, {sum(received.values())} received: {dict(received)}")
+
+    start = time.perf_counter()
+    replayed = frame_capture.replay(args.capture, dispatcher, args.speed)
+    duration = time.perf_counter() - start
+
+    print(f"replayed {replayed} frames in {duration:.3f} s, {replayed / duration:.0f} frames/s")
+    print(f"responses: {dict(modem.transmitted)}")
+
+
+if __name__ == "__main__":
+    main()